@@ -0,0 +1,163 @@
+# Batch Screening API Endpoint
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-17
+
+"""
+API endpoint running an analysis plan over many structures in one request.
+
+Results are streamed as newline-delimited JSON (one line per structure, in
+completion order, followed by a summary line), so clients can process
+results while the rest of the batch is still running.
+"""
+
+import asyncio
+import functools
+import json
+from typing import AsyncIterator, Iterator, Optional
+
+from fastapi import APIRouter, Request, UploadFile, File, Form, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from app.core.analyses import resolve_analysis_plan
+from app.core.batch import (
+    Analyzer,
+    BatchItem,
+    analyze_structure,
+    is_structure_archive,
+    iter_archive_structures,
+    iter_stored_structures,
+    run_batch,
+)
+from app.core.config import settings
+from app.core.exceptions import ZeoppFileTooLargeError
+from app.core.handler import enforce_quota
+from app.core.pipeline import resolve_pipeline, run_pipeline
+from app.utils.cleanup import cleanup_temp_directory
+from app.utils.file import save_uploaded_file
+from app.utils.logger import logger
+
+router = APIRouter()
+
+
+def _parse_json_list(value: str, field: str) -> list:
+    try:
+        items = json.loads(value)
+        if not isinstance(items, list):
+            raise ValueError(f"{field} must be a JSON list")
+    except (json.JSONDecodeError, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid {field}: {e}"
+        )
+    return items
+
+
+@router.post(
+    "/api/v1/batch",
+    summary="Screen Many Structures with One Analysis Plan",
+    tags=["Analysis"],
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}, "description": "One JSON object per line"}},
+)
+async def run_batch_screening(
+    request: Request,
+    archive: Optional[UploadFile] = File(None, description="A zip or tar(.gz/.bz2/.xz) archive of structure files."),
+    structure_ids: Optional[str] = Form(
+        None,
+        description='JSON list of IDs returned by POST /api/v1/structures (alternative to archive).'
+    ),
+    analyses: Optional[str] = Form(
+        None,
+        description='JSON list of analyses as accepted by /api/v1/profile, e.g. ["pore_diameter", '
+                    '{"analysis": "surface_area", "params": {"probe_radius": 1.82}}].'
+    ),
+    pipeline: Optional[str] = Form(
+        None,
+        description='JSON list of pipeline stages (alternative to analyses), e.g. [{"analyses": ["pore_diameter"], '
+                    '"require": [{"field": "pore_diameter.free_diameter", "op": ">=", "value": 3.0}]}, '
+                    '{"analyses": ["surface_area"]}].'
+    ),
+    ha: bool = Form(True, description="Whether to use high accuracy mode (default: True)"),
+    force_recalculate: bool = Form(False, description="Force recalculation, bypassing cache."),
+):
+    """
+    Runs every analysis of the plan on every structure and streams the results as NDJSON.
+
+    Each structure of the archive is added to the structure store and analyzed with one
+    Zeo++ invocation; results share the cache with the single-analysis endpoints. Lines
+    have `type: "result"` (with `index`, `name`, `structure_id`, `status` and `results`/
+    `errors` or `error`) and arrive as structures finish; the last line has
+    `type: "summary"`. A structure that fails does not stop the batch. With a `pipeline`,
+    result lines also carry `passed`, `stages_run` and `rejected_by`, and later stages only
+    run for structures that pass the conditions of the earlier ones.
+    """
+    if (analyses is None) == (pipeline is None):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Provide exactly one of analyses or pipeline"
+        )
+    analyze: Analyzer
+    try:
+        if pipeline is not None:
+            stages = resolve_pipeline(_parse_json_list(pipeline, "pipeline"))
+            analyze = functools.partial(run_pipeline, stages=stages, ha=ha, skip_cache=force_recalculate)
+            names = [spec.name for stage in stages for spec, _ in stage.plan]
+        elif analyses is not None:
+            plan = resolve_analysis_plan(_parse_json_list(analyses, "analyses"))
+            analyze = functools.partial(analyze_structure, plan=plan, ha=ha, skip_cache=force_recalculate)
+            names = [spec.name for spec, _ in plan]
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid {'pipeline' if pipeline is not None else 'analyses'}: {e}"
+        )
+
+    if (archive is None) == (structure_ids is None):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Provide exactly one of archive or structure_ids"
+        )
+    enforce_quota(request)
+
+    archive_path = None
+    items: Iterator[BatchItem]
+    if archive is not None:
+        try:
+            archive_path = await asyncio.to_thread(
+                save_uploaded_file, archive, prefix="batch", max_bytes=settings.batch_max_upload_size_bytes
+            )
+        except ZeoppFileTooLargeError:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File too large. Maximum size: {settings.batch_max_upload_size_mb}MB"
+            )
+        if not is_structure_archive(archive_path):
+            cleanup_temp_directory(archive_path.parent)
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="archive must be a zip or tar file"
+            )
+        items = iter_archive_structures(archive_path)
+    elif structure_ids is not None:
+        ids = _parse_json_list(structure_ids, "structure_ids")
+        if not all(isinstance(structure_id, str) for structure_id in ids):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Invalid structure_ids: expected a list of strings"
+            )
+        items = iter_stored_structures(ids)
+
+    logger.info(f"[batch] Starting batch: {names}")
+
+    async def stream() -> AsyncIterator[str]:
+        try:
+            async for line in run_batch(items, analyze):
+                if line["type"] == "summary":
+                    logger.info(f"[batch] Finished: {line['succeeded']} succeeded, {line['failed']} failed")
+                yield json.dumps(line) + "\n"
+        finally:
+            if archive_path is not None:
+                cleanup_temp_directory(archive_path.parent)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
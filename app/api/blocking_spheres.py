@@ -3,7 +3,9 @@
 # Date: 2025-06-16
 # Version: 0.2.0
 
-from fastapi import APIRouter, UploadFile, File, Form
+from typing import Optional
+
+from fastapi import APIRouter, Request, UploadFile, File, Form
 from app.models.blocking_spheres import BlockingSpheresResponse
 from app.utils.parser import parse_block_from_text
 from app.core.handler import process_zeo_request
@@ -17,7 +19,12 @@ router = APIRouter()
     tags=["Calculation"]
 )
 async def compute_blocking_spheres(
-    structure_file: UploadFile = File(..., description="A .cif, .cssr, .v1, or .arc file."),
+    request: Request,
+    structure_file: Optional[UploadFile] = File(None, description="A .cif, .cssr, .v1, or .arc file."),
+    structure_id: Optional[str] = Form(
+        None,
+        description="ID returned by POST /api/v1/structures (alternative to structure_file)."
+    ),
     probe_radius: float = Form(1.86, description="Radius of the probe molecule in Angstroms."),
     samples: int = Form(50000, description="Number of Monte Carlo samples for integration (recommended: 50000)."),
     ha: bool = Form(True, description="Enable high accuracy mode."),
@@ -41,10 +48,12 @@ async def compute_blocking_spheres(
 
     return await process_zeo_request(
         structure_file=structure_file,
+        structure_id=structure_id,
         zeo_args=zeo_args,
         output_files=[output_filename],
         parser=parse_block_from_text,
         response_model=BlockingSpheresResponse,
         task_name="blocking_spheres",
-        skip_cache=force_recalculate
+        skip_cache=force_recalculate,
+        request=request
     )
\ No newline at end of file
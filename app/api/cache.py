@@ -2,22 +2,29 @@
 # -*- coding: utf-8 -*-
 # Author: Shibo Li
 # Date: 2025-12-31
+# Updated: 2026-10-17 - Added cache eviction endpoint
+# Updated: 2026-10-17 - Added indexed cache entry listing
 # Version: 0.3.1
 
 """
 API endpoints for cache and temporary storage management.
 """
 
-from fastapi import APIRouter, HTTPException, status
+import asyncio
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, status
 from pydantic import BaseModel
 
 from app.utils.cleanup import (
     cleanup_old_temp_files,
     get_temp_storage_stats,
     get_cache_storage_stats,
-    clear_all_cache
+    clear_all_cache,
+    evict_cache_entries
 )
-from app.core.config import ENABLE_CACHE
+from app.core.config import CACHE_DIR, ENABLE_CACHE
+from app.utils.cache_index import get_cache_index
 from app.utils.logger import logger
 
 router = APIRouter(prefix="/api/v1/cache", tags=["Cache Management"])
@@ -46,6 +53,24 @@ class CacheClearResponse(BaseModel):
     entries_failed: int
 
 
+class CacheEntry(BaseModel):
+    """A single indexed cache entry."""
+    key: str
+    operation: str
+    structure_hash: str
+    size_bytes: int
+    created: float
+    last_hit: float
+    hits: int
+
+
+class CacheEntriesResponse(BaseModel):
+    """Response model for cache entry listing."""
+    entries: List[CacheEntry]
+    limit: int
+    offset: int
+
+
 @router.get(
     "/stats",
     response_model=StorageStatsResponse,
@@ -68,6 +93,37 @@ async def get_storage_stats():
     )
 
 
+@router.get(
+    "/entries",
+    response_model=CacheEntriesResponse,
+    summary="List Cache Entries"
+)
+async def list_cache_entries(
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    operation: Optional[str] = Query(None, description="Zeo++ operation, e.g. -sa"),
+    structure_hash: Optional[str] = Query(None, description="SHA-256 of the structure (structure_id)")
+):
+    """
+    List cache entries from the cache index, most recently used first.
+
+    Times are Unix timestamps. Entries written before the index existed have
+    an empty `operation` and `structure_hash`.
+    """
+    entries = await asyncio.to_thread(
+        get_cache_index(CACHE_DIR).list_entries,
+        limit=limit,
+        offset=offset,
+        operation=operation,
+        structure_hash=structure_hash
+    )
+    return CacheEntriesResponse(
+        entries=[CacheEntry(**entry) for entry in entries],
+        limit=limit,
+        offset=offset
+    )
+
+
 @router.post(
     "/cleanup",
     response_model=CleanupResponse,
@@ -100,6 +156,56 @@ async def cleanup_temp_storage(max_age_hours: float = 24.0):
     )
 
 
+class CacheEvictResponse(BaseModel):
+    """Response model for cache eviction."""
+    success: bool
+    message: str
+    expired: int
+    evicted: int
+    failed: int
+    remaining_entries: int
+    remaining_size_mb: float
+
+
+@router.post(
+    "/evict",
+    response_model=CacheEvictResponse,
+    summary="Expire and Evict Cache Entries"
+)
+async def evict_cache(
+    max_age_hours: Optional[float] = None,
+    max_size_mb: Optional[float] = None,
+    max_entries: Optional[int] = None
+):
+    """
+    Run a cache eviction pass now instead of waiting for the background task.
+
+    Entries older than `max_age_hours` are removed, then least recently used
+    entries until the cache fits `max_size_mb` and `max_entries`. Omitted
+    limits use the configured `CACHE_MAX_AGE_HOURS`, `CACHE_MAX_SIZE_MB` and
+    `CACHE_MAX_ENTRIES`; 0 disables a limit.
+    """
+    if any(v is not None and v < 0 for v in (max_age_hours, max_size_mb, max_entries)):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Eviction limits must not be negative"
+        )
+
+    logger.info("[cache] Starting cache eviction pass")
+    result = await asyncio.to_thread(
+        evict_cache_entries,
+        max_age_hours=max_age_hours,
+        max_size_bytes=int(max_size_mb * 1024 * 1024) if max_size_mb is not None else None,
+        max_entries=max_entries
+    )
+    removed = result["expired"] + result["evicted"]
+    return CacheEvictResponse(
+        success=result["failed"] == 0,
+        message=f"Removed {removed} cache entries" if removed > 0 else "Cache is within its limits",
+        **result
+    )
+
+
 @router.delete(
     "/clear",
     response_model=CacheClearResponse,
@@ -4,7 +4,9 @@
 # Updated: 2025-12-31 - Removed unused parameters
 # Version: 0.3.1
 
-from fastapi import APIRouter, UploadFile, File, Form
+from typing import Optional
+
+from fastapi import APIRouter, Request, UploadFile, File, Form
 from app.models.channel_analysis import ChannelAnalysisResponse
 from app.core.handler import process_zeo_request
 from app.utils.parser import parse_chan_from_text
@@ -19,7 +21,12 @@ router = APIRouter()
     tags=["Analysis"]
 )
 async def compute_channel_analysis(
-    structure_file: UploadFile = File(..., description="A .cif, .cssr, .v1, or .arc file."),
+    request: Request,
+    structure_file: Optional[UploadFile] = File(None, description="A .cif, .cssr, .v1, or .arc file."),
+    structure_id: Optional[str] = Form(
+        None,
+        description="ID returned by POST /api/v1/structures (alternative to structure_file)."
+    ),
     probe_radius: float = Form(1.21, description="Radius of the probe molecule in Angstroms."),
     ha: bool = Form(True, description="Whether to use high accuracy mode (default: True)"),
     force_recalculate: bool = Form(False, description="Force recalculation, bypassing cache."),
@@ -39,10 +46,12 @@ async def compute_channel_analysis(
 
     return await process_zeo_request(
         structure_file=structure_file,
+        structure_id=structure_id,
         zeo_args=zeo_args,
         output_files=[output_filename],
         parser=parse_chan_from_text,
         response_model=ChannelAnalysisResponse,
         task_name="channel_analysis",
-        skip_cache=force_recalculate
+        skip_cache=force_recalculate,
+        request=request
     )
\ No newline at end of file
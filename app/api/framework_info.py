@@ -3,7 +3,9 @@
 # Date: 2025-06-16
 # Version: 0.1.0
 
-from fastapi import APIRouter, UploadFile, File, Form
+from typing import Optional
+
+from fastapi import APIRouter, Request, UploadFile, File, Form
 from app.models.framework_info import FrameworkInfoResponse
 from app.utils.parser import parse_strinfo_from_text
 from app.core.handler import process_zeo_request
@@ -17,7 +19,12 @@ router = APIRouter()
     tags=["Structure Analysis"]
 )
 async def get_framework_info(
-    structure_file: UploadFile = File(..., description="A structure file (e.g., .cif, .cssr)."),
+    request: Request,
+    structure_file: Optional[UploadFile] = File(None, description="A structure file (e.g., .cif, .cssr)."),
+    structure_id: Optional[str] = Form(
+        None,
+        description="ID returned by POST /api/v1/structures (alternative to structure_file)."
+    ),
     ha: bool = Form(True, description="Enable high accuracy mode."),
     force_recalculate: bool = Form(False, description="Force recalculation, bypassing cache."),
 ):
@@ -33,10 +40,12 @@ async def get_framework_info(
     
     return await process_zeo_request(
         structure_file=structure_file,
+        structure_id=structure_id,
         zeo_args=zeo_args,
         output_files=[output_filename],
         parser=parse_strinfo_from_text,
         response_model=FrameworkInfoResponse,
         task_name="framework_info",
-        skip_cache=force_recalculate
+        skip_cache=force_recalculate,
+        request=request
     )
\ No newline at end of file
@@ -2,6 +2,9 @@
 # -*- coding: utf-8 -*-
 # Author: Shibo Li
 # Date: 2025-12-22
+# Updated: 2026-10-17 - Report host-wide Zeo++ process slot usage
+# Updated: 2026-10-18 - Report limits and usage of the execution lanes
+# Updated: 2026-10-18 - Process slot fields report the slow lane's share of the host budget
 # Version: 0.3.1
 
 from fastapi import APIRouter, status
@@ -11,8 +14,10 @@ import sys
 import shutil
 import subprocess
 from pathlib import Path
+from typing import Any, Dict
 
 from app.core.config import ZEO_EXECUTABLE, WORKSPACE_ROOT, ENABLE_CACHE, LOG_LEVEL, settings
+from app.core.lanes import SLOW_LANE, get_lane, lane_host_slots, lanes_status
 
 router = APIRouter()
 
@@ -35,6 +40,10 @@ class DetailedHealthResponse(BaseModel):
     log_level: str
     python_version: str
     uptime_seconds: float
+    zeopp_process_slots: int
+    zeopp_processes_running: int
+    zeopp_processes_queued: int
+    zeopp_lanes: Dict[str, Dict[str, Any]]
 
 
 # Store start time for uptime calculation
@@ -110,6 +119,7 @@ async def detailed_health_check():
     
     # Calculate uptime
     uptime = (datetime.utcnow() - _start_time).total_seconds()
+    slots = lane_host_slots(get_lane(SLOW_LANE)).status()
     
     return DetailedHealthResponse(
         status="healthy" if zeopp_available else "degraded",
@@ -122,7 +132,11 @@ async def detailed_health_check():
         cache_enabled=ENABLE_CACHE,
         log_level=LOG_LEVEL,
         python_version=f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}",
-        uptime_seconds=round(uptime, 2)
+        uptime_seconds=round(uptime, 2),
+        zeopp_process_slots=slots["capacity"],
+        zeopp_processes_running=slots["running"],
+        zeopp_processes_queued=slots["queued"],
+        zeopp_lanes=lanes_status()
     )
 
 
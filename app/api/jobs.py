@@ -0,0 +1,231 @@
+# Asynchronous Job API Endpoints
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-17
+
+"""
+API endpoints for long-running analyses submitted as jobs.
+
+A job is answered immediately with its id; clients poll for status and
+result instead of holding a request open for the duration of the Zeo++ run.
+Directory jobs screen every structure under a server-side directory and
+report per-structure results as items.
+"""
+
+import asyncio
+import json
+from typing import List, Optional
+
+from fastapi import APIRouter, Query, UploadFile, File, Form, HTTPException, status
+from fastapi.responses import JSONResponse
+
+from app.core.admission import AdmissionError
+from app.core.deadlines import DeadlineExceededError
+from app.core.handler import raise_deadline_exceeded, raise_not_admitted, submit_job_response
+from app.core.jobs import job_dispatcher, job_item_response, job_response, submit_job
+from app.models.job import JobItemResponse, JobResponse
+from app.utils.job_store import FINAL_STATES, RUNNING
+
+router = APIRouter(prefix="/api/v1/jobs", tags=["Jobs"])
+
+
+def _parse_json_list(value: str, field: str) -> list:
+    try:
+        items = json.loads(value)
+        if not isinstance(items, list):
+            raise ValueError(f"{field} must be a JSON list")
+    except (json.JSONDecodeError, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid {field}: {e}"
+        )
+    return items
+
+
+def _job_or_404(job_id: str) -> dict:
+    job = job_dispatcher.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job not found: {job_id}")
+    return job
+
+
+@router.post(
+    "",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Submit an Analysis Job"
+)
+async def submit_analysis_job(
+    structure_file: Optional[UploadFile] = File(None, description="A .cif, .cssr, .v1, or .arc file."),
+    structure_id: Optional[str] = Form(
+        None,
+        description="ID returned by POST /api/v1/structures (alternative to structure_file)."
+    ),
+    analyses: Optional[str] = Form(
+        None,
+        description='An analysis name, e.g. "channel_analysis", or a JSON list of analyses as accepted by '
+                    '/api/v1/profile, e.g. [{"analysis": "accessible_volume", "params": {"samples": 50000}}].'
+    ),
+    pipeline: Optional[str] = Form(
+        None,
+        description='JSON list of pipeline stages (alternative to analyses), e.g. [{"analyses": ["pore_diameter"], '
+                    '"require": [{"field": "pore_diameter.free_diameter", "op": ">=", "value": 3.0}]}, '
+                    '{"analyses": ["surface_area"]}].'
+    ),
+    ha: bool = Form(True, description="Whether to use high accuracy mode (default: True)"),
+    force_recalculate: bool = Form(False, description="Force recalculation, bypassing cache."),
+) -> JSONResponse:
+    """
+    Queue analyses of one structure and return the job immediately (202 Accepted).
+
+    A single analysis name yields an `analysis` job whose result has the format of the
+    corresponding analysis endpoint; a list yields a `profile` job whose result has the
+    format of `/api/v1/profile`; a `pipeline` yields a `pipeline` job that runs its stages
+    until a condition fails. Uploaded structures are added to the structure store.
+    Poll the URL in the `Location` header for progress and the result.
+    """
+    stages = None
+    if pipeline is not None and analyses is None:
+        kind, items, stages = "pipeline", None, _parse_json_list(pipeline, "pipeline")
+    elif analyses is not None and pipeline is None:
+        try:
+            items = json.loads(analyses)
+        except json.JSONDecodeError:
+            items = analyses.strip()
+        if isinstance(items, str):
+            kind, items = "analysis", [items]
+        elif isinstance(items, list):
+            kind = "profile"
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Invalid analyses: expected an analysis name or a JSON list"
+            )
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Provide exactly one of analyses or pipeline"
+        )
+    return submit_job_response(
+        kind=kind,
+        analyses=items,
+        structure_file=structure_file,
+        structure_id=structure_id,
+        ha=ha,
+        skip_cache=force_recalculate,
+        pipeline=stages,
+    )
+
+
+@router.post(
+    "/directory",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Submit a Directory Screening Job"
+)
+async def submit_directory_job(
+    path: str = Form(
+        ...,
+        description='Absolute directory or glob under MCP_ALLOWED_PATH_ROOTS, e.g. "/shared/mofs" or '
+                    '"/shared/mofs/**/*.cif".'
+    ),
+    analyses: Optional[str] = Form(None, description="JSON list of analyses as accepted by /api/v1/profile."),
+    pipeline: Optional[str] = Form(None, description="JSON list of pipeline stages (alternative to analyses)."),
+    ha: bool = Form(True, description="Whether to use high accuracy mode (default: True)"),
+    force_recalculate: bool = Form(False, description="Force recalculation, bypassing cache."),
+) -> JSONResponse:
+    """
+    Queue a screening of every structure file under a server-side directory (202 Accepted).
+
+    The directory is walked while the job runs. Each finished structure is checkpointed,
+    so a job interrupted by a restart resumes with the remaining structures. Per-structure
+    results are listed by `GET /api/v1/jobs/{job_id}/items`. With a `pipeline`, later
+    stages only run for structures that pass the conditions of the earlier ones.
+    """
+    items = _parse_json_list(analyses, "analyses") if analyses is not None else None
+    stages = _parse_json_list(pipeline, "pipeline") if pipeline is not None else None
+    try:
+        job = await asyncio.to_thread(
+            submit_job, "directory", items, ha=ha, force_recalculate=force_recalculate, path=path, pipeline=stages
+        )
+    except AdmissionError as e:
+        raise_not_admitted(e)
+    except DeadlineExceededError as e:
+        raise_deadline_exceeded(e)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=job_response(job).model_dump(),
+        headers={"Location": f"/api/v1/jobs/{job['id']}"},
+    )
+
+
+@router.get(
+    "",
+    response_model=List[JobResponse],
+    summary="List Jobs"
+)
+async def list_jobs(
+    job_status: Optional[str] = Query(None, alias="status", description="Only jobs in this state"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of jobs returned"),
+    offset: int = Query(0, ge=0, description="Number of jobs skipped"),
+):
+    """List jobs, most recently submitted first."""
+    jobs = await asyncio.to_thread(job_dispatcher.store.list_jobs, job_status, limit, offset)
+    return [job_response(job) for job in jobs]
+
+
+@router.get(
+    "/{job_id}",
+    response_model=JobResponse,
+    summary="Get Job Status and Result"
+)
+async def get_job(job_id: str):
+    """Return the state, progress and, once finished, the result or error of a job."""
+    return job_response(await asyncio.to_thread(_job_or_404, job_id))
+
+
+@router.get(
+    "/{job_id}/items",
+    response_model=List[JobItemResponse],
+    summary="List Per-Structure Results of a Job"
+)
+async def list_job_items(
+    job_id: str,
+    item_status: Optional[str] = Query(None, alias="status", description="Only succeeded or failed structures"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of items returned"),
+    offset: int = Query(0, ge=0, description="Number of items skipped"),
+):
+    """List the structures a directory job has finished, in completion order."""
+    await asyncio.to_thread(_job_or_404, job_id)
+    items = await asyncio.to_thread(job_dispatcher.store.list_items, job_id, item_status, limit, offset)
+    return [job_item_response(item) for item in items]
+
+
+@router.delete(
+    "/{job_id}",
+    response_model=JobResponse,
+    summary="Cancel or Delete a Job"
+)
+async def delete_job(job_id: str):
+    """
+    Cancel a queued or running job, or delete a finished one.
+
+    Queued jobs are cancelled at once. For running jobs cancellation is requested
+    (202 Accepted); the worker running it stops Zeo++ within a few seconds. Finished
+    jobs are removed together with their result.
+    """
+    job = await asyncio.to_thread(_job_or_404, job_id)
+    if job["status"] in FINAL_STATES:
+        await asyncio.to_thread(job_dispatcher.store.delete, job_id)
+        return job_response(job)
+
+    cancelled = await asyncio.to_thread(job_dispatcher.store.request_cancel, job_id)
+    if cancelled is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job not found: {job_id}")
+    job = cancelled
+    job_dispatcher.wake()
+    if job["status"] == RUNNING:
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=job_response(job).model_dump())
+    return job_response(job)
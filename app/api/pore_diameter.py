@@ -5,7 +5,9 @@
 # Date: 2025-05-13
 
 
-from fastapi import APIRouter, UploadFile, File, Form
+from typing import Optional
+
+from fastapi import APIRouter, Request, UploadFile, File, Form
 from app.models.pore_diameter import PoreDiameterResponse
 from app.utils.parser import parse_res_from_text
 from app.core.handler import process_zeo_request 
@@ -19,7 +21,12 @@ router = APIRouter()
     tags=["Analysis"]
 )
 async def compute_pore_diameter(
-    structure_file: UploadFile = File(..., description="A .cif, .cssr, .v1, or .arc file."),
+    request: Request,
+    structure_file: Optional[UploadFile] = File(None, description="A .cif, .cssr, .v1, or .arc file."),
+    structure_id: Optional[str] = Form(
+        None,
+        description="ID returned by POST /api/v1/structures (alternative to structure_file)."
+    ),
     ha: bool = Form(True, description="Enable high accuracy mode."),
     force_recalculate: bool = Form(False, description="Force recalculation, bypassing cache."),
 ):
@@ -34,10 +41,12 @@ async def compute_pore_diameter(
     
     return await process_zeo_request(
         structure_file=structure_file,
+        structure_id=structure_id,
         zeo_args=zeo_args,
         output_files=[output_filename],
         parser=parse_res_from_text,
         response_model=PoreDiameterResponse,
         task_name="pore_diameter",
-        skip_cache=force_recalculate
+        skip_cache=force_recalculate,
+        request=request
     )
\ No newline at end of file
@@ -2,19 +2,33 @@
 # Author: Shibo Li
 # Date: 2025-06-16
 # Updated: 2026-02-25 - Async execution, robust cache behavior, temp cleanup
+# Updated: 2026-10-17 - Accept structure_id from the structure store
+# Updated: 2026-10-17 - Share canonical cache entries with the MCP PSD tool
+# Updated: 2026-10-17 - Only complete (manifested) cache entries are served
+# Updated: 2026-10-17 - Abandon the run when the client disconnects
+# Updated: 2026-10-18 - Predicted runtime in the X-Predicted-Runtime header
+# Updated: 2026-10-18 - Admission control before the run
+# Updated: 2026-10-18 - Runs that miss the client deadline answer 504
+# Updated: 2026-10-18 - Failed runs answer like the other analyses (503 on a full lane, 504 on timeout)
 
-from pathlib import Path
 from typing import Optional
 
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile, status
+from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile, status
 from fastapi.responses import FileResponse
 from starlette.background import BackgroundTask
 
 from app.core.config import settings
-from app.core.middleware import get_allowed_extensions_str, validate_structure_file
+from app.core.handler import (
+    admitted,
+    announce_prediction,
+    await_unless_disconnected,
+    prepare_structure_input,
+    raise_execution_error,
+)
 from app.core.runner import ZeoRunner
-from app.utils.cleanup import cleanup_temp_directory
-from app.utils.file import compute_cache_key, get_cache_path, save_uploaded_file
+from app.utils.cache_entry import find_cached_file
+from app.utils.cleanup import cleanup_temp_directory, touch_cache_entry
+from app.utils.file import compute_cache_key, get_cache_path
 from app.utils.logger import logger
 
 router = APIRouter()
@@ -28,7 +42,12 @@ runner = ZeoRunner()
     tags=["Analysis"]
 )
 async def download_pore_size_dist(
-    structure_file: UploadFile = File(..., description="A .cif, .cssr, .v1, or .arc file."),
+    request: Request,
+    structure_file: Optional[UploadFile] = File(None, description="A .cif, .cssr, .v1, or .arc file."),
+    structure_id: Optional[str] = Form(
+        None,
+        description="ID returned by POST /api/v1/structures (alternative to structure_file)."
+    ),
     probe_radius: float = Form(1.21, description="Radius of the probe for MC sampling. Must be <= chan_radius."),
     chan_radius: Optional[float] = Form(None, description="Radius for accessibility check. Defaults to probe_radius."),
     samples: int = Form(50000, description="Number of Monte Carlo samples per unit cell for integration."),
@@ -39,18 +58,6 @@ async def download_pore_size_dist(
     Calculates the pore size distribution and returns the resulting .psd_histo file for download.
     Corresponds to the `-psd` flag in Zeo++.
     """
-    if not validate_structure_file(structure_file.filename):
-        raise HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail=f"Invalid file type. Allowed extensions: {get_allowed_extensions_str()}"
-        )
-
-    if structure_file.size and structure_file.size > settings.max_upload_size_bytes:
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"File too large. Maximum size: {settings.max_upload_size_mb}MB"
-        )
-
     task_name = "psd_download"
     logger.info(f"[{task_name}] Received new request.")
 
@@ -61,7 +68,7 @@ async def download_pore_size_dist(
             detail=f"Invalid radii: probe_radius ({probe_radius}) cannot be greater than chan_radius ({effective_chan_radius})."
         )
 
-    input_path = save_uploaded_file(structure_file, prefix=task_name)
+    input_path, content_hash = prepare_structure_input(structure_file, structure_id, task_name)
     temp_dir = input_path.parent
     cleanup_scheduled = False
 
@@ -76,42 +83,49 @@ async def download_pore_size_dist(
             zeo_args.insert(0, "-ha")
 
         final_runner_args = zeo_args + [input_path.name]
-        cache_key = compute_cache_key(input_path, final_runner_args, task_name)
+        cache_key = compute_cache_key(input_path, final_runner_args, content_hash=content_hash)
         cache_path = get_cache_path(cache_key)
 
         final_output_filename = f"{input_path.stem}.psd_histo"
-        cached_file_path = cache_path / final_output_filename
+        # The cached histogram keeps the name of the upload that produced it.
+        cached_file_path = find_cached_file(cache_path, ".psd_histo") if settings.enable_cache else None
         generated_file_path = temp_dir / final_output_filename
 
-        if settings.enable_cache and not force_recalculate and cached_file_path.exists():
+        if cached_file_path is not None and not force_recalculate:
             logger.info(f"[{task_name}] Cache hit. Returning file: {cached_file_path}")
+            touch_cache_entry(cache_path)
             cleanup_temp_directory(temp_dir)
-            download_name = f"{Path(structure_file.filename or 'result').name}.psd_histo"
+            download_name = f"{input_path.name}.psd_histo"
             return FileResponse(path=cached_file_path, media_type="text/plain", filename=download_name)
 
+        predicted = await announce_prediction(request, input_path, final_runner_args)
         logger.info(
             f"[{task_name}] "
             f"{'Force recalculate requested. ' if force_recalculate else 'Cache miss. '}Running Zeo++..."
         )
-        result = await runner.run_command_async(
-            structure_file=input_path,
-            zeo_args=final_runner_args,
-            output_files=[final_output_filename],
-            extra_identifier=task_name,
-            skip_cache=force_recalculate
-        )
+        with admitted(request, final_runner_args, predicted):
+            result = await await_unless_disconnected(
+                request,
+                runner.run_command_async(
+                    structure_file=input_path,
+                    zeo_args=final_runner_args,
+                    output_files=[final_output_filename],
+                    skip_cache=force_recalculate,
+                    content_hash=content_hash
+                ),
+                task_name
+            )
 
         if not result["success"]:
-            stderr_content = result.get("stderr", "No stderr captured, command may have failed silently.")
-            error_msg = f"Zeo++ command failed for output '{final_output_filename}'."
-            logger.display_error_panel(f"{task_name} Failed", f"{error_msg}\n\n{stderr_content}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail={"message": error_msg, "stderr": stderr_content}
-            )
+            raise_execution_error(task_name, result)
 
+        if result.get("cached"):
+            cached_file_path = find_cached_file(cache_path, ".psd_histo")
+        elif final_output_filename in result["output_data"]:
+            # Zeo++ ran in a private run directory; materialize the histogram for the download.
+            generated_file_path.write_text(result["output_data"][final_output_filename], encoding="utf-8")
         final_file_path = cached_file_path if result.get("cached") else generated_file_path
-        if not final_file_path.exists():
+        if final_file_path is None or not final_file_path.exists():
             error_msg = f"Expected output file '{final_output_filename}' was not generated."
             logger.display_error_panel(f"{task_name} Failed", error_msg)
             raise HTTPException(
@@ -120,7 +134,7 @@ async def download_pore_size_dist(
             )
 
         logger.success(f"[{task_name}] Task complete. Sending file for download: {final_file_path}")
-        download_name = f"{Path(structure_file.filename or 'result').name}.psd_histo"
+        download_name = f"{input_path.name}.psd_histo"
 
         if result.get("cached"):
             cleanup_temp_directory(temp_dir)
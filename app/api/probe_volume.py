@@ -2,12 +2,17 @@
 # Author: Shibo Li
 # Date: 2025-06-16
 # Updated: 2025-12-31 - Removed unused parameters
+# Updated: 2026-10-18 - samples=auto chooses the Monte Carlo sample count
 # Version: 0.3.1
 
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, status
+from typing import Literal, Optional, Union
+
+from fastapi import APIRouter, Request, UploadFile, File, Form, HTTPException, status
 from app.models.probe_volume import ProbeVolumeResponse
 from app.utils.parser import parse_volpo_from_text
-from app.core.handler import process_zeo_request
+from app.core.analyses import get_analysis
+from app.core.handler import process_adaptive_request, process_zeo_request
+from app.core.montecarlo import AUTO_SAMPLES
 
 router = APIRouter()
 
@@ -19,10 +24,24 @@ router = APIRouter()
     tags=["Analysis"]
 )
 async def compute_probe_volume(
-    structure_file: UploadFile = File(..., description="A .cif, .cssr, .v1, or .arc file."),
+    request: Request,
+    structure_file: Optional[UploadFile] = File(None, description="A .cif, .cssr, .v1, or .arc file."),
+    structure_id: Optional[str] = Form(
+        None,
+        description="ID returned by POST /api/v1/structures (alternative to structure_file)."
+    ),
     chan_radius: float = Form(1.21, description="Channel radius in Angstroms."),
     probe_radius: float = Form(1.21, description="Radius of the probe molecule in Angstroms."),
-    samples: int = Form(50000, description="Number of Monte Carlo samples for integration (recommended: 50000)."),
+    samples: Union[int, Literal["auto"]] = Form(
+        50000,
+        description="Number of Monte Carlo samples for integration (recommended: 50000), "
+                    "or 'auto' to choose it from the requested tolerance."
+    ),
+    tolerance: Optional[float] = Form(
+        None,
+        description="samples=auto: largest relative change of the primary metric between "
+                    "successive runs with doubling samples (default: MC_AUTO_TOLERANCE)."
+    ),
     ha: bool = Form(True, description="Whether to use high accuracy mode (default: True)"),
     force_recalculate: bool = Form(False, description="Force recalculation, bypassing cache."),
 ):
@@ -37,6 +56,19 @@ async def compute_probe_volume(
             detail=f"Invalid radii: probe_radius ({probe_radius}) cannot be greater than chan_radius ({effective_chan_radius})."
         )
 
+    if samples == AUTO_SAMPLES:
+        spec = get_analysis("probe_volume")
+        return await process_adaptive_request(
+            structure_file=structure_file,
+            structure_id=structure_id,
+            spec=spec,
+            params=spec.resolve_params({"chan_radius": effective_chan_radius, "probe_radius": probe_radius}),
+            tolerance=tolerance,
+            ha=ha,
+            skip_cache=force_recalculate,
+            request=request
+        )
+
     output_filename = "result.volpo"
     zeo_args = [
         "-volpo",
@@ -50,10 +82,12 @@ async def compute_probe_volume(
 
     return await process_zeo_request(
         structure_file=structure_file,
+        structure_id=structure_id,
         zeo_args=zeo_args,
         output_files=[output_filename],
         parser=parse_volpo_from_text,
         response_model=ProbeVolumeResponse,
         task_name="probe_volume",
-        skip_cache=force_recalculate
+        skip_cache=force_recalculate,
+        request=request
     )
\ No newline at end of file
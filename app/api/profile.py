@@ -0,0 +1,61 @@
+# Structure Profile API Endpoint (several analyses, one Zeo++ invocation)
+# Author: Shibo Li
+# Date: 2026-10-17
+
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Request, UploadFile, File, Form, HTTPException, status
+from app.models.profile import ProfileResponse
+from app.core.analyses import resolve_analysis_plan
+from app.core.handler import process_profile_request
+
+router = APIRouter()
+
+
+@router.post(
+    "/api/v1/profile",
+    response_model=ProfileResponse,
+    summary="Run Several Analyses in One Zeo++ Invocation",
+    tags=["Analysis"]
+)
+async def compute_profile(
+    request: Request,
+    structure_file: Optional[UploadFile] = File(None, description="A .cif, .cssr, .v1, or .arc file."),
+    structure_id: Optional[str] = Form(
+        None,
+        description="ID returned by POST /api/v1/structures (alternative to structure_file)."
+    ),
+    analyses: str = Form(
+        ...,
+        description='JSON list of analyses, e.g. ["pore_diameter", {"analysis": "surface_area", '
+                    '"params": {"probe_radius": 1.82, "samples": 2000}}].'
+    ),
+    ha: bool = Form(True, description="Whether to use high accuracy mode (default: True)"),
+    force_recalculate: bool = Form(False, description="Force recalculation, bypassing cache."),
+):
+    """
+    Runs several analyses (`-res`, `-sa`, `-vol`, `-volpo`, `-chan`, `-strinfo`, `-oms`, `-block`)
+    against one structure. Uncached analyses are combined into a single Zeo++ command line so the
+    Voronoi decomposition is computed once; every sub-result is cached under the same key as the
+    corresponding single-analysis endpoint.
+    """
+    try:
+        items = json.loads(analyses)
+        if not isinstance(items, list):
+            raise ValueError("analyses must be a JSON list")
+        plan = resolve_analysis_plan(items)
+    except (json.JSONDecodeError, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid analyses: {e}"
+        )
+
+    return await process_profile_request(
+        structure_file=structure_file,
+        structure_id=structure_id,
+        plan=plan,
+        ha=ha,
+        skip_cache=force_recalculate,
+        request=request
+    )
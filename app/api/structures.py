@@ -0,0 +1,71 @@
+# Structure Store API Endpoints (upload once, analyze many)
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-17
+
+"""
+API endpoints for the content-addressed structure store.
+"""
+
+from dataclasses import asdict
+
+from fastapi import APIRouter, UploadFile, File, HTTPException, status
+
+from app.core.config import settings
+from app.core.handler import raise_file_too_large, validate_upload
+from app.core.exceptions import ZeoppFileTooLargeError, ZeoppStructureNotFoundError
+from app.models.structure import StructureResponse
+from app.utils.structure_store import delete_structure, get_structure, store_structure
+
+router = APIRouter(prefix="/api/v1/structures", tags=["Structures"])
+
+
+@router.post(
+    "",
+    response_model=StructureResponse,
+    summary="Upload a Structure Once"
+)
+async def upload_structure(
+    structure_file: UploadFile = File(..., description="A .cif, .cssr, .v1, or .arc file."),
+):
+    """
+    Store a structure file and return its `structure_id`.
+
+    The id is the SHA-256 of the content, so uploading the same content again
+    returns the same id. Every analysis endpoint accepts `structure_id` in
+    place of `structure_file`.
+    """
+    validate_upload(structure_file)
+    try:
+        stored = store_structure(
+            structure_file.file,
+            structure_file.filename,
+            max_bytes=settings.max_upload_size_bytes
+        )
+    except ZeoppFileTooLargeError:
+        raise_file_too_large()
+    return StructureResponse(**asdict(stored))
+
+
+@router.get(
+    "/{structure_id}",
+    response_model=StructureResponse,
+    summary="Get Stored Structure Metadata"
+)
+async def get_stored_structure(structure_id: str):
+    """Return metadata of a stored structure."""
+    try:
+        return StructureResponse(**asdict(get_structure(structure_id)))
+    except ZeoppStructureNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=e.message)
+
+
+@router.delete(
+    "/{structure_id}",
+    summary="Delete a Stored Structure"
+)
+async def delete_stored_structure(structure_id: str):
+    """Remove a structure from the store. Cached results are not affected."""
+    if not delete_structure(structure_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Structure not found: {structure_id}")
+    return {"success": True, "structure_id": structure_id}
@@ -2,13 +2,18 @@
 # Author: Shibo Li
 # Date: 2025-06-16
 # Updated: 2025-12-31 - Removed unused parameters
+# Updated: 2026-10-18 - samples=auto chooses the Monte Carlo sample count
 # Version: 0.3.1
 
 
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, status
+from typing import Literal, Optional, Union
+
+from fastapi import APIRouter, Request, UploadFile, File, Form, HTTPException, status
 from app.models.surface_area import SurfaceAreaResponse
 from app.utils.parser import parse_sa_from_text
-from app.core.handler import process_zeo_request
+from app.core.analyses import get_analysis
+from app.core.handler import process_adaptive_request, process_zeo_request
+from app.core.montecarlo import AUTO_SAMPLES
 
 router = APIRouter()
 
@@ -20,10 +25,24 @@ router = APIRouter()
     tags=["Analysis"]
 )
 async def compute_surface_area(
-    structure_file: UploadFile = File(..., description="A .cif, .cssr, .v1, or .arc file."),
+    request: Request,
+    structure_file: Optional[UploadFile] = File(None, description="A .cif, .cssr, .v1, or .arc file."),
+    structure_id: Optional[str] = Form(
+        None,
+        description="ID returned by POST /api/v1/structures (alternative to structure_file)."
+    ),
     chan_radius: float = Form(1.21, description="Channel radius in Angstroms."),
     probe_radius: float = Form(1.21, description="Radius of the probe molecule in Angstroms."),
-    samples: int = Form(2000, description="Number of Monte Carlo samples for integration."),
+    samples: Union[int, Literal["auto"]] = Form(
+        2000,
+        description="Number of Monte Carlo samples for integration, "
+                    "or 'auto' to choose it from the requested tolerance."
+    ),
+    tolerance: Optional[float] = Form(
+        None,
+        description="samples=auto: largest relative change of the primary metric between "
+                    "successive runs with doubling samples (default: MC_AUTO_TOLERANCE)."
+    ),
     ha: bool = Form(True, description="Whether to use high accuracy mode (default: True)"),
     force_recalculate: bool = Form(False, description="Force recalculation, bypassing cache."),
 ):
@@ -39,6 +58,19 @@ async def compute_surface_area(
             detail=f"Invalid radii: probe_radius ({probe_radius}) cannot be greater than chan_radius ({effective_chan_radius})."
         )
 
+    if samples == AUTO_SAMPLES:
+        spec = get_analysis("surface_area")
+        return await process_adaptive_request(
+            structure_file=structure_file,
+            structure_id=structure_id,
+            spec=spec,
+            params=spec.resolve_params({"chan_radius": effective_chan_radius, "probe_radius": probe_radius}),
+            tolerance=tolerance,
+            ha=ha,
+            skip_cache=force_recalculate,
+            request=request
+        )
+
     output_filename = "result.sa"
     zeo_args = [
         "-sa",
@@ -53,10 +85,12 @@ async def compute_surface_area(
 
     return await process_zeo_request(
         structure_file=structure_file,
+        structure_id=structure_id,
         zeo_args=zeo_args,
         output_files=[output_filename],
         parser=parse_sa_from_text,
         response_model=SurfaceAreaResponse,
         task_name="surface_area",
-        skip_cache=force_recalculate
+        skip_cache=force_recalculate,
+        request=request
     )
\ No newline at end of file
@@ -0,0 +1,74 @@
+# Probe-Radius Sweep API Endpoint
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-18
+
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Request, UploadFile, File, Form, HTTPException, status
+from app.models.sweep import SweepResponse
+from app.core.analyses import get_analysis
+from app.core.handler import process_sweep_request
+from app.core.sweep import SWEEP_ANALYSES, resolve_sweep, sweep_radii
+
+router = APIRouter()
+
+
+@router.post(
+    "/api/v1/sweep",
+    response_model=SweepResponse,
+    summary="Run One Analysis over a Range of Probe Radii",
+    tags=["Analysis"]
+)
+async def compute_sweep(
+    request: Request,
+    structure_file: Optional[UploadFile] = File(None, description="A .cif, .cssr, .v1, or .arc file."),
+    structure_id: Optional[str] = Form(
+        None,
+        description="ID returned by POST /api/v1/structures (alternative to structure_file)."
+    ),
+    analysis: str = Form(..., description=f"Analysis to sweep: {', '.join(SWEEP_ANALYSES)}"),
+    radii: Optional[str] = Form(None, description="JSON list of probe radii, e.g. [1.2, 1.5, 1.82]."),
+    radius_start: Optional[float] = Form(None, description="First probe radius of a range (alternative to radii)."),
+    radius_stop: Optional[float] = Form(None, description="Last probe radius of a range (inclusive)."),
+    radius_step: Optional[float] = Form(None, description="Step between the radii of a range."),
+    chan_radius: Optional[float] = Form(
+        None,
+        description="Fixed channel radius (default: equal to each probe radius); omit for blocking_spheres."
+    ),
+    samples: Optional[int] = Form(None, description="Monte Carlo samples per point (default of the analysis)."),
+    ha: bool = Form(True, description="Whether to use high accuracy mode (default: True)"),
+    force_recalculate: bool = Form(False, description="Force recalculation, bypassing cache."),
+):
+    """
+    Runs `surface_area` (`-sa`), `accessible_volume` (`-vol`), `probe_volume` (`-volpo`) or
+    `blocking_spheres` (`-block`) at every probe radius, concurrently, and returns one list per
+    metric aligned with `probe_radii`. Every point is cached under the same key as the
+    single-analysis request with that radius. At most 50 radii per sweep.
+    """
+    try:
+        values = json.loads(radii) if radii is not None else None
+        if values is not None and not isinstance(values, list):
+            raise ValueError("radii must be a JSON list")
+        points = resolve_sweep(
+            analysis,
+            sweep_radii(values, radius_start, radius_stop, radius_step),
+            chan_radius=chan_radius,
+            samples=samples,
+        )
+    except (json.JSONDecodeError, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid sweep: {e}"
+        )
+
+    return await process_sweep_request(
+        structure_file=structure_file,
+        structure_id=structure_id,
+        spec=get_analysis(analysis),
+        points=points,
+        ha=ha,
+        skip_cache=force_recalculate,
+        request=request
+    )
@@ -0,0 +1,161 @@
+# Admission Control for Zeo++ Runs
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-18
+
+"""
+Early rejection of synchronous analysis requests the service cannot serve in time.
+
+The per-IP request rate limit (``app/core/limiter.py``) does not account for
+compute, so a burst of heavy requests would queue up behind the lanes'
+schedulers and hold their uploads until they time out. Before a request
+starts its Zeo++ run, :func:`admit` checks:
+
+- **Saturation** (503): the queue of the run's execution lane is full, or the
+  run is predicted to wait longer than ``ADMISSION_MAX_WAIT_SECONDS`` for a
+  slot on this worker (see :meth:`CostScheduler.expected_wait`).
+- **Tenant backlog** (429): the tenant already has more than
+  ``ADMISSION_TENANT_MAX_SECONDS`` of predicted Zeo++ time running or queued
+  on this worker. A tenant is identified by its API key (``X-API-Key``) or
+  bearer token, else by its client address. A single run larger than the
+  limit is still admitted when the tenant has nothing else outstanding.
+
+Both errors carry ``retry_after``, the predicted seconds until the request
+would be admitted. Cache hits and jobs are not subject to admission control.
+"""
+
+import hashlib
+import math
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Sequence
+
+from fastapi import Request
+from slowapi.util import get_remote_address
+
+from app.core.config import settings
+from app.core.lanes import LANE_NAMES, assign_lane, get_lane, lane_scheduler
+from app.core.scheduler import virtual_start
+
+
+class AdmissionError(RuntimeError):
+    """
+    Raised when a run is not admitted.
+
+    Args:
+        message: Reason for the rejection
+        retry_after: Predicted seconds until the run would be admitted
+    """
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class ServiceSaturatedError(AdmissionError):
+    """The run's execution lane is saturated (HTTP 503)."""
+    status_code = 503
+
+
+class TenantBacklogError(AdmissionError):
+    """The tenant already has too much predicted work outstanding (HTTP 429)."""
+    status_code = 429
+
+
+def _digest(secret: str) -> str:
+    return hashlib.sha256(secret.encode()).hexdigest()[:16]
+
+
+def tenant_key(request: Request) -> str:
+    """Tenant of a request: a digest of its ``X-API-Key`` or bearer token, else its client address."""
+    api_key = request.headers.get("x-api-key", "").strip()
+    if api_key:
+        return "key:" + _digest(api_key)
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer ") and authorization[7:].strip():
+        return "token:" + _digest(authorization[7:].strip())
+    return "ip:" + get_remote_address(request)
+
+
+class TenantLedger:
+    """Predicted Zeo++ seconds of the admitted runs of each tenant on this worker."""
+
+    def __init__(self):
+        self._outstanding: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def outstanding(self, tenant: str) -> float:
+        with self._lock:
+            return self._outstanding.get(tenant, 0.0)
+
+    def add(self, tenant: str, seconds: float) -> None:
+        with self._lock:
+            self._outstanding[tenant] = self._outstanding.get(tenant, 0.0) + seconds
+
+    def remove(self, tenant: str, seconds: float) -> None:
+        with self._lock:
+            remaining = self._outstanding.get(tenant, 0.0) - seconds
+            if remaining > 1e-9:
+                self._outstanding[tenant] = remaining
+            else:
+                self._outstanding.pop(tenant, None)
+
+
+tenant_ledger = TenantLedger()
+
+
+def check_admission(tenant: str, zeo_args: Sequence[str], predicted_seconds: float) -> None:
+    """
+    Decide whether a run may start queueing.
+
+    Raises:
+        ServiceSaturatedError: If the run's lane has a full queue or too long a predicted wait.
+        TenantBacklogError: If the tenant's outstanding predicted seconds would exceed the limit.
+    """
+    lane = assign_lane(zeo_args, predicted_seconds)
+    scheduler = lane_scheduler(lane)
+    if scheduler.full():
+        raise ServiceSaturatedError(
+            f"The {lane.name} execution lane is full ({scheduler.max_queued} runs queued)",
+            scheduler.expected_wait(),
+        )
+    max_wait = settings.admission_max_wait_seconds
+    if max_wait > 0:
+        wait = scheduler.expected_wait(virtual_start(predicted_seconds))
+        if wait > max_wait:
+            raise ServiceSaturatedError(
+                f"The {lane.name} execution lane is saturated (predicted wait {wait:.0f}s, limit {max_wait:.0f}s)",
+                wait - max_wait,
+            )
+    limit = settings.admission_tenant_max_seconds
+    outstanding = tenant_ledger.outstanding(tenant)
+    if limit > 0 and outstanding > 0 and outstanding + predicted_seconds > limit:
+        raise TenantBacklogError(
+            f"Too much Zeo++ work outstanding for this client ({outstanding:.0f}s predicted, limit {limit:.0f}s)",
+            (outstanding + predicted_seconds - limit) / lane.max_concurrent,
+        )
+
+
+@contextmanager
+def admit(tenant: str, zeo_args: Sequence[str], predicted_seconds: float) -> Iterator[None]:
+    """
+    Admit a run (see :func:`check_admission`) and count it against its tenant while the block runs.
+
+    Raises:
+        AdmissionError: If the run is not admitted; raised before the block runs.
+    """
+    check_admission(tenant, zeo_args, predicted_seconds)
+    tenant_ledger.add(tenant, predicted_seconds)
+    try:
+        yield
+    finally:
+        tenant_ledger.remove(tenant, predicted_seconds)
+
+
+def full_lanes_retry_after() -> int:
+    """Predicted seconds until a lane with a full queue frees a slot (at least 1)."""
+    schedulers = [lane_scheduler(get_lane(name)) for name in LANE_NAMES]
+    waits = [scheduler.expected_wait() for scheduler in schedulers if scheduler.full()]
+    return max(1, math.ceil(min(waits, default=1.0)))
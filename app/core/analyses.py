@@ -0,0 +1,289 @@
+# Registry of Zeo++ analyses that can be composed into one invocation
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-17
+# Updated: 2026-10-17 - Recover analysis parameters from a command line
+# Updated: 2026-10-17 - Numeric result fields for pipeline conditions and sweeps
+# Version: 0.3.2
+
+"""
+Declarative description of every Zeo++ analysis exposed by the service.
+
+Each :class:`AnalysisSpec` knows its Zeo++ flag, positional parameters,
+output file, parser and response model. The specs build exactly the same
+argument segments as the single-analysis routes in ``app/api``, so results
+produced through a combined invocation share cache entries with them.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, get_args
+
+from pydantic import BaseModel
+
+from app.core.exceptions import ZeoppOutputNotFoundError, ZeoppParsingError
+from app.models.accessible_volume import AccessibleVolumeResponse
+from app.models.blocking_spheres import BlockingSpheresResponse
+from app.models.channel_analysis import ChannelAnalysisResponse
+from app.models.framework_info import FrameworkInfoResponse
+from app.models.open_metal_sites import OpenMetalSitesResponse
+from app.models.pore_diameter import PoreDiameterResponse
+from app.models.probe_volume import ProbeVolumeResponse
+from app.models.surface_area import SurfaceAreaResponse
+from app.utils.parser import (
+    parse_block_from_text,
+    parse_chan_from_text,
+    parse_oms_from_text,
+    parse_res_from_text,
+    parse_sa_from_text,
+    parse_strinfo_from_text,
+    parse_vol_from_text,
+    parse_volpo_from_text,
+)
+
+
+@dataclass(frozen=True)
+class AnalysisParam:
+    """A positional Zeo++ parameter following the analysis flag."""
+    name: str
+    type: type
+    default: Any
+
+
+@dataclass(frozen=True)
+class AnalysisSpec:
+    """Static description of a single Zeo++ analysis."""
+    name: str
+    flag: str
+    output_file: str
+    parser: Callable[[str], Dict[str, Any]]
+    response_model: Type[BaseModel]
+    params: Tuple[AnalysisParam, ...] = ()
+
+    def resolve_params(self, raw: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Validate user supplied parameters and fill in defaults.
+
+        ``chan_radius`` defaults to ``probe_radius`` when omitted, mirroring
+        the pore size distribution route.
+
+        Raises:
+            ValueError: On unknown parameters, wrong types or invalid radii.
+        """
+        raw = dict(raw or {})
+        known = {p.name for p in self.params}
+        unknown = sorted(set(raw) - known)
+        if unknown:
+            raise ValueError(f"Unknown parameter(s) for {self.name}: {', '.join(unknown)}")
+
+        resolved: Dict[str, Any] = {}
+        for param in self.params:
+            value = raw.get(param.name, param.default)
+            if value is None:
+                resolved[param.name] = None
+                continue
+            try:
+                resolved[param.name] = param.type(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{self.name}.{param.name} must be of type {param.type.__name__}")
+            if resolved[param.name] <= 0:
+                raise ValueError(f"{self.name}.{param.name} must be greater than 0")
+
+        if "chan_radius" in resolved and resolved["chan_radius"] is None:
+            resolved["chan_radius"] = resolved["probe_radius"]
+        if "chan_radius" in resolved and resolved["probe_radius"] > resolved["chan_radius"]:
+            raise ValueError(
+                f"Invalid radii: probe_radius ({resolved['probe_radius']}) cannot be greater "
+                f"than chan_radius ({resolved['chan_radius']})."
+            )
+        return resolved
+
+    def build_args(self, params: Dict[str, Any]) -> List[str]:
+        """Build the ``<flag> <params...> <output>`` argument segment."""
+        return [self.flag, *(str(params[p.name]) for p in self.params), self.output_file]
+
+    def numeric_fields(self) -> List[str]:
+        """Result fields holding a number (int or float, possibly optional), in model order."""
+        fields = []
+        for name, info in self.response_model.model_fields.items():
+            types = set(get_args(info.annotation)) or {info.annotation}
+            if types - {type(None)} <= {int, float}:
+                fields.append(name)
+        return fields
+
+    def params_from_args(self, zeo_args: List[str]) -> Dict[str, Any]:
+        """
+        Recover the parameters from a command line built like :meth:`build_args`.
+
+        Raises:
+            ValueError: If the flag is missing or the parameters are invalid.
+        """
+        start = zeo_args.index(self.flag) + 1
+        values = zeo_args[start:start + len(self.params)]
+        return self.resolve_params({p.name: v for p, v in zip(self.params, values)})
+
+
+def _radii_and_samples(samples: int) -> Tuple[AnalysisParam, ...]:
+    """Parameters shared by the Monte Carlo analyses (-sa, -vol, -volpo)."""
+    return (
+        AnalysisParam("chan_radius", float, None),
+        AnalysisParam("probe_radius", float, 1.21),
+        AnalysisParam("samples", int, samples),
+    )
+
+
+ANALYSES: Dict[str, AnalysisSpec] = {
+    spec.name: spec
+    for spec in (
+        AnalysisSpec(
+            name="pore_diameter",
+            flag="-res",
+            output_file="result.res",
+            parser=parse_res_from_text,
+            response_model=PoreDiameterResponse,
+        ),
+        AnalysisSpec(
+            name="surface_area",
+            flag="-sa",
+            output_file="result.sa",
+            parser=parse_sa_from_text,
+            response_model=SurfaceAreaResponse,
+            params=_radii_and_samples(2000),
+        ),
+        AnalysisSpec(
+            name="accessible_volume",
+            flag="-vol",
+            output_file="result.vol",
+            parser=parse_vol_from_text,
+            response_model=AccessibleVolumeResponse,
+            params=_radii_and_samples(50000),
+        ),
+        AnalysisSpec(
+            name="probe_volume",
+            flag="-volpo",
+            output_file="result.volpo",
+            parser=parse_volpo_from_text,
+            response_model=ProbeVolumeResponse,
+            params=_radii_and_samples(50000),
+        ),
+        AnalysisSpec(
+            name="channel_analysis",
+            flag="-chan",
+            output_file="result.chan",
+            parser=parse_chan_from_text,
+            response_model=ChannelAnalysisResponse,
+            params=(AnalysisParam("probe_radius", float, 1.21),),
+        ),
+        AnalysisSpec(
+            name="framework_info",
+            flag="-strinfo",
+            output_file="result.strinfo",
+            parser=parse_strinfo_from_text,
+            response_model=FrameworkInfoResponse,
+        ),
+        AnalysisSpec(
+            name="open_metal_sites",
+            flag="-oms",
+            output_file="result.oms",
+            parser=parse_oms_from_text,
+            response_model=OpenMetalSitesResponse,
+        ),
+        AnalysisSpec(
+            name="blocking_spheres",
+            flag="-block",
+            output_file="result.block",
+            parser=parse_block_from_text,
+            response_model=BlockingSpheresResponse,
+            params=(
+                AnalysisParam("probe_radius", float, 1.86),
+                AnalysisParam("samples", int, 50000),
+            ),
+        ),
+    )
+}
+
+
+def get_analysis(name: str) -> AnalysisSpec:
+    """
+    Look up an analysis by name.
+
+    Raises:
+        ValueError: If the analysis is unknown.
+    """
+    spec = ANALYSES.get(name)
+    if spec is None:
+        raise ValueError(f"Unknown analysis '{name}'. Available: {', '.join(sorted(ANALYSES))}")
+    return spec
+
+
+def resolve_analysis_plan(items: List[Any]) -> List[Tuple[AnalysisSpec, Dict[str, Any]]]:
+    """
+    Normalize a list of analyses into ``(spec, params)`` pairs.
+
+    Each item is either an analysis name or a mapping with an ``analysis``
+    key and an optional ``params`` mapping. Every analysis may appear at
+    most once because Zeo++ writes each one to a fixed output file.
+
+    Raises:
+        ValueError: On malformed items, unknown analyses or duplicates.
+    """
+    if not items:
+        raise ValueError("At least one analysis is required")
+
+    plan: List[Tuple[AnalysisSpec, Dict[str, Any]]] = []
+    seen = set()
+    for item in items:
+        raw_params: Any
+        if isinstance(item, str):
+            name, raw_params = item, {}
+        elif isinstance(item, dict) and isinstance(item.get("analysis"), str):
+            name, raw_params = item["analysis"], item.get("params") or {}
+            if not isinstance(raw_params, dict):
+                raise ValueError(f"params for {name} must be an object")
+        else:
+            raise ValueError("Each analysis must be a name or an object with an 'analysis' key")
+
+        spec = get_analysis(name)
+        if name in seen:
+            raise ValueError(f"Analysis '{name}' was requested more than once")
+        seen.add(name)
+        plan.append((spec, spec.resolve_params(raw_params)))
+    return plan
+
+
+def parse_plan_results(
+    plan: List[Tuple[AnalysisSpec, Dict[str, Any]]],
+    results: Dict[str, Dict[str, Any]],
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """
+    Parse and validate every sub-result of a combined run.
+
+    A missing or unparsable output only fails its own analysis; the other
+    analyses of the profile are still returned.
+
+    Returns:
+        Tuple of (validated results by analysis name, errors by analysis name).
+    """
+    parsed_results: Dict[str, Dict[str, Any]] = {}
+    errors: Dict[str, Dict[str, Any]] = {}
+    for spec, _ in plan:
+        result = results[spec.name]
+        output_text = result["output_data"].get(spec.output_file)
+        if output_text is None:
+            errors[spec.name] = {
+                "message": f"Output file '{spec.output_file}' was not generated by Zeo++.",
+                "error_code": ZeoppOutputNotFoundError.error_code.value,
+            }
+            continue
+        try:
+            parsed = spec.parser(output_text)
+            parsed_results[spec.name] = spec.response_model(
+                **{**parsed, "cached": result["cached"]}
+            ).model_dump()
+        except ZeoppParsingError as e:
+            errors[spec.name] = {"message": e.message, "error_code": e.error_code.value}
+        except Exception as e:
+            errors[spec.name] = {
+                "message": f"Unexpected error while parsing '{spec.output_file}': {str(e)}",
+                "error_code": ZeoppParsingError.error_code.value,
+            }
+    return parsed_results, errors
@@ -0,0 +1,329 @@
+# Batch Screening of Many Structures
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-17
+# Updated: 2026-10-18 - Report runs rejected by a full execution lane
+# Updated: 2026-10-18 - Report runs that missed the client's deadline
+
+"""
+Server-side execution of an analysis plan over many structures.
+
+Structures come from an uploaded zip/tar archive (each member is added to
+the structure store, so repeated uploads of the same structure are stored
+once), from a list of ``structure_id``\\ s or from a directory or glob on
+the server under ``MCP_ALLOWED_PATH_ROOTS``. Sources are consumed lazily;
+at most ``concurrency`` structures are in flight at a time and results are
+yielded in completion order, so one slow structure never holds back the
+others. Each structure runs all analyses of the plan in one Zeo++
+invocation (or the stages of a pipeline, see ``app/core/pipeline.py``) and
+shares cache entries with the single-analysis endpoints.
+"""
+
+import asyncio
+import glob
+import os
+import tarfile
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import (
+    IO,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from app.core.analyses import AnalysisSpec, parse_plan_results
+from app.core.config import settings
+from app.core.deadlines import DEADLINE_EXIT_CODE
+from app.core.exceptions import ErrorCode, ZeoppFileTooLargeError, ZeoppStructureNotFoundError
+from app.core.lanes import QUEUE_FULL_EXIT_CODE
+from app.core.middleware import validate_structure_file
+from app.core.runner import OutputCallback, ZeoRunner
+from app.utils.cleanup import cleanup_temp_directory
+from app.utils.logger import logger
+from app.utils.structure_store import materialize_structure, store_structure
+
+Plan = List[Tuple[AnalysisSpec, Dict[str, Any]]]
+# Runs the batch's analyses on one stored structure, e.g. a bound analyze_structure or run_pipeline
+Analyzer = Callable[[str], Awaitable[Dict[str, Any]]]
+
+runner = ZeoRunner()
+
+
+@dataclass
+class BatchItem:
+    """One structure of a batch, or the reason it could not be read."""
+    index: int
+    name: str
+    structure_id: Optional[str] = None
+    error: Optional[Dict[str, Any]] = None
+
+
+def _error(message: str, error_code: ErrorCode) -> Dict[str, Any]:
+    return {"message": message, "error_code": error_code.value}
+
+
+async def analyze_structure(
+    structure_id: str,
+    plan: Plan,
+    ha: bool = True,
+    skip_cache: bool = False,
+    prefix: str = "batch",
+    on_output: Optional[OutputCallback] = None,
+) -> Dict[str, Any]:
+    """
+    Run a plan on a stored structure with a single Zeo++ invocation.
+
+    Returns:
+        ``{"status": "succeeded", "results", "errors", "computed"}`` or
+        ``{"status": "failed", "error"}`` when the structure is missing or
+        Zeo++ fails. Parsing errors of individual analyses are reported in
+        ``errors`` without failing the others.
+    """
+    try:
+        input_path = await asyncio.to_thread(materialize_structure, structure_id, prefix)
+    except ZeoppStructureNotFoundError as e:
+        return {"status": "failed", "error": {"message": e.message, "error_code": e.error_code.value}}
+
+    try:
+        results = await runner.run_combined_async(
+            structure_file=input_path,
+            segments=[(spec.name, spec.build_args(params), [spec.output_file]) for spec, params in plan],
+            ha=ha,
+            skip_cache=skip_cache,
+            content_hash=structure_id,
+            on_output=on_output,
+        )
+    finally:
+        cleanup_temp_directory(input_path.parent)
+
+    failed = next((r for r in results.values() if not r["success"]), None)
+    if failed is not None:
+        if failed["exit_code"] == 124:
+            message = f"Zeo++ execution timed out after {settings.zeo_command_timeout_seconds}s"
+            error = _error(message, ErrorCode.TIMEOUT)
+        elif failed["exit_code"] == QUEUE_FULL_EXIT_CODE:
+            error = _error(failed.get("stderr", "Zeo++ execution queue is full"), ErrorCode.QUEUE_FULL)
+        elif failed["exit_code"] == DEADLINE_EXIT_CODE:
+            error = _error(failed.get("stderr") or "Deadline exceeded", ErrorCode.DEADLINE_EXCEEDED)
+        else:
+            error = _error(f"Zeo++ exited with code {failed['exit_code']}.", ErrorCode.EXECUTION_FAILED)
+        error.update(exit_code=failed["exit_code"], stderr=failed.get("stderr", ""))
+        return {"status": "failed", "error": error}
+
+    parsed_results, errors = parse_plan_results(plan, results)
+    return {
+        "status": "succeeded",
+        "results": parsed_results,
+        "errors": errors,
+        "computed": [name for name, result in results.items() if not result["cached"]],
+    }
+
+
+def _is_structure_member(name: str) -> bool:
+    """Skip directories, hidden files and resource forks (``__MACOSX/._x.cif``)."""
+    path = PurePosixPath(name)
+    if any(part.startswith(".") or part == "__MACOSX" for part in path.parts):
+        return False
+    return validate_structure_file(path.name)
+
+
+def _store_member(index: int, name: str, source: IO[bytes]) -> BatchItem:
+    try:
+        stored = store_structure(source, PurePosixPath(name).name, max_bytes=settings.max_upload_size_bytes)
+    except ZeoppFileTooLargeError:
+        return BatchItem(index, name, error=_error(
+            f"Structure larger than {settings.max_upload_size_mb}MB", ErrorCode.FILE_TOO_LARGE
+        ))
+    return BatchItem(index, name, structure_id=stored.structure_id)
+
+
+def is_structure_archive(archive_path: Path) -> bool:
+    """Whether ``archive_path`` is a zip or (optionally compressed) tar archive."""
+    return zipfile.is_zipfile(archive_path) or tarfile.is_tarfile(archive_path)
+
+
+def iter_archive_structures(archive_path: Path) -> Iterator[BatchItem]:
+    """
+    Store the structure files of a zip/tar archive one at a time.
+
+    Members are streamed into the structure store as the iterator advances;
+    nothing is extracted up front. Members without an allowed structure
+    extension are skipped.
+    """
+    index = 0
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not _is_structure_member(info.filename):
+                    continue
+                with archive.open(info) as source:
+                    yield _store_member(index, info.filename, source)
+                index += 1
+        return
+
+    with tarfile.open(archive_path, "r:*") as archive:
+        for member in archive:
+            if not member.isfile() or not _is_structure_member(member.name):
+                continue
+            member_file = archive.extractfile(member)
+            if member_file is None:
+                continue
+            with member_file:
+                yield _store_member(index, member.name, member_file)
+            index += 1
+
+
+def iter_stored_structures(structure_ids: Iterable[str]) -> Iterator[BatchItem]:
+    """Batch items for structures already in the store (checked when they run)."""
+    for index, structure_id in enumerate(structure_ids):
+        yield BatchItem(index, structure_id, structure_id=structure_id)
+
+
+def _under_roots(path: Path, roots: List[Path]) -> bool:
+    return any(path.is_relative_to(root) for root in roots)
+
+
+def resolve_screening_path(path: str) -> str:
+    """
+    Validate a directory or glob pattern for server-side screening.
+
+    A directory stands for every structure file below it; a pattern is
+    expanded with ``**`` matching subdirectories. Unlike the MCP tools,
+    screening is disabled while ``MCP_ALLOWED_PATH_ROOTS`` is empty.
+
+    Returns:
+        The absolute, normalized path or pattern.
+
+    Raises:
+        ValueError: If the path is relative, outside the allowed roots, or
+            (for a plain path) not a directory.
+    """
+    roots = settings.mcp_allowed_path_roots_list
+    if not roots:
+        raise ValueError("Directory screening is disabled: MCP_ALLOWED_PATH_ROOTS is not configured")
+    candidate = Path(path).expanduser()
+    if not candidate.is_absolute():
+        raise ValueError(f"path must be absolute: {path}")
+
+    parts = candidate.parts
+    magic_at = next((i for i, part in enumerate(parts) if glob.has_magic(part)), len(parts))
+    base = Path(*parts[:magic_at]).resolve()
+    if not _under_roots(base, roots):
+        allowed = ", ".join(str(root) for root in roots)
+        raise ValueError(f"path is outside MCP_ALLOWED_PATH_ROOTS. Allowed roots: {allowed}")
+    if magic_at == len(parts):
+        if not base.is_dir():
+            raise ValueError(f"path does not exist or is not a directory: {base}")
+        return str(base)
+    return str(base.joinpath(*parts[magic_at:]))
+
+
+def iter_directory_structures(path: str, skip: Collection[str] = ()) -> Iterator[BatchItem]:
+    """
+    Store the structure files of a directory or glob one at a time.
+
+    The tree is walked lazily with :func:`glob.iglob`, so the file list is
+    never built in memory. Files are named by their absolute path; names in
+    ``skip`` (already checkpointed) are passed over without being read, and
+    symlinks leading outside the allowed roots are ignored.
+
+    Args:
+        path: Directory or pattern returned by :func:`resolve_screening_path`
+        skip: Names of files that must not be yielded again
+    """
+    roots = settings.mcp_allowed_path_roots_list
+    pattern = path if glob.has_magic(path) else os.path.join(glob.escape(path), "**", "*")
+    index = 0
+    for match in glob.iglob(pattern, recursive=True):
+        name = os.path.abspath(match)
+        if name in skip or not validate_structure_file(os.path.basename(name)):
+            continue
+        try:
+            if not os.path.isfile(name) or not _under_roots(Path(name).resolve(), roots):
+                continue
+            with open(name, "rb") as source:
+                item = _store_member(index, name, source)
+        except OSError as e:
+            item = BatchItem(index, name, error=_error(f"Cannot read structure: {e}", ErrorCode.INTERNAL_ERROR))
+        yield item
+        index += 1
+
+
+async def _run_item(item: BatchItem, analyze: Analyzer) -> Dict[str, Any]:
+    line: Dict[str, Any] = {"type": "result", "index": item.index, "name": item.name, "structure_id": item.structure_id}
+    if item.error is not None:
+        return {**line, "status": "failed", "error": item.error}
+    assert item.structure_id is not None  # set for every readable structure
+    try:
+        return {**line, **await analyze(item.structure_id)}
+    except Exception as e:
+        logger.error(f"[batch] {item.name} failed unexpectedly: {e}")
+        return {**line, "status": "failed", "error": _error(str(e), ErrorCode.INTERNAL_ERROR)}
+
+
+async def run_batch(
+    items: Iterator[BatchItem],
+    analyze: Analyzer,
+    concurrency: Optional[int] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run ``analyze`` on every item and yield one result per structure as it finishes.
+
+    Items are pulled from ``items`` (in a worker thread, since archive
+    members are read from disk) only when a slot in the window of
+    ``concurrency`` in-flight structures is free. Closing the generator
+    (e.g. the client disconnected) cancels the structures in flight.
+
+    Yields:
+        Result dicts with ``type: "result"``, followed by one
+        ``type: "summary"`` dict with the counts. ``filtered`` counts
+        succeeded structures a pipeline rejected (``passed: false``).
+    """
+    concurrency = max(1, concurrency or settings.max_concurrent_tasks)
+    pending: Set["asyncio.Task[Dict[str, Any]]"] = set()
+    exhausted = False
+    succeeded = failed = filtered = 0
+    try:
+        while True:
+            while not exhausted and len(pending) < concurrency:
+                item = await asyncio.to_thread(next, items, None)
+                if item is None:
+                    exhausted = True
+                    break
+                pending.add(asyncio.create_task(_run_item(item, analyze)))
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                line = task.result()
+                if line["status"] == "succeeded":
+                    succeeded += 1
+                    filtered += line.get("passed") is False
+                else:
+                    failed += 1
+                yield line
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        close = getattr(items, "close", None)
+        if close is not None:
+            close()
+    yield {
+        "type": "summary",
+        "total": succeeded + failed,
+        "succeeded": succeeded,
+        "failed": failed,
+        "filtered": filtered,
+    }
@@ -3,10 +3,22 @@
 # Author: Shibo Li
 # Date: 2025-05-13
 # Updated: 2025-12-31 - Migrated to Pydantic Settings for type safety
+# Updated: 2026-10-17 - Added cache eviction budgets
+# Updated: 2026-10-17 - Added in-memory parsed-result cache budget
+# Updated: 2026-10-17 - MAX_CONCURRENT_TASKS caps asyncio Zeo++ subprocesses
+# Updated: 2026-10-17 - Added policy for runs abandoned by their clients
+# Updated: 2026-10-17 - Added host-wide Zeo++ process cap
+# Updated: 2026-10-17 - Added asynchronous job retention
+# Updated: 2026-10-17 - Added batch archive size limit
+# Updated: 2026-10-18 - Added adaptive Monte Carlo sampling defaults
+# Updated: 2026-10-18 - Added aging factor of the cost-aware scheduler
+# Updated: 2026-10-18 - Added fast and slow execution lanes
+# Updated: 2026-10-18 - Added admission control limits
+# Updated: 2026-10-18 - Added per-tenant CPU-second quotas
 # Version: 0.3.1
 
 from pathlib import Path
-from typing import List
+from typing import List, Literal
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -46,7 +58,23 @@ class Settings(BaseSettings):
     )
     cache_max_age_hours: float = Field(
         default=168.0,  # 1 week
-        description="Maximum age for cached results in hours"
+        description="Maximum age for cached results in hours (0 disables age expiry)"
+    )
+    cache_max_size_mb: float = Field(
+        default=10240.0,
+        description="Cache size budget in MB; least recently used entries are evicted beyond it (0 disables)"
+    )
+    cache_max_entries: int = Field(
+        default=0,
+        description="Maximum number of cache entries; least recently used entries are evicted beyond it (0 disables)"
+    )
+    cache_eviction_interval_minutes: float = Field(
+        default=30.0,
+        description="Interval of the background cache eviction task in minutes (0 disables the task)"
+    )
+    result_memory_cache_mb: float = Field(
+        default=64.0,
+        description="Per-process memory budget in MB for parsed cache hits kept in front of the disk cache (0 disables)"
     )
     
     # Security Configuration
@@ -62,6 +90,10 @@ class Settings(BaseSettings):
         default=50,
         description="Maximum file upload size in MB"
     )
+    batch_max_upload_size_mb: int = Field(
+        default=2048,
+        description="Maximum size in MB of a structure archive uploaded to the batch endpoint"
+    )
     
     # Logging Configuration
     log_level: str = Field(
@@ -76,7 +108,12 @@ class Settings(BaseSettings):
     )
     max_concurrent_tasks: int = Field(
         default=4,
-        description="Maximum concurrent Zeo++ tasks in thread pool"
+        description="Maximum concurrent Zeo++ processes per worker"
+    )
+    host_max_concurrent_tasks: int = Field(
+        default=0,
+        description="Maximum concurrent Zeo++ processes across all workers on the host, shared through "
+        "lock files on the workspace volume (0 = number of CPUs available to the container)"
     )
     zeo_command_timeout_seconds: int = Field(
         default=1800,
@@ -84,6 +121,86 @@ class Settings(BaseSettings):
         "Operations such as `-chan` or `-oms` on large MOFs can be slow; on "
         "timeout the runner returns success=False with exit_code=124."
     )
+    scheduler_aging_factor: float = Field(
+        default=10.0,
+        description="Seconds of predicted runtime a waiting Zeo++ run or job is credited per second waited. "
+        "Runs start shortest-predicted first; aging keeps long runs from starving (0 = first come, first served)"
+    )
+    lane_assignment: Literal["operation", "predicted"] = Field(
+        default="operation",
+        description="How Zeo++ runs are assigned to the fast or slow execution lane: `operation` sends runs "
+        "made only of FAST_LANE_OPERATIONS to the fast lane, `predicted` sends runs predicted to take at most "
+        "FAST_LANE_MAX_PREDICTED_SECONDS there. The slow lane uses MAX_CONCURRENT_TASKS, the host slots "
+        "not reserved for the fast lane and ZEO_COMMAND_TIMEOUT_SECONDS."
+    )
+    fast_lane_operations: str = Field(
+        default="-res,-chan,-strinfo",
+        description="Comma-separated Zeo++ operations run in the fast lane with LANE_ASSIGNMENT=operation"
+    )
+    fast_lane_max_predicted_seconds: float = Field(
+        default=5.0,
+        description="Longest predicted runtime in seconds run in the fast lane with LANE_ASSIGNMENT=predicted"
+    )
+    fast_lane_max_concurrent_tasks: int = Field(
+        default=2,
+        description="Maximum concurrent fast-lane Zeo++ processes per worker; host-wide, both lanes together "
+        "stay within HOST_MAX_CONCURRENT_TASKS"
+    )
+    fast_lane_host_max_concurrent_tasks: int = Field(
+        default=0,
+        description="Host slots of HOST_MAX_CONCURRENT_TASKS reserved for fast-lane Zeo++ processes across all "
+        "workers; the slow lane gets the rest (0 = a quarter of the budget, at least one)"
+    )
+    fast_lane_queue_depth: int = Field(
+        default=64,
+        description="Fast-lane runs allowed to wait per worker; further runs are rejected (0 = unbounded)"
+    )
+    slow_lane_queue_depth: int = Field(
+        default=0,
+        description="Slow-lane runs allowed to wait per worker; further runs are rejected (0 = unbounded)"
+    )
+    fast_lane_timeout_seconds: int = Field(
+        default=60,
+        description="Timeout of a fast-lane Zeo++ process; a run exceeding it is killed and rerun in the slow lane"
+    )
+    admission_max_wait_seconds: float = Field(
+        default=300.0,
+        description="Synchronous analysis requests whose run is predicted to wait longer than this for a "
+        "process slot of its lane are rejected with 503 and Retry-After (0 disables)"
+    )
+    admission_tenant_max_seconds: float = Field(
+        default=3600.0,
+        description="Predicted Zeo++ seconds a tenant (bearer token or client IP) may have running or queued "
+        "per worker; further synchronous requests are rejected with 429 and Retry-After (0 disables)"
+    )
+    quota_cpu_seconds_per_hour: float = Field(
+        default=0.0,
+        description="Zeo++ CPU-seconds per hour each tenant (API key, bearer token or client IP) earns in its "
+        "token bucket; a tenant with an empty bucket gets 429 for new runs (0 disables quotas)"
+    )
+    quota_burst_cpu_seconds: float = Field(
+        default=0.0,
+        description="Capacity of a tenant's token bucket in CPU-seconds (0 = one hour's worth)"
+    )
+    quota_request_cpu_seconds: float = Field(
+        default=0.01,
+        description="CPU-seconds charged per request or MCP call on top of its Zeo++ time, so cache hits cost "
+        "almost nothing"
+    )
+    abandoned_run_policy: Literal["kill", "finish"] = Field(
+        default="kill",
+        description="What happens to a Zeo++ run once every client waiting for it has disconnected "
+        "or cancelled: `kill` terminates it, `finish` lets it complete and populate the cache."
+    )
+    job_retention_hours: float = Field(
+        default=24.0,
+        description="Hours for which finished asynchronous jobs and their results are kept"
+    )
+    mc_auto_tolerance: float = Field(
+        default=0.01,
+        description="Default largest relative change of the primary metric between successive runs "
+        "(doubling sample counts) of samples=auto"
+    )
 
     # MCP Configuration
     mcp_auth_token: str = Field(
@@ -96,8 +213,9 @@ class Settings(BaseSettings):
     )
     mcp_allowed_path_roots: str = Field(
         default="",
-        description="Comma-separated allowed root directories for structure_path input. "
-        "Empty string disables restriction (stdio mode: bootstrap sets this to $HOME,/tmp). "
+        description="Comma-separated allowed root directories for structure_path input and directory "
+        "screening jobs. Empty string disables the restriction for structure_path and disables directory "
+        "screening (stdio mode: bootstrap sets this to $HOME,/tmp). "
         "For Docker/HTTP mode, set to /app/workspace,/shared or similar."
     )
     mcp_max_result_chars: int = Field(
@@ -122,6 +240,26 @@ class Settings(BaseSettings):
         """Get max upload size in bytes."""
         return self.max_upload_size_mb * 1024 * 1024
 
+    @property
+    def batch_max_upload_size_bytes(self) -> int:
+        """Get the batch archive size limit in bytes."""
+        return self.batch_max_upload_size_mb * 1024 * 1024
+
+    @property
+    def cache_max_size_bytes(self) -> int:
+        """Get the cache size budget in bytes."""
+        return int(self.cache_max_size_mb * 1024 * 1024)
+
+    @property
+    def result_memory_cache_bytes(self) -> int:
+        """Get the in-memory parsed-result cache budget in bytes."""
+        return int(self.result_memory_cache_mb * 1024 * 1024)
+
+    @property
+    def fast_lane_operations_list(self) -> List[str]:
+        """Parse fast-lane operations from comma-separated string."""
+        return [item.strip() for item in self.fast_lane_operations.split(",") if item.strip()]
+
     @property
     def mcp_allowed_path_roots_list(self) -> List[Path]:
         """Parse allowed MCP file roots from comma-separated string."""
@@ -140,6 +278,10 @@ settings = Settings()
 WORKSPACE_ROOT = Path(settings.zeo_workspace)
 TMP_DIR = WORKSPACE_ROOT / "tmp"
 CACHE_DIR = WORKSPACE_ROOT / "cache"
+STRUCTURES_DIR = WORKSPACE_ROOT / "structures"
+JOBS_DIR = WORKSPACE_ROOT / "jobs"
+RUNTIMES_DIR = WORKSPACE_ROOT / "runtimes"
+QUOTAS_DIR = WORKSPACE_ROOT / "quotas"
 ZEO_EXECUTABLE = settings.zeo_exec_path
 ENABLE_CACHE = settings.enable_cache
 LOG_LEVEL = settings.log_level
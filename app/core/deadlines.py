@@ -0,0 +1,113 @@
+# Client Deadlines for Zeo++ Runs
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-18
+
+"""
+Client-supplied time budgets for requests, MCP calls and jobs.
+
+``ZEO_COMMAND_TIMEOUT_SECONDS`` bounds every Zeo++ process, but an
+interactive client may need an answer within seconds or not at all, while
+a screening job may have hours. REST clients send the budget in seconds in
+the ``X-Request-Timeout`` header (every route), MCP clients in the
+``timeout_seconds`` argument (every analysis tool). The budget becomes an
+absolute deadline carried in a context variable (see :func:`deadline_scope`)
+that follows the request into the runner and into the jobs it submits:
+
+- A run whose predicted runtime plus its predicted wait for a process slot
+  exceeds the remaining budget is refused before it is queued.
+- A run that waits for a slot past the deadline is dropped without starting.
+- The process timeout is shortened to the remaining budget.
+- Queued jobs whose deadline passes before they start are failed.
+
+Runs refused or stopped because of a deadline end with
+``DEADLINE_EXIT_CODE``; the API answers them with 504 and error code
+``ZEOPP_1003``, the MCP tools with ``ZEOPP_DEADLINE_EXCEEDED``.
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+# Request header carrying the client's time budget in seconds
+DEADLINE_HEADER = "X-Request-Timeout"
+# Exit code of runs refused or stopped because their deadline could not be met (ETIME)
+DEADLINE_EXIT_CODE = 62
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("zeopp_deadline", default=None)
+
+
+class DeadlineExceededError(RuntimeError):
+    """Raised when work cannot be done before the client's deadline."""
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+def parse_timeout(value: str) -> float:
+    """
+    Parse a time budget in seconds.
+
+    Raises:
+        ValueError: If the value is not a positive number.
+    """
+    try:
+        seconds = float(value)
+    except ValueError:
+        raise ValueError(f"Invalid {DEADLINE_HEADER}: expected seconds, got '{value}'")
+    if not seconds > 0 or seconds == float("inf"):
+        raise ValueError(f"Invalid {DEADLINE_HEADER}: must be a positive number of seconds")
+    return seconds
+
+
+def current_deadline() -> Optional[float]:
+    """Deadline (``time.time()`` seconds) of the code running now, or None without one."""
+    return _deadline.get()
+
+
+def remaining_seconds() -> Optional[float]:
+    """Seconds left until the current deadline (negative once passed), or None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.time()
+
+
+@contextmanager
+def deadline_scope(timeout_seconds: Optional[float] = None, deadline: Optional[float] = None) -> Iterator[None]:
+    """
+    Run the block under a deadline, given as a budget from now or as an absolute time.
+
+    A deadline can only be tightened: an enclosing earlier deadline stays in force.
+
+    Raises:
+        ValueError: If ``timeout_seconds`` is not positive.
+    """
+    if timeout_seconds is not None:
+        if not timeout_seconds > 0:
+            raise ValueError("timeout_seconds must be greater than 0")
+        deadline = time.time() + timeout_seconds
+    enclosing = _deadline.get()
+    if deadline is None or (enclosing is not None and enclosing <= deadline):
+        yield
+        return
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def check_deadline(predicted_seconds: float, what: str = "The run") -> None:
+    """
+    Refuse work predicted to take longer than the remaining budget.
+
+    Raises:
+        DeadlineExceededError: If ``predicted_seconds`` exceeds the time left.
+    """
+    remaining = remaining_seconds()
+    if remaining is not None and predicted_seconds > remaining:
+        raise DeadlineExceededError(
+            f"{what} is predicted to take {predicted_seconds:.1f}s but only {max(remaining, 0.0):.1f}s "
+            "of the time budget remain"
+        )
@@ -3,6 +3,7 @@
 # Author: Shibo Li
 # Date: 2025-12-22
 # Updated: 2025-12-31 - Added error codes and standardized error response
+# Updated: 2026-10-18 - Added error code for runs rejected by a full execution lane
 # Version: 0.3.1
 
 """
@@ -20,6 +21,7 @@ class ErrorCode(str, Enum):
     # Execution errors (1xxx)
     EXECUTION_FAILED = "ZEOPP_1001"
     TIMEOUT = "ZEOPP_1002"
+    DEADLINE_EXCEEDED = "ZEOPP_1003"
     
     # Parsing errors (2xxx)
     PARSING_FAILED = "ZEOPP_2001"
@@ -30,10 +32,12 @@ class ErrorCode(str, Enum):
     INVALID_FILE_TYPE = "ZEOPP_3001"
     FILE_TOO_LARGE = "ZEOPP_3002"
     INVALID_PARAMETER = "ZEOPP_3003"
+    STRUCTURE_NOT_FOUND = "ZEOPP_3004"
     
     # System errors (4xxx)
     INTERNAL_ERROR = "ZEOPP_4001"
     CACHE_ERROR = "ZEOPP_4002"
+    QUEUE_FULL = "ZEOPP_4003"
 
 
 class ErrorResponse(BaseModel):
@@ -138,3 +142,13 @@ class ZeoppInvalidFileTypeError(ZeoppBaseException):
             "allowed_types": allowed_types
         }
         super().__init__(message, details)
+
+
+class ZeoppStructureNotFoundError(ZeoppBaseException):
+    """Raised when a structure_id does not exist in the structure store."""
+    error_code = ErrorCode.STRUCTURE_NOT_FOUND
+
+    def __init__(self, message: str, structure_id: Optional[str] = None):
+        details = {"structure_id": structure_id}
+        super().__init__(message, details)
+        self.structure_id = structure_id
@@ -3,102 +3,472 @@
 # Date: 2025-06-16
 # Updated: 2025-12-22 - Enhanced error handling
 # Updated: 2025-12-31 - Added automatic temp file cleanup, file validation
+# Updated: 2026-10-17 - Added multi-analysis profile processing, structure_id inputs
+# Updated: 2026-10-17 - Stream uploads to disk with size cap, hash while writing
+# Updated: 2026-10-17 - Serve hot results from the in-memory parsed-result cache
+# Updated: 2026-10-17 - Abandon Zeo++ runs when the HTTP client disconnects
+# Updated: 2026-10-17 - Opt-in asynchronous responses (Prefer: respond-async) backed by jobs
+# Updated: 2026-10-18 - Probe-radius sweeps
+# Updated: 2026-10-18 - Adaptive Monte Carlo sample counts (samples=auto)
+# Updated: 2026-10-18 - Predicted Zeo++ runtime exposed in the X-Predicted-Runtime header
+# Updated: 2026-10-18 - Runs rejected by a full execution lane answer 503
+# Updated: 2026-10-18 - Admission control with 503/429 and Retry-After
+# Updated: 2026-10-18 - Runs of tenants whose CPU quota is exhausted answer 429
+# Updated: 2026-10-18 - Client deadlines (X-Request-Timeout) answer 504 when they cannot be met
 # Version: 0.3.1
 
 
-from fastapi import UploadFile, HTTPException, status
-from typing import List, Callable, Dict, Any, Type
+import asyncio
+from contextlib import ExitStack, contextmanager
+from fastapi import Request, UploadFile, HTTPException, status
+from fastapi.responses import JSONResponse
+from pathlib import Path
+from typing import (
+    Awaitable, Iterator, List, Callable, Dict, Any, NoReturn, Optional, Sequence, Tuple, Type, TypeVar, Union
+)
 from pydantic import BaseModel
 
+from app.core.admission import AdmissionError, admit, full_lanes_retry_after, tenant_key
+from app.core.analyses import ANALYSES, AnalysisSpec, parse_plan_results
 from app.core.runner import ZeoRunner
 from app.core.config import settings
-from app.core.exceptions import ZeoppParsingError, ZeoppOutputNotFoundError, ZeoppExecutionError
-from app.core.middleware import validate_structure_file, get_allowed_extensions_str
-from app.utils.file import save_uploaded_file
+from app.core.deadlines import DEADLINE_EXIT_CODE, DeadlineExceededError, remaining_seconds
+from app.core.exceptions import (
+    ErrorCode,
+    ZeoppParsingError,
+    ZeoppOutputNotFoundError,
+    ZeoppExecutionError,
+    ZeoppFileTooLargeError,
+    ZeoppStructureNotFoundError,
+)
+from app.core.jobs import job_response, submit_job
+from app.core.lanes import QUEUE_FULL_EXIT_CODE
+from app.core.montecarlo import run_adaptive
+from app.core.quota import check_quota
+from app.core.scheduler import runtime_model
+from app.core.sweep import run_sweep
+from app.models.profile import ProfileResponse
+from app.models.sweep import SweepResponse
+from app.core.middleware import RAW_RECEIVE_SCOPE_KEY, validate_structure_file, get_allowed_extensions_str
+from app.utils.cache_entry import read_cache_manifest
+from app.utils.file import compute_cache_key, get_cache_path, save_uploaded_file_hashed
+from app.utils.result_cache import result_memory_cache
+from app.utils.structure_store import get_structure, materialize_structure, store_structure
 from app.utils.cleanup import cleanup_temp_directory
 from app.utils.logger import logger
 
 # Create a singleton instance of ZeoRunner
 runner = ZeoRunner()
 
+# Interval at which a waiting request checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = 1.0
+# Non-standard status (as used by nginx) logged for requests the client abandoned
+CLIENT_CLOSED_REQUEST = 499
+
+T = TypeVar("T")
+
+
+async def await_unless_disconnected(
+    request: Optional[Request],
+    awaitable: Awaitable[T],
+    task_name: str
+) -> T:
+    """
+    Await a Zeo++ run while watching the HTTP client and its deadline.
+
+    If the client disconnects first, the wait is cancelled; the runner then
+    kills the Zeo++ process or lets it finish for the cache, according to
+    ``ABANDONED_RUN_POLICY``. The same happens when the request's deadline
+    (``X-Request-Timeout``) passes, e.g. while waiting for a shared run.
+
+    Raises:
+        HTTPException: 499 when the client disconnected, 504 when the deadline passed.
+    """
+    if request is None:
+        return await awaitable
+    # Poll the server's channel directly; BaseHTTPMiddleware hides disconnects.
+    raw_receive = request.scope.get(RAW_RECEIVE_SCOPE_KEY)
+    client = Request(request.scope, raw_receive) if raw_receive is not None else request
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            remaining = remaining_seconds()
+            timeout = DISCONNECT_POLL_SECONDS if remaining is None else max(min(DISCONNECT_POLL_SECONDS, remaining), 0)
+            done, _ = await asyncio.wait({task}, timeout=timeout)
+            if done:
+                return task.result()
+            if remaining is not None and remaining <= DISCONNECT_POLL_SECONDS:
+                logger.warning(f"[{task_name}] Deadline passed; abandoning Zeo++ run.")
+                raise HTTPException(
+                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                    detail={
+                        "message": f"Deadline exceeded for {task_name}",
+                        "error_code": ErrorCode.DEADLINE_EXCEEDED.value,
+                    },
+                )
+            if await client.is_disconnected():
+                logger.warning(f"[{task_name}] Client disconnected; abandoning Zeo++ run.")
+                raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+def validate_upload(structure_file: UploadFile) -> None:
+    """Reject uploads with a disallowed extension or an oversized payload."""
+    # Validate file extension
+    if not validate_structure_file(structure_file.filename):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid file type. Allowed extensions: {get_allowed_extensions_str()}"
+        )
+
+    # Check file size (if available)
+    if structure_file.size and structure_file.size > settings.max_upload_size_bytes:
+        raise_file_too_large()
+
+
+def raise_file_too_large() -> NoReturn:
+    """Raise the 413 response used for every oversized upload."""
+    raise HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File too large. Maximum size: {settings.max_upload_size_mb}MB"
+    )
+
+
+def structure_source(structure_file: Optional[UploadFile], structure_id: Optional[str]) -> Union[UploadFile, str]:
+    """
+    The request's structure: its upload, or the ID of a stored structure.
+
+    Raises:
+        HTTPException: 422 unless exactly one of ``structure_file`` and ``structure_id`` is given.
+    """
+    if structure_file is not None and not structure_id:
+        return structure_file
+    if structure_file is None and structure_id:
+        return structure_id
+    raise HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail="Provide exactly one of structure_file or structure_id"
+    )
+
+
+def prepare_structure_input(
+    structure_file: Optional[UploadFile],
+    structure_id: Optional[str],
+    task_name: str,
+) -> Tuple[Path, str]:
+    """
+    Place the request's structure into a fresh task directory.
+
+    Exactly one of ``structure_file`` (a new upload) or ``structure_id``
+    (a structure previously stored via ``POST /api/v1/structures``) must be
+    given.
+
+    Uploads are streamed to disk in chunks and hashed in the same pass;
+    the request fails with 413 as soon as ``max_upload_size_mb`` is exceeded,
+    even when the client did not announce the file size.
+
+    Returns:
+        Tuple of (input path, content hash). The content hash is the
+        structure_id for stored structures and the SHA-256 of the upload
+        otherwise, so the cache key never re-reads the file.
+    """
+    source = structure_source(structure_file, structure_id)
+    if isinstance(source, str):
+        try:
+            input_path = materialize_structure(source, prefix=task_name)
+        except ZeoppStructureNotFoundError as e:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail={"message": e.message, "error_code": e.error_code.value}
+            )
+        logger.info(f"[{task_name}] Using stored structure {source}")
+        return input_path, source
+
+    validate_upload(source)
+    logger.info(f"[{task_name}] Received new request. Saving file...")
+    try:
+        return save_uploaded_file_hashed(
+            source,
+            prefix=task_name,
+            max_bytes=settings.max_upload_size_bytes
+        )
+    except ZeoppFileTooLargeError:
+        raise_file_too_large()
+
+
+async def announce_prediction(request: Optional[Request], input_path: Path, zeo_args: List[str]) -> float:
+    """
+    Predict the Zeo++ runtime of a request (see ``app/core/scheduler.py``).
+
+    The prediction is returned to the client in the ``X-Predicted-Runtime``
+    header added by ``RequestTimingMiddleware``.
+    """
+    predicted = await asyncio.to_thread(runtime_model.predict, zeo_args, input_path)
+    if request is not None:
+        request.state.predicted_runtime_seconds = predicted
+    return predicted
+
+
+@contextmanager
+def admitted(
+    request: Optional[Request],
+    zeo_args: List[str],
+    predicted: float,
+    cache_keys: Sequence[str] = (),
+    skip_cache: bool = False
+) -> Iterator[None]:
+    """
+    Admission control of a request's Zeo++ run (see ``app/core/admission.py``
+    and ``app/core/quota.py``).
+
+    Runs whose results are all in the cache, and internal calls without a
+    request, are always admitted.
+
+    Raises:
+        HTTPException: 503 (saturated) or 429 (tenant backlog, CPU quota
+            exhausted) with a ``Retry-After`` header when the run is not admitted.
+    """
+    cached = (
+        settings.enable_cache and not skip_cache and bool(cache_keys)
+        and all(read_cache_manifest(get_cache_path(key)) is not None for key in cache_keys)
+    )
+    if request is None or cached:
+        yield
+        return
+    tenant = tenant_key(request)
+    with ExitStack() as stack:
+        try:
+            check_quota(tenant)
+            stack.enter_context(admit(tenant, zeo_args, predicted))
+        except AdmissionError as e:
+            raise_not_admitted(e)
+        yield
+
+
+def enforce_quota(request: Optional[Request]) -> None:
+    """
+    Refuse requests that start new Zeo++ runs once the tenant's CPU quota is used up.
+
+    For requests that run many processes (sweeps, samples=auto, batches), which
+    are not subject to the per-run admission control of :func:`admitted`.
+
+    Raises:
+        HTTPException: 429 with a ``Retry-After`` header.
+    """
+    if request is None:
+        return
+    try:
+        check_quota(tenant_key(request))
+    except AdmissionError as e:
+        raise_not_admitted(e)
+
+
+def raise_deadline_exceeded(error: DeadlineExceededError) -> NoReturn:
+    """Translate a job refused for its deadline (see ``app/core/deadlines.py``) into a 504."""
+    raise HTTPException(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        detail={"message": error.message, "error_code": ErrorCode.DEADLINE_EXCEEDED.value},
+    )
+
+
+def raise_not_admitted(error: AdmissionError) -> NoReturn:
+    """Translate an admission or quota rejection into its HTTP error with ``Retry-After``."""
+    logger.warning(f"[admission] Rejected with {error.status_code}: {error.message}")
+    raise HTTPException(
+        status_code=error.status_code,
+        detail={"message": error.message, "retry_after_seconds": error.retry_after},
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
+def wants_async_response(request: Optional[Request]) -> bool:
+    """Whether the client asked for a job instead of waiting (``Prefer: respond-async``, RFC 7240)."""
+    if request is None:
+        return False
+    prefer = request.headers.get("prefer", "")
+    return any(token.split(";")[0].strip().lower() == "respond-async" for token in prefer.split(","))
+
+
+def store_job_structure(structure_file: Optional[UploadFile], structure_id: Optional[str]) -> str:
+    """
+    Make the request's structure available to a job, which may run on another worker.
+
+    Uploads are added to the structure store; a given ``structure_id`` must exist.
+
+    Returns:
+        The structure_id the job runs on.
+    """
+    source = structure_source(structure_file, structure_id)
+    if isinstance(source, str):
+        try:
+            return get_structure(source).structure_id
+        except ZeoppStructureNotFoundError as e:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail={"message": e.message, "error_code": e.error_code.value}
+            )
+    validate_upload(source)
+    try:
+        stored = store_structure(
+            source.file,
+            source.filename,
+            max_bytes=settings.max_upload_size_bytes
+        )
+    except ZeoppFileTooLargeError:
+        raise_file_too_large()
+    return stored.structure_id
+
+
+def submit_job_response(
+    *,
+    kind: str,
+    analyses: Optional[List[Any]],
+    structure_file: Optional[UploadFile],
+    structure_id: Optional[str],
+    ha: bool,
+    skip_cache: bool,
+    pipeline: Optional[List[Any]] = None
+) -> JSONResponse:
+    """Queue a job for the request and answer 202 Accepted with its Location."""
+    job_structure_id = store_job_structure(structure_file, structure_id)
+    try:
+        job = submit_job(
+            kind, analyses, job_structure_id, ha=ha, force_recalculate=skip_cache, pipeline=pipeline
+        )
+    except AdmissionError as e:
+        raise_not_admitted(e)
+    except DeadlineExceededError as e:
+        raise_deadline_exceeded(e)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=job_response(job).model_dump(),
+        headers={"Location": f"/api/v1/jobs/{job['id']}", "Preference-Applied": "respond-async"},
+    )
+
+
+def raise_execution_error(task_name: str, result: Dict[str, Any]) -> None:
+    """Translate a failed runner result into the matching HTTP error."""
+    error_detail = f"Zeo++ exited with code {result['exit_code']}."
+    stderr_content = result.get("stderr", "No stderr output.")
+    logger.display_error_panel(f"{task_name} Failed", f"{error_detail}\n\n{stderr_content}")
+    if result["exit_code"] == 124:
+        # Map subprocess timeout (exit_code 124) to HTTP 504 Gateway
+        # Timeout so callers can distinguish a long-running compute
+        # from a real Zeo++ failure.
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail={
+                "message": f"Zeo++ execution timed out for {task_name}",
+                "timeout_seconds": settings.zeo_command_timeout_seconds,
+                "stderr": stderr_content,
+            },
+        )
+    if result["exit_code"] == DEADLINE_EXIT_CODE:
+        # Refused or stopped because the client's time budget could not be met
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail={
+                "message": f"Deadline exceeded for {task_name}",
+                "error_code": ErrorCode.DEADLINE_EXCEEDED.value,
+                "stderr": stderr_content,
+            },
+        )
+    if result["exit_code"] == QUEUE_FULL_EXIT_CODE:
+        # The run never started: its execution lane already had a full queue
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={"message": f"Zeo++ execution queue is full for {task_name}", "stderr": stderr_content},
+            headers={"Retry-After": str(full_lanes_retry_after())},
+        )
+    raise ZeoppExecutionError(
+        message=f"Zeo++ execution failed for {task_name}",
+        exit_code=result['exit_code'],
+        stderr=stderr_content
+    )
+
+
 async def process_zeo_request(
     *,
-    structure_file: UploadFile,
+    structure_file: Optional[UploadFile],
     zeo_args: List[str],
     output_files: List[str],
     parser: Callable[[str], Dict[str, Any]],
     response_model: Type[BaseModel],
     task_name: str,
-    skip_cache: bool = False
+    skip_cache: bool = False,
+    structure_id: Optional[str] = None,
+    request: Optional[Request] = None
 ) -> Any:
     """
     A generic async function to handle the boilerplate logic for all Zeo++ API requests.
 
     Args:
         structure_file (UploadFile): The structure file uploaded by the user.
+        structure_id (str): ID of a stored structure, alternative to structure_file.
         zeo_args (List[str]): The list of command-line arguments for Zeo++.
         output_files (List[str]): A list of expected output filenames from Zeo++.
         parser (Callable): The function to parse the main output file.
         response_model (Type[BaseModel]): The Pydantic model for the final response.
         task_name (str): A unique name for the task, used for logging and temp file prefixes.
         skip_cache (bool): If True, skip cache and force recalculation.
+        request (Request): The incoming request, watched for client disconnects.
+            With ``Prefer: respond-async`` the analysis is queued as a job instead
+            and 202 Accepted is returned with the job's Location.
     """
-    # Validate file extension
-    if not validate_structure_file(structure_file.filename):
-        raise HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail=f"Invalid file type. Allowed extensions: {get_allowed_extensions_str()}"
-        )
-    
-    # Check file size (if available)
-    if structure_file.size and structure_file.size > settings.max_upload_size_bytes:
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"File too large. Maximum size: {settings.max_upload_size_mb}MB"
+    analysis = ANALYSES.get(task_name)
+    if analysis is not None and wants_async_response(request):
+        try:
+            params = analysis.params_from_args(zeo_args)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+        return submit_job_response(
+            kind="analysis",
+            analyses=[{"analysis": analysis.name, "params": params}],
+            structure_file=structure_file,
+            structure_id=structure_id,
+            ha="-ha" in zeo_args,
+            skip_cache=skip_cache,
         )
-    
-    logger.info(f"[{task_name}] Received new request. Saving file...")
-    input_path = save_uploaded_file(structure_file, prefix=task_name)
+
+    input_path, content_hash = prepare_structure_input(structure_file, structure_id, task_name)
 
     try:
         # Create a copy of the args to avoid modifying the original list
         final_zeo_args = zeo_args.copy()
         final_zeo_args.append(input_path.name)
 
-        logger.info(f"[{task_name}] Running Zeo++ with args: {' '.join(final_zeo_args)}")
+        cache_key = compute_cache_key(input_path, final_zeo_args, content_hash=content_hash)
+        if settings.enable_cache and not skip_cache:
+            memory_hit = result_memory_cache.get(cache_key, response_model)
+            if memory_hit is not None:
+                logger.info(f"[{task_name}] Served parsed result from memory cache.")
+                return memory_hit
 
-        # Use async method to run Zeo++ in thread pool, avoiding event loop blocking
-        # This allows health checks and other requests to be processed during long calculations
-        result = await runner.run_command_async(
-            structure_file=input_path,
-            zeo_args=final_zeo_args,
-            output_files=output_files,
-            extra_identifier=task_name,
-            skip_cache=skip_cache
-        )
+        predicted = await announce_prediction(request, input_path, final_zeo_args)
+        logger.info(f"[{task_name}] Running Zeo++ with args: {' '.join(final_zeo_args)} (predicted {predicted:.2f}s)")
 
-        if not result["success"]:
-            error_detail = f"Zeo++ exited with code {result['exit_code']}."
-            stderr_content = result.get("stderr", "No stderr output.")
-            logger.display_error_panel(f"{task_name} Failed", f"{error_detail}\n\n{stderr_content}")
-            if result["exit_code"] == 124:
-                # Map subprocess timeout (exit_code 124) to HTTP 504 Gateway
-                # Timeout so callers can distinguish a long-running compute
-                # from a real Zeo++ failure.
-                raise HTTPException(
-                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                    detail={
-                        "message": f"Zeo++ execution timed out for {task_name}",
-                        "timeout_seconds": settings.zeo_command_timeout_seconds,
-                        "stderr": stderr_content,
-                    },
-                )
-            raise ZeoppExecutionError(
-                message=f"Zeo++ execution failed for {task_name}",
-                exit_code=result['exit_code'],
-                stderr=stderr_content
+        with admitted(request, final_zeo_args, predicted, [cache_key], skip_cache):
+            # Zeo++ runs as an asyncio subprocess, avoiding event loop blocking
+            # This allows health checks and other requests to be processed during long calculations
+            result = await await_unless_disconnected(
+                request,
+                runner.run_command_async(
+                    structure_file=input_path,
+                    zeo_args=final_zeo_args,
+                    output_files=output_files,
+                    skip_cache=skip_cache,
+                    content_hash=content_hash
+                ),
+                task_name
             )
 
+        if not result["success"]:
+            raise_execution_error(task_name, result)
+
         main_output_file = output_files[0]
         output_text = result["output_data"].get(main_output_file)
 
@@ -132,6 +502,203 @@ async def process_zeo_request(
         final_data = {**parsed_data, "cached": result["cached"]}
         logger.success(f"[{task_name}] Task completed successfully.")
         logger.display_data_as_table(final_data, f"Result for {task_name}")
-        return response_model(**final_data)
+        response = response_model(**final_data)
+        if settings.enable_cache:
+            result_memory_cache.put(cache_key, response.model_copy(update={"cached": True}))
+        return response
+    finally:
+        cleanup_temp_directory(input_path.parent)
+
+
+async def process_profile_request(
+    *,
+    structure_file: Optional[UploadFile],
+    plan: List[Tuple[AnalysisSpec, Dict[str, Any]]],
+    ha: bool = True,
+    skip_cache: bool = False,
+    structure_id: Optional[str] = None,
+    request: Optional[Request] = None
+) -> Union[ProfileResponse, JSONResponse]:
+    """
+    Run several analyses on one uploaded structure with a single Zeo++ call.
+
+    Analyses already present in the cache are served from it; the remaining
+    ones are combined into one ``network`` command line so the Voronoi
+    decomposition is computed only once.
+
+    Args:
+        structure_file (UploadFile): The structure file uploaded by the user.
+        structure_id (str): ID of a stored structure, alternative to structure_file.
+        plan: ``(spec, params)`` pairs from ``resolve_analysis_plan``.
+        ha (bool): Whether to use high accuracy mode.
+        skip_cache (bool): If True, skip cache and force recalculation.
+        request (Request): The incoming request, watched for client disconnects;
+            ``Prefer: respond-async`` queues the profile as a job (202 Accepted).
+    """
+    if wants_async_response(request):
+        return submit_job_response(
+            kind="profile",
+            analyses=[{"analysis": spec.name, "params": params} for spec, params in plan],
+            structure_file=structure_file,
+            structure_id=structure_id,
+            ha=ha,
+            skip_cache=skip_cache,
+        )
+
+    task_name = "profile"
+    logger.info(f"[{task_name}] Requested analyses: {[spec.name for spec, _ in plan]}")
+    input_path, content_hash = prepare_structure_input(structure_file, structure_id, task_name)
+
+    try:
+        segments = [
+            (spec.name, spec.build_args(params), [spec.output_file])
+            for spec, params in plan
+        ]
+        combined_args = (["-ha"] if ha else []) + [arg for _, args, _ in segments for arg in args]
+        predicted = await announce_prediction(request, input_path, combined_args)
+        cache_keys = [
+            compute_cache_key(input_path, (["-ha"] if ha else []) + args + [input_path.name], content_hash=content_hash)
+            for _, args, _ in segments
+        ]
+        with admitted(request, combined_args + [input_path.name], predicted, cache_keys, skip_cache):
+            results = await await_unless_disconnected(
+                request,
+                runner.run_combined_async(
+                    structure_file=input_path,
+                    segments=segments,
+                    ha=ha,
+                    skip_cache=skip_cache,
+                    content_hash=content_hash
+                ),
+                task_name
+            )
+
+        failed = next((r for r in results.values() if not r["success"]), None)
+        if failed is not None:
+            raise_execution_error(task_name, failed)
+
+        parsed_results, errors = parse_plan_results(plan, results)
+        for name, error in errors.items():
+            logger.display_error_panel(f"{task_name}/{name} Failed", error["message"])
+
+        computed = [name for name, result in results.items() if not result["cached"]]
+        logger.success(f"[{task_name}] Completed {len(parsed_results)}/{len(plan)} analyses.")
+        return ProfileResponse(
+            results=parsed_results,
+            errors=errors,
+            computed=computed,
+            zeo_invocations=1 if computed else 0,
+        )
+    finally:
+        cleanup_temp_directory(input_path.parent)
+
+
+async def process_sweep_request(
+    *,
+    structure_file: Optional[UploadFile],
+    spec: AnalysisSpec,
+    points: List[Dict[str, Any]],
+    ha: bool = True,
+    skip_cache: bool = False,
+    structure_id: Optional[str] = None,
+    request: Optional[Request] = None
+) -> SweepResponse:
+    """
+    Run one analysis at several probe radii on one uploaded structure.
+
+    The structure is uploaded, hashed and placed on disk once; the points
+    then run concurrently, each cached like the single-analysis request
+    with its radius. Points that fail are reported in ``errors`` without
+    failing the sweep.
+
+    Args:
+        structure_file (UploadFile): The structure file uploaded by the user.
+        structure_id (str): ID of a stored structure, alternative to structure_file.
+        spec: The swept analysis.
+        points: Parameters of every point from ``resolve_sweep``.
+        ha (bool): Whether to use high accuracy mode.
+        skip_cache (bool): If True, skip cache and force recalculation.
+        request (Request): The incoming request, watched for client disconnects.
+    """
+    task_name = "sweep"
+    enforce_quota(request)
+    logger.info(f"[{task_name}] {spec.name} at probe radii {[params['probe_radius'] for params in points]}")
+    input_path, content_hash = prepare_structure_input(structure_file, structure_id, task_name)
+
+    try:
+        outcome = await await_unless_disconnected(
+            request,
+            run_sweep(input_path, content_hash, spec, points, ha=ha, skip_cache=skip_cache),
+            task_name
+        )
+        failed = sum(1 for error in outcome["errors"] if error is not None)
+        logger.success(f"[{task_name}] Completed {len(points) - failed}/{len(points)} points.")
+        return SweepResponse(**outcome)
+    finally:
+        cleanup_temp_directory(input_path.parent)
+
+
+async def process_adaptive_request(
+    *,
+    structure_file: Optional[UploadFile],
+    spec: AnalysisSpec,
+    params: Dict[str, Any],
+    tolerance: Optional[float] = None,
+    ha: bool = True,
+    skip_cache: bool = False,
+    structure_id: Optional[str] = None,
+    request: Optional[Request] = None
+) -> Any:
+    """
+    Run a Monte Carlo analysis with ``samples=auto``.
+
+    The sample count doubles until the primary metric changes by at most the
+    relative ``tolerance`` between successive runs (see ``app/core/montecarlo.py``).
+    The response is the analysis response of the largest run with a
+    ``convergence`` report. Auto requests are always answered synchronously.
+
+    Args:
+        structure_file (UploadFile): The structure file uploaded by the user.
+        structure_id (str): ID of a stored structure, alternative to structure_file.
+        spec: The Monte Carlo analysis (surface_area, accessible_volume, probe_volume).
+        params: Resolved parameters; ``samples`` is chosen automatically.
+        tolerance (float): Largest relative change between successive runs (default ``MC_AUTO_TOLERANCE``).
+        ha (bool): Whether to use high accuracy mode.
+        skip_cache (bool): If True, skip cache and force recalculation.
+        request (Request): The incoming request, watched for client disconnects.
+    """
+    if tolerance is not None and tolerance <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="tolerance must be greater than 0"
+        )
+
+    task_name = spec.name
+    enforce_quota(request)
+    input_path, content_hash = prepare_structure_input(structure_file, structure_id, task_name)
+
+    try:
+        logger.info(f"[{task_name}] Choosing Monte Carlo samples automatically")
+        try:
+            result, convergence = await await_unless_disconnected(
+                request,
+                run_adaptive(input_path, content_hash, spec, params, tolerance, ha=ha, skip_cache=skip_cache),
+                task_name
+            )
+        except ZeoppExecutionError as e:
+            raise_execution_error(task_name, {"exit_code": e.exit_code, "stderr": e.stderr})
+        except (ZeoppParsingError, ZeoppOutputNotFoundError) as e:
+            logger.display_error_panel(f"{task_name} Failed", e.message)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail={"message": f"Failed to parse Zeo++ output for {task_name}", "error": e.message}
+            )
+
+        logger.success(
+            f"[{task_name}] {convergence['metric']} = {convergence['value']:.6g} "
+            f"from {convergence['samples']} samples, {convergence['previous_value']:.6g} from half as many "
+            f"({'converged' if convergence['converged'] else 'sample budget exhausted'})."
+        )
+        return spec.response_model(**result, convergence=convergence)
     finally:
         cleanup_temp_directory(input_path.parent)
@@ -0,0 +1,249 @@
+# Host-wide Zeo++ Process Slots
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-17
+# Updated: 2026-10-18 - Queue tickets ordered by scheduling priority
+# Updated: 2026-10-18 - Only the head of the queue polls the slots
+# Updated: 2026-10-18 - Host budget split between the execution lanes (app/core/lanes.py)
+
+"""
+Cap on concurrent Zeo++ processes shared by all workers on a host.
+
+``MAX_CONCURRENT_TASKS`` only limits processes per uvicorn worker. The slots
+here are lock files on the workspace volume (``<workspace>/.slots/slot-<i>.lock``)
+that every worker competes for, so the total number of running ``network``
+processes never exceeds ``HOST_MAX_CONCURRENT_TASKS`` (default: the CPUs
+available to the container). The budget is split between the fast and slow
+execution lanes, each with its own slots (see ``app/core/lanes.py``).
+
+Waiters queue across workers: each one places a ticket named after its
+priority in ``.slots/queue/`` and only the lowest live ticket may take a free
+slot. The priority is the arrival time, or the virtual start time of the
+cost-aware scheduler (``app/core/scheduler.py``) so that predicted short runs
+go first. Tickets and slots are held with ``flock``, so those of a crashed
+worker are released by the kernel and stale tickets are pruned once they
+reach the front of the queue.
+"""
+
+import asyncio
+import math
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows development: per-worker limits only
+    fcntl = None  # type: ignore[assignment]
+
+SLOTS_DIRNAME = ".slots"
+QUEUE_DIRNAME = "queue"
+# Poll interval bounds while waiting for a slot
+SLOT_POLL_INITIAL_SECONDS = 0.02
+SLOT_POLL_MAX_SECONDS = 0.25
+# Longest poll interval of waiters with more than one ticket ahead of them
+QUEUED_POLL_MAX_SECONDS = 1.0
+
+
+def available_cpus() -> int:
+    """
+    Number of CPUs this process may use.
+
+    Honours the cgroup CPU quota (``cpus:`` limit in docker-compose) and the
+    scheduler affinity mask, falling back to ``os.cpu_count()``.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cpus = os.cpu_count() or 1
+
+    quota = None
+    try:
+        max_text, period_text = Path("/sys/fs/cgroup/cpu.max").read_text().split()[:2]
+        if max_text != "max":
+            quota = int(max_text) / int(period_text)
+    except (OSError, ValueError):
+        try:
+            quota_us = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text())
+            period_us = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text())
+            if quota_us > 0 and period_us > 0:
+                quota = quota_us / period_us
+        except (OSError, ValueError):
+            pass
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return max(1, cpus)
+
+
+def _flock(fd: int) -> bool:
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+class HostSlots:
+    """
+    Fixed set of process slots shared through lock files under ``root``.
+
+    Args:
+        root: Directory holding the slot and queue files (on the shared volume)
+        capacity: Number of processes allowed to run at once on the host
+    """
+
+    def __init__(self, root: Path, capacity: int):
+        self.root = root
+        self.capacity = max(1, capacity)
+
+    @property
+    def _queue_dir(self) -> Path:
+        return self.root / QUEUE_DIRNAME
+
+    def _enqueue(self, priority: Optional[float] = None) -> Tuple[Path, int]:
+        """Place a locked ticket in the queue; returns its path and descriptor."""
+        queue_dir = self._queue_dir
+        queue_dir.mkdir(parents=True, exist_ok=True)
+        rank = time.time_ns() if priority is None else int(priority * 1e9)
+        name = f"{rank:020d}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        # Lock before the ticket becomes visible so it is never mistaken for a stale one
+        staging = queue_dir / f".{name}"
+        fd = os.open(staging, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        ticket = queue_dir / name
+        os.rename(staging, ticket)
+        return ticket, fd
+
+    def _tickets(self) -> List[str]:
+        """Queued ticket names in priority order, including those of dead processes."""
+        return sorted(name for name in os.listdir(self._queue_dir) if not name.startswith("."))
+
+    def _pruned(self, name: str) -> bool:
+        """Remove the ticket ``name`` if its owner died while waiting; whether it is gone."""
+        path = self._queue_dir / name
+        try:
+            fd = os.open(path, os.O_RDWR)
+        except FileNotFoundError:
+            return True
+        try:
+            if _flock(fd):
+                # Nobody holds the ticket: its owner died while waiting
+                os.unlink(path)
+                return True
+        except OSError:
+            return True
+        finally:
+            os.close(fd)
+        return False
+
+    def _live_tickets(self) -> List[str]:
+        """Queued ticket names in priority order, pruning those of dead processes."""
+        return [name for name in self._tickets() if not self._pruned(name)]
+
+    def _try_slot(self) -> Optional[Tuple[int, int]]:
+        """Lock the first free slot; returns (index, descriptor) or None."""
+        for index in range(self.capacity):
+            fd = os.open(self.root / f"slot-{index}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+            if _flock(fd):
+                return index, fd
+            os.close(fd)
+        return None
+
+    def _poll(self, ticket: Path) -> Tuple[Optional[Tuple[int, int]], int]:
+        """
+        Take a slot if ``ticket`` is at the head of the queue.
+
+        Only the ticket at the front is checked for liveness (and pruned if
+        dead), and only the head tries the slots, so a poll costs one
+        directory listing and usually a single lock attempt however many
+        workers are waiting.
+
+        Returns:
+            Tuple of (slot or None, position of the ticket in the queue)
+        """
+        while True:
+            tickets = self._tickets()
+            position = tickets.index(ticket.name) if ticket.name in tickets else 0
+            if position == 0:
+                return self._try_slot(), 0
+            if not self._pruned(tickets[0]):
+                return None, position
+
+    @staticmethod
+    def _leave(ticket: Path, fd: int) -> None:
+        try:
+            os.unlink(ticket)
+        except OSError:
+            pass
+        os.close(fd)
+
+    @asynccontextmanager
+    async def hold_async(self, priority: Optional[float] = None) -> AsyncIterator[Optional[int]]:
+        """
+        Wait until a slot is free and hold it while the block runs.
+
+        Waiting never blocks the event loop. The poll interval backs off to
+        ``SLOT_POLL_MAX_SECONDS`` for the head of the queue and the waiter
+        behind it, and to ``QUEUED_POLL_MAX_SECONDS`` further back; it is reset
+        whenever the ticket moves up the queue, so the next waiter picks up a
+        released slot promptly.
+
+        Args:
+            priority: Queue position as a timestamp in seconds (lowest first);
+                defaults to the arrival time
+
+        Yields:
+            Index of the slot, or None when host-wide slots are unavailable
+        """
+        if fcntl is None:
+            yield None
+            return
+        ticket, ticket_fd = self._enqueue(priority)
+        try:
+            delay = SLOT_POLL_INITIAL_SECONDS
+            last_position = None
+            while True:
+                slot, position = self._poll(ticket)
+                if slot is not None:
+                    break
+                if last_position is not None and position < last_position:
+                    delay = SLOT_POLL_INITIAL_SECONDS
+                last_position = position
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, SLOT_POLL_MAX_SECONDS if position <= 1 else QUEUED_POLL_MAX_SECONDS)
+        finally:
+            self._leave(ticket, ticket_fd)
+        try:
+            yield slot[0]
+        finally:
+            os.close(slot[1])
+
+    def status(self) -> Dict[str, int]:
+        """Host-wide slot usage: capacity, running processes and queued waiters."""
+        if fcntl is None or not self.root.exists():
+            return {"capacity": self.capacity, "running": 0, "queued": 0}
+        running = 0
+        for index in range(self.capacity):
+            path = self.root / f"slot-{index}.lock"
+            if not path.exists():
+                continue
+            fd = os.open(path, os.O_RDWR)
+            try:
+                if not _flock(fd):
+                    running += 1
+            finally:
+                os.close(fd)
+        queued = len(self._live_tickets()) if self._queue_dir.exists() else 0
+        return {"capacity": self.capacity, "running": running, "queued": queued}
+
+
+def host_capacity() -> int:
+    """Zeo++ processes allowed on the host: ``HOST_MAX_CONCURRENT_TASKS`` or the available CPUs."""
+    if settings.host_max_concurrent_tasks > 0:
+        return settings.host_max_concurrent_tasks
+    return available_cpus()
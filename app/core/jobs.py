@@ -0,0 +1,428 @@
+# Asynchronous Job Execution
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-17
+# Updated: 2026-10-18 - Runtime predicted at submission orders the queue
+# Updated: 2026-10-18 - Jobs charged to the CPU quota of the tenant that submitted them
+# Updated: 2026-10-18 - Jobs inherit the client deadline; overdue queued jobs fail
+# Updated: 2026-10-18 - Results of runs that lost their lease are dropped
+
+"""
+Submission and execution of jobs for ``/api/v1/jobs``.
+
+A job runs one or more analyses from the registry in ``app/core/analyses.py``
+on a stored structure, a staged pipeline (``app/core/pipeline.py``) on a
+stored structure, or either on every structure of a server-side directory
+(``directory`` jobs, which checkpoint each finished structure and resume
+from there after a restart). Its state lives in the :class:`JobStore` in the
+workspace; every worker runs a :class:`JobDispatcher` that claims queued
+jobs, renews their lease while they run and records the result. Jobs left
+behind by a worker that died are re-queued once their lease expires, and a
+worker shutting down puts its running jobs back in the queue.
+"""
+
+import asyncio
+import functools
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core.analyses import resolve_analysis_plan
+from app.core.batch import (
+    Analyzer,
+    analyze_structure,
+    iter_directory_structures,
+    resolve_screening_path,
+    run_batch,
+)
+from app.core.config import JOBS_DIR, settings
+from app.core.deadlines import check_deadline, current_deadline, deadline_scope
+from app.core.exceptions import ErrorCode, ZeoppStructureNotFoundError
+from app.core.pipeline import pipeline_analyses, resolve_pipeline, run_pipeline
+from app.core.quota import check_quota, current_tenant, exhausted_tenants, metered
+from app.core.runner import OutputCallback
+from app.core.scheduler import runtime_model
+from app.models.job import JobItemResponse, JobResponse
+from app.models.profile import ProfileResponse
+from app.utils.job_store import (
+    CANCELLED,
+    FAILED,
+    SUCCEEDED,
+    JobStore,
+    get_job_store,
+    worker_identity,
+)
+from app.utils.logger import logger
+from app.utils.structure_store import get_structure
+
+# Interval at which a dispatcher renews its leases, checks for cancellations and polls the queue
+JOB_HEARTBEAT_SECONDS = 2.0
+# A running job whose lease is not renewed for this long is re-queued
+JOB_LEASE_SECONDS = 30.0
+# Maximum length of the progress message kept per job
+JOB_MESSAGE_MAX_CHARS = 200
+# Job kinds: one analysis, a profile plan or a pipeline on one structure, either on a directory
+JOB_KINDS = ("analysis", "profile", "pipeline", "directory")
+# Error of queued jobs whose deadline passed before they started
+DEADLINE_PASSED_ERROR = {
+    "message": "The deadline passed before the job started",
+    "error_code": ErrorCode.DEADLINE_EXCEEDED.value,
+}
+
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def _iso_or_none(timestamp: Optional[float]) -> Optional[str]:
+    return None if timestamp is None else _iso(timestamp)
+
+
+def job_response(job: Dict[str, Any]) -> JobResponse:
+    """Build the API representation of a stored job."""
+    return JobResponse(
+        job_id=job["id"],
+        kind=job["kind"],
+        status=job["status"],
+        stage=job["stage"],
+        message=job["message"],
+        analyses=job["spec"]["analyses"],
+        ha=job["spec"]["ha"],
+        structure_id=job["structure_id"] or None,
+        path=job["spec"].get("path"),
+        pipeline=job["spec"].get("pipeline"),
+        created=_iso(job["created"]),
+        started=_iso_or_none(job["started"]),
+        finished=_iso_or_none(job["finished"]),
+        predicted_seconds=job.get("predicted_seconds"),
+        attempts=job["attempts"],
+        cancel_requested=job["cancel_requested"],
+        result=job["result"],
+        error=job["error"],
+    )
+
+
+def job_item_response(item: Dict[str, Any]) -> JobItemResponse:
+    """Build the API representation of a checkpointed structure of a job."""
+    return JobItemResponse(
+        name=item["name"],
+        status=item["status"],
+        structure_id=item["structure_id"],
+        finished=_iso(item["finished"]),
+        **{
+            key: item["result"].get(key)
+            for key in ("results", "errors", "computed", "error", "passed", "stages_run", "rejected_by")
+        },
+    )
+
+
+def _job_analyzer(job: Dict[str, Any], on_output: Optional[OutputCallback] = None) -> Analyzer:
+    """Bind the analyses or pipeline of a job to a function of the structure_id."""
+    spec = job["spec"]
+    options = {
+        "ha": spec["ha"],
+        "skip_cache": spec["force_recalculate"],
+        "prefix": f"job_{job['id'][:8]}",
+        "on_output": on_output,
+    }
+    if spec.get("pipeline"):
+        return functools.partial(run_pipeline, stages=resolve_pipeline(spec["pipeline"]), **options)
+    return functools.partial(analyze_structure, plan=resolve_analysis_plan(spec["analyses"]), **options)
+
+
+async def _execute_directory_job(
+    store: JobStore,
+    job: Dict[str, Any],
+    messages: Dict[str, str],
+) -> Tuple[str, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Run the plan or pipeline of a directory job on every structure not yet checkpointed.
+
+    Every finished structure is recorded in the job's items before the next
+    progress update, so a job restarted after a crash or redeploy continues
+    with the structures that are missing.
+    """
+    job_id = job["id"]
+    analyze = _job_analyzer(job)
+    done = await asyncio.to_thread(store.completed_items, job_id)
+    counts = await asyncio.to_thread(store.item_counts, job_id)
+    succeeded, failed, filtered = counts.get(SUCCEEDED, 0), counts.get(FAILED, 0), counts.get("filtered", 0)
+    if done:
+        logger.info(f"[jobs] Resuming directory job {job_id}: {len(done)} structure(s) already done")
+
+    await asyncio.to_thread(store.set_stage, job_id, "screening")
+    items = iter_directory_structures(job["spec"]["path"], skip=done)
+    async for line in run_batch(items, analyze):
+        if line["type"] != "result":
+            continue
+        result = {key: value for key, value in line.items() if key not in ("type", "index", "name", "structure_id")}
+        await asyncio.to_thread(
+            store.record_item, job_id, line["name"], line["status"], line["structure_id"], result
+        )
+        if line["status"] == SUCCEEDED:
+            succeeded += 1
+            filtered += line.get("passed") is False
+        else:
+            failed += 1
+        messages[job_id] = f"{succeeded + failed} structure(s) done, {failed} failed, {filtered} filtered out"
+
+    summary = {"total": succeeded + failed, "succeeded": succeeded, "failed": failed, "filtered": filtered}
+    return SUCCEEDED, summary, None
+
+
+async def _execute_job(
+    store: JobStore,
+    job: Dict[str, Any],
+    messages: Dict[str, str],
+) -> Tuple[str, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Run the analyses of a job.
+
+    Returns:
+        Tuple of (final status, result, error).
+    """
+    if job["kind"] == "directory":
+        return await _execute_directory_job(store, job, messages)
+
+    job_id = job["id"]
+
+    def on_output(_stream: str, text: str) -> None:
+        lines = [line for line in text.splitlines() if line.strip()]
+        if lines:
+            messages[job_id] = lines[-1][:JOB_MESSAGE_MAX_CHARS]
+
+    analyze = _job_analyzer(job, on_output)
+    await asyncio.to_thread(store.set_stage, job_id, "running")
+    outcome = await analyze(job["structure_id"])
+    if outcome["status"] == FAILED:
+        return FAILED, None, outcome["error"]
+
+    if job["kind"] == "pipeline":
+        return SUCCEEDED, {key: value for key, value in outcome.items() if key != "status"}, None
+
+    if job["kind"] == "analysis":
+        plan = resolve_analysis_plan(job["spec"]["analyses"])
+        name = plan[0][0].name
+        if name in outcome["errors"]:
+            return FAILED, None, outcome["errors"][name]
+        return SUCCEEDED, outcome["results"][name], None
+
+    profile = ProfileResponse(
+        results=outcome["results"],
+        errors=outcome["errors"],
+        computed=outcome["computed"],
+        zeo_invocations=1 if outcome["computed"] else 0,
+    )
+    return SUCCEEDED, profile.model_dump(), None
+
+
+class JobDispatcher:
+    """
+    Per-worker loop that claims queued jobs and runs them.
+
+    Args:
+        store: Shared job store
+        concurrency: Maximum number of jobs this worker runs at once
+    """
+
+    def __init__(self, store: JobStore, concurrency: int):
+        self.store = store
+        self.concurrency = max(1, concurrency)
+        self.owner = worker_identity()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._messages: Dict[str, str] = {}
+        self._cancelled: Set[str] = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self._last_housekeeping = 0.0
+
+    def wake(self) -> None:
+        """Make the dispatcher poll the queue now instead of at its next heartbeat."""
+        if self._wake is not None:
+            self._wake.set()
+
+    def ensure_running(self) -> None:
+        """
+        Start dispatching in the running event loop unless already started.
+
+        The API starts the dispatcher at startup; processes without a startup
+        hook (the MCP servers) start it when their first job is submitted.
+        """
+        if self._wake is None and (self._loop_task is None or self._loop_task.done()):
+            self._loop_task = asyncio.get_running_loop().create_task(self.run_forever())
+
+    def _housekeeping(self) -> None:
+        requeued = self.store.requeue_expired(JOB_LEASE_SECONDS)
+        if requeued:
+            logger.warning(f"[jobs] Re-queued {requeued} job(s) whose worker stopped responding")
+        purged = self.store.purge_finished(settings.job_retention_hours)
+        if purged:
+            logger.info(f"[jobs] Purged {purged} finished job(s)")
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        logger.info(f"[jobs] Running job {job_id} (attempt {job['attempts']})")
+        try:
+            with deadline_scope(deadline=job["spec"].get("deadline")):
+                async with metered(job["spec"].get("tenant")):
+                    status, result, error = await _execute_job(self.store, job, self._messages)
+        except asyncio.CancelledError:
+            if job_id in self._cancelled:
+                await asyncio.shield(
+                    asyncio.to_thread(self.store.finish, job_id, self.owner, job["attempts"], CANCELLED)
+                )
+                logger.info(f"[jobs] Cancelled job {job_id}")
+            raise
+        except Exception as e:
+            logger.error(f"[jobs] Job {job_id} failed unexpectedly: {e}")
+            status, result, error = FAILED, None, {
+                "message": str(e),
+                "error_code": ErrorCode.INTERNAL_ERROR.value,
+            }
+        finally:
+            self._tasks.pop(job_id, None)
+            self._messages.pop(job_id, None)
+            self._cancelled.discard(job_id)
+            self.wake()
+        recorded = await asyncio.to_thread(
+            self.store.finish, job_id, self.owner, job["attempts"], status, result, error
+        )
+        if not recorded:
+            logger.warning(f"[jobs] Dropped the result of job {job_id}: its lease was lost to another claim")
+            return
+        logger.info(f"[jobs] Job {job_id} {status}")
+
+    async def _tick(self) -> None:
+        now = time.monotonic()
+        if now - self._last_housekeeping >= JOB_LEASE_SECONDS:
+            self._last_housekeeping = now
+            await asyncio.to_thread(self._housekeeping)
+
+        cancel = await asyncio.to_thread(self.store.heartbeat, self.owner, dict(self._messages))
+        for job_id in cancel - self._cancelled:
+            task = self._tasks.get(job_id)
+            if task is not None:
+                self._cancelled.add(job_id)
+                task.cancel()
+
+        deferred: List[str] = []
+        if len(self._tasks) < self.concurrency:
+            expired = await asyncio.to_thread(self.store.expire_overdue, DEADLINE_PASSED_ERROR)
+            if expired:
+                logger.warning(f"[jobs] Failed {expired} queued job(s) whose deadline passed before they started")
+            deferred = await asyncio.to_thread(exhausted_tenants)
+        while len(self._tasks) < self.concurrency:
+            job = await asyncio.to_thread(
+                self.store.claim_next, self.owner, settings.scheduler_aging_factor, deferred
+            )
+            if job is None:
+                break
+            self._tasks[job["id"]] = asyncio.create_task(self._run(job))
+
+    async def run_forever(self) -> None:
+        """Dispatch jobs until cancelled, then hand running jobs back to the queue."""
+        self._wake = asyncio.Event()
+        try:
+            while True:
+                try:
+                    await self._tick()
+                except Exception as e:
+                    logger.error(f"[jobs] Dispatcher error: {e}")
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=JOB_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            tasks = list(self._tasks.values())
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            released = self.store.release(self.owner)
+            if released:
+                logger.info(f"[jobs] Returned {released} running job(s) to the queue")
+            self._wake = None
+
+
+def _predict_runtime(spec: Dict[str, Any], structure_id: str) -> Optional[float]:
+    """Predicted Zeo++ runtime of every analysis of a job on its stored structure."""
+    try:
+        path = get_structure(structure_id).path
+    except ZeoppStructureNotFoundError:
+        return None
+    zeo_args = ["-ha"] if spec["ha"] else []
+    for analysis, params in resolve_analysis_plan(spec["analyses"]):
+        zeo_args.extend(analysis.build_args(params))
+    return runtime_model.predict(zeo_args, path)
+
+
+def submit_job(
+    kind: str,
+    analyses: Optional[List[Any]] = None,
+    structure_id: Optional[str] = None,
+    ha: bool = True,
+    force_recalculate: bool = False,
+    path: Optional[str] = None,
+    pipeline: Optional[List[Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Queue a job and wake this worker's dispatcher.
+
+    Args:
+        kind: ``analysis`` (one analysis, result in its response format), ``profile``,
+            ``pipeline`` or ``directory`` (plan or pipeline on every structure under ``path``)
+        analyses: Analysis plan as accepted by ``resolve_analysis_plan``
+        structure_id: Stored structure to analyze (all but directory jobs)
+        ha: Whether to use high accuracy mode
+        force_recalculate: Bypass the result cache
+        path: Directory or glob under ``MCP_ALLOWED_PATH_ROOTS`` (directory jobs)
+        pipeline: Stages as accepted by ``resolve_pipeline`` (pipeline and directory jobs)
+
+    The job is charged to the tenant being metered (see :func:`app.core.quota.metered`)
+    and inherits the current deadline (see :mod:`app.core.deadlines`): it fails
+    if it has not started by then, and its runs must finish by then.
+
+    Raises:
+        ValueError: If the analysis plan, the pipeline or the path is invalid.
+        QuotaExceededError: If the tenant's CPU quota is exhausted.
+        DeadlineExceededError: If the job is predicted to take longer than the time left.
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    spec: Dict[str, Any] = {"ha": ha, "force_recalculate": force_recalculate}
+    if pipeline is not None and analyses is None:
+        if kind not in ("pipeline", "directory"):
+            raise ValueError(f"A {kind} job does not take a pipeline")
+        stages = resolve_pipeline(pipeline)
+        spec.update(analyses=pipeline_analyses(stages), pipeline=[stage.to_dict() for stage in stages])
+    elif analyses is not None and pipeline is None:
+        if kind == "pipeline":
+            raise ValueError("A pipeline job needs a pipeline")
+        plan = resolve_analysis_plan(analyses)
+        if kind == "analysis" and len(plan) != 1:
+            raise ValueError("An analysis job runs exactly one analysis")
+        spec["analyses"] = [{"analysis": s.name, "params": params} for s, params in plan]
+    else:
+        raise ValueError("Provide exactly one of analyses or pipeline")
+    if kind == "directory":
+        spec["path"] = resolve_screening_path(path or "")
+        structure_id = ""
+    elif not structure_id:
+        raise ValueError(f"A {kind} job needs a structure_id")
+    tenant = current_tenant()
+    check_quota(tenant)
+    if tenant is not None:
+        spec["tenant"] = tenant
+    predicted = _predict_runtime(spec, structure_id) if structure_id else None
+    deadline = current_deadline()
+    if deadline is not None:
+        if predicted is not None:
+            check_deadline(predicted, f"The {kind} job")
+        spec["deadline"] = deadline
+    job = job_dispatcher.store.create(kind, spec, structure_id, predicted)
+    logger.info(f"[jobs] Queued {kind} job {job['id']}: {[item['analysis'] for item in spec['analyses']]}")
+    job_dispatcher.wake()
+    return job
+
+
+job_dispatcher = JobDispatcher(get_job_store(JOBS_DIR), settings.max_concurrent_tasks)
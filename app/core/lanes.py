@@ -0,0 +1,178 @@
+# Execution Lanes for Zeo++ Processes
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-18
+# Updated: 2026-10-18 - Fast-lane host slots carved out of HOST_MAX_CONCURRENT_TASKS
+
+"""
+Separate execution lanes for fast and slow Zeo++ runs.
+
+``-res``, ``-chan`` and ``-strinfo`` on ordinary cells finish within
+seconds, while ``-oms``, ``-psd`` or high-sample ``-vol``/``-block`` runs
+can take tens of minutes. Each lane has its own per-worker scheduler
+(concurrency and queue depth), its own host-wide slots and its own process
+timeout, so quick interactive requests never wait behind a batch of long
+runs:
+
+- ``fast``: ``FAST_LANE_MAX_CONCURRENT_TASKS``, ``FAST_LANE_HOST_MAX_CONCURRENT_TASKS``,
+  ``FAST_LANE_QUEUE_DEPTH`` and ``FAST_LANE_TIMEOUT_SECONDS``.
+- ``slow``: ``MAX_CONCURRENT_TASKS``, the rest of the host slots,
+  ``SLOW_LANE_QUEUE_DEPTH`` and ``ZEO_COMMAND_TIMEOUT_SECONDS``.
+
+The host slots of both lanes are carved out of one budget,
+``HOST_MAX_CONCURRENT_TASKS`` (see :func:`lane_host_capacities`), so the
+lanes together never run more processes than the host allows.
+
+Runs are assigned by operation (``LANE_ASSIGNMENT=operation``: only runs
+made entirely of ``FAST_LANE_OPERATIONS`` go fast) or by predicted runtime
+(``predicted``: runs predicted to take at most
+``FAST_LANE_MAX_PREDICTED_SECONDS``). A fast-lane run that exceeds the fast
+timeout was misjudged; the runner kills it and reruns it in the slow lane.
+Within a lane, runs start in cost-aware order (see :mod:`app.core.scheduler`).
+"""
+
+import asyncio
+import weakref
+from dataclasses import dataclass
+from typing import Any, Dict, Sequence, Tuple
+
+from app.core.config import WORKSPACE_ROOT, settings
+from app.core.host_slots import SLOTS_DIRNAME, HostSlots, host_capacity
+from app.core.scheduler import CostScheduler, run_operations
+
+FAST_LANE = "fast"
+SLOW_LANE = "slow"
+LANE_NAMES = (FAST_LANE, SLOW_LANE)
+# Exit code of runs rejected because the queue of their lane is full (EX_TEMPFAIL)
+QUEUE_FULL_EXIT_CODE = 75
+
+
+@dataclass(frozen=True)
+class Lane:
+    """Limits of one execution lane; concurrency and queue depth are per worker."""
+    name: str
+    max_concurrent: int
+    queue_depth: int
+    timeout_seconds: int
+
+
+def get_lane(name: str) -> Lane:
+    """
+    Current limits of a lane from the settings.
+
+    Raises:
+        ValueError: If ``name`` is not a lane.
+    """
+    if name == FAST_LANE:
+        return Lane(
+            FAST_LANE,
+            settings.fast_lane_max_concurrent_tasks,
+            settings.fast_lane_queue_depth,
+            min(settings.fast_lane_timeout_seconds, settings.zeo_command_timeout_seconds),
+        )
+    if name == SLOW_LANE:
+        return Lane(
+            SLOW_LANE,
+            settings.max_concurrent_tasks,
+            settings.slow_lane_queue_depth,
+            settings.zeo_command_timeout_seconds,
+        )
+    raise ValueError(f"Unknown execution lane '{name}'. Available: {', '.join(LANE_NAMES)}")
+
+
+def assign_lane(zeo_args: Sequence[str], predicted_seconds: float) -> Lane:
+    """
+    Lane of a Zeo++ command line, according to ``LANE_ASSIGNMENT``.
+
+    Command lines without a known operation go to the slow lane.
+    """
+    operations = run_operations(zeo_args)
+    if not operations:
+        return get_lane(SLOW_LANE)
+    if settings.lane_assignment == "predicted":
+        fast = predicted_seconds <= settings.fast_lane_max_predicted_seconds
+    else:
+        fast_operations = set(settings.fast_lane_operations_list)
+        fast = all(operation in fast_operations for operation, _ in operations)
+    return get_lane(FAST_LANE if fast else SLOW_LANE)
+
+
+_schedulers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, CostScheduler]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def lane_scheduler(lane: Lane) -> CostScheduler:
+    """Return the scheduler of ``lane`` on the running loop."""
+    loop = asyncio.get_running_loop()
+    schedulers = _schedulers.setdefault(loop, {})
+    scheduler = schedulers.get(lane.name)
+    if scheduler is None:
+        scheduler = schedulers[lane.name] = CostScheduler(lane.max_concurrent, lane.queue_depth)
+    return scheduler
+
+
+def lane_host_capacities(total: int) -> Tuple[int, int]:
+    """
+    Split the host-wide process budget ``total`` between the lanes.
+
+    The fast lane reserves ``FAST_LANE_HOST_MAX_CONCURRENT_TASKS`` slots
+    (default: a quarter of the budget, at least one) and the slow lane gets
+    the rest, keeping at least one slot. A budget of one process cannot be
+    split; both lanes then share it.
+
+    Returns:
+        Tuple of (fast, slow) host slots; fast is 0 when the lanes share the
+        slow lane's slots.
+    """
+    if total < 2:
+        return 0, max(1, total)
+    fast = settings.fast_lane_host_max_concurrent_tasks
+    if fast <= 0:
+        fast = max(1, total // 4)
+    fast = min(fast, total - 1)
+    return fast, total - fast
+
+
+def _lane_host_slots() -> Dict[str, HostSlots]:
+    fast, slow = lane_host_capacities(host_capacity())
+    # The slow lane keeps the original slot files
+    slow_slots = HostSlots(WORKSPACE_ROOT / SLOTS_DIRNAME, slow)
+    fast_slots = HostSlots(WORKSPACE_ROOT / SLOTS_DIRNAME / FAST_LANE, fast) if fast else slow_slots
+    return {FAST_LANE: fast_slots, SLOW_LANE: slow_slots}
+
+
+_host_slots = _lane_host_slots()
+
+
+def lane_host_slots(lane: Lane) -> HostSlots:
+    """Host-wide process slots of ``lane``."""
+    return _host_slots[lane.name]
+
+
+def lanes_status() -> Dict[str, Dict[str, Any]]:
+    """
+    Limits and usage of every lane.
+
+    ``running``/``queued`` count the processes of this worker,
+    ``host_running``/``host_queued`` those of all workers.
+    """
+    schedulers = _schedulers.get(asyncio.get_running_loop(), {})
+    status: Dict[str, Dict[str, Any]] = {}
+    for name in LANE_NAMES:
+        lane = get_lane(name)
+        scheduler = schedulers.get(name)
+        worker = scheduler.status() if scheduler is not None else {}
+        host = lane_host_slots(lane).status()
+        status[name] = {
+            "max_concurrent": lane.max_concurrent,
+            "queue_depth": lane.queue_depth,
+            "timeout_seconds": lane.timeout_seconds,
+            "running": worker.get("running", 0),
+            "queued": worker.get("queued", 0),
+            "queued_seconds": worker.get("queued_seconds", 0.0),
+            "host_capacity": host["capacity"],
+            "host_running": host["running"],
+            "host_queued": host["queued"],
+        }
+    return status
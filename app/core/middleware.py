@@ -2,18 +2,31 @@
 # -*- coding: utf-8 -*-
 # Author: Shibo Li
 # Date: 2025-12-31
+# Updated: 2026-10-17 - Reject oversized request bodies before they are parsed
+# Updated: 2026-10-17 - Expose the server receive channel for disconnect detection
+# Updated: 2026-10-17 - Separate body size limit for batch archives
+# Updated: 2026-10-18 - Expose the predicted Zeo++ runtime of a request
+# Updated: 2026-10-18 - Meter API requests against per-tenant CPU quotas
+# Updated: 2026-10-18 - Client deadlines from the X-Request-Timeout header
 # Version: 0.3.1
 
 """
 Custom middleware for request processing, timing, and security.
 """
 
+import asyncio
 import time
 import uuid
 from typing import Callable, Optional
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import Request, Response, status
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from starlette.types import ASGIApp, Receive, Scope, Send
 
+from app.core.admission import tenant_key
+from app.core.config import settings
+from app.core.deadlines import DEADLINE_HEADER, deadline_scope, parse_timeout
+from app.core.quota import metered, quota_status
 from app.utils.logger import logger
 
 
@@ -46,6 +59,9 @@ class RequestTimingMiddleware(BaseHTTPMiddleware):
             # Add headers
             response.headers["X-Request-ID"] = request_id
             response.headers["X-Process-Time"] = f"{process_time_ms}ms"
+            predicted = getattr(request.state, "predicted_runtime_seconds", None)
+            if predicted is not None:
+                response.headers["X-Predicted-Runtime"] = f"{predicted:.3f}s"
             
             # Record metrics (skip /metrics endpoint to avoid recursion)
             if not request.url.path.startswith("/metrics"):
@@ -69,6 +85,112 @@ class RequestTimingMiddleware(BaseHTTPMiddleware):
             metrics_store.active_requests -= 1
 
 
+# Allowance for multipart boundaries and regular form fields on top of the file itself
+FORM_OVERHEAD_BYTES = 1024 * 1024
+# Endpoint accepting structure archives, limited by BATCH_MAX_UPLOAD_SIZE_MB instead
+BATCH_PATH = "/api/v1/batch"
+
+
+class UploadSizeLimitMiddleware(BaseHTTPMiddleware):
+    """
+    Reject requests whose announced body size exceeds the upload limit.
+
+    The check runs on the ``Content-Length`` header, before the multipart
+    body is received and spooled. Bodies without a length header are capped
+    while they are copied to disk (see ``app.utils.file.copy_stream_hashed``).
+    """
+
+    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
+        content_length = request.headers.get("content-length")
+        limit_mb = (
+            settings.batch_max_upload_size_mb if request.url.path == BATCH_PATH else settings.max_upload_size_mb
+        )
+        limit = limit_mb * 1024 * 1024 + FORM_OVERHEAD_BYTES
+        if content_length and content_length.isdigit() and int(content_length) > limit:
+            return JSONResponse(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                content={"detail": f"File too large. Maximum size: {limit_mb}MB"},
+            )
+        return await call_next(request)
+
+
+class DeadlineMiddleware(BaseHTTPMiddleware):
+    """
+    Apply the client's time budget from the ``X-Request-Timeout`` header (seconds).
+
+    The request is handled under the resulting deadline (see
+    ``app/core/deadlines.py``); an invalid value is rejected with 400.
+    """
+
+    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
+        value = request.headers.get(DEADLINE_HEADER)
+        if value is None:
+            return await call_next(request)
+        try:
+            timeout_seconds = parse_timeout(value)
+        except ValueError as e:
+            return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"detail": str(e)})
+        with deadline_scope(timeout_seconds):
+            return await call_next(request)
+
+
+# Routes metered against and reporting the CPU quota of their tenant
+QUOTA_PATH_PREFIX = "/api/"
+
+
+class CpuQuotaMiddleware(BaseHTTPMiddleware):
+    """
+    Meter API requests against the CPU quota of their tenant (see ``app/core/quota.py``).
+
+    Zeo++ processes started while a POST request is handled, and the
+    per-request fee, are charged to the request's tenant. API responses
+    report the tenant's quota in ``X-CPU-Quota-Limit``,
+    ``X-CPU-Quota-Remaining`` (CPU-seconds) and ``X-CPU-Quota-Reset``
+    (seconds until the bucket is full) when quotas are enabled.
+    """
+
+    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
+        if not request.url.path.startswith(QUOTA_PATH_PREFIX):
+            return await call_next(request)
+        tenant = tenant_key(request)
+        if request.method == "POST":
+            async with metered(tenant):
+                response = await call_next(request)
+        else:
+            response = await call_next(request)
+        try:
+            quota = await asyncio.to_thread(quota_status, tenant)
+        except Exception as e:
+            logger.warning(f"[quota] Could not read the quota of {tenant}: {e}")
+            quota = None
+        if quota is not None:
+            response.headers.update(quota.headers())
+        return response
+
+
+# Scope key under which the server's own ``receive`` channel is stored
+RAW_RECEIVE_SCOPE_KEY = "zeopp.raw_receive"
+
+
+class ClientDisconnectMiddleware:
+    """
+    Pure ASGI middleware exposing the server's ``receive`` channel to handlers.
+
+    ``BaseHTTPMiddleware`` layers hide client disconnects from
+    ``Request.is_disconnected()``. Added as the outermost middleware, this
+    stores the untouched channel in the scope so handlers can notice clients
+    that gave up on long Zeo++ runs (see ``app.core.handler``).
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            scope[RAW_RECEIVE_SCOPE_KEY] = receive
+        await self.app(scope, receive, send)
+
+
 # Allowed file extensions for structure files
 ALLOWED_EXTENSIONS = {
     ".cif",
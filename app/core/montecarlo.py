@@ -0,0 +1,173 @@
+# Adaptive Monte Carlo Sampling
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-18
+# Updated: 2026-10-18 - samples=auto doubles the samples until successive runs agree
+
+"""
+Automatic choice of the Monte Carlo sample count of ``-sa``, ``-vol`` and ``-volpo``.
+
+Zeo++ seeds its random number generator with a fixed value and has no
+option to change it, so runs of one structure are not independent: a run
+of ``2n`` samples starts with the ``n`` samples of a run of ``n``. Their
+spread says nothing about the sampling error, and no standard error is
+claimed for them.
+
+With ``samples="auto"`` the sample count instead doubles from a tenth of the
+analysis default (``n``, ``2n``, ``4n``, ...) until the primary metric
+(e.g. ``asa_mass``) changes by at most the relative tolerance between two
+successive runs, or the sample budget is spent. The result is that of the
+largest run. The first two runs start together; each run has its own cache
+entry, so repeating an auto request is served from the cache.
+"""
+
+import asyncio
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.analyses import AnalysisSpec
+from app.core.config import settings
+from app.core.exceptions import ZeoppExecutionError, ZeoppOutputNotFoundError
+from app.core.runner import ZeoRunner
+
+AUTO_SAMPLES = "auto"
+# Metric whose change between successive runs decides convergence, as a dotted path into the result
+PRIMARY_METRICS = {
+    "surface_area": "asa_mass",
+    "accessible_volume": "av.fraction",
+    "probe_volume": "poav_fraction",
+}
+# Samples of the first run, as a fraction of the analysis default
+INITIAL_SAMPLES_FRACTION = 0.1
+# Budget over all runs, as a multiple of the analysis default
+MAX_SAMPLES_FACTOR = 20
+
+runner = ZeoRunner()
+
+
+def primary_metric(result: Dict[str, Any], path: str) -> float:
+    """Look up a dotted metric path such as ``av.fraction`` in a parsed result."""
+    value: Any = result
+    for key in path.split("."):
+        value = value[key]
+    return float(value)
+
+
+async def run_sample_counts(
+    structure_file: Path,
+    content_hash: str,
+    spec: AnalysisSpec,
+    params: Dict[str, Any],
+    sample_counts: Sequence[int],
+    ha: bool = True,
+    skip_cache: bool = False,
+) -> List[Tuple[Dict[str, Any], bool]]:
+    """
+    Run the analysis once per sample count concurrently and parse the outputs.
+
+    Returns:
+        ``(parsed result, cached)`` per run, in the order of ``sample_counts``.
+
+    Raises:
+        ZeoppExecutionError: If a run failed (``exit_code`` 124 on timeout).
+        ZeoppOutputNotFoundError: If a run wrote no output.
+        ZeoppParsingError: If an output could not be parsed.
+    """
+    results = await asyncio.gather(*(
+        runner.run_combined_async(
+            structure_file=structure_file,
+            segments=[(spec.name, spec.build_args({**params, "samples": samples}), [spec.output_file])],
+            ha=ha,
+            skip_cache=skip_cache,
+            content_hash=content_hash,
+        )
+        for samples in sample_counts
+    ))
+
+    parsed = []
+    for result in results:
+        run = result[spec.name]
+        if not run["success"]:
+            raise ZeoppExecutionError(
+                f"Zeo++ execution failed for {spec.name}", exit_code=run["exit_code"], stderr=run.get("stderr", "")
+            )
+        output_text = run["output_data"].get(spec.output_file)
+        if output_text is None:
+            raise ZeoppOutputNotFoundError(
+                f"Output file '{spec.output_file}' was not generated by Zeo++.", expected_file=spec.output_file
+            )
+        parsed.append((spec.parser(output_text), run["cached"]))
+    return parsed
+
+
+def _relative_change(value: float, previous: float) -> Optional[float]:
+    """``|value - previous| / |value|``; None when only ``value`` is 0."""
+    if value:
+        return abs(value - previous) / abs(value)
+    return 0.0 if previous == 0 else None
+
+
+async def run_adaptive(
+    structure_file: Path,
+    content_hash: str,
+    spec: AnalysisSpec,
+    params: Dict[str, Any],
+    tolerance: Optional[float] = None,
+    ha: bool = True,
+    skip_cache: bool = False,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Run an analysis with doubling sample counts until successive runs agree.
+
+    Args:
+        params: Resolved parameters; ``samples`` is replaced by the chosen counts.
+        tolerance: Largest relative change of the primary metric between two
+            successive runs (default ``MC_AUTO_TOLERANCE``).
+
+    Returns:
+        Tuple of (parsed result of the largest run, with ``cached`` set when
+        every run came from the cache; convergence report with ``metric``,
+        ``value``, ``previous_value``, ``relative_change``, ``tolerance``,
+        ``converged``, ``samples``, ``total_samples`` and ``runs``).
+
+    Raises:
+        ValueError: If the analysis has no auto mode or the tolerance is not positive.
+        ZeoppExecutionError, ZeoppOutputNotFoundError, ZeoppParsingError: As
+            :func:`run_sample_counts`.
+    """
+    metric = PRIMARY_METRICS.get(spec.name)
+    if metric is None:
+        raise ValueError(f"samples='auto' is not available for {spec.name}")
+    tolerance = settings.mc_auto_tolerance if tolerance is None else tolerance
+    if tolerance <= 0:
+        raise ValueError("tolerance must be greater than 0")
+
+    default_samples = next(p.default for p in spec.params if p.name == "samples")
+    budget = default_samples * MAX_SAMPLES_FACTOR
+    samples = max(1, int(default_samples * INITIAL_SAMPLES_FRACTION))
+
+    counts = [samples, 2 * samples]
+    runs = await run_sample_counts(structure_file, content_hash, spec, params, counts, ha=ha, skip_cache=skip_cache)
+    while True:
+        previous, value = (primary_metric(parsed, metric) for parsed, _ in runs[-2:])
+        change = _relative_change(value, previous)
+        converged = change is not None and change <= tolerance
+        if converged or sum(counts) + 2 * counts[-1] > budget:
+            break
+        counts.append(2 * counts[-1])
+        runs += await run_sample_counts(
+            structure_file, content_hash, spec, params, counts[-1:], ha=ha, skip_cache=skip_cache
+        )
+
+    result, _ = runs[-1]
+    return {**result, "cached": all(cached for _, cached in runs)}, {
+        "metric": metric,
+        "value": value,
+        "previous_value": previous,
+        "relative_change": change,
+        "tolerance": tolerance,
+        "converged": converged,
+        "samples": counts[-1],
+        "total_samples": sum(counts),
+        "runs": len(runs),
+    }
@@ -0,0 +1,173 @@
+# Staged Screening Pipelines
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-17
+
+"""
+Declarative multi-stage screening with filters between stages.
+
+A pipeline is a list of stages. Each stage runs a plan of analyses (one
+Zeo++ invocation) and may ``require`` conditions on the results gathered so
+far; a structure that fails a condition skips all later stages. Cheap
+analyses such as ``-res`` or ``-chan`` go first so that expensive Monte
+Carlo stages only run for structures that can pass::
+
+    [
+        {"analyses": ["pore_diameter"],
+         "require": [{"field": "pore_diameter.free_diameter", "op": ">=", "value": 3.0}]},
+        {"analyses": ["channel_analysis"],
+         "require": [{"field": "channel_analysis.dimension", "op": ">=", "value": 1}]},
+        {"analyses": ["surface_area", "accessible_volume"]}
+    ]
+"""
+
+import operator
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.analyses import AnalysisSpec, get_analysis, resolve_analysis_plan
+from app.core.batch import analyze_structure
+from app.core.runner import OutputCallback
+
+OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+@dataclass(frozen=True)
+class Predicate:
+    """Condition ``<analysis>.<field> <op> <value>`` on an earlier result."""
+    analysis: str
+    field: str
+    op: str
+    value: Any
+
+    def __str__(self) -> str:
+        return f"{self.analysis}.{self.field} {self.op} {self.value}"
+
+    def evaluate(self, results: Dict[str, Dict[str, Any]]) -> bool:
+        """Whether the condition holds; a missing result never passes."""
+        actual = results.get(self.analysis, {}).get(self.field)
+        if actual is None:
+            return False
+        return OPERATORS[self.op](actual, self.value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"field": f"{self.analysis}.{self.field}", "op": self.op, "value": self.value}
+
+
+@dataclass(frozen=True)
+class PipelineStage:
+    """Analyses run together, followed by the conditions to continue."""
+    plan: List[Tuple[AnalysisSpec, Dict[str, Any]]]
+    require: Tuple[Predicate, ...] = ()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "analyses": [{"analysis": spec.name, "params": params} for spec, params in self.plan],
+            "require": [predicate.to_dict() for predicate in self.require],
+        }
+
+
+Pipeline = List[PipelineStage]
+
+
+def _resolve_predicate(raw: Any, available: set) -> Predicate:
+    if not isinstance(raw, dict) or not isinstance(raw.get("field"), str):
+        raise ValueError("Each condition must be an object with 'field', 'op' and 'value'")
+    analysis, _, field = raw["field"].partition(".")
+    if analysis not in available:
+        raise ValueError(f"Condition on '{raw['field']}' refers to an analysis not run in this or an earlier stage")
+    fields = get_analysis(analysis).numeric_fields()
+    if field not in fields:
+        raise ValueError(f"Unknown field '{field}' of {analysis}. Available: {', '.join(sorted(fields))}")
+    op = raw.get("op")
+    if op not in OPERATORS:
+        raise ValueError(f"Invalid operator {op!r}. Available: {', '.join(OPERATORS)}")
+    value = raw.get("value")
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"Condition value for '{raw['field']}' must be a number")
+    return Predicate(analysis, field, op, value)
+
+
+def resolve_pipeline(raw: Any) -> Pipeline:
+    """
+    Validate a pipeline given as a list of ``{"analyses": [...], "require": [...]}`` stages.
+
+    Analyses use the format of :func:`resolve_analysis_plan`; every analysis
+    may appear in one stage only. Conditions name a numeric field of an
+    analysis run in the same or an earlier stage, e.g.
+    ``{"field": "pore_diameter.free_diameter", "op": ">=", "value": 3.0}``.
+
+    Raises:
+        ValueError: On malformed stages, unknown analyses or fields, or invalid conditions.
+    """
+    if not isinstance(raw, list) or not raw:
+        raise ValueError("A pipeline must be a non-empty list of stages")
+
+    stages: Pipeline = []
+    available: set = set()
+    for number, stage in enumerate(raw, start=1):
+        if not isinstance(stage, dict) or not isinstance(stage.get("analyses"), list):
+            raise ValueError(f"Stage {number} must be an object with an 'analyses' list")
+        plan = resolve_analysis_plan(stage["analyses"])
+        names = {spec.name for spec, _ in plan}
+        repeated = names & available
+        if repeated:
+            raise ValueError(f"Analysis '{sorted(repeated)[0]}' appears in more than one stage")
+        available |= names
+        require = stage.get("require") or []
+        if not isinstance(require, list):
+            raise ValueError(f"require of stage {number} must be a list")
+        stages.append(PipelineStage(plan, tuple(_resolve_predicate(p, available) for p in require)))
+    return stages
+
+
+def pipeline_analyses(stages: Pipeline) -> List[Dict[str, Any]]:
+    """All analyses of a pipeline in stage order."""
+    return [item for stage in stages for item in stage.to_dict()["analyses"]]
+
+
+async def run_pipeline(
+    structure_id: str,
+    stages: Pipeline,
+    ha: bool = True,
+    skip_cache: bool = False,
+    prefix: str = "pipeline",
+    on_output: Optional[OutputCallback] = None,
+) -> Dict[str, Any]:
+    """
+    Run the stages of a pipeline on a stored structure until one rejects it.
+
+    Returns:
+        ``{"status": "succeeded", "passed", "stages_run", "rejected_by",
+        "results", "errors", "computed"}``; ``passed`` is False when a
+        condition failed and ``rejected_by`` names it. ``{"status":
+        "failed", "error", ...}`` when a stage could not run.
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    errors: Dict[str, Dict[str, Any]] = {}
+    computed: List[str] = []
+    progress = {"results": results, "errors": errors, "computed": computed}
+
+    for number, stage in enumerate(stages, start=1):
+        outcome = await analyze_structure(
+            structure_id, stage.plan, ha=ha, skip_cache=skip_cache, prefix=prefix, on_output=on_output
+        )
+        if outcome["status"] != "succeeded":
+            return {**outcome, "stages_run": number, **progress}
+        results.update(outcome["results"])
+        errors.update(outcome["errors"])
+        computed.extend(outcome["computed"])
+
+        rejected = next((p for p in stage.require if not p.evaluate(results)), None)
+        if rejected is not None:
+            return {"status": "succeeded", "passed": False, "stages_run": number, "rejected_by": str(rejected),
+                    **progress}
+
+    return {"status": "succeeded", "passed": True, "stages_run": len(stages), "rejected_by": None, **progress}
@@ -0,0 +1,154 @@
+# Per-Tenant CPU Quotas
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-18
+
+"""
+Token-bucket quotas of Zeo++ compute time per tenant.
+
+The request rate limit (``app/core/limiter.py``) counts requests per IP, so a
+cached ``-res`` lookup costs as much as a fresh 500k-sample ``-psd``. With
+``QUOTA_CPU_SECONDS_PER_HOUR > 0`` every tenant (see
+:func:`app.core.admission.tenant_key`: API key, bearer token or client IP)
+also has a bucket of Zeo++ CPU-seconds that refills at that rate up to
+``QUOTA_BURST_CPU_SECONDS``:
+
+- Every Zeo++ process started on behalf of a tenant is charged its runtime
+  when it exits (Zeo++ is single-threaded, so wall-clock seconds of the
+  process are its CPU-seconds). Each request or MCP call additionally costs
+  ``QUOTA_REQUEST_CPU_SECONDS``, which is all a cache hit costs.
+- A tenant whose bucket is empty cannot start new runs (429 with
+  ``Retry-After`` until the bucket refills); cache hits are still served.
+- Queued jobs of exhausted tenants are claimed only when no other tenant has
+  a job waiting, so one screening campaign cannot starve everyone else.
+
+The buckets live in the workspace (:mod:`app.utils.quota_store`), so all
+workers and the MCP server share them. The tenant being charged is carried
+in a context variable set by :func:`metered`, which follows the request into
+the runner's tasks and threads.
+"""
+
+import asyncio
+import contextvars
+import math
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional
+
+from app.core.admission import AdmissionError
+from app.core.config import QUOTAS_DIR, settings
+from app.utils.logger import logger
+from app.utils.quota_store import get_quota_store
+
+store = get_quota_store(QUOTAS_DIR)
+
+_current_tenant: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("zeopp_quota_tenant", default=None)
+
+
+class QuotaExceededError(AdmissionError):
+    """The tenant has used up its CPU quota (HTTP 429)."""
+    status_code = 429
+
+
+@dataclass(frozen=True)
+class QuotaStatus:
+    """State of a tenant's bucket in CPU-seconds; ``reset_seconds`` until it is full again."""
+    limit: float
+    remaining: float
+    reset_seconds: float
+
+    def headers(self) -> Dict[str, str]:
+        """``X-CPU-Quota-*`` response headers."""
+        return {
+            "X-CPU-Quota-Limit": f"{self.limit:.0f}",
+            "X-CPU-Quota-Remaining": f"{max(self.remaining, 0.0):.2f}",
+            "X-CPU-Quota-Reset": str(math.ceil(self.reset_seconds)),
+        }
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "limit_cpu_seconds": self.limit,
+            "remaining_cpu_seconds": round(max(self.remaining, 0.0), 3),
+            "reset_seconds": math.ceil(self.reset_seconds),
+        }
+
+
+def quotas_enabled() -> bool:
+    return settings.quota_cpu_seconds_per_hour > 0
+
+
+def _capacity() -> float:
+    return settings.quota_burst_cpu_seconds or settings.quota_cpu_seconds_per_hour
+
+
+def _rate() -> float:
+    return settings.quota_cpu_seconds_per_hour / 3600
+
+
+def quota_status(tenant: str) -> Optional[QuotaStatus]:
+    """Current quota of a tenant, or None when quotas are disabled."""
+    if not quotas_enabled():
+        return None
+    capacity = _capacity()
+    remaining = store.peek(tenant, capacity, _rate())
+    return QuotaStatus(capacity, remaining, (capacity - remaining) / _rate())
+
+
+def check_quota(tenant: Optional[str]) -> None:
+    """
+    Refuse new runs of a tenant whose bucket is empty.
+
+    Raises:
+        QuotaExceededError: With ``retry_after`` the seconds until the bucket refills above zero.
+    """
+    if tenant is None or not quotas_enabled():
+        return
+    remaining = store.peek(tenant, _capacity(), _rate())
+    if remaining <= 0:
+        raise QuotaExceededError(
+            f"CPU quota exhausted ({settings.quota_cpu_seconds_per_hour:.0f} Zeo++ CPU-seconds per hour)",
+            -remaining / _rate(),
+        )
+
+
+def charge(tenant: Optional[str], cpu_seconds: float) -> None:
+    """Take ``cpu_seconds`` from a tenant's bucket (no-op without tenant or with quotas disabled)."""
+    if tenant is None or not quotas_enabled() or cpu_seconds <= 0:
+        return
+    try:
+        store.charge(tenant, cpu_seconds, _capacity(), _rate())
+    except Exception as e:
+        logger.warning(f"[quota] Could not charge {cpu_seconds:.2f} CPU-seconds to {tenant}: {e}")
+
+
+def current_tenant() -> Optional[str]:
+    """Tenant that the code running now is metered for (see :func:`metered`)."""
+    return _current_tenant.get()
+
+
+def record_execution(cpu_seconds: float) -> None:
+    """Charge a finished Zeo++ process to the current tenant."""
+    charge(_current_tenant.get(), cpu_seconds)
+
+
+def exhausted_tenants() -> List[str]:
+    """Tenants with an empty bucket; their queued jobs are claimed last."""
+    if not quotas_enabled():
+        return []
+    return store.exhausted(_capacity(), _rate())
+
+
+@asynccontextmanager
+async def metered(tenant: Optional[str]) -> AsyncIterator[None]:
+    """
+    Charge the Zeo++ processes started within the block to ``tenant``.
+
+    The per-request fee ``QUOTA_REQUEST_CPU_SECONDS`` is charged when the block exits.
+    """
+    token = _current_tenant.set(tenant)
+    try:
+        yield
+    finally:
+        _current_tenant.reset(token)
+        if tenant is not None and quotas_enabled():
+            await asyncio.shield(asyncio.to_thread(charge, tenant, settings.quota_request_cpu_seconds))
@@ -1,28 +1,65 @@
-"""Zeo++ command runner with caching and async thread-pool execution."""
+"""Zeo++ command runner with caching and asyncio subprocess execution."""
 
 # -*- coding: utf-8 -*-
 # Author: Shibo Li
 # Date: 2025-05-13
 # Updated: 2026-02-25 - Added cross-platform subprocess fallback for Windows development
+# Updated: 2026-10-17 - Added combined multi-analysis invocation (run_combined)
+# Updated: 2026-10-17 - Canonical cache keys shared by REST, MCP and combined runs
+# Updated: 2026-10-17 - Record entry size and last access for cache eviction
+# Updated: 2026-10-17 - Cache entries are recorded in the SQLite cache index
+# Updated: 2026-10-17 - Cache entries are staged and published atomically with a manifest
+# Updated: 2026-10-17 - Single-flight coalescing of identical runs (in-process and cross-worker)
+# Updated: 2026-10-17 - Native asyncio subprocess engine replaces the thread-pool wrapper
+# Updated: 2026-10-17 - Abandoned runs are killed or finished for the cache (ABANDONED_RUN_POLICY)
+# Updated: 2026-10-17 - Processes also take a host-wide slot shared by all workers
+# Updated: 2026-10-18 - Processes start shortest-predicted first; durations recorded for the runtime model
+# Updated: 2026-10-18 - Fast and slow execution lanes with their own limits and timeouts
+# Updated: 2026-10-18 - Process runtimes charged to the CPU quota of the current tenant
+# Updated: 2026-10-18 - Client deadlines refuse late runs and shorten process timeouts
+# Updated: 2026-10-18 - Removed the synchronous execution path (run_command, run_combined)
 
 import asyncio
-import functools
-import subprocess
-from concurrent.futures import ThreadPoolExecutor
+import os
+import shutil
+import signal
+import time
+import uuid
+from contextlib import AsyncExitStack, nullcontext
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 
 from app.core.config import WORKSPACE_ROOT, ZEO_EXECUTABLE, settings
-from app.utils.file import compute_cache_key, get_cache_path
+from app.core.deadlines import DEADLINE_EXIT_CODE, remaining_seconds
+from app.core.lanes import (
+    FAST_LANE,
+    QUEUE_FULL_EXIT_CODE,
+    SLOW_LANE,
+    Lane,
+    assign_lane,
+    get_lane,
+    lane_host_slots,
+    lane_scheduler,
+)
+from app.core.quota import record_execution
+from app.core.scheduler import QueueFullError, runtime_model, virtual_start
+from app.core.single_flight import SingleFlight, async_cache_key_lock
+from app.utils.cache_entry import read_cache_manifest, write_cache_entry
+from app.utils.cache_layout import cache_root_of
+from app.utils.cleanup import record_cache_entry, touch_cache_entry
+from app.utils.file import compute_cache_key, get_cache_path, hash_file, parse_zeo_args
 from app.utils.logger import logger
+from app.utils.structure_size import StructureSize
 
-try:
-    import sh as sh_lib  # type: ignore[import-untyped]
-except ImportError:
-    sh_lib = None
 
+# Size of the chunks in which stdout/stderr of a running process are read
+STREAM_CHUNK_SIZE = 64 * 1024
+# Margin past a deadline after which a run still waiting for its slot is dropped
+DEADLINE_GRACE_SECONDS = 1.0
 
-_executor = ThreadPoolExecutor(max_workers=settings.max_concurrent_tasks)
+_single_flight = SingleFlight()
+
+OutputCallback = Callable[[str, str], None]
 
 
 def _safe_read_text(path: Path) -> str:
@@ -37,152 +74,549 @@ def _decode_stream(value) -> str:
     return str(value)
 
 
+def _kill_process_group(process: asyncio.subprocess.Process) -> None:
+    """Kill a Zeo++ process and anything it spawned."""
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+
+async def _drain(
+    stream: Optional[asyncio.StreamReader],
+    chunks: List[bytes],
+    name: str,
+    on_output: Optional[OutputCallback]
+) -> None:
+    """Collect a process stream chunk by chunk, forwarding each chunk to ``on_output``."""
+    if stream is None:
+        return
+    while True:
+        chunk = await stream.read(STREAM_CHUNK_SIZE)
+        if not chunk:
+            return
+        chunks.append(chunk)
+        if on_output is not None:
+            on_output(name, chunk.decode("utf-8", errors="replace"))
+
+
 class ZeoRunner:
     def __init__(self, zeo_exec_path: str = ZEO_EXECUTABLE, workspace: Path = WORKSPACE_ROOT):
         self.zeo_exec = zeo_exec_path
         self.workspace = workspace
 
-    def _run_with_sh(self, zeo_args: List[str], cwd: Path) -> Tuple[bool, int, str, str]:
-        """Run command via `sh` (Linux/macOS)."""
+    @staticmethod
+    def _cached_result(cache_dir: Path, output_files: Optional[List[str]] = None) -> Optional[Dict]:
+        """
+        Load a published cache entry.
+
+        Returns:
+            The cached result, or None if there is no complete entry (missing
+            manifest, or the entry was evicted while being read).
+        """
+        manifest = read_cache_manifest(cache_dir)
+        if manifest is None:
+            return None
         try:
-            result = sh_lib.Command(self.zeo_exec)(  # type: ignore[union-attr]
-                *zeo_args,
-                _cwd=str(cwd),
-                _err_to_out=True,
-                _timeout=settings.zeo_command_timeout_seconds,
-            )
-            return True, 0, str(result), ""
-        except sh_lib.CommandNotFound as exc:  # type: ignore[union-attr]
-            return False, 127, "", str(exc)
-        except sh_lib.TimeoutException as exc:  # type: ignore[union-attr]
-            logger.error(
-                f"[runner] Zeo++ command timed out after "
-                f"{settings.zeo_command_timeout_seconds}s: {zeo_args}"
+            output_data = {name: _safe_read_text(cache_dir / name) for name in manifest["files"]}
+        except (OSError, KeyError, TypeError):
+            return None
+        touch_cache_entry(cache_dir)
+        # Outputs named after the input file (``<stem>.psd_histo``) may have been
+        # cached by an upload of the same content under another filename.
+        for filename in output_files or []:
+            if filename not in output_data:
+                suffix = Path(filename).suffix
+                matches = [name for name in output_data if Path(name).suffix == suffix]
+                if len(matches) == 1:
+                    output_data[filename] = output_data[matches[0]]
+        return {
+            "success": True,
+            "exit_code": 0,
+            "stdout": "[cache] Used cached result.",
+            "stderr": "",
+            "cached": True,
+            "output_data": output_data
+        }
+
+    @staticmethod
+    def _failed_result(exit_code: int, stdout: str, stderr: str) -> Dict:
+        return {
+            "success": False,
+            "exit_code": exit_code,
+            "stdout": stdout,
+            "stderr": stderr,
+            "cached": False,
+            "output_data": {}
+        }
+
+    @staticmethod
+    def _fresh_result(
+        cwd: Path,
+        output_files: List[str],
+        cache_dir: Path,
+        stdout: str,
+        stderr: str,
+        operation: str = "",
+        structure_hash: str = "",
+        replace: bool = False
+    ) -> Dict:
+        """
+        Collect freshly generated outputs, publish them to the cache and index the entry.
+
+        When a concurrent identical run has already published the entry, that
+        entry is kept (``replace`` forces this run's outputs to win). Runs that
+        did not produce every expected output are not cached.
+        """
+        output_data = {
+            filename: _safe_read_text(cwd / filename)
+            for filename in output_files
+            if (cwd / filename).exists()
+        }
+        if settings.enable_cache and len(output_data) == len(output_files):
+            encoded = {filename: content.encode("utf-8") for filename, content in output_data.items()}
+            try:
+                if write_cache_entry(cache_dir, encoded, replace=replace):
+                    size_bytes = sum(len(content) for content in encoded.values())
+                    record_cache_entry(cache_dir, size_bytes, operation, structure_hash)
+            except OSError as e:
+                logger.warning(f"[cache] Failed to write cache entry {cache_dir.name}: {e}")
+
+        return {
+            "success": True,
+            "exit_code": 0,
+            "stdout": stdout,
+            "stderr": stderr,
+            "cached": False,
+            "output_data": output_data
+        }
+
+    async def _execute_async(
+        self,
+        zeo_args: List[str],
+        cwd: Path,
+        on_output: Optional[OutputCallback] = None
+    ) -> Tuple[bool, int, str, str]:
+        """
+        Run the Zeo++ executable as an asyncio subprocess.
+
+        The run is assigned to the fast or slow execution lane (see
+        :mod:`app.core.lanes`). Each lane caps its processes per worker and
+        host-wide; further calls wait in the lane's cost-aware scheduler,
+        which starts the run with the shortest predicted runtime first, with
+        aging (see :mod:`app.core.scheduler`), and then for a host-wide slot
+        of the lane (see :mod:`app.core.host_slots`) queued by the same
+        priority. Under a client deadline (see :mod:`app.core.deadlines`),
+        runs predicted to finish too late are refused before queueing and
+        the process timeout is shortened to the time left. A fast-lane run
+        that exceeds the fast-lane timeout is rerun in the slow lane. The
+        duration of successful runs is recorded
+        for the runtime model, and every process is charged to the CPU quota
+        of the current tenant (see :mod:`app.core.quota`).
+
+        Args:
+            zeo_args: Arguments passed to the executable.
+            cwd: Working directory (the task directory).
+            on_output: Optional callback ``(stream, text)`` receiving stdout
+                and stderr chunks as they are produced.
+
+        Returns:
+            Tuple of (success, exit_code, stdout, stderr); exit code 124 on
+            timeout, ``QUEUE_FULL_EXIT_CODE`` when the lane's queue is full,
+            ``DEADLINE_EXIT_CODE`` when the deadline cannot be or was not met.
+        """
+        structure_file = cwd / zeo_args[-1] if zeo_args else cwd
+        size, predicted = await asyncio.to_thread(runtime_model.estimate, zeo_args, structure_file)
+        priority = virtual_start(predicted)
+        lane = assign_lane(zeo_args, predicted)
+        remaining = remaining_seconds()
+        if remaining is not None:
+            wait = lane_scheduler(lane).expected_wait(priority)
+            if predicted + wait > remaining:
+                logger.warning(f"[runner] Refusing run that cannot meet its deadline: {zeo_args}")
+                return False, DEADLINE_EXIT_CODE, "", (
+                    f"Deadline cannot be met: predicted {predicted:.1f}s run after {wait:.1f}s of waiting, "
+                    f"{max(remaining, 0.0):.1f}s of the time budget left"
+                )
+        outcome = await self._execute_in_lane(lane, zeo_args, cwd, on_output, priority, predicted, size)
+        if outcome[1] == 124 and lane.name == FAST_LANE and lane.timeout_seconds < settings.zeo_command_timeout_seconds:
+            logger.warning(
+                f"[runner] Fast-lane run exceeded {lane.timeout_seconds}s; rerunning in the slow lane: {zeo_args}"
             )
-            return False, 124, "", f"Zeo++ command timed out after {settings.zeo_command_timeout_seconds}s: {exc}"
-        except sh_lib.ErrorReturnCode as exc:  # type: ignore[union-attr]
-            return (
-                False,
-                int(exc.exit_code),
-                _decode_stream(exc.stdout),
-                _decode_stream(exc.stderr),
+            outcome = await self._execute_in_lane(
+                get_lane(SLOW_LANE), zeo_args, cwd, on_output, priority, predicted, size
             )
+        return outcome
 
-    def _run_with_subprocess(self, zeo_args: List[str], cwd: Path) -> Tuple[bool, int, str, str]:
-        """Run command via subprocess (cross-platform fallback)."""
-        cmd = [self.zeo_exec, *zeo_args]
+    async def _execute_in_lane(
+        self,
+        lane: Lane,
+        zeo_args: List[str],
+        cwd: Path,
+        on_output: Optional[OutputCallback],
+        priority: float,
+        predicted: float,
+        size: StructureSize
+    ) -> Tuple[bool, int, str, str]:
+        """
+        Run one Zeo++ process within the limits of ``lane`` and the current deadline.
+
+        The wait for a slot ends at the deadline, and the process timeout is
+        shortened to the time left.
+        """
+        remaining = remaining_seconds()
+        slots = self._process_in_lane(lane, zeo_args, cwd, on_output, priority, predicted, size)
+        if remaining is None:
+            return await slots
+        try:
+            return await asyncio.wait_for(slots, remaining + DEADLINE_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning(f"[runner] Deadline passed while waiting for a {lane.name}-lane slot: {zeo_args}")
+            return False, DEADLINE_EXIT_CODE, "", "Deadline passed before the run could start"
+
+    async def _process_in_lane(
+        self,
+        lane: Lane,
+        zeo_args: List[str],
+        cwd: Path,
+        on_output: Optional[OutputCallback],
+        priority: float,
+        predicted: float,
+        size: StructureSize
+    ) -> Tuple[bool, int, str, str]:
         try:
-            completed = subprocess.run(
-                cmd,
+            async with lane_scheduler(lane).slot(priority, predicted), lane_host_slots(lane).hold_async(priority):
+                remaining = remaining_seconds()
+                if remaining is None or remaining >= lane.timeout_seconds:
+                    return await self._run_process(zeo_args, cwd, on_output, lane.timeout_seconds, size)
+                if remaining <= 0:
+                    return False, DEADLINE_EXIT_CODE, "", "Deadline passed before the run could start"
+                success, exit_code, stdout, stderr = await self._run_process(zeo_args, cwd, on_output, remaining, size)
+                if exit_code == 124:
+                    message = f"Zeo++ run stopped at the deadline after {remaining:.1f}s"
+                    return False, DEADLINE_EXIT_CODE, stdout, message
+                return success, exit_code, stdout, stderr
+        except QueueFullError as e:
+            logger.warning(f"[runner] {lane.name.capitalize()} lane queue is full ({e}); rejecting: {zeo_args}")
+            return False, QUEUE_FULL_EXIT_CODE, "", f"The {lane.name} execution lane is full: {e}"
+
+    async def _run_process(
+        self,
+        zeo_args: List[str],
+        cwd: Path,
+        on_output: Optional[OutputCallback],
+        timeout: float,
+        size: StructureSize
+    ) -> Tuple[bool, int, str, str]:
+        """
+        Start the Zeo++ process and collect its output.
+
+        The process is started in its own session so that on timeout (or
+        cancellation of the caller) the whole process group is killed.
+        """
+        started = time.monotonic()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                self.zeo_exec,
+                *zeo_args,
                 cwd=str(cwd),
-                capture_output=True,
-                text=True,
-                check=False,
-                timeout=settings.zeo_command_timeout_seconds,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=os.name == "posix",
             )
-            return completed.returncode == 0, completed.returncode, completed.stdout or "", completed.stderr or ""
         except FileNotFoundError:
             return False, 127, "", f"Executable not found: {self.zeo_exec}"
-        except subprocess.TimeoutExpired as exc:
-            logger.error(
-                f"[runner] Zeo++ command timed out after "
-                f"{settings.zeo_command_timeout_seconds}s: {zeo_args}"
-            )
-            stdout = _decode_stream(exc.stdout)
-            return False, 124, stdout, f"Zeo++ command timed out after {settings.zeo_command_timeout_seconds}s"
-        except Exception as exc:
+        except OSError as exc:
             return False, 1, "", str(exc)
 
-    def run_command(
+        stdout_chunks: List[bytes] = []
+        stderr_chunks: List[bytes] = []
+        gathered = asyncio.gather(
+            _drain(process.stdout, stdout_chunks, "stdout", on_output),
+            _drain(process.stderr, stderr_chunks, "stderr", on_output),
+            process.wait(),
+        )
+        try:
+            await asyncio.wait_for(gathered, timeout=timeout)
+        except asyncio.TimeoutError:
+            _kill_process_group(process)
+            await process.wait()
+            logger.error(f"[runner] Zeo++ command timed out after {timeout}s: {zeo_args}")
+            await asyncio.to_thread(record_execution, time.monotonic() - started)
+            return False, 124, _decode_stream(b"".join(stdout_chunks)), f"Zeo++ command timed out after {timeout}s"
+        finally:
+            if process.returncode is None:
+                _kill_process_group(process)
+            if gathered.done() and not gathered.cancelled():
+                # A cancelled gather stores CancelledError as its exception; mark it retrieved
+                gathered.exception()
+
+        exit_code = await process.wait()
+        stdout = _decode_stream(b"".join(stdout_chunks))
+        stderr = _decode_stream(b"".join(stderr_chunks))
+        elapsed = time.monotonic() - started
+        await asyncio.to_thread(record_execution, elapsed)
+        if exit_code == 0:
+            await asyncio.to_thread(runtime_model.record, zeo_args, size, elapsed)
+        return exit_code == 0, exit_code, stdout, stderr
+
+    @staticmethod
+    def _key_lock_async(cache_dir: Path):
+        """Cross-worker lock serializing runs that would write ``cache_dir``."""
+        if not settings.enable_cache:
+            return nullcontext()
+        return async_cache_key_lock(cache_root_of(cache_dir), cache_dir.name)
+
+    @staticmethod
+    def _cancel_abandoned() -> bool:
+        """Whether a run nobody waits for any more is killed (vs. finished for the cache)."""
+        return settings.abandoned_run_policy != "finish" or not settings.enable_cache
+
+    async def _supervised(self, compute: Callable[[], Awaitable[Dict]]) -> Dict:
+        """Run ``compute`` without coalescing, applying the abandoned-run policy."""
+        result: Dict
+        result, _ = await _single_flight.run(None, compute, self._cancel_abandoned())
+        return result
+
+    async def _coalesced(self, key: str, compute: Callable[[], Awaitable[Dict]]) -> Dict:
+        """
+        Run ``compute``, sharing one run among concurrent callers of ``key``.
+
+        A failed leader result is shared; otherwise followers run ``compute``
+        themselves, which then hits the cache entry the leader published (or
+        recomputes if it could not). A run that every caller abandoned is
+        killed or finished according to ``ABANDONED_RUN_POLICY``.
+        """
+        result: Optional[Dict]
+        result, leader = await _single_flight.run(key, compute, self._cancel_abandoned())
+        if result is not None and (leader or not self._all_succeeded(result)):
+            return result
+        return await self._supervised(compute)
+
+    @staticmethod
+    def _create_run_dir(structure_file: Path) -> Path:
+        """
+        Create a private directory next to the task directory for one Zeo++ run.
+
+        The structure is hard-linked (or copied) into it, so the run does not
+        depend on the task directory, which the request that started it may
+        remove after it stops waiting (disconnect, cancellation).
+        """
+        run_dir = structure_file.parent.parent / f"zeo_run_{uuid.uuid4().hex}"
+        run_dir.mkdir(parents=True)
+        target = run_dir / structure_file.name
+        try:
+            os.link(structure_file, target)
+        except OSError:
+            shutil.copyfile(structure_file, target)
+        return run_dir
+
+    @staticmethod
+    def _all_succeeded(result: Dict) -> bool:
+        if "success" in result:
+            return bool(result["success"])
+        return all(item["success"] for item in result.values())
+
+    async def _compute_command(
+        self,
+        structure_file: Path,
+        zeo_args: List[str],
+        output_files: List[str],
+        cache_dir: Path,
+        content_hash: str,
+        skip_cache: bool,
+        on_output: Optional[OutputCallback]
+    ) -> Dict:
+        async with self._key_lock_async(cache_dir):
+            if settings.enable_cache and not skip_cache:
+                cached = await asyncio.to_thread(self._cached_result, cache_dir, output_files)
+                if cached is not None:
+                    logger.info(f"[cache] Cache entry published by a concurrent run: {cache_dir.name}")
+                    return cached
+
+            logger.info("[cache] Cache miss. Running Zeo++...")
+            cwd = await asyncio.to_thread(self._create_run_dir, structure_file)
+            try:
+                success, exit_code, stdout, stderr = await self._execute_async(zeo_args, cwd, on_output)
+                if not success:
+                    logger.error(f"[zeo++] Error: Exit code {exit_code}")
+                    return self._failed_result(exit_code, stdout, stderr)
+
+                logger.info("[zeo++] Execution completed.")
+                operation = parse_zeo_args(zeo_args)[0]
+                return await asyncio.to_thread(
+                    self._fresh_result, cwd, output_files, cache_dir, stdout, stderr,
+                    operation, content_hash, skip_cache
+                )
+            finally:
+                shutil.rmtree(cwd, ignore_errors=True)
+
+    async def run_command_async(
         self,
         structure_file: Path,
         zeo_args: List[str],
         output_files: List[str],
         extra_identifier: Optional[str] = None,
-        skip_cache: bool = False
+        skip_cache: bool = False,
+        content_hash: Optional[str] = None,
+        on_output: Optional[OutputCallback] = None
     ) -> Dict:
         """
-        Run Zeo++ command with cache lookup.
+        Run a Zeo++ command as an asyncio subprocess, with cache lookup.
+
+        Threads are only used for hashing and cache file I/O. Identical
+        concurrent calls (same cache key) are coalesced into one run.
+
+        Args:
+            structure_file: Path to the structure in its task directory.
+            zeo_args: Zeo++ arguments ending with the input filename.
+            output_files: Output files to collect and cache.
+            extra_identifier: Optional variant tag for results that must not
+                share the canonical cache entry of ``zeo_args``.
+            skip_cache: Ignore (and replace) an existing cache entry.
+            content_hash: Precomputed sha256 of the structure (e.g. a
+                structure_id); when given the file is not re-hashed.
+            on_output: Optional callback ``(stream, text)`` receiving
+                stdout/stderr chunks while Zeo++ runs.
 
         Returns:
             Dict containing execution status and output file content.
         """
         logger.info(f"[runner] Preparing Zeo++ command: {zeo_args}")
 
-        cache_key = compute_cache_key(structure_file, zeo_args, extra_identifier)
+        structure_hash = content_hash if content_hash else await asyncio.to_thread(hash_file, structure_file)
+        cache_key = compute_cache_key(structure_file, zeo_args, extra_identifier, structure_hash)
         cache_dir = get_cache_path(cache_key)
 
-        if settings.enable_cache and cache_dir.exists() and not skip_cache:
+        def compute() -> Awaitable[Dict]:
+            return self._compute_command(
+                structure_file, zeo_args, output_files, cache_dir, structure_hash, skip_cache, on_output
+            )
+
+        if not settings.enable_cache or skip_cache:
+            if skip_cache:
+                logger.info("[cache] Skipping cache (force_recalculate=True)")
+            return await self._supervised(compute)
+
+        cached = await asyncio.to_thread(self._cached_result, cache_dir, output_files)
+        if cached is not None:
             logger.info(f"[cache] Cache hit for key: {cache_key}")
-            return {
-                "success": True,
-                "exit_code": 0,
-                "stdout": "[cache] Used cached result.",
-                "stderr": "",
-                "cached": True,
-                "output_data": {f.name: _safe_read_text(f) for f in cache_dir.glob("*") if f.is_file()}
-            }
-
-        if skip_cache:
-            logger.info("[cache] Skipping cache (force_recalculate=True)")
-
-        logger.info("[cache] Cache miss. Running Zeo++...")
-
-        cwd = structure_file.parent
-        if sh_lib is not None:
-            success, exit_code, stdout, stderr = self._run_with_sh(zeo_args, cwd)
-        else:
-            success, exit_code, stdout, stderr = self._run_with_subprocess(zeo_args, cwd)
-
-        if not success:
-            logger.error(f"[zeo++] Error: Exit code {exit_code}")
-            return {
-                "success": False,
-                "exit_code": exit_code,
-                "stdout": stdout,
-                "stderr": stderr,
-                "cached": False,
-                "output_data": {}
-            }
-
-        logger.info("[zeo++] Execution completed.")
-
-        if settings.enable_cache:
-            cache_dir.mkdir(parents=True, exist_ok=True)
-            for out_file in output_files:
-                out_path = cwd / out_file
-                if out_path.exists():
-                    (cache_dir / out_file).write_text(_safe_read_text(out_path), encoding="utf-8")
+            return cached
+        return await self._coalesced(cache_key, compute)
 
-        return {
-            "success": True,
-            "exit_code": 0,
-            "stdout": stdout,
-            "stderr": stderr,
-            "cached": False,
-            "output_data": {
-                filename: _safe_read_text(cwd / filename)
-                for filename in output_files
-                if (cwd / filename).exists()
-            }
-        }
+    async def _compute_combined(
+        self,
+        structure_file: Path,
+        pending: List[Tuple[str, List[str], List[str], Path]],
+        prefix: List[str],
+        content_hash: str,
+        skip_cache: bool,
+        on_output: Optional[OutputCallback]
+    ) -> Dict[str, Dict]:
+        results: Dict[str, Dict] = {}
+        async with AsyncExitStack() as locks:
+            # Lock in key order so overlapping combined runs cannot deadlock.
+            for cache_dir in sorted(entry[3] for entry in pending):
+                await locks.enter_async_context(self._key_lock_async(cache_dir))
+            if settings.enable_cache and not skip_cache:
+                still_pending = []
+                for entry in pending:
+                    cached = await asyncio.to_thread(self._cached_result, entry[3], entry[2])
+                    if cached is not None:
+                        logger.info(f"[cache] Cache entry for {entry[0]} published by a concurrent run")
+                        results[entry[0]] = cached
+                    else:
+                        still_pending.append(entry)
+                pending = still_pending
+                if not pending:
+                    return results
 
-    async def run_command_async(
+            combined_args = prefix + [arg for _, segment_args, _, _ in pending for arg in segment_args]
+            combined_args.append(structure_file.name)
+            logger.info(f"[runner] Running combined Zeo++ command: {combined_args}")
+
+            cwd = await asyncio.to_thread(self._create_run_dir, structure_file)
+            try:
+                success, exit_code, stdout, stderr = await self._execute_async(combined_args, cwd, on_output)
+                if not success:
+                    logger.error(f"[zeo++] Error: Exit code {exit_code}")
+
+                for identifier, segment_args, output_files, cache_dir in pending:
+                    if success:
+                        results[identifier] = await asyncio.to_thread(
+                            self._fresh_result, cwd, output_files, cache_dir, stdout, stderr,
+                            parse_zeo_args(segment_args)[0], content_hash, skip_cache
+                        )
+                    else:
+                        results[identifier] = self._failed_result(exit_code, stdout, stderr)
+            finally:
+                shutil.rmtree(cwd, ignore_errors=True)
+        return results
+
+    async def run_combined_async(
         self,
         structure_file: Path,
-        zeo_args: List[str],
-        output_files: List[str],
-        extra_identifier: Optional[str] = None,
-        skip_cache: bool = False
-    ) -> Dict:
-        """Async wrapper for `run_command` that uses thread pool execution."""
-        loop = asyncio.get_event_loop()
-        func = functools.partial(
-            self.run_command,
-            structure_file,
-            zeo_args,
-            output_files,
-            extra_identifier,
-            skip_cache
-        )
-        return await loop.run_in_executor(_executor, func)
+        segments: List[Tuple[str, List[str], List[str]]],
+        ha: bool = True,
+        skip_cache: bool = False,
+        content_hash: Optional[str] = None,
+        on_output: Optional[OutputCallback] = None
+    ) -> Dict[str, Dict]:
+        """
+        Run several analyses against one structure in a single Zeo++ invocation.
+
+        Zeo++ accepts multiple analysis flags on one command line and computes
+        the Voronoi decomposition only once. Each segment is cached under the
+        same key a standalone ``run_command_async`` call would use, so
+        single-analysis requests hit entries produced here and vice versa.
+        Identical concurrent calls (same set of missing segment keys) are
+        coalesced into one Zeo++ invocation.
+
+        Args:
+            structure_file: Path to the structure in its task directory.
+            segments: ``(identifier, segment_args, output_files)`` tuples where
+                ``segment_args`` is ``<flag> <params...> <output>`` without
+                ``-ha`` or the input filename.
+            ha: Prefix the invocation with ``-ha``.
+            skip_cache: Ignore existing cache entries.
+            content_hash: Precomputed sha256 of the structure content.
+            on_output: Optional callback ``(stream, text)`` receiving
+                stdout/stderr chunks while Zeo++ runs.
+
+        Returns:
+            Dict mapping each identifier to a result dict shaped like the one
+            returned by ``run_command_async``.
+        """
+        prefix = ["-ha"] if ha else []
+        structure_hash = content_hash if content_hash else await asyncio.to_thread(hash_file, structure_file)
+        results: Dict[str, Dict] = {}
+        pending: List[Tuple[str, List[str], List[str], Path]] = []
+
+        for identifier, segment_args, output_files in segments:
+            full_args = prefix + segment_args + [structure_file.name]
+            cache_key = compute_cache_key(structure_file, full_args, content_hash=structure_hash)
+            cache_dir = get_cache_path(cache_key)
+            cached = None
+            if settings.enable_cache and not skip_cache:
+                cached = await asyncio.to_thread(self._cached_result, cache_dir, output_files)
+            if cached is not None:
+                logger.info(f"[cache] Cache hit for {identifier}: {cache_key}")
+                results[identifier] = cached
+            else:
+                pending.append((identifier, segment_args, output_files, cache_dir))
+
+        if not pending:
+            return results
+
+        def compute() -> Awaitable[Dict[str, Dict]]:
+            return self._compute_combined(structure_file, pending, prefix, structure_hash, skip_cache, on_output)
+
+        if not settings.enable_cache or skip_cache:
+            results.update(await self._supervised(compute))
+        else:
+            key = "+".join(sorted(entry[3].name for entry in pending))
+            results.update(await self._coalesced(key, compute))
+        return results
@@ -0,0 +1,340 @@
+# Cost-Aware Scheduling of Zeo++ Processes
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-18
+# Updated: 2026-10-18 - Bounded queues for execution lanes
+# Updated: 2026-10-18 - Predicted wait for admission control
+
+"""
+Shortest-predicted-job-first ordering of Zeo++ processes and jobs.
+
+Every Zeo++ run gets a predicted runtime from a :class:`RuntimeModel`. The
+model is a log-linear regression per operation,
+
+    ln(seconds) = b0 + b1 ln(atoms / 100) + b2 ln(volume / 1000)
+                  + b3 ln(samples / 1000) + b4 [-ha],
+
+fitted on the durations the service records itself (see
+``app/utils/runtime_store.py``) and pulled towards built-in priors while an
+operation has few recorded runs. A combined invocation is predicted as the
+sum of its operations; only single-operation runs are recorded.
+
+Waiting processes are started in order of a *virtual start time*
+``arrival + predicted / SCHEDULER_AGING_FACTOR``: short runs overtake long
+ones, but every second spent waiting lowers a run's effective cost by
+``SCHEDULER_AGING_FACTOR`` seconds, so long runs are never starved. The same
+key orders the host-wide slot queue and the asynchronous job queue.
+``SCHEDULER_AGING_FACTOR=0`` restores first-come, first-served.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import RUNTIMES_DIR, settings
+from app.utils.logger import logger
+from app.utils.runtime_store import RuntimeStore, get_runtime_store
+from app.utils.structure_size import StructureSize, structure_size
+
+# Position of the sample count after the flag, for operations that take one
+SAMPLES_OFFSET = {"-sa": 3, "-vol": 3, "-volpo": 3, "-psd": 3, "-block": 2}
+# Prior runtime per operation: (seconds for 100 atoms and 1000 samples, atom exponent)
+PRIOR_RUNTIMES: Dict[str, Tuple[float, float]] = {
+    "-res": (0.05, 1.0),
+    "-chan": (0.2, 1.0),
+    "-strinfo": (0.1, 1.0),
+    "-oms": (1.0, 2.0),
+    "-sa": (0.05, 1.0),
+    "-vol": (0.05, 1.0),
+    "-volpo": (0.05, 1.0),
+    "-psd": (0.5, 1.0),
+    "-block": (0.3, 1.0),
+}
+# Runtime factor assumed for -ha until fitted
+PRIOR_HA_FACTOR = 1.5
+# Weight of the prior in the fit, in runs
+RUNTIME_PRIOR_WEIGHT = 2.0
+# Recorded runs per operation the model is fitted on
+RUNTIME_FIT_RUNS = 500
+# Fitted coefficients are refreshed after this long (runs of other workers)
+RUNTIME_REFIT_SECONDS = 60.0
+# Shortest duration used in the fit
+MIN_RECORDED_SECONDS = 1e-3
+
+Operation = Tuple[str, Optional[float]]
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a run would exceed the queue depth of a :class:`CostScheduler`."""
+
+
+def run_operations(zeo_args: Sequence[str]) -> List[Operation]:
+    """
+    Operations of a Zeo++ command line with their sample counts.
+
+    Returns:
+        ``(flag, samples)`` pairs in order for the operations of
+        ``PRIOR_RUNTIMES``; ``samples`` is None for operations without
+        Monte Carlo sampling. Options such as ``-ha`` are not operations.
+    """
+    operations: List[Operation] = []
+    for index, token in enumerate(zeo_args):
+        if token not in PRIOR_RUNTIMES:
+            continue
+        samples = None
+        offset = SAMPLES_OFFSET.get(token)
+        if offset is not None and index + offset < len(zeo_args) and _is_number(zeo_args[index + offset]):
+            samples = float(zeo_args[index + offset])
+        operations.append((token, samples))
+    return operations
+
+
+def _is_number(token: str) -> bool:
+    try:
+        float(token)
+        return True
+    except ValueError:
+        return False
+
+
+def cost_features(size: StructureSize, samples: Optional[float], ha: bool) -> List[float]:
+    """Regression features of one operation (see the module docstring)."""
+    return [
+        1.0,
+        math.log(max(size.atoms, 1) / 100),
+        math.log((size.volume or 1000.0) / 1000),
+        math.log(samples / 1000) if samples else 0.0,
+        1.0 if ha else 0.0,
+    ]
+
+
+def _prior(operation: str) -> List[float]:
+    seconds, atom_exponent = PRIOR_RUNTIMES[operation]
+    samples_exponent = 1.0 if operation in SAMPLES_OFFSET else 0.0
+    return [math.log(seconds), atom_exponent, 0.0, samples_exponent, math.log(PRIOR_HA_FACTOR)]
+
+
+def _solve(matrix: List[List[float]], vector: List[float]) -> List[float]:
+    """Solve a small linear system by Gaussian elimination with partial pivoting."""
+    size = len(vector)
+    rows = [row[:] + [value] for row, value in zip(matrix, vector)]
+    for column in range(size):
+        pivot = max(range(column, size), key=lambda r: abs(rows[r][column]))
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+        for row in range(column + 1, size):
+            factor = rows[row][column] / rows[column][column]
+            for k in range(column, size + 1):
+                rows[row][k] -= factor * rows[column][k]
+    solution = [0.0] * size
+    for row in reversed(range(size)):
+        total = rows[row][size] - sum(rows[row][k] * solution[k] for k in range(row + 1, size))
+        solution[row] = total / rows[row][row]
+    return solution
+
+
+def fit_coefficients(operation: str, runs: List[Dict[str, float]]) -> List[float]:
+    """
+    Fit the regression of one operation on recorded runs.
+
+    Ridge regression towards the prior coefficients: with no runs the prior
+    is returned unchanged, with many runs the data dominate.
+    """
+    prior = _prior(operation)
+    size = len(prior)
+    matrix = [[RUNTIME_PRIOR_WEIGHT if i == j else 0.0 for j in range(size)] for i in range(size)]
+    vector = [RUNTIME_PRIOR_WEIGHT * value for value in prior]
+    for run in runs:
+        x = cost_features(StructureSize(int(run["atoms"]), run["volume"] or None), run["samples"], bool(run["ha"]))
+        y = math.log(max(run["seconds"], MIN_RECORDED_SECONDS))
+        for i in range(size):
+            vector[i] += x[i] * y
+            for j in range(size):
+                matrix[i][j] += x[i] * x[j]
+    return _solve(matrix, vector)
+
+
+class RuntimeModel:
+    """
+    Runtime predictions from the recorded durations of a :class:`RuntimeStore`.
+
+    Args:
+        store: Shared history of run durations
+    """
+
+    def __init__(self, store: RuntimeStore):
+        self.store = store
+        self._coefficients: Dict[str, Tuple[List[float], float]] = {}
+        self._lock = threading.Lock()
+
+    def coefficients(self, operation: str) -> List[float]:
+        """Fitted coefficients of ``operation``, refreshed every ``RUNTIME_REFIT_SECONDS``."""
+        now = time.monotonic()
+        with self._lock:
+            fitted = self._coefficients.get(operation)
+        if fitted is not None and now - fitted[1] < RUNTIME_REFIT_SECONDS:
+            return fitted[0]
+        try:
+            runs = self.store.recent(operation, RUNTIME_FIT_RUNS)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"[scheduler] Cannot read recorded runtimes: {e}")
+            runs = []
+        coefficients = fit_coefficients(operation, runs)
+        with self._lock:
+            self._coefficients[operation] = (coefficients, now)
+        return coefficients
+
+    def predict_operations(self, operations: List[Operation], size: StructureSize, ha: bool) -> float:
+        """Predicted seconds of a command line given its operations."""
+        total = 0.0
+        for operation, samples in operations:
+            features = cost_features(size, samples, ha)
+            total += math.exp(sum(b * x for b, x in zip(self.coefficients(operation), features)))
+        return total
+
+    def estimate(self, zeo_args: Sequence[str], structure_file: Path) -> Tuple[StructureSize, float]:
+        """Size of ``structure_file`` and predicted seconds of a Zeo++ command line on it."""
+        operations = run_operations(zeo_args)
+        if not operations:
+            return StructureSize(1), 0.0
+        size = structure_size(structure_file)
+        return size, self.predict_operations(operations, size, "-ha" in zeo_args)
+
+    def predict(self, zeo_args: Sequence[str], structure_file: Path) -> float:
+        """Predicted seconds of a Zeo++ command line on ``structure_file``."""
+        return self.estimate(zeo_args, structure_file)[1]
+
+    def record(self, zeo_args: Sequence[str], size: StructureSize, seconds: float) -> None:
+        """Record the duration of a finished run; combined invocations are skipped."""
+        operations = run_operations(zeo_args)
+        if len(operations) != 1:
+            return
+        operation, samples = operations[0]
+        try:
+            self.store.record(operation, size.atoms, size.volume or 0.0, samples or 0.0, "-ha" in zeo_args, seconds)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"[scheduler] Cannot record runtime: {e}")
+            return
+        with self._lock:
+            self._coefficients.pop(operation, None)
+
+
+def virtual_start(predicted_seconds: float, arrival: Optional[float] = None) -> float:
+    """
+    Scheduling key of a run or job: ``arrival + predicted / SCHEDULER_AGING_FACTOR``.
+
+    Ordering by this key equals ordering by ``predicted - factor * waited``
+    at any moment; the arrival time alone with an aging factor of 0.
+    """
+    arrival = time.time() if arrival is None else arrival
+    if settings.scheduler_aging_factor <= 0:
+        return arrival
+    return arrival + predicted_seconds / settings.scheduler_aging_factor
+
+
+class CostScheduler:
+    """
+    Per-worker cap on concurrent Zeo++ processes that starts waiters by priority.
+
+    Replaces a FIFO semaphore: when a slot frees up, it goes to the waiter
+    with the lowest key (see :func:`virtual_start`).
+
+    Args:
+        capacity: Number of processes allowed to run at once
+        max_queued: Number of waiters allowed at once (0 = unbounded)
+    """
+
+    def __init__(self, capacity: int, max_queued: int = 0):
+        self.capacity = max(1, capacity)
+        self.max_queued = max(0, max_queued)
+        self._running = 0
+        self._running_seconds = 0.0
+        # Start time and predicted seconds of the runs holding a slot
+        self._active: Dict[int, Tuple[float, float]] = {}
+        self._waiters: List[Tuple[float, int, float, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    def _release(self) -> None:
+        while self._waiters:
+            _, _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._running -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: float, predicted_seconds: float = 0.0) -> AsyncIterator[None]:
+        """
+        Wait for a process slot (lowest ``priority`` first) and hold it while the block runs.
+
+        Raises:
+            QueueFullError: If no slot is free and ``max_queued`` runs are already waiting.
+        """
+        if self._running < self.capacity:
+            self._running += 1
+        else:
+            if self.max_queued and self.queued() >= self.max_queued:
+                raise QueueFullError(f"{self.max_queued} runs are already queued")
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._sequence), predicted_seconds, future))
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # The slot was handed over just before the cancellation
+                    self._release()
+                raise
+        self._running_seconds += predicted_seconds
+        token = next(self._sequence)
+        self._active[token] = (time.monotonic(), predicted_seconds)
+        try:
+            yield
+        finally:
+            self._running_seconds -= predicted_seconds
+            del self._active[token]
+            self._release()
+
+    def queued(self) -> int:
+        """Number of runs waiting for a slot."""
+        return sum(1 for entry in self._waiters if not entry[3].done())
+
+    def full(self) -> bool:
+        """Whether a new run would be rejected by ``max_queued``."""
+        return self._running >= self.capacity and bool(self.max_queued) and self.queued() >= self.max_queued
+
+    def expected_wait(self, priority: float = -math.inf) -> float:
+        """
+        Predicted seconds until a run queued now with ``priority`` would start.
+
+        The predicted remaining time of the running processes and the
+        predicted time of the waiters ahead (lower key) are shared among the
+        slots. With the default priority only the running processes count,
+        which estimates when the next slot frees up.
+        """
+        if self._running < self.capacity:
+            return 0.0
+        now = time.monotonic()
+        remaining = sum(max(predicted - (now - started), 0.0) for started, predicted in self._active.values())
+        ahead = sum(entry[2] for entry in self._waiters if not entry[3].done() and entry[0] <= priority)
+        return (remaining + ahead) / self.capacity
+
+    def status(self) -> Dict[str, float]:
+        """Running and queued processes, with the predicted seconds of each group."""
+        queued = [entry for entry in self._waiters if not entry[3].done()]
+        return {
+            "capacity": self.capacity,
+            "max_queued": self.max_queued,
+            "running": self._running,
+            "queued": len(queued),
+            "running_seconds": round(self._running_seconds, 3),
+            "queued_seconds": round(sum(entry[2] for entry in queued), 3),
+        }
+
+
+runtime_model = RuntimeModel(get_runtime_store(RUNTIMES_DIR))
@@ -0,0 +1,204 @@
+# Single-flight Coalescing of Identical Computations
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-17
+# Updated: 2026-10-17 - Async key lock that polls instead of blocking a thread
+# Updated: 2026-10-17 - Abandoned computations are cancelled or finished in the background
+# Updated: 2026-10-18 - Removed the blocking cache_key_lock of the synchronous runner
+
+"""
+Deduplication of concurrent Zeo++ runs that share a cache key.
+
+Two layers cooperate:
+
+* :class:`SingleFlight` coalesces identical requests inside one worker
+  process. The first caller for a key runs the computation; later callers
+  await the same future instead of starting another Zeo++ process.
+* :func:`async_cache_key_lock` takes an exclusive file lock in the shared
+  cache directory (``<cache>/.locks/<key>.lock``). It serializes identical
+  runs across uvicorn workers and the MCP server, so the
+  second one finds the entry published by the first when it gets the lock.
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.utils.logger import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows development: no cross-process coalescing
+    fcntl = None  # type: ignore[assignment]
+
+LOCKS_DIRNAME = ".locks"
+# Poll interval bounds while waiting for a lock held by another worker
+LOCK_POLL_INITIAL_SECONDS = 0.05
+LOCK_POLL_MAX_SECONDS = 1.0
+
+
+class _Flight:
+    """A computation running as its own task, with the number of callers awaiting it."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    In-process registry of computations currently running per key.
+
+    Each computation runs as a separate task that callers await through
+    :func:`asyncio.shield`, so a caller that goes away (client disconnect,
+    cancelled MCP call) never cancels it for the others. When the last
+    caller leaves, the computation is cancelled if ``cancel_when_abandoned``
+    is set, and otherwise finishes in the background (e.g. to populate the
+    cache).
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, _Flight] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._inflight
+
+    async def run(
+        self,
+        key: Optional[str],
+        func: Callable[[], Awaitable[Any]],
+        cancel_when_abandoned: bool = True,
+    ) -> Tuple[Any, bool]:
+        """
+        Run ``func`` unless a computation for ``key`` is already in flight.
+
+        Args:
+            key: Coalescing key; None supervises the run without sharing it.
+            func: Coroutine factory performing the computation.
+            cancel_when_abandoned: Cancel the computation once no caller awaits it.
+
+        Returns:
+            Tuple of (result, leader). Followers receive the leader's result,
+            or None if the leader raised or was cancelled.
+        """
+        flight = self._inflight.get(key) if key is not None else None
+        leader = flight is None
+        if flight is None:
+            flight = self._start(key, func)
+        else:
+            logger.info(f"[runner] Joining in-flight computation for key: {key}")
+
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                label = key or "unshared run"
+                if cancel_when_abandoned:
+                    logger.info(f"[runner] Computation abandoned by all callers, cancelling: {label}")
+                    self._forget(key, flight)
+                    flight.task.cancel()
+                else:
+                    logger.info(f"[runner] Computation abandoned by all callers, finishing in background: {label}")
+            raise
+        except Exception:
+            flight.waiters -= 1
+            if leader:
+                raise
+            return None, False
+        flight.waiters -= 1
+        return result, leader
+
+    def _start(self, key: Optional[str], func: Callable[[], Awaitable[Any]]) -> _Flight:
+        flight = _Flight(asyncio.ensure_future(func()))
+        if key is not None:
+            self._inflight[key] = flight
+
+        def _done(_task: asyncio.Future) -> None:
+            self._on_done(key, flight)
+
+        flight.task.add_done_callback(_done)
+        return flight
+
+    def _on_done(self, key: Optional[str], flight: _Flight) -> None:
+        self._forget(key, flight)
+        task = flight.task
+        if not task.cancelled() and task.exception() is not None and flight.waiters == 0:
+            logger.warning(f"[runner] Background computation failed: {task.exception()}")
+
+    def _forget(self, key: Optional[str], flight: _Flight) -> None:
+        if key is not None and self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+
+def _lock_path(cache_root: Path, key: str) -> Path:
+    lock_dir = cache_root / LOCKS_DIRNAME
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    return lock_dir / f"{key}.lock"
+
+
+def _try_lock(lock_path: Path) -> Optional[int]:
+    """
+    Lock ``lock_path`` and return its descriptor, or None if it is busy.
+
+    A holder that locked a file which was unlinked meanwhile (released by
+    the previous holder) retries with a fresh one, so removing lock files on
+    release never lets two holders in at once.
+    """
+    while True:
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return None
+            try:
+                current = os.stat(lock_path)
+            except FileNotFoundError:
+                current = None
+            if current is not None and current.st_ino == os.fstat(fd).st_ino:
+                return fd
+        except BaseException:
+            os.close(fd)
+            raise
+        os.close(fd)
+
+
+def _release(lock_path: Path, fd: int) -> None:
+    try:
+        os.unlink(lock_path)
+    except OSError:
+        pass
+    os.close(fd)
+
+
+@asynccontextmanager
+async def async_cache_key_lock(cache_root: Path, key: str) -> AsyncIterator[Optional[Path]]:
+    """
+    Hold an exclusive cross-process lock for ``key`` while the block runs.
+
+    The lock file is removed on release. Without ``fcntl`` this is a no-op.
+    Waiting polls with a non-blocking lock and exponential backoff, so a
+    request queued behind another worker's run holds neither a thread nor
+    the event loop.
+    """
+    if fcntl is None:
+        yield None
+        return
+
+    lock_path = _lock_path(cache_root, key)
+    delay = LOCK_POLL_INITIAL_SECONDS
+    while True:
+        fd = _try_lock(lock_path)
+        if fd is not None:
+            break
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, LOCK_POLL_MAX_SECONDS)
+    try:
+        yield lock_path
+    finally:
+        _release(lock_path, fd)
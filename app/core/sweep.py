@@ -0,0 +1,181 @@
+# Probe-Radius Sweeps
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-17
+# Updated: 2026-10-18 - Report runs rejected by a full execution lane
+# Updated: 2026-10-18 - Report runs that missed the client's deadline
+
+"""
+Run one probe-dependent analysis over a list or range of probe radii.
+
+The structure is prepared once and every radius runs as its own Zeo++
+invocation, concurrently, within the runner's process limits. Each point
+is cached under the same key as the single-analysis endpoint with that
+radius, so sweeps and single requests share results. The outcome is
+columnar: one list per metric, aligned with the radii.
+"""
+
+import asyncio
+import math
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.core.analyses import AnalysisSpec, get_analysis, parse_plan_results
+from app.core.config import settings
+from app.core.deadlines import DEADLINE_EXIT_CODE
+from app.core.exceptions import ErrorCode
+from app.core.lanes import QUEUE_FULL_EXIT_CODE
+from app.core.runner import ZeoRunner
+
+# Analyses whose result depends on the probe radius
+SWEEP_ANALYSES = ("surface_area", "accessible_volume", "probe_volume", "blocking_spheres")
+# Upper bound on the number of radii of one sweep
+MAX_SWEEP_POINTS = 50
+
+runner = ZeoRunner()
+
+
+def sweep_radii(
+    radii: Optional[List[float]] = None,
+    start: Optional[float] = None,
+    stop: Optional[float] = None,
+    step: Optional[float] = None,
+) -> List[float]:
+    """
+    Normalize the radii of a sweep, given as a list or as an inclusive range.
+
+    Returns:
+        Distinct radii in ascending order.
+
+    Raises:
+        ValueError: If both or neither form is given, the range is invalid,
+            or there are more than ``MAX_SWEEP_POINTS`` radii.
+    """
+    has_range = any(value is not None for value in (start, stop, step))
+    if (radii is not None) == has_range:
+        raise ValueError("Provide either a list of radii or radius_start, radius_stop and radius_step")
+    if has_range:
+        if start is None or stop is None or step is None:
+            raise ValueError("A radius range needs radius_start, radius_stop and radius_step")
+        if step <= 0 or stop < start:
+            raise ValueError("A radius range needs radius_step > 0 and radius_stop >= radius_start")
+        count = math.floor((stop - start) / step + 1e-9) + 1
+        if count > MAX_SWEEP_POINTS:
+            raise ValueError(f"A sweep has at most {MAX_SWEEP_POINTS} radii, the range gives {count}")
+        radii = [round(start + i * step, 6) for i in range(count)]
+
+    try:
+        values = sorted({float(radius) for radius in radii or []})
+    except (TypeError, ValueError):
+        raise ValueError("Radii must be numbers")
+    if not values:
+        raise ValueError("At least one radius is required")
+    if len(values) > MAX_SWEEP_POINTS:
+        raise ValueError(f"A sweep has at most {MAX_SWEEP_POINTS} radii")
+    return values
+
+
+def resolve_sweep(
+    analysis: str,
+    radii: List[float],
+    chan_radius: Optional[float] = None,
+    samples: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Resolve the parameters of every point of a sweep.
+
+    ``chan_radius`` follows the probe radius of each point unless fixed.
+
+    Raises:
+        ValueError: If the analysis does not take a probe radius, ``chan_radius``
+            is given for an analysis without one, or a point is invalid.
+    """
+    if analysis not in SWEEP_ANALYSES:
+        raise ValueError(f"Cannot sweep '{analysis}'. Available: {', '.join(SWEEP_ANALYSES)}")
+    spec = get_analysis(analysis)
+    if chan_radius is not None and all(param.name != "chan_radius" for param in spec.params):
+        raise ValueError(f"{analysis} takes no chan_radius; omit it")
+    fixed = {key: value for key, value in (("chan_radius", chan_radius), ("samples", samples)) if value is not None}
+    return [spec.resolve_params({**fixed, "probe_radius": radius}) for radius in radii]
+
+
+def _point_error(result: Dict[str, Any]) -> Dict[str, Any]:
+    if result["exit_code"] == 124:
+        message = f"Zeo++ execution timed out after {settings.zeo_command_timeout_seconds}s"
+        error_code = ErrorCode.TIMEOUT
+    elif result["exit_code"] == QUEUE_FULL_EXIT_CODE:
+        message = result.get("stderr") or "Zeo++ execution queue is full"
+        error_code = ErrorCode.QUEUE_FULL
+    elif result["exit_code"] == DEADLINE_EXIT_CODE:
+        message = result.get("stderr") or "Deadline exceeded"
+        error_code = ErrorCode.DEADLINE_EXCEEDED
+    else:
+        message = f"Zeo++ exited with code {result['exit_code']}."
+        error_code = ErrorCode.EXECUTION_FAILED
+    return {"message": message, "error_code": error_code.value, "exit_code": result["exit_code"]}
+
+
+def _fixed_params(points: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Parameters shared by all points (``chan_radius`` is left out when it follows the probe)."""
+    return {
+        key: value
+        for key, value in points[0].items()
+        if key != "probe_radius" and all(params[key] == value for params in points)
+    }
+
+
+async def run_sweep(
+    structure_file: Path,
+    content_hash: str,
+    spec: AnalysisSpec,
+    points: List[Dict[str, Any]],
+    ha: bool = True,
+    skip_cache: bool = False,
+) -> Dict[str, Any]:
+    """
+    Run all points of a sweep concurrently and collect a columnar result.
+
+    Returns:
+        Dict with ``probe_radii``, ``metrics`` (one list per numeric result
+        field, ``None`` where a point failed), ``cached``, ``errors`` (one
+        entry per point, ``None`` on success) and ``zeo_invocations``.
+    """
+    results = await asyncio.gather(*(
+        runner.run_combined_async(
+            structure_file=structure_file,
+            segments=[(spec.name, spec.build_args(params), [spec.output_file])],
+            ha=ha,
+            skip_cache=skip_cache,
+            content_hash=content_hash,
+        )
+        for params in points
+    ))
+
+    # Inputs echoed in the result (probe_radius, samples) are not metrics
+    inputs = {param.name for param in spec.params}
+    fields = [field for field in spec.numeric_fields() if field not in inputs]
+    metrics: Dict[str, List[Any]] = {field: [] for field in fields}
+    cached: List[bool] = []
+    errors: List[Optional[Dict[str, Any]]] = []
+    for params, result in zip(points, results):
+        point = result[spec.name]
+        cached.append(point.get("cached", False))
+        parsed: Dict[str, Any] = {}
+        if not point["success"]:
+            errors.append(_point_error(point))
+        else:
+            parsed_results, parse_errors = parse_plan_results([(spec, params)], result)
+            parsed = parsed_results.get(spec.name, {})
+            errors.append(parse_errors.get(spec.name))
+        for field in fields:
+            metrics[field].append(parsed.get(field))
+
+    return {
+        "analysis": spec.name,
+        "probe_radii": [params["probe_radius"] for params in points],
+        "params": _fixed_params(points),
+        "metrics": metrics,
+        "cached": cached,
+        "errors": errors,
+        "zeo_invocations": sum(1 for result in results if not result[spec.name].get("cached", False)),
+    }
@@ -4,6 +4,19 @@
 # Date: 2025-05-13
 # Updated: 2025-12-22 - Added v1 API versioning and health checks
 # Updated: 2025-12-31 - Added cache management, security enhancements, rate limiting
+# Updated: 2026-10-17 - Added upload size limit middleware
+# Updated: 2026-10-17 - Background cache eviction task
+# Updated: 2026-10-17 - Cache layout check at startup
+# Updated: 2026-10-17 - Client disconnect detection middleware
+# Updated: 2026-10-17 - Log host-wide Zeo++ process slots at startup
+# Updated: 2026-10-17 - Asynchronous job API and per-worker job dispatcher
+# Updated: 2026-10-17 - Batch screening endpoint
+# Updated: 2026-10-18 - Probe-radius sweep endpoint
+# Updated: 2026-10-18 - Log execution lane limits at startup
+# Updated: 2026-10-18 - Per-tenant CPU quota middleware
+# Updated: 2026-10-18 - Client deadline middleware (X-Request-Timeout)
+
+import asyncio
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -12,9 +25,19 @@ from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 
 # Import configuration and middleware
-from app.core.config import settings
+from app.core.config import CACHE_DIR, settings
+from app.core.lanes import LANE_NAMES, get_lane, lane_host_slots
+from app.core.jobs import job_dispatcher
 from app.core.limiter import limiter
-from app.core.middleware import RequestTimingMiddleware
+from app.core.middleware import (
+    ClientDisconnectMiddleware,
+    CpuQuotaMiddleware,
+    DeadlineMiddleware,
+    RequestTimingMiddleware,
+    UploadSizeLimitMiddleware,
+)
+from app.utils.cache_layout import ensure_cache_layout
+from app.utils.cleanup import run_cache_eviction_loop
 
 # Import all route modules
 from app.api import (
@@ -27,9 +50,14 @@ from app.api import (
     pore_size_dist,
     blocking_spheres,
     open_metal_sites,
+    profile,
+    structures,
     health,
     cache,
-    metrics
+    metrics,
+    jobs,
+    batch,
+    sweep
 )
 
 app = FastAPI(
@@ -45,6 +73,15 @@ app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)  # type: ignore[arg-type]
 app.add_middleware(SlowAPIMiddleware)
 
+# Charge Zeo++ time to per-tenant CPU quotas and report them in headers
+app.add_middleware(CpuQuotaMiddleware)
+
+# Handle requests under the client's X-Request-Timeout deadline
+app.add_middleware(DeadlineMiddleware)
+
+# Reject oversized uploads before their body is received
+app.add_middleware(UploadSizeLimitMiddleware)
+
 # Add request timing middleware
 app.add_middleware(RequestTimingMiddleware)
 
@@ -57,10 +94,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost: lets handlers detect clients that disconnect during long runs
+app.add_middleware(ClientDisconnectMiddleware)
+
 # Register health check and system routers first
 app.include_router(health.router)
 app.include_router(cache.router)
 app.include_router(metrics.router)
+app.include_router(structures.router)
+app.include_router(jobs.router)
 
 # Register analysis API routers (v1)
 app.include_router(pore_diameter.router)
@@ -72,6 +114,9 @@ app.include_router(framework_info.router)
 app.include_router(pore_size_dist.router)
 app.include_router(blocking_spheres.router)
 app.include_router(open_metal_sites.router)
+app.include_router(profile.router)
+app.include_router(batch.router)
+app.include_router(sweep.router)
 
 
 @app.get("/", tags=["System"])
@@ -95,4 +140,39 @@ async def startup_event():
     logger.info(f"CORS origins: {settings.cors_origins}")
     logger.info(f"Rate limit: {settings.rate_limit_requests} requests/minute")
     logger.info(f"Max upload size: {settings.max_upload_size_mb}MB")
+    if settings.quota_cpu_seconds_per_hour > 0:
+        logger.info(
+            f"CPU quota: {settings.quota_cpu_seconds_per_hour:.0f} Zeo++ CPU-seconds/hour per tenant "
+            f"(burst {settings.quota_burst_cpu_seconds or settings.quota_cpu_seconds_per_hour:.0f})"
+        )
+    for name in LANE_NAMES:
+        lane = get_lane(name)
+        logger.info(
+            f"Zeo++ {name} lane: {lane.max_concurrent} processes per worker, "
+            f"{lane_host_slots(lane).capacity} host-wide, timeout {lane.timeout_seconds}s"
+        )
+    if settings.enable_cache:
+        ensure_cache_layout(CACHE_DIR)
+    if settings.enable_cache and settings.cache_eviction_interval_minutes > 0:
+        logger.info(
+            f"Cache eviction every {settings.cache_eviction_interval_minutes} min "
+            f"(max age {settings.cache_max_age_hours}h, max size {settings.cache_max_size_mb}MB, "
+            f"max entries {settings.cache_max_entries or 'unlimited'})"
+        )
+        app.state.cache_eviction_task = asyncio.create_task(
+            run_cache_eviction_loop(settings.cache_eviction_interval_minutes * 60)
+        )
+    app.state.job_dispatcher_task = asyncio.create_task(job_dispatcher.run_forever())
     logger.rule("Ready to accept requests", style="green")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks; running jobs go back to the queue for other workers."""
+    task = getattr(app.state, "cache_eviction_task", None)
+    if task is not None:
+        task.cancel()
+    task = getattr(app.state, "job_dispatcher_task", None)
+    if task is not None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
@@ -7,21 +7,42 @@
 # This module defines the FastMCP instance and all Zeo++ analysis tools.
 # It is shared between the HTTP transport (main.py) and stdio transport (stdio_main.py).
 
+import asyncio
 import base64
+import hashlib
+import io
+import time
 import uuid
-from dataclasses import dataclass
+from contextlib import AsyncExitStack
+from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Callable, Dict, Optional, Type
+from typing import Any, Callable, Dict, Literal, Optional, Type
 
 from mcp.server.fastmcp import Context, FastMCP
 from pydantic import BaseModel
 
 from app.api.health import _check_zeopp_available
+from app.core.admission import AdmissionError, admit, tenant_key
+from app.core.analyses import get_analysis, parse_plan_results, resolve_analysis_plan
 from app.core.config import CACHE_DIR, TMP_DIR, settings
-from app.core.exceptions import ZeoppParsingError
+from app.core.deadlines import DEADLINE_EXIT_CODE, deadline_scope
+from app.core.exceptions import (
+    ErrorCode,
+    ZeoppExecutionError,
+    ZeoppOutputNotFoundError,
+    ZeoppParsingError,
+    ZeoppStructureNotFoundError,
+)
+from app.core.jobs import job_dispatcher, job_item_response, job_response, submit_job
+from app.core.lanes import QUEUE_FULL_EXIT_CODE
+from app.core.pipeline import resolve_pipeline, run_pipeline
+from app.core.quota import QuotaExceededError, check_quota, metered, quota_status
 from app.core.middleware import get_allowed_extensions_str, validate_structure_file
+from app.core.montecarlo import AUTO_SAMPLES, run_adaptive
 from app.core.runner import ZeoRunner
+from app.core.scheduler import runtime_model
+from app.core.sweep import SWEEP_ANALYSES, resolve_sweep, run_sweep, sweep_radii
 from app.models.accessible_volume import AccessibleVolumeResponse
 from app.models.blocking_spheres import BlockingSpheresResponse
 from app.models.channel_analysis import ChannelAnalysisResponse
@@ -34,9 +55,14 @@ from app.utils.cleanup import (
     cleanup_old_temp_files,
     cleanup_temp_directory,
     clear_all_cache,
+    evict_cache_entries,
     get_cache_storage_stats,
     get_temp_storage_stats,
 )
+from app.utils.cache_entry import read_cache_manifest
+from app.utils.file import compute_cache_key, get_cache_path
+from app.utils.result_cache import result_memory_cache
+from app.utils.structure_store import get_structure, materialize_structure, store_structure
 from app.utils.parser import (
     parse_block_from_text,
     parse_chan_from_text,
@@ -77,7 +103,8 @@ mcp = FastMCP(
         "This is a LOCAL server — it has direct access to the local filesystem. "
         "Prefer structure_path (absolute local file path) when the file already exists on disk. "
         "Use structure_text to pass file content as a string, or structure_base64 for binary-encoded content. "
-        "Provide exactly one of: structure_path, structure_text, or structure_base64."
+        "Use structure_id (from structure_upload) to analyze the same structure many times without resending it. "
+        "Provide exactly one of: structure_path, structure_text, structure_base64, or structure_id."
     ),
     log_level=_as_log_level(settings.log_level),
 )
@@ -92,6 +119,7 @@ class PreparedStructure:
     size_bytes: int
     source: str
     filename: str
+    content_hash: str
 
 
 def _now_iso() -> str:
@@ -141,11 +169,72 @@ def _error(tool: str, message: str, *, code: str = "TOOL_ERROR", details: Option
     return payload
 
 
+def _queue_full_error(tool: str, exit_code: int, stderr: str) -> Dict[str, Any]:
+    """Error for a run rejected because its execution lane had a full queue; retrying later may succeed."""
+    return _error(
+        tool,
+        "Zeo++ execution queue is full; retry later",
+        code="ZEOPP_QUEUE_FULL",
+        details={"exit_code": exit_code, "stderr": stderr},
+    )
+
+
+def _deadline_error(tool: str, exit_code: int, stderr: str) -> Dict[str, Any]:
+    """Error for a run refused or stopped because the call's ``timeout_seconds`` could not be met."""
+    return _error(
+        tool,
+        "Deadline exceeded; the result could not be produced within timeout_seconds",
+        code="ZEOPP_DEADLINE_EXCEEDED",
+        details={"exit_code": exit_code, "stderr": stderr},
+    )
+
+
+def _tenant(ctx: Optional[Context]) -> str:
+    """Admission and quota tenant of a call: API key, bearer token or client address over HTTP, ``stdio`` otherwise."""
+    try:
+        request = ctx.request_context.request if ctx is not None else None
+    except ValueError:  # outside of a request
+        request = None
+    return tenant_key(request) if request is not None else "stdio"
+
+
+def _admission_error(tool: str, exc: AdmissionError) -> Dict[str, Any]:
+    """Error for a call rejected by admission control or quota; ``retry_after_seconds`` says when to retry."""
+    if isinstance(exc, QuotaExceededError):
+        code = "ZEOPP_QUOTA_EXCEEDED"
+    else:
+        code = "ZEOPP_TENANT_BACKLOG" if exc.status_code == 429 else "ZEOPP_SATURATED"
+    return _error(tool, exc.message, code=code, details={"retry_after_seconds": exc.retry_after})
+
+
+def _quota_error(tool: str, tenant: str) -> Optional[Dict[str, Any]]:
+    """Error for a call whose tenant has used up its CPU quota (see ``app/core/quota.py``), else None."""
+    try:
+        check_quota(tenant)
+    except QuotaExceededError as exc:
+        return _admission_error(tool, exc)
+    return None
+
+
+async def _quota_meta(tenant: str) -> Dict[str, Any]:
+    """``quota`` entry of a result's meta when CPU quotas are enabled."""
+    quota = await asyncio.to_thread(quota_status, tenant)
+    return {"quota": quota.to_dict()} if quota is not None else {}
+
+
 def _validate_positive(name: str, value: float) -> None:
     if value <= 0:
         raise ValueError(f"{name} must be greater than 0")
 
 
+def _deadline_of(timeout_seconds: Optional[float]) -> Optional[float]:
+    """Deadline of a call with a ``timeout_seconds`` budget (see ``app/core/deadlines.py``)."""
+    if timeout_seconds is None:
+        return None
+    _validate_positive("timeout_seconds", timeout_seconds)
+    return time.time() + timeout_seconds
+
+
 def _decode_base64_content(raw: str) -> bytes:
     payload = raw.strip()
     marker = ";base64,"
@@ -180,18 +269,13 @@ def _is_under_allowed_roots(candidate: Path) -> bool:
     return False
 
 
-def _prepare_structure(
+def _read_structure_source(
     *,
-    task_name: str,
     structure_path: Optional[str],
     structure_text: Optional[str],
     structure_base64: Optional[str],
     filename: Optional[str],
-) -> PreparedStructure:
-    provided = [bool(structure_path), bool(structure_text), bool(structure_base64)]
-    if sum(provided) != 1:
-        raise ValueError("Provide exactly one of structure_path, structure_text, or structure_base64")
-
+) -> tuple[bytes, str, str]:
     file_bytes: bytes
     source: str
     final_name: str
@@ -204,6 +288,11 @@ def _prepare_structure(
             allowed = ", ".join(str(p) for p in settings.mcp_allowed_path_roots_list) or "(none configured)"
             raise ValueError(f"structure_path is outside MCP_ALLOWED_PATH_ROOTS. Allowed roots: {allowed}")
         final_name = _sanitize_filename(filename or source_path.name, fallback=source_path.name)
+        file_size = source_path.stat().st_size
+        if file_size > settings.max_upload_size_bytes:
+            raise ValueError(
+                f"File too large ({file_size} bytes). Maximum size: {settings.max_upload_size_mb}MB"
+            )
         file_bytes = source_path.read_bytes()
         source = "path"
     elif structure_text is not None:
@@ -222,6 +311,43 @@ def _prepare_structure(
         raise ValueError(
             f"File too large ({len(file_bytes)} bytes). Maximum size: {settings.max_upload_size_mb}MB"
         )
+    return file_bytes, source, final_name
+
+
+def _prepare_structure(
+    *,
+    task_name: str,
+    structure_path: Optional[str],
+    structure_text: Optional[str],
+    structure_base64: Optional[str],
+    filename: Optional[str],
+    structure_id: Optional[str] = None,
+) -> PreparedStructure:
+    provided = [bool(structure_path), bool(structure_text), bool(structure_base64), bool(structure_id)]
+    if sum(provided) != 1:
+        raise ValueError("Provide exactly one of structure_path, structure_text, structure_base64, or structure_id")
+
+    if structure_id:
+        try:
+            stored = get_structure(structure_id)
+            input_path = materialize_structure(structure_id, prefix=f"mcp_{task_name}")
+        except ZeoppStructureNotFoundError as exc:
+            raise ValueError(exc.message) from exc
+        return PreparedStructure(
+            input_path=input_path,
+            task_dir=input_path.parent,
+            size_bytes=stored.size_bytes,
+            source="structure_id",
+            filename=stored.filename,
+            content_hash=structure_id,
+        )
+
+    file_bytes, source, final_name = _read_structure_source(
+        structure_path=structure_path,
+        structure_text=structure_text,
+        structure_base64=structure_base64,
+        filename=filename,
+    )
 
     TMP_DIR.mkdir(parents=True, exist_ok=True)
     task_dir = TMP_DIR / f"mcp_{task_name}_{uuid.uuid4().hex}"
@@ -235,6 +361,7 @@ def _prepare_structure(
         size_bytes=len(file_bytes),
         source=source,
         filename=final_name,
+        content_hash=hashlib.sha256(file_bytes).hexdigest(),
     )
 
 
@@ -252,6 +379,8 @@ async def _execute_analysis(
     response_model: Type[BaseModel],
     force_recalculate: bool,
     ctx: Optional[Context] = None,
+    structure_id: Optional[str] = None,
+    timeout_seconds: Optional[float] = None,
 ) -> Dict[str, Any]:
     async def _progress(step: int) -> None:
         if ctx is not None:
@@ -262,12 +391,14 @@ async def _execute_analysis(
 
     await _progress(1)
     try:
+        deadline = _deadline_of(timeout_seconds)
         prepared = _prepare_structure(
             task_name=task_name,
             structure_path=structure_path,
             structure_text=structure_text,
             structure_base64=structure_base64,
             filename=filename,
+            structure_id=structure_id,
         )
     except ValueError as exc:
         return _error(tool_name, str(exc), code="INPUT_VALIDATION_ERROR")
@@ -275,18 +406,51 @@ async def _execute_analysis(
     await _progress(2)
     try:
         final_args = zeo_args + [prepared.input_path.name]
-        result = await runner.run_command_async(
-            structure_file=prepared.input_path,
-            zeo_args=final_args,
-            output_files=output_files,
-            extra_identifier=task_name,
-            skip_cache=force_recalculate,
+        meta = {
+            "source": prepared.source,
+            "filename": prepared.filename,
+            "input_size_bytes": prepared.size_bytes,
+        }
+        cache_key = compute_cache_key(prepared.input_path, final_args, content_hash=prepared.content_hash)
+        if settings.enable_cache and not force_recalculate:
+            memory_hit = result_memory_cache.get(cache_key, response_model)
+            if memory_hit is not None:
+                await _progress(4)
+                return _ok(tool_name, memory_hit.model_dump(), cached=True, meta=meta)
+
+        predicted = await asyncio.to_thread(runtime_model.predict, final_args, prepared.input_path)
+        meta["predicted_seconds"] = predicted
+
+        tenant = _tenant(ctx)
+        cached = (
+            settings.enable_cache and not force_recalculate
+            and read_cache_manifest(get_cache_path(cache_key)) is not None
         )
+        async with AsyncExitStack() as stack:
+            await stack.enter_async_context(metered(tenant))
+            stack.enter_context(deadline_scope(deadline=deadline))
+            if not cached:
+                try:
+                    check_quota(tenant)
+                    stack.enter_context(admit(tenant, final_args, predicted))
+                except AdmissionError as exc:
+                    return _admission_error(tool_name, exc)
+            result = await runner.run_command_async(
+                structure_file=prepared.input_path,
+                zeo_args=final_args,
+                output_files=output_files,
+                skip_cache=force_recalculate,
+                content_hash=prepared.content_hash,
+            )
         await _progress(3)
 
         if not result.get("success"):
             exit_code = result.get("exit_code")
             stderr = result.get("stderr", "")
+            if exit_code == QUEUE_FULL_EXIT_CODE:
+                return _queue_full_error(tool_name, exit_code, stderr)
+            if exit_code == DEADLINE_EXIT_CODE:
+                return _deadline_error(tool_name, exit_code, stderr)
             if exit_code == 124:
                 return _error(
                     tool_name,
@@ -332,21 +496,107 @@ async def _execute_analysis(
                 code="PARSING_FAILED",
             )
 
-        validated = response_model(**{**parsed, "cached": result.get("cached", False)}).model_dump()
+        model = response_model(**{**parsed, "cached": result.get("cached", False)})
+        if settings.enable_cache:
+            result_memory_cache.put(cache_key, model.model_copy(update={"cached": True}))
+        meta.update(await _quota_meta(tenant))
         await _progress(4)
         return _ok(
             tool_name,
-            validated,
+            model.model_dump(),
             cached=result.get("cached", False),
-            meta={
-                "source": prepared.source,
-                "filename": prepared.filename,
-                "input_size_bytes": prepared.size_bytes,
-            },
+            meta=meta,
+        )
+    finally:
+        cleanup_temp_directory(prepared.task_dir)
+
+
+async def _execute_adaptive(
+    *,
+    tool_name: str,
+    params: Dict[str, Any],
+    tolerance: Optional[float],
+    structure_path: Optional[str],
+    structure_text: Optional[str],
+    structure_base64: Optional[str],
+    filename: Optional[str],
+    ha: bool,
+    force_recalculate: bool,
+    structure_id: Optional[str] = None,
+    timeout_seconds: Optional[float] = None,
+    ctx: Optional[Context] = None,
+) -> Dict[str, Any]:
+    """Run a Monte Carlo analysis with samples='auto' (see ``app/core/montecarlo.py``)."""
+    spec = get_analysis(tool_name)
+    tenant = _tenant(ctx)
+    quota_error = _quota_error(tool_name, tenant)
+    if quota_error is not None:
+        return quota_error
+    try:
+        if tolerance is not None:
+            _validate_positive("tolerance", tolerance)
+        deadline = _deadline_of(timeout_seconds)
+        prepared = _prepare_structure(
+            task_name=tool_name,
+            structure_path=structure_path,
+            structure_text=structure_text,
+            structure_base64=structure_base64,
+            filename=filename,
+            structure_id=structure_id,
+        )
+    except ValueError as exc:
+        return _error(tool_name, str(exc), code="INPUT_VALIDATION_ERROR")
+
+    try:
+        with deadline_scope(deadline=deadline):
+            async with metered(tenant):
+                result, convergence = await run_adaptive(
+                    prepared.input_path,
+                    prepared.content_hash,
+                    spec,
+                    spec.resolve_params(params),
+                    tolerance,
+                    ha=ha,
+                    skip_cache=force_recalculate,
+                )
+    except ZeoppExecutionError as exc:
+        if exc.exit_code == QUEUE_FULL_EXIT_CODE:
+            return _queue_full_error(tool_name, exc.exit_code, exc.stderr or "")
+        if exc.exit_code == DEADLINE_EXIT_CODE:
+            return _deadline_error(tool_name, exc.exit_code, exc.stderr or "")
+        if exc.exit_code == 124:
+            return _error(
+                tool_name,
+                f"Zeo++ execution timed out after {settings.zeo_command_timeout_seconds}s",
+                code="ZEOPP_TIMEOUT",
+                details={"exit_code": exc.exit_code, "stderr": exc.stderr},
+            )
+        return _error(
+            tool_name,
+            "Zeo++ execution failed",
+            code="ZEOPP_EXECUTION_FAILED",
+            details={"exit_code": exc.exit_code, "stderr": exc.stderr},
         )
+    except ZeoppOutputNotFoundError as exc:
+        return _error(tool_name, exc.message, code="OUTPUT_NOT_FOUND")
+    except ZeoppParsingError as exc:
+        return _error(tool_name, exc.message, code="PARSING_FAILED", details=exc.details)
     finally:
         cleanup_temp_directory(prepared.task_dir)
 
+    model = spec.response_model(**result, convergence=convergence)
+    return _ok(
+        tool_name,
+        model.model_dump(),
+        cached=result["cached"],
+        meta={
+            "source": prepared.source,
+            "filename": prepared.filename,
+            "input_size_bytes": prepared.size_bytes,
+            **await _quota_meta(tenant),
+        },
+    )
+
 
 def _summarize_psd_histogram(hist_text: str) -> Dict[str, Any]:
     lines = hist_text.splitlines()
@@ -446,6 +696,29 @@ async def tool_cache_cleanup(max_age_hours: float = 24.0) -> Dict[str, Any]:
     )
 
 
+@mcp.tool(
+    name="cache_evict",
+    description=(
+        "Expire cache entries older than max_age_hours and evict least recently used entries "
+        "over the size/entry budget. Omitted limits use the server settings; 0 disables a limit."
+    ),
+)
+async def tool_cache_evict(
+    max_age_hours: float | None = None,
+    max_size_mb: float | None = None,
+    max_entries: int | None = None,
+) -> Dict[str, Any]:
+    if any(v is not None and v < 0 for v in (max_age_hours, max_size_mb, max_entries)):
+        return _error("cache_evict", "Eviction limits must not be negative", code="INPUT_VALIDATION_ERROR")
+    result = await asyncio.to_thread(
+        evict_cache_entries,
+        max_age_hours=max_age_hours,
+        max_size_bytes=int(max_size_mb * 1024 * 1024) if max_size_mb is not None else None,
+        max_entries=max_entries,
+    )
+    return _ok("cache_evict", {"success": result["failed"] == 0, **result})
+
+
 @mcp.tool(name="cache_clear", description="Clear all Zeo++ cached entries.")
 async def tool_cache_clear() -> Dict[str, Any]:
     removed, failed = clear_all_cache()
@@ -459,15 +732,47 @@ async def tool_cache_clear() -> Dict[str, Any]:
     )
 
 
+@mcp.tool(
+    name="structure_upload",
+    description=(
+        "Store a structure once and return its structure_id. Pass structure_id to any analysis "
+        "tool instead of resending the structure."
+    ),
+)
+async def tool_structure_upload(
+    structure_path: str | None = None,
+    structure_text: str | None = None,
+    structure_base64: str | None = None,
+    filename: str | None = None,
+) -> Dict[str, Any]:
+    provided = [bool(structure_path), bool(structure_text), bool(structure_base64)]
+    try:
+        if sum(provided) != 1:
+            raise ValueError("Provide exactly one of structure_path, structure_text, or structure_base64")
+        file_bytes, source, final_name = _read_structure_source(
+            structure_path=structure_path,
+            structure_text=structure_text,
+            structure_base64=structure_base64,
+            filename=filename,
+        )
+    except ValueError as exc:
+        return _error("structure_upload", str(exc), code="INPUT_VALIDATION_ERROR")
+
+    stored = store_structure(io.BytesIO(file_bytes), final_name)
+    return _ok("structure_upload", asdict(stored), meta={"source": source})
+
+
 @mcp.tool(name="pore_diameter", description="Calculate pore diameter using Zeo++ -res.")
 async def tool_pore_diameter(
     structure_path: str | None = None,
     structure_text: str | None = None,
     structure_base64: str | None = None,
+    structure_id: str | None = None,
     filename: str | None = None,
     ha: bool = True,
     force_recalculate: bool = False,
-    ctx: Context = None,
+    timeout_seconds: float | None = None,
+    ctx: Optional[Context] = None,
 ) -> Dict[str, Any]:
     zeo_args = ["-res", "result.res"]
     if ha:
@@ -478,33 +783,44 @@ async def tool_pore_diameter(
         structure_path=structure_path,
         structure_text=structure_text,
         structure_base64=structure_base64,
+        structure_id=structure_id,
         filename=filename,
         zeo_args=zeo_args,
         output_files=["result.res"],
         parser=parse_res_from_text,
         response_model=PoreDiameterResponse,
         force_recalculate=force_recalculate,
+        timeout_seconds=timeout_seconds,
         ctx=ctx,
     )
 
 
-@mcp.tool(name="surface_area", description="Calculate accessible surface area using Zeo++ -sa.")
+@mcp.tool(
+    name="surface_area",
+    description=(
+        "Calculate accessible surface area using Zeo++ -sa. samples='auto' doubles the samples until the "
+        "primary metric changes by at most `tolerance` between runs."
+    ),
+)
 async def tool_surface_area(
     structure_path: str | None = None,
     structure_text: str | None = None,
     structure_base64: str | None = None,
+    structure_id: str | None = None,
     filename: str | None = None,
     chan_radius: float = 1.21,
     probe_radius: float = 1.21,
-    samples: int = 2000,
+    samples: int | Literal["auto"] = 2000,
+    tolerance: float | None = None,
     ha: bool = True,
     force_recalculate: bool = False,
-    ctx: Context = None,
+    timeout_seconds: float | None = None,
+    ctx: Optional[Context] = None,
 ) -> Dict[str, Any]:
     try:
         _validate_positive("chan_radius", chan_radius)
         _validate_positive("probe_radius", probe_radius)
-        if samples <= 0:
+        if isinstance(samples, int) and samples <= 0:
             raise ValueError("samples must be greater than 0")
         if probe_radius > chan_radius:
             raise ValueError(
@@ -513,6 +829,21 @@ async def tool_surface_area(
     except ValueError as exc:
         return _error("surface_area", str(exc), code="INPUT_VALIDATION_ERROR")
 
+    if samples == AUTO_SAMPLES:
+        return await _execute_adaptive(
+            tool_name="surface_area",
+            params={"chan_radius": chan_radius, "probe_radius": probe_radius},
+            tolerance=tolerance,
+            structure_path=structure_path,
+            structure_text=structure_text,
+            structure_base64=structure_base64,
+            structure_id=structure_id,
+            filename=filename,
+            ha=ha,
+            force_recalculate=force_recalculate,
+            timeout_seconds=timeout_seconds,
+            ctx=ctx,
+        )
     zeo_args = ["-sa", str(chan_radius), str(probe_radius), str(samples), "result.sa"]
     if ha:
         zeo_args.insert(0, "-ha")
@@ -522,33 +853,44 @@ async def tool_surface_area(
         structure_path=structure_path,
         structure_text=structure_text,
         structure_base64=structure_base64,
+        structure_id=structure_id,
         filename=filename,
         zeo_args=zeo_args,
         output_files=["result.sa"],
         parser=parse_sa_from_text,
         response_model=SurfaceAreaResponse,
         force_recalculate=force_recalculate,
+        timeout_seconds=timeout_seconds,
         ctx=ctx,
     )
 
 
-@mcp.tool(name="accessible_volume", description="Calculate accessible volume using Zeo++ -vol.")
+@mcp.tool(
+    name="accessible_volume",
+    description=(
+        "Calculate accessible volume using Zeo++ -vol. samples='auto' doubles the samples until the "
+        "primary metric changes by at most `tolerance` between runs."
+    ),
+)
 async def tool_accessible_volume(
     structure_path: str | None = None,
     structure_text: str | None = None,
     structure_base64: str | None = None,
+    structure_id: str | None = None,
     filename: str | None = None,
     chan_radius: float = 1.21,
     probe_radius: float = 1.21,
-    samples: int = 50000,
+    samples: int | Literal["auto"] = 50000,
+    tolerance: float | None = None,
     ha: bool = True,
     force_recalculate: bool = False,
-    ctx: Context = None,
+    timeout_seconds: float | None = None,
+    ctx: Optional[Context] = None,
 ) -> Dict[str, Any]:
     try:
         _validate_positive("chan_radius", chan_radius)
         _validate_positive("probe_radius", probe_radius)
-        if samples <= 0:
+        if isinstance(samples, int) and samples <= 0:
             raise ValueError("samples must be greater than 0")
         if probe_radius > chan_radius:
             raise ValueError(
@@ -557,6 +899,21 @@ async def tool_accessible_volume(
     except ValueError as exc:
         return _error("accessible_volume", str(exc), code="INPUT_VALIDATION_ERROR")
 
+    if samples == AUTO_SAMPLES:
+        return await _execute_adaptive(
+            tool_name="accessible_volume",
+            params={"chan_radius": chan_radius, "probe_radius": probe_radius},
+            tolerance=tolerance,
+            structure_path=structure_path,
+            structure_text=structure_text,
+            structure_base64=structure_base64,
+            structure_id=structure_id,
+            filename=filename,
+            ha=ha,
+            force_recalculate=force_recalculate,
+            timeout_seconds=timeout_seconds,
+            ctx=ctx,
+        )
     zeo_args = ["-vol", str(chan_radius), str(probe_radius), str(samples), "result.vol"]
     if ha:
         zeo_args.insert(0, "-ha")
@@ -566,33 +923,44 @@ async def tool_accessible_volume(
         structure_path=structure_path,
         structure_text=structure_text,
         structure_base64=structure_base64,
+        structure_id=structure_id,
         filename=filename,
         zeo_args=zeo_args,
         output_files=["result.vol"],
         parser=parse_vol_from_text,
         response_model=AccessibleVolumeResponse,
         force_recalculate=force_recalculate,
+        timeout_seconds=timeout_seconds,
         ctx=ctx,
     )
 
 
-@mcp.tool(name="probe_volume", description="Calculate probe-occupiable volume using Zeo++ -volpo.")
+@mcp.tool(
+    name="probe_volume",
+    description=(
+        "Calculate probe-occupiable volume using Zeo++ -volpo. samples='auto' doubles the samples until the "
+        "primary metric changes by at most `tolerance` between runs."
+    ),
+)
 async def tool_probe_volume(
     structure_path: str | None = None,
     structure_text: str | None = None,
     structure_base64: str | None = None,
+    structure_id: str | None = None,
     filename: str | None = None,
     chan_radius: float = 1.21,
     probe_radius: float = 1.21,
-    samples: int = 50000,
+    samples: int | Literal["auto"] = 50000,
+    tolerance: float | None = None,
     ha: bool = True,
     force_recalculate: bool = False,
-    ctx: Context = None,
+    timeout_seconds: float | None = None,
+    ctx: Optional[Context] = None,
 ) -> Dict[str, Any]:
     try:
         _validate_positive("chan_radius", chan_radius)
         _validate_positive("probe_radius", probe_radius)
-        if samples <= 0:
+        if isinstance(samples, int) and samples <= 0:
             raise ValueError("samples must be greater than 0")
         if probe_radius > chan_radius:
             raise ValueError(
@@ -601,6 +969,21 @@ async def tool_probe_volume(
     except ValueError as exc:
         return _error("probe_volume", str(exc), code="INPUT_VALIDATION_ERROR")
 
+    if samples == AUTO_SAMPLES:
+        return await _execute_adaptive(
+            tool_name="probe_volume",
+            params={"chan_radius": chan_radius, "probe_radius": probe_radius},
+            tolerance=tolerance,
+            structure_path=structure_path,
+            structure_text=structure_text,
+            structure_base64=structure_base64,
+            structure_id=structure_id,
+            filename=filename,
+            ha=ha,
+            force_recalculate=force_recalculate,
+            timeout_seconds=timeout_seconds,
+            ctx=ctx,
+        )
     zeo_args = ["-volpo", str(chan_radius), str(probe_radius), str(samples), "result.volpo"]
     if ha:
         zeo_args.insert(0, "-ha")
@@ -610,12 +993,14 @@ async def tool_probe_volume(
         structure_path=structure_path,
         structure_text=structure_text,
         structure_base64=structure_base64,
+        structure_id=structure_id,
         filename=filename,
         zeo_args=zeo_args,
         output_files=["result.volpo"],
         parser=parse_volpo_from_text,
         response_model=ProbeVolumeResponse,
         force_recalculate=force_recalculate,
+        timeout_seconds=timeout_seconds,
         ctx=ctx,
     )
 
@@ -625,11 +1010,13 @@ async def tool_channel_analysis(
     structure_path: str | None = None,
     structure_text: str | None = None,
     structure_base64: str | None = None,
+    structure_id: str | None = None,
     filename: str | None = None,
     probe_radius: float = 1.21,
     ha: bool = True,
     force_recalculate: bool = False,
-    ctx: Context = None,
+    timeout_seconds: float | None = None,
+    ctx: Optional[Context] = None,
 ) -> Dict[str, Any]:
     try:
         _validate_positive("probe_radius", probe_radius)
@@ -645,12 +1032,14 @@ async def tool_channel_analysis(
         structure_path=structure_path,
         structure_text=structure_text,
         structure_base64=structure_base64,
+        structure_id=structure_id,
         filename=filename,
         zeo_args=zeo_args,
         output_files=["result.chan"],
         parser=parse_chan_from_text,
         response_model=ChannelAnalysisResponse,
         force_recalculate=force_recalculate,
+        timeout_seconds=timeout_seconds,
         ctx=ctx,
     )
 
@@ -660,10 +1049,12 @@ async def tool_framework_info(
     structure_path: str | None = None,
     structure_text: str | None = None,
     structure_base64: str | None = None,
+    structure_id: str | None = None,
     filename: str | None = None,
     ha: bool = True,
     force_recalculate: bool = False,
-    ctx: Context = None,
+    timeout_seconds: float | None = None,
+    ctx: Optional[Context] = None,
 ) -> Dict[str, Any]:
     zeo_args = ["-strinfo", "result.strinfo"]
     if ha:
@@ -674,12 +1065,14 @@ async def tool_framework_info(
         structure_path=structure_path,
         structure_text=structure_text,
         structure_base64=structure_base64,
+        structure_id=structure_id,
         filename=filename,
         zeo_args=zeo_args,
         output_files=["result.strinfo"],
         parser=parse_strinfo_from_text,
         response_model=FrameworkInfoResponse,
         force_recalculate=force_recalculate,
+        timeout_seconds=timeout_seconds,
         ctx=ctx,
     )
 
@@ -689,10 +1082,12 @@ async def tool_open_metal_sites(
     structure_path: str | None = None,
     structure_text: str | None = None,
     structure_base64: str | None = None,
+    structure_id: str | None = None,
     filename: str | None = None,
     ha: bool = True,
     force_recalculate: bool = False,
-    ctx: Context = None,
+    timeout_seconds: float | None = None,
+    ctx: Optional[Context] = None,
 ) -> Dict[str, Any]:
     zeo_args = ["-oms", "result.oms"]
     if ha:
@@ -703,12 +1098,14 @@ async def tool_open_metal_sites(
         structure_path=structure_path,
         structure_text=structure_text,
         structure_base64=structure_base64,
+        structure_id=structure_id,
         filename=filename,
         zeo_args=zeo_args,
         output_files=["result.oms"],
         parser=parse_oms_from_text,
         response_model=OpenMetalSitesResponse,
         force_recalculate=force_recalculate,
+        timeout_seconds=timeout_seconds,
         ctx=ctx,
     )
 
@@ -718,12 +1115,14 @@ async def tool_blocking_spheres(
     structure_path: str | None = None,
     structure_text: str | None = None,
     structure_base64: str | None = None,
+    structure_id: str | None = None,
     filename: str | None = None,
     probe_radius: float = 1.86,
     samples: int = 50000,
     ha: bool = True,
     force_recalculate: bool = False,
-    ctx: Context = None,
+    timeout_seconds: float | None = None,
+    ctx: Optional[Context] = None,
 ) -> Dict[str, Any]:
     try:
         _validate_positive("probe_radius", probe_radius)
@@ -741,12 +1140,14 @@ async def tool_blocking_spheres(
         structure_path=structure_path,
         structure_text=structure_text,
         structure_base64=structure_base64,
+        structure_id=structure_id,
         filename=filename,
         zeo_args=zeo_args,
         output_files=["result.block"],
         parser=parse_block_from_text,
         response_model=BlockingSpheresResponse,
         force_recalculate=force_recalculate,
+        timeout_seconds=timeout_seconds,
         ctx=ctx,
     )
 
@@ -756,6 +1157,7 @@ async def tool_pore_size_dist_summary(
     structure_path: str | None = None,
     structure_text: str | None = None,
     structure_base64: str | None = None,
+    structure_id: str | None = None,
     filename: str | None = None,
     probe_radius: float = 1.21,
     chan_radius: float | None = None,
@@ -763,7 +1165,8 @@ async def tool_pore_size_dist_summary(
     ha: bool = True,
     force_recalculate: bool = False,
     preview_lines: int = 20,
-    ctx: Context = None,
+    timeout_seconds: float | None = None,
+    ctx: Optional[Context] = None,
 ) -> Dict[str, Any]:
     async def _progress(step: int) -> None:
         if ctx is not None:
@@ -780,6 +1183,7 @@ async def tool_pore_size_dist_summary(
             raise ValueError("samples must be greater than 0")
         if preview_lines <= 0:
             raise ValueError("preview_lines must be greater than 0")
+        deadline = _deadline_of(timeout_seconds)
     except ValueError as exc:
         return _error("pore_size_dist_summary", str(exc), code="INPUT_VALIDATION_ERROR")
 
@@ -799,6 +1203,7 @@ async def tool_pore_size_dist_summary(
             structure_text=structure_text,
             structure_base64=structure_base64,
             filename=filename,
+            structure_id=structure_id,
         )
     except ValueError as exc:
         return _error("pore_size_dist_summary", str(exc), code="INPUT_VALIDATION_ERROR")
@@ -810,19 +1215,33 @@ async def tool_pore_size_dist_summary(
         if ha:
             zeo_args.insert(0, "-ha")
         final_args = zeo_args + [prepared.input_path.name]
+        predicted = await asyncio.to_thread(runtime_model.predict, final_args, prepared.input_path)
 
-        execution = await runner.run_command_async(
-            structure_file=prepared.input_path,
-            zeo_args=final_args,
-            output_files=[output_filename],
-            extra_identifier="pore_size_dist_summary",
-            skip_cache=force_recalculate,
-        )
+        tenant = _tenant(ctx)
+        async with AsyncExitStack() as stack:
+            await stack.enter_async_context(metered(tenant))
+            stack.enter_context(deadline_scope(deadline=deadline))
+            try:
+                check_quota(tenant)
+                stack.enter_context(admit(tenant, final_args, predicted))
+            except AdmissionError as exc:
+                return _admission_error("pore_size_dist_summary", exc)
+            execution = await runner.run_command_async(
+                structure_file=prepared.input_path,
+                zeo_args=final_args,
+                output_files=[output_filename],
+                skip_cache=force_recalculate,
+                content_hash=prepared.content_hash,
+            )
         await _progress(3)
 
         if not execution.get("success"):
             exit_code = execution.get("exit_code")
             stderr = execution.get("stderr", "")
+            if exit_code == QUEUE_FULL_EXIT_CODE:
+                return _queue_full_error("pore_size_dist_summary", exit_code, stderr)
+            if exit_code == DEADLINE_EXIT_CODE:
+                return _deadline_error("pore_size_dist_summary", exit_code, stderr)
             if exit_code == 124:
                 return _error(
                     "pore_size_dist_summary",
@@ -877,7 +1296,335 @@ async def tool_pore_size_dist_summary(
                 "source": prepared.source,
                 "filename": prepared.filename,
                 "input_size_bytes": prepared.size_bytes,
+                "predicted_seconds": predicted,
+                **await _quota_meta(tenant),
+            },
+        )
+    finally:
+        cleanup_temp_directory(prepared.task_dir)
+
+
+@mcp.tool(
+    name="profile",
+    description=(
+        "Run several analyses (pore_diameter, surface_area, accessible_volume, probe_volume, "
+        "channel_analysis, framework_info, open_metal_sites, blocking_spheres) on one structure "
+        "in a single Zeo++ invocation. `analyses` is a list of names or {analysis, params} objects."
+    ),
+)
+async def tool_profile(
+    analyses: list[dict[str, Any] | str],
+    structure_path: str | None = None,
+    structure_text: str | None = None,
+    structure_base64: str | None = None,
+    structure_id: str | None = None,
+    filename: str | None = None,
+    ha: bool = True,
+    force_recalculate: bool = False,
+    timeout_seconds: float | None = None,
+    ctx: Optional[Context] = None,
+) -> Dict[str, Any]:
+    async def _progress(step: int) -> None:
+        if ctx is not None:
+            try:
+                await ctx.report_progress(step, 4)
+            except Exception:
+                pass
+
+    try:
+        plan = resolve_analysis_plan(analyses)
+        deadline = _deadline_of(timeout_seconds)
+    except ValueError as exc:
+        return _error("profile", str(exc), code="INPUT_VALIDATION_ERROR")
+    tenant = _tenant(ctx)
+    quota_error = _quota_error("profile", tenant)
+    if quota_error is not None:
+        return quota_error
+
+    await _progress(1)
+    try:
+        prepared = _prepare_structure(
+            task_name="profile",
+            structure_path=structure_path,
+            structure_text=structure_text,
+            structure_base64=structure_base64,
+            filename=filename,
+            structure_id=structure_id,
+        )
+    except ValueError as exc:
+        return _error("profile", str(exc), code="INPUT_VALIDATION_ERROR")
+
+    await _progress(2)
+    try:
+        with deadline_scope(deadline=deadline):
+            async with metered(tenant):
+                results = await runner.run_combined_async(
+                    structure_file=prepared.input_path,
+                    segments=[(spec.name, spec.build_args(params), [spec.output_file]) for spec, params in plan],
+                    ha=ha,
+                    skip_cache=force_recalculate,
+                    content_hash=prepared.content_hash,
+                )
+        await _progress(3)
+
+        failed = next((r for r in results.values() if not r.get("success")), None)
+        if failed is not None:
+            exit_code = failed.get("exit_code")
+            stderr = failed.get("stderr", "")
+            if exit_code == QUEUE_FULL_EXIT_CODE:
+                return _queue_full_error("profile", exit_code, stderr)
+            if exit_code == DEADLINE_EXIT_CODE:
+                return _deadline_error("profile", exit_code, stderr)
+            if exit_code == 124:
+                return _error(
+                    "profile",
+                    f"Zeo++ execution timed out after {settings.zeo_command_timeout_seconds}s",
+                    code="ZEOPP_TIMEOUT",
+                    details={
+                        "exit_code": exit_code,
+                        "timeout_seconds": settings.zeo_command_timeout_seconds,
+                        "stderr": stderr,
+                    },
+                )
+            return _error(
+                "profile",
+                "Zeo++ execution failed",
+                code="ZEOPP_EXECUTION_FAILED",
+                details={
+                    "exit_code": exit_code,
+                    "stderr": stderr,
+                },
+            )
+
+        parsed_results, errors = parse_plan_results(plan, results)
+        computed = [name for name, result in results.items() if not result.get("cached")]
+        await _progress(4)
+        return _ok(
+            "profile",
+            {
+                "results": parsed_results,
+                "errors": errors,
+                "computed": computed,
+                "zeo_invocations": 1 if computed else 0,
+            },
+            cached=not computed,
+            meta={
+                "source": prepared.source,
+                "filename": prepared.filename,
+                "input_size_bytes": prepared.size_bytes,
+                **await _quota_meta(tenant),
             },
         )
     finally:
         cleanup_temp_directory(prepared.task_dir)
+
+
+@mcp.tool(
+    name="probe_sweep",
+    description=(
+        f"Run one analysis ({', '.join(SWEEP_ANALYSES)}) at several probe radii on one structure. "
+        "Give `radii` as a list or `radius_start`, `radius_stop` and `radius_step` (inclusive); points "
+        "run concurrently and the result holds one list per metric aligned with `probe_radii`. "
+        "`chan_radius` must be omitted for blocking_spheres."
+    ),
+)
+async def tool_probe_sweep(
+    analysis: str,
+    radii: list[float] | None = None,
+    radius_start: float | None = None,
+    radius_stop: float | None = None,
+    radius_step: float | None = None,
+    chan_radius: float | None = None,
+    samples: int | None = None,
+    structure_path: str | None = None,
+    structure_text: str | None = None,
+    structure_base64: str | None = None,
+    structure_id: str | None = None,
+    filename: str | None = None,
+    ha: bool = True,
+    force_recalculate: bool = False,
+    timeout_seconds: float | None = None,
+    ctx: Optional[Context] = None,
+) -> Dict[str, Any]:
+    tenant = _tenant(ctx)
+    quota_error = _quota_error("probe_sweep", tenant)
+    if quota_error is not None:
+        return quota_error
+    try:
+        deadline = _deadline_of(timeout_seconds)
+        points = resolve_sweep(
+            analysis,
+            sweep_radii(radii, radius_start, radius_stop, radius_step),
+            chan_radius=chan_radius,
+            samples=samples,
+        )
+        prepared = _prepare_structure(
+            task_name="probe_sweep",
+            structure_path=structure_path,
+            structure_text=structure_text,
+            structure_base64=structure_base64,
+            filename=filename,
+            structure_id=structure_id,
+        )
+    except ValueError as exc:
+        return _error("probe_sweep", str(exc), code="INPUT_VALIDATION_ERROR")
+
+    try:
+        with deadline_scope(deadline=deadline):
+            async with metered(tenant):
+                outcome = await run_sweep(
+                    prepared.input_path,
+                    prepared.content_hash,
+                    get_analysis(analysis),
+                    points,
+                    ha=ha,
+                    skip_cache=force_recalculate,
+                )
+    finally:
+        cleanup_temp_directory(prepared.task_dir)
+    return _ok(
+        "probe_sweep",
+        outcome,
+        cached=outcome["zeo_invocations"] == 0,
+        meta={
+            "source": prepared.source,
+            "filename": prepared.filename,
+            "input_size_bytes": prepared.size_bytes,
+            **await _quota_meta(tenant),
+        },
+    )
+
+
+@mcp.tool(
+    name="pipeline",
+    description=(
+        "Run a staged screening pipeline on one structure. `stages` is a list of "
+        "{analyses: [...], require: [{field: 'pore_diameter.free_diameter', op: '>=', value: 3.0}]}; "
+        "each stage is one Zeo++ invocation and later stages are skipped once a condition fails."
+    ),
+)
+async def tool_pipeline(
+    stages: list[dict[str, Any]],
+    structure_path: str | None = None,
+    structure_text: str | None = None,
+    structure_base64: str | None = None,
+    structure_id: str | None = None,
+    filename: str | None = None,
+    ha: bool = True,
+    force_recalculate: bool = False,
+    timeout_seconds: float | None = None,
+    ctx: Optional[Context] = None,
+) -> Dict[str, Any]:
+    tenant = _tenant(ctx)
+    quota_error = _quota_error("pipeline", tenant)
+    if quota_error is not None:
+        return quota_error
+    provided = [bool(structure_path), bool(structure_text), bool(structure_base64), bool(structure_id)]
+    try:
+        pipeline = resolve_pipeline(stages)
+        deadline = _deadline_of(timeout_seconds)
+        if sum(provided) != 1:
+            raise ValueError("Provide exactly one of structure_path, structure_text, structure_base64, or structure_id")
+        if structure_id:
+            source = "structure_id"
+        else:
+            file_bytes, source, final_name = _read_structure_source(
+                structure_path=structure_path,
+                structure_text=structure_text,
+                structure_base64=structure_base64,
+                filename=filename,
+            )
+            structure_id = store_structure(io.BytesIO(file_bytes), final_name).structure_id
+    except ValueError as exc:
+        return _error("pipeline", str(exc), code="INPUT_VALIDATION_ERROR")
+
+    with deadline_scope(deadline=deadline):
+        async with metered(tenant):
+            outcome = await run_pipeline(
+                structure_id, pipeline, ha=ha, skip_cache=force_recalculate, prefix="mcp_pipeline"
+            )
+    if outcome["status"] != "succeeded":
+        error = outcome["error"]
+        codes = {
+            ErrorCode.TIMEOUT.value: "ZEOPP_TIMEOUT",
+            ErrorCode.QUEUE_FULL.value: "ZEOPP_QUEUE_FULL",
+            ErrorCode.DEADLINE_EXCEEDED.value: "ZEOPP_DEADLINE_EXCEEDED",
+            ErrorCode.STRUCTURE_NOT_FOUND.value: "INPUT_VALIDATION_ERROR",
+        }
+        return _error(
+            "pipeline",
+            error["message"],
+            code=codes.get(error["error_code"], "ZEOPP_EXECUTION_FAILED"),
+            details={key: value for key, value in outcome.items() if key not in ("status", "error")},
+        )
+    result = {key: value for key, value in outcome.items() if key != "status"}
+    return _ok(
+        "pipeline",
+        result,
+        cached=not outcome["computed"],
+        meta={"source": source, "structure_id": structure_id, **await _quota_meta(tenant)},
+    )
+
+
+@mcp.tool(
+    name="screen_directory",
+    description=(
+        "Queue a screening job running `analyses` (as for `profile`) or pipeline `stages` (as for `pipeline`) "
+        "on every structure file under a directory or glob (e.g. /shared/mofs/**/*.cif) inside "
+        "MCP_ALLOWED_PATH_ROOTS. Returns the job; poll it with `job_status`. Finished structures are "
+        "checkpointed, so the job resumes after restarts."
+    ),
+)
+async def tool_screen_directory(
+    path: str,
+    analyses: list[dict[str, Any] | str] | None = None,
+    stages: list[dict[str, Any]] | None = None,
+    ha: bool = True,
+    force_recalculate: bool = False,
+    timeout_seconds: float | None = None,
+    ctx: Optional[Context] = None,
+) -> Dict[str, Any]:
+    try:
+        with deadline_scope(timeout_seconds):
+            async with metered(_tenant(ctx)):
+                job = await asyncio.to_thread(
+                    submit_job,
+                    "directory",
+                    analyses,
+                    ha=ha,
+                    force_recalculate=force_recalculate,
+                    path=path,
+                    pipeline=stages,
+                )
+    except QuotaExceededError as exc:
+        return _admission_error("screen_directory", exc)
+    except ValueError as exc:
+        return _error("screen_directory", str(exc), code="INPUT_VALIDATION_ERROR")
+    job_dispatcher.ensure_running()
+    return _ok("screen_directory", job_response(job).model_dump())
+
+
+@mcp.tool(
+    name="job_status",
+    description=(
+        "Get the status, progress and result of a job. For directory jobs, set item_limit > 0 to also "
+        "return per-structure results (optionally only status='failed' ones)."
+    ),
+)
+async def tool_job_status(
+    job_id: str,
+    item_limit: int = 0,
+    item_offset: int = 0,
+    item_status: str | None = None,
+) -> Dict[str, Any]:
+    job_dispatcher.ensure_running()
+    job = await asyncio.to_thread(job_dispatcher.store.get, job_id)
+    if job is None:
+        return _error("job_status", f"Job not found: {job_id}", code="JOB_NOT_FOUND")
+    result = job_response(job).model_dump()
+    if item_limit > 0:
+        items = await asyncio.to_thread(
+            job_dispatcher.store.list_items, job_id, item_status, min(item_limit, 1000), max(item_offset, 0)
+        )
+        result["items"] = [job_item_response(item).model_dump() for item in items]
+    return _ok("job_status", result)
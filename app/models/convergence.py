@@ -0,0 +1,36 @@
+# Monte Carlo Convergence Models
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-18
+# Updated: 2026-10-18 - samples=auto reports the change between successive runs
+# Updated: 2026-10-18 - The report is documented as a stability check, not an error bound
+
+from pydantic import BaseModel, Field
+from typing import Optional
+
+
+class MonteCarloConvergence(BaseModel):
+    """
+    Stability check of samples='auto' between successive runs, not an error bound.
+
+    Zeo++ uses a fixed random seed, so a run of 2n samples contains the run
+    of n samples; agreement between them does not bound the Monte Carlo error.
+    """
+
+    metric: str = Field(..., description="Primary metric checked for stability, e.g. 'asa_mass' or 'av.fraction'")
+    value: float = Field(..., description="Primary metric of the largest run, whose result is returned")
+    previous_value: float = Field(..., description="Primary metric of the run with half the samples")
+    relative_change: Optional[float] = Field(
+        None,
+        description="|value - previous_value| / |value| (0 when both are 0, null when only value is 0)"
+    )
+    tolerance: float = Field(..., description="Largest relative change between successive runs accepted as stable")
+    converged: bool = Field(
+        ...,
+        description="Whether the last two runs agreed within the tolerance before the sample budget was spent; "
+                    "a stability check between nested runs, not a precision guarantee"
+    )
+    samples: int = Field(..., description="Monte Carlo samples of the largest run")
+    total_samples: int = Field(..., description="Monte Carlo samples used over all runs")
+    runs: int = Field(..., description="Number of Zeo++ runs with doubling sample counts")
+
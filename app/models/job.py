@@ -0,0 +1,53 @@
+# Asynchronous Job Response Models
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-17
+# Updated: 2026-10-18 - Predicted runtime
+
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+
+from app.models.profile import ProfileAnalysisItem
+
+
+class JobResponse(BaseModel):
+    job_id: str = Field(..., description="Job identifier; poll GET /api/v1/jobs/{job_id}")
+    kind: str = Field(
+        ...,
+        description="'analysis' (result is the analysis response), 'profile' (result is a profile), "
+                    "'pipeline' (result is a pipeline outcome) or 'directory' (result counts the "
+                    "structures; per-structure results are its items)"
+    )
+    status: str = Field(..., description="queued, running, succeeded, failed or cancelled")
+    stage: str = Field("", description="Current step of a running job (starting, running)")
+    message: str = Field("", description="Last line of Zeo++ output seen while running")
+    analyses: List[ProfileAnalysisItem] = Field(..., description="Analyses with resolved parameters")
+    ha: bool = Field(..., description="Whether high accuracy mode is used")
+    structure_id: Optional[str] = Field(None, description="Stored structure the job runs on")
+    path: Optional[str] = Field(None, description="Directory or glob a directory job screens")
+    pipeline: Optional[List[Dict[str, Any]]] = Field(None, description="Stages of a pipeline with their conditions")
+    created: str = Field(..., description="ISO timestamp of submission")
+    started: Optional[str] = Field(None, description="ISO timestamp of the latest start")
+    finished: Optional[str] = Field(None, description="ISO timestamp of completion")
+    predicted_seconds: Optional[float] = Field(
+        None,
+        description="Zeo++ runtime predicted at submission (all stages of a pipeline; none for directory jobs)"
+    )
+    attempts: int = Field(0, description="Number of times the job was started (restarts after a worker died)")
+    cancel_requested: bool = Field(False, description="Cancellation was requested while the job was running")
+    result: Optional[Dict[str, Any]] = Field(None, description="Result once the job succeeded")
+    error: Optional[Dict[str, Any]] = Field(None, description="Error once the job failed")
+
+
+class JobItemResponse(BaseModel):
+    name: str = Field(..., description="Absolute path of the structure file")
+    status: str = Field(..., description="succeeded or failed")
+    structure_id: Optional[str] = Field(None, description="ID of the structure in the structure store")
+    finished: str = Field(..., description="ISO timestamp of completion")
+    results: Optional[Dict[str, Any]] = Field(None, description="Results by analysis name")
+    errors: Optional[Dict[str, Any]] = Field(None, description="Parsing errors by analysis name")
+    computed: Optional[List[str]] = Field(None, description="Analyses computed (not served from cache)")
+    error: Optional[Dict[str, Any]] = Field(None, description="Why the structure failed")
+    passed: Optional[bool] = Field(None, description="Pipelines: whether the structure passed every condition")
+    stages_run: Optional[int] = Field(None, description="Pipelines: number of stages run")
+    rejected_by: Optional[str] = Field(None, description="Pipelines: the condition the structure failed")
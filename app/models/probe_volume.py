@@ -2,10 +2,13 @@
 # -*- coding: utf-8 -*-
 # Author: Shibo Li
 # Date: 2025-05-13
+# Updated: 2026-10-18 - Convergence report of samples='auto'
 
 from pydantic import BaseModel, Field
 from typing import List, Optional
 
+from app.models.convergence import MonteCarloConvergence
+
 
 class ProbeVolumeRequest(BaseModel):
     chan_radius: float = Field(..., description="Probe radius used to determine POAV")
@@ -29,4 +32,7 @@ class ProbeVolumeResponse(BaseModel):
     number_of_pockets: Optional[int] = None
     pocket_volume_a3: Optional[List[float]] = None
     cached: bool
+    # Set when samples='auto' chose the sample count; a stability check between
+    # successive runs, not an error bound (see MonteCarloConvergence)
+    convergence: Optional[MonteCarloConvergence] = None
 
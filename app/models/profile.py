@@ -0,0 +1,22 @@
+# Structure Profile Request & Response Models
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-17
+
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List
+
+
+class ProfileAnalysisItem(BaseModel):
+    analysis: str = Field(..., description="Analysis name, e.g. 'pore_diameter' or 'surface_area'")
+    params: Dict[str, Any] = Field(
+        default_factory=dict,
+        description="Analysis parameters (defaults apply when omitted)"
+    )
+
+
+class ProfileResponse(BaseModel):
+    results: Dict[str, Dict[str, Any]] = Field(..., description="Validated result per analysis name")
+    errors: Dict[str, Dict[str, Any]] = Field(default_factory=dict, description="Per-analysis parsing errors")
+    computed: List[str] = Field(default_factory=list, description="Analyses computed by Zeo++ (not served from cache)")
+    zeo_invocations: int = Field(..., description="Number of Zeo++ processes started for this request")
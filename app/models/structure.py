@@ -0,0 +1,13 @@
+# Structure Store Response Models
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-17
+
+from pydantic import BaseModel, Field
+
+
+class StructureResponse(BaseModel):
+    structure_id: str = Field(..., description="SHA-256 of the structure content; pass it as structure_id to analyses")
+    filename: str = Field(..., description="Filename the structure is stored under")
+    size_bytes: int = Field(..., description="Size of the stored structure in bytes")
+    created: str = Field(..., description="ISO timestamp of the first upload")
@@ -0,0 +1,20 @@
+# Probe-Radius Sweep Response Models
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-18
+
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+
+
+class SweepResponse(BaseModel):
+    analysis: str = Field(..., description="Swept analysis, e.g. 'surface_area'")
+    probe_radii: List[float] = Field(..., description="Probe radii in ascending order")
+    params: Dict[str, Any] = Field(..., description="Parameters shared by all points")
+    metrics: Dict[str, List[Optional[float]]] = Field(
+        ...,
+        description="One list per numeric result field, aligned with probe_radii (null where a point failed)"
+    )
+    cached: List[bool] = Field(..., description="Whether each point was served from cache")
+    errors: List[Optional[Dict[str, Any]]] = Field(..., description="Error of each point, null on success")
+    zeo_invocations: int = Field(..., description="Number of Zeo++ processes started for this request")
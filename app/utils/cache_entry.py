@@ -0,0 +1,149 @@
+# Atomic Cache Entry Writes
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-17
+
+"""
+Crash-safe publishing of cache entries.
+
+An entry is written to ``<cache>/.staging/<uuid>/`` together with a manifest
+(``.complete.json``) listing every output file and its SHA-256, and is then
+moved to its final path with a single rename. A cache entry therefore either
+has a manifest and all of its files, or does not exist; readers only check
+for the manifest and never re-validate the outputs.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.utils.cache_layout import cache_root_of
+from app.utils.logger import logger
+
+MANIFEST_FILENAME = ".complete.json"
+STAGING_DIRNAME = ".staging"
+
+
+def _manifest_checksum(files: Dict[str, str]) -> str:
+    m = hashlib.sha256()
+    for name in sorted(files):
+        m.update(f"{name}\0{files[name]}\n".encode())
+    return m.hexdigest()
+
+
+def read_cache_manifest(cache_dir: Path) -> Optional[dict]:
+    """
+    Return the manifest of a published cache entry.
+
+    Returns:
+        The manifest dict, or None if the entry does not exist or was
+        written without a manifest (treated as a cache miss).
+    """
+    try:
+        manifest: dict = json.loads((cache_dir / MANIFEST_FILENAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return manifest
+
+
+def find_cached_file(cache_dir: Path, suffix: str) -> Optional[Path]:
+    """Return the file with ``suffix`` listed in a published entry, if any."""
+    manifest = read_cache_manifest(cache_dir)
+    if manifest is None:
+        return None
+    for name in manifest.get("files", {}):
+        if Path(name).suffix == suffix:
+            return cache_dir / str(name)
+    return None
+
+
+def write_cache_entry(cache_dir: Path, outputs: Dict[str, bytes], replace: bool = False) -> bool:
+    """
+    Stage the outputs of a run and publish them atomically at ``cache_dir``.
+
+    If a complete entry already exists (a concurrent identical run finished
+    first) it is kept and the staged copy is discarded, unless ``replace``
+    is set (forced recalculation). Entries without a manifest, e.g. left by
+    older versions, are always replaced.
+
+    Args:
+        cache_dir: Final path of the cache entry
+        outputs: Output file contents by filename
+        replace: Replace an existing complete entry
+
+    Returns:
+        True if this call published the entry.
+    """
+    cache_root = cache_root_of(cache_dir)
+    staging_root = cache_root / STAGING_DIRNAME
+    staging_root.mkdir(parents=True, exist_ok=True)
+    staging_dir = staging_root / uuid.uuid4().hex
+    staging_dir.mkdir()
+
+    try:
+        files = {}
+        for filename, content in outputs.items():
+            (staging_dir / filename).write_bytes(content)
+            files[filename] = hashlib.sha256(content).hexdigest()
+        manifest = {
+            "files": files,
+            "checksum": _manifest_checksum(files),
+            "size_bytes": sum(len(c) for c in outputs.values()),
+            "created": time.time(),
+        }
+        (staging_dir / MANIFEST_FILENAME).write_text(json.dumps(manifest), encoding="utf-8")
+
+        cache_dir.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.rename(staging_dir, cache_dir)
+            return True
+        except OSError:
+            pass
+
+        # The target exists: keep a complete entry unless asked to replace it.
+        if not replace and read_cache_manifest(cache_dir) is not None:
+            return False
+        retired = staging_root / f"{uuid.uuid4().hex}.old"
+        try:
+            os.rename(cache_dir, retired)
+        except OSError:
+            pass
+        try:
+            os.rename(staging_dir, cache_dir)
+        except OSError as e:
+            logger.warning(f"[cache] Could not publish cache entry {cache_dir.name}: {e}")
+            return False
+        finally:
+            shutil.rmtree(retired, ignore_errors=True)
+        return True
+    finally:
+        if staging_dir.exists():
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def cleanup_cache_staging(cache_root: Path, max_age_hours: float = 1.0) -> int:
+    """
+    Remove staging directories left behind by crashed writers.
+
+    Returns:
+        Number of directories removed
+    """
+    staging_root = cache_root / STAGING_DIRNAME
+    if not staging_root.exists():
+        return 0
+    removed = 0
+    cutoff = time.time() - max_age_hours * 3600
+    with os.scandir(staging_root) as it:
+        for item in it:
+            try:
+                if item.stat().st_mtime < cutoff:
+                    shutil.rmtree(item.path)
+                    removed += 1
+            except OSError:
+                continue
+    return removed
@@ -0,0 +1,239 @@
+# SQLite Index of Cache Entries
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-17
+# Updated: 2026-10-17 - Backfill walks the sharded cache layout
+
+"""
+Embedded index of the result cache.
+
+Every cache entry written by the runner is recorded in a small SQLite
+database next to the entries (``<cache>/.index.sqlite3``) with its key,
+Zeo++ operation, structure hash, size, creation and last-hit time. Running
+totals are maintained by triggers, so statistics are a single-row lookup and
+listing/eviction are index scans instead of filesystem walks.
+
+The index builds itself from the entries on disk the first time it is
+opened; afterwards the filesystem is only touched to delete entries.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.utils.cache_layout import iter_cache_entries
+from app.utils.logger import logger
+
+INDEX_FILENAME = ".index.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    operation TEXT NOT NULL DEFAULT '',
+    structure_hash TEXT NOT NULL DEFAULT '',
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    last_hit REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_entries_last_hit ON entries (last_hit);
+CREATE INDEX IF NOT EXISTS idx_entries_created ON entries (created);
+CREATE INDEX IF NOT EXISTS idx_entries_structure ON entries (structure_hash);
+CREATE INDEX IF NOT EXISTS idx_entries_operation ON entries (operation);
+
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    size_bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals (id, entries, size_bytes) VALUES (0, 0, 0);
+
+CREATE TRIGGER IF NOT EXISTS entries_after_insert AFTER INSERT ON entries BEGIN
+    UPDATE totals SET entries = entries + 1, size_bytes = size_bytes + NEW.size_bytes WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_after_delete AFTER DELETE ON entries BEGIN
+    UPDATE totals SET entries = entries - 1, size_bytes = size_bytes - OLD.size_bytes WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_after_update AFTER UPDATE OF size_bytes ON entries BEGIN
+    UPDATE totals SET size_bytes = size_bytes - OLD.size_bytes + NEW.size_bytes WHERE id = 0;
+END;
+"""
+
+_ENTRY_COLUMNS = ("key", "operation", "structure_hash", "size_bytes", "created", "last_hit", "hits")
+
+
+class CacheIndex:
+    """SQLite-backed metadata of the entries below one cache directory."""
+
+    def __init__(self, cache_root: Path):
+        self.cache_root = cache_root
+        self.db_path = cache_root / INDEX_FILENAME
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a connection, creating (and backfilling) the index on first use."""
+        if not self._initialized:
+            self._initialize()
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _initialize(self) -> None:
+        with self._init_lock:
+            if self._initialized:
+                return
+            self.cache_root.mkdir(parents=True, exist_ok=True)
+            is_new = not self.db_path.exists()
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                if is_new:
+                    self._backfill(conn)
+            finally:
+                conn.close()
+            self._initialized = True
+
+    def _backfill(self, conn: sqlite3.Connection) -> None:
+        """Index entries that were written before the index existed (one-time walk)."""
+        rows = []
+        for key, path in iter_cache_entries(self.cache_root):
+            size = 0
+            with os.scandir(path) as files:
+                for f in files:
+                    if f.is_file():
+                        size += f.stat().st_size
+            mtime = os.stat(path).st_mtime
+            rows.append((key, size, mtime, mtime))
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO entries (key, size_bytes, created, last_hit) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+        if rows:
+            logger.info(f"[cache] Indexed {len(rows)} existing cache entries")
+
+    def record(
+        self,
+        key: str,
+        operation: str = "",
+        structure_hash: str = "",
+        size_bytes: int = 0,
+        created: Optional[float] = None,
+        last_hit: Optional[float] = None,
+    ) -> None:
+        """Insert or replace the metadata of a freshly written entry."""
+        now = time.time()
+        created = now if created is None else created
+        last_hit = created if last_hit is None else last_hit
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO entries (key, operation, structure_hash, size_bytes, created, last_hit, hits)
+                VALUES (?, ?, ?, ?, ?, ?, 0)
+                ON CONFLICT(key) DO UPDATE SET
+                    operation = excluded.operation,
+                    structure_hash = excluded.structure_hash,
+                    size_bytes = excluded.size_bytes,
+                    created = excluded.created,
+                    last_hit = excluded.last_hit
+                """,
+                (key, operation, structure_hash, size_bytes, created, last_hit),
+            )
+
+    def touch(self, key: str) -> None:
+        """Record a cache hit."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE entries SET last_hit = ?, hits = hits + 1 WHERE key = ?",
+                (time.time(), key),
+            )
+
+    def remove(self, keys: List[str]) -> None:
+        """Forget entries (their directories are deleted by the caller)."""
+        if not keys:
+            return
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k in keys])
+
+    def totals(self) -> Tuple[int, int]:
+        """Return (entry count, total size in bytes) in O(1)."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT entries, size_bytes FROM totals WHERE id = 0").fetchone()
+        return int(row[0]), int(row[1])
+
+    def list_entries(
+        self,
+        limit: int = 100,
+        offset: int = 0,
+        operation: Optional[str] = None,
+        structure_hash: Optional[str] = None,
+    ) -> List[Dict]:
+        """Return entries ordered by most recent hit."""
+        clauses, params = [], []
+        if operation:
+            clauses.append("operation = ?")
+            params.append(operation)
+        if structure_hash:
+            clauses.append("structure_hash = ?")
+            params.append(structure_hash)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(_ENTRY_COLUMNS)} FROM entries {where} "
+                "ORDER BY last_hit DESC LIMIT ? OFFSET ?",
+                (*params, limit, offset),
+            ).fetchall()
+        return [dict(zip(_ENTRY_COLUMNS, row)) for row in rows]
+
+    def created_before(self, cutoff: float) -> List[Tuple[str, int]]:
+        """Return (key, size) of entries created before ``cutoff``."""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT key, size_bytes FROM entries WHERE created < ?", (cutoff,)
+            ).fetchall()
+
+    def least_recently_used(
+        self,
+        limit: int,
+        after: Optional[Tuple[float, str]] = None,
+    ) -> List[Tuple[str, int, float]]:
+        """
+        Return (key, size, last_hit) of the least recently used entries.
+
+        ``after`` is the ``(last_hit, key)`` of the last row of a previous
+        batch, for paging past entries that could not be removed.
+        """
+        with self._connect() as conn:
+            if after is None:
+                return conn.execute(
+                    "SELECT key, size_bytes, last_hit FROM entries ORDER BY last_hit, key LIMIT ?",
+                    (limit,),
+                ).fetchall()
+            return conn.execute(
+                "SELECT key, size_bytes, last_hit FROM entries "
+                "WHERE (last_hit, key) > (?, ?) ORDER BY last_hit, key LIMIT ?",
+                (*after, limit),
+            ).fetchall()
+
+
+_indexes: Dict[Path, CacheIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_cache_index(cache_root: Path) -> CacheIndex:
+    """Return the shared index of a cache directory."""
+    with _indexes_lock:
+        index = _indexes.get(cache_root)
+        if index is None:
+            index = _indexes[cache_root] = CacheIndex(cache_root)
+        return index
@@ -0,0 +1,152 @@
+# On-disk Layout of the Result Cache
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-17
+
+"""
+Two-level fan-out layout of the result cache.
+
+Entries live at ``cache/<k[0:2]>/<k[2:4]>/<k>``: the root and every
+first-level shard hold at most 256 subdirectories and each leaf shard about
+1/65536 of the entries, so lookups stay constant-time as the cache grows. The layout version is recorded in
+``cache/.layout``; caches created before sharding (flat ``cache/<k>``,
+version 1) are converted once with::
+
+    python -m app.utils.cache_layout
+"""
+
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Iterator, Tuple
+
+from app.utils.logger import logger
+
+CACHE_LAYOUT_VERSION = 2
+LAYOUT_FILENAME = ".layout"
+
+_KEY_RE = re.compile(r"^[0-9a-f]{64}$")
+_SHARD_RE = re.compile(r"^[0-9a-f]{2}$")
+
+
+def cache_entry_path(cache_root: Path, cache_key: str) -> Path:
+    """Return the sharded path of a cache entry: ``<root>/ab/cd/<key>``."""
+    return cache_root / cache_key[:2] / cache_key[2:4] / cache_key
+
+
+def cache_root_of(cache_dir: Path) -> Path:
+    """Return the cache root of a sharded entry path."""
+    return cache_dir.parent.parent.parent
+
+
+def iter_cache_entries(cache_root: Path) -> Iterator[Tuple[str, str]]:
+    """
+    Yield ``(key, path)`` of every entry in the sharded layout.
+
+    This walks all shards and is meant for one-time jobs (index backfill,
+    clearing the cache), not for request handling.
+    """
+    if not cache_root.exists():
+        return
+    with os.scandir(cache_root) as level1:
+        for shard1 in level1:
+            if not (shard1.is_dir() and _SHARD_RE.match(shard1.name)):
+                continue
+            with os.scandir(shard1.path) as level2:
+                for shard2 in level2:
+                    if not (shard2.is_dir() and _SHARD_RE.match(shard2.name)):
+                        continue
+                    with os.scandir(shard2.path) as entries:
+                        for entry in entries:
+                            if entry.is_dir() and _KEY_RE.match(entry.name):
+                                yield entry.name, entry.path
+
+
+def _legacy_entries(cache_root: Path) -> Iterator[os.DirEntry]:
+    """Yield flat (layout version 1) entries directly below the cache root."""
+    with os.scandir(cache_root) as it:
+        for item in it:
+            if item.is_dir() and _KEY_RE.match(item.name):
+                yield item
+
+
+def read_layout_version(cache_root: Path) -> int:
+    """Return the layout version recorded in the cache root (1 if unmarked)."""
+    try:
+        return int((cache_root / LAYOUT_FILENAME).read_text(encoding="utf-8").strip())
+    except (OSError, ValueError):
+        return 1
+
+
+def write_layout_version(cache_root: Path) -> None:
+    """Record the current layout version in the cache root."""
+    cache_root.mkdir(parents=True, exist_ok=True)
+    (cache_root / LAYOUT_FILENAME).write_text(f"{CACHE_LAYOUT_VERSION}\n", encoding="utf-8")
+
+
+def ensure_cache_layout(cache_root: Path) -> bool:
+    """
+    Check the layout of the cache at startup.
+
+    A cache without flat entries is marked with the current version. A cache
+    that still holds flat entries is left alone and a warning points to the
+    migration command.
+
+    Returns:
+        True if the cache uses the current layout.
+    """
+    if read_layout_version(cache_root) == CACHE_LAYOUT_VERSION:
+        return True
+    if cache_root.exists() and next(_legacy_entries(cache_root), None) is not None:
+        logger.warning(
+            "[cache] Cache uses the flat layout; existing entries are not found until "
+            "it is migrated with `python -m app.utils.cache_layout`"
+        )
+        return False
+    write_layout_version(cache_root)
+    return True
+
+
+def migrate_cache_layout(cache_root: Path) -> Tuple[int, int]:
+    """
+    Move flat ``cache/<key>`` entries into the sharded layout.
+
+    Each entry is moved with a single rename, so the migration can run while
+    the service is up and can be resumed after an interruption.
+
+    Returns:
+        Tuple of (entries_moved, entries_failed)
+    """
+    if not cache_root.exists():
+        write_layout_version(cache_root)
+        return 0, 0
+
+    moved = 0
+    failed = 0
+    for item in list(_legacy_entries(cache_root)):
+        target = cache_entry_path(cache_root, item.name)
+        try:
+            if target.exists():
+                # Already recomputed under the new layout; drop the stale copy.
+                shutil.rmtree(item.path)
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.rename(item.path, target)
+            moved += 1
+        except OSError as e:
+            logger.warning(f"[cache] Failed to migrate cache entry {item.name}: {e}")
+            failed += 1
+
+    if failed == 0:
+        write_layout_version(cache_root)
+    logger.info(f"[cache] Migrated {moved} cache entries to layout version {CACHE_LAYOUT_VERSION}")
+    return moved, failed
+
+
+if __name__ == "__main__":
+    from app.core.config import CACHE_DIR
+
+    moved, failed = migrate_cache_layout(CACHE_DIR)
+    print(f"Migrated {moved} cache entries ({failed} failed) in {CACHE_DIR}")
+    raise SystemExit(1 if failed else 0)
@@ -2,20 +2,34 @@
 # -*- coding: utf-8 -*-
 # Author: Shibo Li
 # Date: 2025-12-31
+# Updated: 2026-10-17 - LRU/age-based cache eviction
+# Updated: 2026-10-17 - Stats and eviction served by the SQLite cache index
+# Updated: 2026-10-17 - Sharded cache layout
+# Updated: 2026-10-17 - Eviction purges staging directories of crashed cache writers
+# Updated: 2026-10-17 - Clearing/evicting invalidates the in-memory parsed-result cache
 # Version: 0.3.1
 
 """
 Utilities for cleaning up temporary files and managing workspace storage.
 """
 
+import asyncio
+import os
 import shutil
 import time
 from pathlib import Path
-from typing import Tuple
+from typing import Optional, Tuple
 from contextlib import contextmanager
 
-from app.core.config import TMP_DIR, CACHE_DIR
+from app.core.config import TMP_DIR, CACHE_DIR, settings
+from app.utils.cache_entry import cleanup_cache_staging
+from app.utils.cache_index import get_cache_index
+from app.utils.cache_layout import cache_entry_path, cache_root_of, iter_cache_entries
 from app.utils.logger import logger
+from app.utils.result_cache import result_memory_cache
+
+# Number of least recently used entries fetched per eviction batch
+EVICTION_BATCH_SIZE = 256
 
 
 def cleanup_temp_directory(task_dir: Path) -> bool:
@@ -87,13 +101,16 @@ def get_temp_storage_stats() -> dict:
     
     count = 0
     total_size = 0
-    
-    for item in TMP_DIR.iterdir():
-        if item.is_dir():
-            count += 1
-            for file in item.rglob("*"):
-                if file.is_file():
-                    total_size += file.stat().st_size
+
+    # Task directories are flat (input structure + Zeo++ outputs)
+    with os.scandir(TMP_DIR) as it:
+        for item in it:
+            if item.is_dir():
+                count += 1
+                with os.scandir(item.path) as files:
+                    for file in files:
+                        if file.is_file():
+                            total_size += file.stat().st_size
     
     return {
         "exists": True,
@@ -105,6 +122,9 @@ def get_temp_storage_stats() -> dict:
 def get_cache_storage_stats() -> dict:
     """
     Get statistics about cache storage usage.
+
+    Served from the running totals of the cache index, without touching
+    the cached files.
     
     Returns:
         Dict with cache directory statistics
@@ -112,15 +132,7 @@ def get_cache_storage_stats() -> dict:
     if not CACHE_DIR.exists():
         return {"exists": False, "count": 0, "total_size_mb": 0}
     
-    count = 0
-    total_size = 0
-    
-    for item in CACHE_DIR.iterdir():
-        if item.is_dir():
-            count += 1
-            for file in item.rglob("*"):
-                if file.is_file():
-                    total_size += file.stat().st_size
+    count, total_size = get_cache_index(CACHE_DIR).totals()
     
     return {
         "exists": True,
@@ -131,25 +143,28 @@ def get_cache_storage_stats() -> dict:
 
 def clear_all_cache() -> Tuple[int, int]:
     """
-    Clear all cached results.
+    Clear all cached results, including parsed results held in memory.
     
     Returns:
         Tuple of (entries_removed, entries_failed)
     """
+    result_memory_cache.clear()
     if not CACHE_DIR.exists():
         return 0, 0
     
-    removed = 0
+    removed_keys = []
     failed = 0
     
-    for item in CACHE_DIR.iterdir():
-        if item.is_dir():
-            try:
-                shutil.rmtree(item)
-                removed += 1
-            except Exception as e:
-                logger.warning(f"[cache] Failed to remove cache entry {item}: {e}")
-                failed += 1
+    for key, path in list(iter_cache_entries(CACHE_DIR)):
+        try:
+            shutil.rmtree(path)
+            removed_keys.append(key)
+        except Exception as e:
+            logger.warning(f"[cache] Failed to remove cache entry {key}: {e}")
+            failed += 1
+
+    get_cache_index(CACHE_DIR).remove(removed_keys)
+    removed = len(removed_keys)
     
     if removed > 0:
         logger.success(f"[cache] Cleared {removed} cache entries")
@@ -157,6 +172,154 @@ def clear_all_cache() -> Tuple[int, int]:
     return removed, failed
 
 
+def record_cache_entry(
+    cache_dir: Path,
+    size_bytes: int,
+    operation: str = "",
+    structure_hash: str = ""
+) -> None:
+    """
+    Add a freshly written cache entry to the cache index.
+
+    Args:
+        cache_dir: Path of the cache entry
+        size_bytes: Total size of the cached outputs
+        operation: Zeo++ operation, e.g. ``-sa``
+        structure_hash: sha256 of the structure content
+    """
+    try:
+        get_cache_index(cache_root_of(cache_dir)).record(cache_dir.name, operation, structure_hash, size_bytes)
+    except Exception as e:
+        logger.warning(f"[cache] Failed to index cache entry {cache_dir.name}: {e}")
+
+
+def touch_cache_entry(cache_dir: Path) -> None:
+    """
+    Record a cache hit in the cache index (last access time for LRU eviction).
+
+    Args:
+        cache_dir: Path of the cache entry
+    """
+    try:
+        get_cache_index(cache_root_of(cache_dir)).touch(cache_dir.name)
+    except Exception as e:
+        logger.warning(f"[cache] Failed to record cache hit for {cache_dir.name}: {e}")
+
+
+def _remove_cache_entry(key: str) -> bool:
+    """Delete one cache entry directory; True if it is gone afterwards."""
+    path = cache_entry_path(CACHE_DIR, key)
+    try:
+        if path.exists():
+            shutil.rmtree(path)
+        return True
+    except OSError as e:
+        logger.warning(f"[cache] Failed to remove cache entry {key}: {e}")
+        return False
+
+
+def evict_cache_entries(
+    max_age_hours: Optional[float] = None,
+    max_size_bytes: Optional[int] = None,
+    max_entries: Optional[int] = None
+) -> dict:
+    """
+    Expire old cache entries and evict least recently used ones over budget.
+
+    Staging directories abandoned by interrupted cache writes are removed as
+    well. Entries older than ``max_age_hours`` (by creation time) are removed
+    first. If the remaining entries still exceed ``max_size_bytes`` or
+    ``max_entries``, the least recently used ones are removed until both
+    budgets hold. Candidates come from the cache index, so a pass never
+    lists the cache directory. Limits left at None use the settings;
+    0 disables a limit.
+
+    Returns:
+        Dict with expired/evicted/failed counts and the remaining usage
+    """
+    if max_age_hours is None:
+        max_age_hours = settings.cache_max_age_hours
+    if max_size_bytes is None:
+        max_size_bytes = settings.cache_max_size_bytes
+    if max_entries is None:
+        max_entries = settings.cache_max_entries
+
+    expired = 0
+    evicted = 0
+    failed = 0
+    if not CACHE_DIR.exists():
+        return {
+            "expired": 0, "evicted": 0, "failed": 0,
+            "remaining_entries": 0, "remaining_size_mb": 0
+        }
+
+    index = get_cache_index(CACHE_DIR)
+    if max_age_hours > 0:
+        removed_keys = []
+        for key, _ in index.created_before(time.time() - max_age_hours * 3600):
+            if _remove_cache_entry(key):
+                removed_keys.append(key)
+            else:
+                failed += 1
+        index.remove(removed_keys)
+        result_memory_cache.discard(removed_keys)
+        expired = len(removed_keys)
+
+    count, total_size = index.totals()
+
+    def over_budget() -> bool:
+        return (max_size_bytes > 0 and total_size > max_size_bytes) or (0 < max_entries < count)
+
+    after = None
+    while over_budget():
+        batch = index.least_recently_used(EVICTION_BATCH_SIZE, after)
+        if not batch:
+            break
+        removed_keys = []
+        for key, size, last_hit in batch:
+            after = (last_hit, key)
+            if not over_budget():
+                break
+            if _remove_cache_entry(key):
+                removed_keys.append(key)
+                count -= 1
+                total_size -= size
+            else:
+                failed += 1
+        index.remove(removed_keys)
+        result_memory_cache.discard(removed_keys)
+        evicted += len(removed_keys)
+
+    stale_staging = cleanup_cache_staging(CACHE_DIR)
+    if stale_staging:
+        logger.info(f"[cache] Removed {stale_staging} abandoned staging directories")
+
+    if expired or evicted:
+        logger.success(f"[cache] Expired {expired} and evicted {evicted} cache entries")
+
+    return {
+        "expired": expired,
+        "evicted": evicted,
+        "failed": failed,
+        "remaining_entries": count,
+        "remaining_size_mb": round(total_size / (1024 * 1024), 2)
+    }
+
+
+async def run_cache_eviction_loop(interval_seconds: float) -> None:
+    """
+    Periodically run ``evict_cache_entries`` in a worker thread.
+
+    Started as a background task on application startup; cancel it to stop.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(evict_cache_entries)
+        except Exception as e:
+            logger.warning(f"[cache] Background eviction failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
 @contextmanager
 def auto_cleanup_temp(task_dir: Path):
     """
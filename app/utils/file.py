@@ -2,26 +2,69 @@
 # -*- coding: utf-8 -*-
 # Author: Shibo Li
 # Date: 2025-05-13
+# Updated: 2026-10-17 - Cache key hashes the content digest so stored structures skip re-hashing
+# Updated: 2026-10-17 - Uploads are streamed to disk in chunks with a size cap
+# Updated: 2026-10-17 - Canonical cache key independent of filenames and number formatting
+# Updated: 2026-10-17 - Two-level sharded cache layout
 
 import hashlib
+import json
+import shutil
 import uuid
+from decimal import Decimal, InvalidOperation
 from pathlib import Path
-from typing import List, Optional
+from typing import IO, List, Optional, Sequence, Tuple, Union
 
 from app.core.config import TMP_DIR, CACHE_DIR
+from app.core.exceptions import ZeoppFileTooLargeError
+from app.utils.cache_layout import cache_entry_path
 
+# Chunk size used when streaming uploads and hashing files
+COPY_CHUNK_SIZE = 1024 * 1024
 
-def save_uploaded_file(uploaded_file, prefix: str = "task") -> Path:
+# Bump when the layout of the cache key payload changes
+CACHE_KEY_VERSION = 2
+
+
+def save_uploaded_file(uploaded_file, prefix: str = "task", max_bytes: Optional[int] = None) -> Path:
     """
     Upload Files to temporary directory and return the file path
 
     Args:
         uploaded_file: UploadFile 
         prefix (str): optional, prefix for the task ID
+        max_bytes (int): optional, maximum allowed size of the upload
 
     Returns:
         Path: path to the saved file
     """
+    file_path, _ = save_uploaded_file_hashed(uploaded_file, prefix=prefix, max_bytes=max_bytes)
+    return file_path
+
+
+def save_uploaded_file_hashed(
+    uploaded_file,
+    prefix: str = "task",
+    max_bytes: Optional[int] = None
+) -> Tuple[Path, str]:
+    """
+    Stream an upload into a fresh task directory and hash it in the same pass
+
+    The upload is copied in fixed-size chunks, so memory use does not grow
+    with the file size. The task directory is removed again when the upload
+    exceeds ``max_bytes``.
+
+    Args:
+        uploaded_file: UploadFile
+        prefix (str): optional, prefix for the task ID
+        max_bytes (int): optional, maximum allowed size of the upload
+
+    Returns:
+        Tuple[Path, str]: path to the saved file and its sha256 hex digest
+
+    Raises:
+        ZeoppFileTooLargeError: If the upload is larger than ``max_bytes``.
+    """
     TMP_DIR.mkdir(parents=True, exist_ok=True)
     task_id = f"{prefix}_{uuid.uuid4().hex}"
     task_dir = TMP_DIR / task_id
@@ -34,32 +77,177 @@ def save_uploaded_file(uploaded_file, prefix: str = "task") -> Path:
         safe_filename = "structure.cif"
 
     file_path = task_dir / safe_filename
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.file.read())
+    try:
+        content_hash, _ = copy_stream_hashed(uploaded_file.file, file_path, max_bytes=max_bytes)
+    except ZeoppFileTooLargeError:
+        shutil.rmtree(task_dir, ignore_errors=True)
+        raise
 
-    return file_path
+    return file_path, content_hash
+
+
+def copy_stream_hashed(source: IO[bytes], dest_path: Path, max_bytes: Optional[int] = None) -> Tuple[str, int]:
+    """
+    Copy a binary stream to disk in fixed-size chunks while hashing it
+
+    Args:
+        source (IO[bytes]): readable binary stream
+        dest_path (Path): destination file path
+        max_bytes (int): optional, abort once more than this many bytes were read
+
+    Returns:
+        Tuple[str, int]: sha256 hex digest and number of bytes written
+
+    Raises:
+        ZeoppFileTooLargeError: If the stream is larger than ``max_bytes``;
+            the partially written file is removed.
+    """
+    m = hashlib.sha256()
+    size = 0
+    with open(dest_path, "wb") as f:
+        while True:
+            chunk = source.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if max_bytes is not None and size > max_bytes:
+                break
+            m.update(chunk)
+            f.write(chunk)
+
+    if max_bytes is not None and size > max_bytes:
+        dest_path.unlink(missing_ok=True)
+        raise ZeoppFileTooLargeError(
+            f"File too large. Maximum size: {max_bytes} bytes",
+            file_size=size,
+            max_size=max_bytes
+        )
+    return m.hexdigest(), size
+
+
+def hash_file(file_path: Path) -> str:
+    """
+    Return the sha256 hex digest of a file, reading it in chunks
+
+    Args:
+        file_path (Path): path to the file
+    Returns:
+        str: sha256 hex digest
+    """
+    m = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b""):
+            m.update(chunk)
+    return m.hexdigest()
+
+
+def _normalize_number(token: str) -> Optional[str]:
+    """Return a canonical spelling of a numeric token ("1.20" -> "1.2"), or None."""
+    try:
+        value = Decimal(token)
+    except (InvalidOperation, ValueError):
+        return None
+    if not value.is_finite():
+        return None
+    return format(value.normalize(), "f")
 
 
-def compute_cache_key(file_path: Path, args: List[str], extra: Optional[str] = None) -> str:
+def parse_zeo_args(args: Sequence[str]) -> Tuple[str, List[str], bool]:
+    """
+    Split a Zeo++ argument list into its cache-relevant parts
+
+    Flags make up the operation, numeric arguments are normalized and every
+    other token (the input filename and output filenames) is dropped.
+
+    Args:
+        args (Sequence[str]): Zeo++ arguments, e.g. ``["-ha", "-sa", "1.2", "1.2", "2000", "result.sa", "x.cif"]``
+
+    Returns:
+        Tuple[str, List[str], bool]: operation (e.g. ``"-sa"``), normalized
+        parameters and whether ``-ha`` was given
+    """
+    flags: List[str] = []
+    params: List[str] = []
+    ha = False
+    for token in args:
+        number = _normalize_number(token)
+        if number is not None:
+            params.append(number)
+        elif token == "-ha":
+            ha = True
+        elif token.startswith("-"):
+            flags.append(token)
+    return " ".join(flags), params, ha
+
+
+def build_cache_key(
+    content_hash: str,
+    operation: str,
+    params: Sequence[Union[int, float, str]] = (),
+    ha: bool = False,
+    variant: Optional[str] = None
+) -> str:
+    """
+    Build the canonical cache key of a Zeo++ computation
+
+    Only what determines the result is hashed: the structure content hash,
+    the operation, the normalized numeric parameters and the ``-ha`` flag.
+    Filenames are deliberately excluded so the same structure uploaded under
+    different names shares one cache entry.
+
+    Args:
+        content_hash (str): sha256 of the structure content
+        operation (str): Zeo++ flag(s), e.g. ``"-sa"``
+        params (Sequence): positional parameters following the flag
+        ha (bool): whether high accuracy mode is enabled
+        variant (str): optional, extra tag for results that must not share
+            an entry with the plain computation
+
+    Returns:
+        str: sha256 hex digest
+    """
+    normalized = []
+    for param in params:
+        number = _normalize_number(str(param))
+        normalized.append(number if number is not None else str(param))
+    payload = {
+        "version": CACHE_KEY_VERSION,
+        "content": content_hash,
+        "operation": operation,
+        "params": normalized,
+        "ha": bool(ha),
+    }
+    if variant:
+        payload["variant"] = variant
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def compute_cache_key(
+    file_path: Path,
+    args: List[str],
+    extra: Optional[str] = None,
+    content_hash: Optional[str] = None
+) -> str:
     """
     generate a cache key based on the file content and command arguments
     This key is used to check if the result is already cached.
 
+    The arguments are reduced to their canonical form (see
+    ``parse_zeo_args``) before hashing, so input/output filenames and the
+    spelling of numbers do not affect the key.
+
     Args:
         file_path (Path): path to the input file
         args (List[str]): parameters passed to the command of zeo++
-        extra (str): optional, extra identifier to distinguish different calls
+        extra (str): optional, variant tag folded into the key
+        content_hash (str): optional, precomputed sha256 of the file content
+            (e.g. a structure_id); the file is only read when it is missing
 
     Returns:
-        str: sha256 hash of the file content and command arguments
+        str: canonical cache key (see ``build_cache_key``)
     """
-    file_bytes = file_path.read_bytes()
-    m = hashlib.sha256()
-    m.update(file_bytes)
-    m.update(" ".join(args).encode())
-    if extra:
-        m.update(extra.encode())
-    return m.hexdigest()
+    operation, params, ha = parse_zeo_args(args)
+    return build_cache_key(content_hash or hash_file(file_path), operation, params, ha, variant=extra)
 
 
 def get_cache_path(cache_key: str) -> Path:
@@ -69,6 +257,6 @@ def get_cache_path(cache_key: str) -> Path:
     Args:
         cache_key (str): cache key generated by compute_cache_key
     Returns:
-        Path: workspace/cache/<hash> path
+        Path: workspace/cache/<hash[0:2]>/<hash[2:4]>/<hash> path
     """
-    return CACHE_DIR / cache_key
+    return cache_entry_path(CACHE_DIR, cache_key)
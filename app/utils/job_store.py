@@ -0,0 +1,415 @@
+# SQLite Store of Asynchronous Jobs
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-17
+# Updated: 2026-10-18 - Queued jobs are claimed shortest-predicted first, with aging
+# Updated: 2026-10-18 - Jobs of tenants over their CPU quota are claimed last
+# Updated: 2026-10-18 - Queued jobs past their deadline are failed
+# Updated: 2026-10-18 - Only the current claim of a job can finish it
+
+"""
+Persistent state of jobs submitted through ``/api/v1/jobs``.
+
+Jobs live in a small SQLite database in the workspace
+(``<workspace>/jobs/jobs.sqlite3``) shared by all workers. A job is queued
+on submission and claimed by whichever worker's dispatcher picks it up
+first; the claiming worker renews a lease (``heartbeat``) while the job
+runs. Jobs whose lease expired because their worker died are put back in
+the queue, so submitted work survives worker restarts and redeploys.
+
+Jobs that process many structures checkpoint every finished structure in
+``job_items``; a restarted job skips the structures recorded there.
+
+Jobs carry the runtime predicted at submission; the queue is served in
+order of ``created + predicted_seconds / aging_factor`` (see
+``app/core/scheduler.py``), jobs without a prediction by age.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set
+
+JOBS_DB_FILENAME = "jobs.sqlite3"
+
+# Job states; the last three are final
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINAL_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    spec TEXT NOT NULL,
+    structure_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT NOT NULL DEFAULT '',
+    message TEXT NOT NULL DEFAULT '',
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    heartbeat REAL,
+    owner TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    predicted_seconds REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    structure_id TEXT,
+    result TEXT,
+    finished REAL NOT NULL,
+    PRIMARY KEY (job_id, name)
+);
+"""
+
+_JSON_COLUMNS = ("spec", "result", "error")
+
+
+def worker_identity() -> str:
+    """Identifier of this worker process recorded as the owner of claimed jobs."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    for column in _JSON_COLUMNS:
+        if job[column] is not None:
+            job[column] = json.loads(job[column])
+    job["cancel_requested"] = bool(job["cancel_requested"])
+    return job
+
+
+class JobStore:
+    """SQLite-backed queue and state of asynchronous jobs."""
+
+    def __init__(self, jobs_dir: Path):
+        self.jobs_dir = jobs_dir
+        self.db_path = jobs_dir / JOBS_DB_FILENAME
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        if not self._initialized:
+            self._initialize()
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _initialize(self) -> None:
+        with self._init_lock:
+            if self._initialized:
+                return
+            self.jobs_dir.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+                if "predicted_seconds" not in columns:
+                    # Stores created before runtime predictions
+                    conn.execute("ALTER TABLE jobs ADD COLUMN predicted_seconds REAL")
+            finally:
+                conn.close()
+            self._initialized = True
+
+    def create(
+        self,
+        kind: str,
+        spec: Dict[str, Any],
+        structure_id: str,
+        predicted_seconds: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Queue a new job and return it."""
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, spec, structure_id, status, stage, created, predicted_seconds) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(spec), structure_id, QUEUED, QUEUED, time.time(), predicted_seconds),
+            )
+        job = self.get(job_id)
+        assert job is not None  # just inserted
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row is not None else None
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+        """Return jobs ordered by most recent submission."""
+        where, params = ("WHERE status = ?", [status]) if status else ("", [])
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM jobs {where} ORDER BY created DESC LIMIT ? OFFSET ?",
+                (*params, limit, offset),
+            ).fetchall()
+        return [_row_to_job(row) for row in rows]
+
+    def claim_next(
+        self,
+        owner: str,
+        aging_factor: float = 0.0,
+        deferred_tenants: Sequence[str] = (),
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Atomically move the next queued job to ``running`` for ``owner``.
+
+        With ``aging_factor > 0`` the job with the lowest
+        ``created + predicted_seconds / aging_factor`` is next, otherwise the oldest.
+        Jobs of ``deferred_tenants`` (``spec.tenant``) are only claimed when no
+        other job is queued.
+        """
+        now = time.time()
+        order, params = ("created", []) if aging_factor <= 0 else (
+            "created + COALESCE(predicted_seconds, 0) / ?", [aging_factor]
+        )
+        query = f"SELECT id FROM jobs WHERE status = ? {{}} ORDER BY {order}, created LIMIT 1"
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = None
+            if deferred_tenants:
+                placeholders = ", ".join("?" * len(deferred_tenants))
+                row = conn.execute(
+                    query.format(f"AND COALESCE(json_extract(spec, '$.tenant'), '') NOT IN ({placeholders})"),
+                    (QUEUED, *deferred_tenants, *params),
+                ).fetchone()
+            if row is None:
+                row = conn.execute(query.format(""), (QUEUED, *params)).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, owner = ?, started = ?, heartbeat = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (RUNNING, "starting", owner, now, now, row["id"]),
+            )
+        return self.get(row["id"])
+
+    def heartbeat(self, owner: str, progress: Dict[str, str]) -> Set[str]:
+        """
+        Renew the lease of the jobs ``owner`` is running and store their progress.
+
+        Args:
+            owner: Worker identity
+            progress: Latest progress message by job id
+
+        Returns:
+            Ids of those jobs whose cancellation was requested.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE jobs SET message = ? WHERE id = ? AND owner = ?",
+                [(message, job_id, owner) for job_id, message in progress.items()],
+            )
+            conn.execute(
+                "UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status = ?", (now, owner, RUNNING)
+            )
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE owner = ? AND status = ? AND cancel_requested = 1", (owner, RUNNING)
+            ).fetchall()
+        return {row["id"] for row in rows}
+
+    def set_stage(self, job_id: str, stage: str) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET stage = ? WHERE id = ?", (stage, job_id))
+
+    def finish(
+        self,
+        job_id: str,
+        owner: str,
+        attempt: int,
+        status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        """
+        Record the final state of a job that ``owner`` still runs under the
+        claim numbered ``attempt``.
+
+        A worker whose lease expired may still finish its run after the job
+        was re-queued, claimed again or cancelled; its result is not recorded.
+
+        Returns:
+            Whether the job was updated.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, finished = ?, heartbeat = NULL, result = ?, error = ? "
+                "WHERE id = ? AND owner = ? AND attempts = ? AND status = ?",
+                (
+                    status,
+                    status,
+                    time.time(),
+                    json.dumps(result) if result is not None else None,
+                    json.dumps(error) if error is not None else None,
+                    job_id,
+                    owner,
+                    attempt,
+                    RUNNING,
+                ),
+            )
+        return cursor.rowcount > 0
+
+    def request_cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancel a job: queued jobs are cancelled at once, running jobs are
+        flagged for their worker. Final jobs are left unchanged.
+
+        Returns:
+            The job after the update, or None if it does not exist.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, finished = ? WHERE id = ? AND status = ?",
+                (CANCELLED, CANCELLED, now, job_id, QUEUED),
+            )
+            conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING)
+            )
+        return self.get(job_id)
+
+    def record_item(
+        self,
+        job_id: str,
+        name: str,
+        status: str,
+        structure_id: Optional[str],
+        result: Dict[str, Any],
+    ) -> None:
+        """Checkpoint one finished structure of a job."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO job_items (job_id, name, status, structure_id, result, finished) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, name, status, structure_id, json.dumps(result), time.time()),
+            )
+
+    def completed_items(self, job_id: str) -> Set[str]:
+        """Names of the structures of a job that are already checkpointed."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT name FROM job_items WHERE job_id = ?", (job_id,)).fetchall()
+        return {row["name"] for row in rows}
+
+    def item_counts(self, job_id: str) -> Dict[str, int]:
+        """Number of checkpointed structures of a job by status, plus ``filtered`` (rejected by a pipeline)."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) AS n FROM job_items WHERE job_id = ? GROUP BY status", (job_id,)
+            ).fetchall()
+            filtered = conn.execute(
+                "SELECT COUNT(*) FROM job_items WHERE job_id = ? AND json_extract(result, '$.passed') = 0",
+                (job_id,),
+            ).fetchone()[0]
+        return {**{row["status"]: row["n"] for row in rows}, "filtered": filtered}
+
+    def list_items(
+        self,
+        job_id: str,
+        status: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """Return checkpointed structures of a job in the order they finished."""
+        where, params = ("AND status = ?", [status]) if status else ("", [])
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM job_items WHERE job_id = ? {where} ORDER BY finished, name LIMIT ? OFFSET ?",
+                (job_id, *params, limit, offset),
+            ).fetchall()
+        items = []
+        for row in rows:
+            item = dict(row)
+            item["result"] = json.loads(item["result"])
+            items.append(item)
+        return items
+
+    def delete(self, job_id: str) -> bool:
+        """Remove a finished job's record and checkpoints."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"DELETE FROM jobs WHERE id = ? AND status IN ({', '.join('?' * len(FINAL_STATES))})",
+                (job_id, *FINAL_STATES),
+            )
+            if cursor.rowcount:
+                conn.execute("DELETE FROM job_items WHERE job_id = ?", (job_id,))
+        return cursor.rowcount > 0
+
+    def release(self, owner: str) -> int:
+        """Put the running jobs of a worker that is shutting down back in the queue."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, owner = NULL, heartbeat = NULL "
+                "WHERE owner = ? AND status = ?",
+                (QUEUED, QUEUED, owner, RUNNING),
+            )
+        return cursor.rowcount
+
+    def requeue_expired(self, lease_seconds: float) -> int:
+        """Put running jobs whose worker stopped renewing the lease back in the queue."""
+        cutoff = time.time() - lease_seconds
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, owner = NULL, heartbeat = NULL "
+                "WHERE status = ? AND heartbeat < ?",
+                (QUEUED, QUEUED, RUNNING, cutoff),
+            )
+        return cursor.rowcount
+
+    def expire_overdue(self, error: Dict[str, Any]) -> int:
+        """Fail queued jobs whose deadline (``spec.deadline``) has passed, recording ``error``."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, finished = ?, error = ? "
+                "WHERE status = ? AND json_extract(spec, '$.deadline') < ?",
+                (FAILED, FAILED, now, json.dumps(error), QUEUED, now),
+            )
+        return cursor.rowcount
+
+    def purge_finished(self, max_age_hours: float) -> int:
+        """Delete final jobs that finished more than ``max_age_hours`` ago."""
+        cutoff = time.time() - max_age_hours * 3600
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINAL_STATES))}) AND finished < ?",
+                (*FINAL_STATES, cutoff),
+            )
+            if cursor.rowcount:
+                conn.execute("DELETE FROM job_items WHERE job_id NOT IN (SELECT id FROM jobs)")
+        return cursor.rowcount
+
+
+_stores: Dict[Path, JobStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_job_store(jobs_dir: Path) -> JobStore:
+    """Return the shared store of a jobs directory."""
+    with _stores_lock:
+        store = _stores.get(jobs_dir)
+        if store is None:
+            store = _stores[jobs_dir] = JobStore(jobs_dir)
+        return store
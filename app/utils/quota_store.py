@@ -0,0 +1,119 @@
+# SQLite Store of Per-Tenant CPU Quotas
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-18
+
+"""
+Token buckets of Zeo++ CPU-seconds, one per tenant.
+
+Each bucket holds up to ``capacity`` CPU-seconds and refills at ``rate``
+CPU-seconds per second; Zeo++ runs are charged after they finish and may
+drive a bucket below zero (debt), which the refill pays off. The buckets
+live in a small SQLite database in the workspace
+(``<workspace>/quotas/quotas.sqlite3``) and every charge is a single
+``BEGIN IMMEDIATE`` transaction, so all uvicorn workers and the MCP server
+share the same counters.
+"""
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+QUOTAS_DB_FILENAME = "quotas.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    tenant TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+
+def refill(tokens: float, elapsed: float, capacity: float, rate: float) -> float:
+    """Bucket level after ``elapsed`` seconds of refill at ``rate``, capped at ``capacity``."""
+    return min(capacity, tokens + max(elapsed, 0.0) * rate)
+
+
+class QuotaStore:
+    """SQLite-backed token buckets shared by all workers."""
+
+    def __init__(self, quotas_dir: Path):
+        self.quotas_dir = quotas_dir
+        self.db_path = quotas_dir / QUOTAS_DB_FILENAME
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        if not self._initialized:
+            self._initialize()
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _initialize(self) -> None:
+        with self._init_lock:
+            if self._initialized:
+                return
+            self.quotas_dir.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+            finally:
+                conn.close()
+            self._initialized = True
+
+    @staticmethod
+    def _level(row: Optional[sqlite3.Row], now: float, capacity: float, rate: float) -> float:
+        if row is None:
+            return capacity
+        return refill(row["tokens"], now - row["updated"], capacity, rate)
+
+    def peek(self, tenant: str, capacity: float, rate: float) -> float:
+        """Current level of a tenant's bucket; a new tenant starts with a full bucket."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE tenant = ?", (tenant,)).fetchone()
+        return self._level(row, time.time(), capacity, rate)
+
+    def charge(self, tenant: str, seconds: float, capacity: float, rate: float) -> float:
+        """Take ``seconds`` from a tenant's bucket after refilling it; returns the new level."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE tenant = ?", (tenant,)).fetchone()
+            tokens = self._level(row, now, capacity, rate) - seconds
+            conn.execute(
+                "INSERT INTO buckets (tenant, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(tenant) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (tenant, tokens, now),
+            )
+        return tokens
+
+    def exhausted(self, capacity: float, rate: float) -> List[str]:
+        """Tenants whose bucket is empty or in debt."""
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute("SELECT tenant, tokens, updated FROM buckets WHERE tokens <= 0").fetchall()
+        return [row["tenant"] for row in rows if self._level(row, now, capacity, rate) <= 0]
+
+
+_stores: Dict[Path, QuotaStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_quota_store(quotas_dir: Path) -> QuotaStore:
+    """Return the shared store of a quotas directory."""
+    with _stores_lock:
+        store = _stores.get(quotas_dir)
+        if store is None:
+            store = _stores[quotas_dir] = QuotaStore(quotas_dir)
+        return store
@@ -0,0 +1,79 @@
+# In-memory Cache of Parsed Results
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-17
+
+"""
+Per-process LRU of parsed and validated analysis results.
+
+Sits in front of the disk cache: a hit returns the response model built by a
+previous request for the same canonical cache key, skipping the entry read,
+the ``parse_*_from_text`` call and Pydantic validation. The LRU is bounded by
+the serialized size of the stored models (``RESULT_MEMORY_CACHE_MB``) and is
+invalidated when the disk cache is cleared or entries are evicted.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from app.core.config import settings
+
+
+class ParsedResultCache:
+    """Byte-bounded LRU of response models keyed by ``(cache_key, model)``."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[BaseModel, int]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, cache_key: str, model: Type[BaseModel]) -> Optional[BaseModel]:
+        """Return the stored result for ``cache_key`` parsed into ``model``, if any."""
+        with self._lock:
+            item = self._entries.get((cache_key, model.__name__))
+            if item is None:
+                return None
+            self._entries.move_to_end((cache_key, model.__name__))
+            return item[0]
+
+    def put(self, cache_key: str, result: BaseModel) -> None:
+        """Store a validated result; it is returned as-is on later hits."""
+        if self.max_bytes <= 0:
+            return
+        size = len(result.model_dump_json())
+        if size > self.max_bytes:
+            return
+        key = (cache_key, type(result).__name__)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+            self._entries[key] = (result, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+    def discard(self, cache_keys: Iterable[str]) -> None:
+        """Drop the results of evicted disk cache entries."""
+        keys = set(cache_keys)
+        if not keys:
+            return
+        with self._lock:
+            for key in [k for k in self._entries if k[0] in keys]:
+                self._size -= self._entries.pop(key)[1]
+
+    def clear(self) -> int:
+        """Drop everything; returns the number of results removed."""
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            self._size = 0
+            return removed
+
+
+result_memory_cache = ParsedResultCache(settings.result_memory_cache_bytes)
@@ -0,0 +1,119 @@
+# SQLite Store of Zeo++ Run Durations
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-18
+
+"""
+Observed durations of Zeo++ processes, the training data of the runtime model.
+
+Every finished single-operation run is recorded with its cost features
+(operation, atom count, cell volume, samples, ``-ha``) in a small SQLite
+database in the workspace (``<workspace>/runtimes/runtimes.sqlite3``), so all
+workers learn from each other's runs and the model survives restarts. Only
+the most recent ``RUNTIME_HISTORY_PER_OPERATION`` runs of each operation are
+kept.
+"""
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+RUNTIMES_DB_FILENAME = "runtimes.sqlite3"
+# Runs kept per operation; older ones are trimmed as new ones arrive
+RUNTIME_HISTORY_PER_OPERATION = 2000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    operation TEXT NOT NULL,
+    atoms REAL NOT NULL,
+    volume REAL NOT NULL,
+    samples REAL NOT NULL,
+    ha INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    recorded REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_operation ON runs (operation, id);
+"""
+
+_RUN_COLUMNS = ("atoms", "volume", "samples", "ha", "seconds")
+
+
+class RuntimeStore:
+    """SQLite-backed history of Zeo++ run durations."""
+
+    def __init__(self, runtimes_dir: Path):
+        self.runtimes_dir = runtimes_dir
+        self.db_path = runtimes_dir / RUNTIMES_DB_FILENAME
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        if not self._initialized:
+            self._initialize()
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _initialize(self) -> None:
+        with self._init_lock:
+            if self._initialized:
+                return
+            self.runtimes_dir.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+            finally:
+                conn.close()
+            self._initialized = True
+
+    def record(self, operation: str, atoms: float, volume: float, samples: float, ha: bool, seconds: float) -> None:
+        """Record one finished run and trim the history of its operation."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO runs (operation, atoms, volume, samples, ha, seconds, recorded) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (operation, atoms, volume, samples, int(ha), seconds, time.time()),
+            )
+            assert cursor.lastrowid is not None  # just inserted
+            conn.execute(
+                "DELETE FROM runs WHERE operation = ? AND id <= ?",
+                (operation, cursor.lastrowid - RUNTIME_HISTORY_PER_OPERATION),
+            )
+
+    def recent(self, operation: str, limit: int = 500) -> List[Dict[str, float]]:
+        """The latest runs of ``operation``, newest first."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(_RUN_COLUMNS)} FROM runs WHERE operation = ? ORDER BY id DESC LIMIT ?",
+                (operation, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        """Number of recorded runs by operation."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT operation, COUNT(*) AS n FROM runs GROUP BY operation").fetchall()
+        return {row["operation"]: row["n"] for row in rows}
+
+
+_stores: Dict[Path, RuntimeStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_runtime_store(runtimes_dir: Path) -> RuntimeStore:
+    """Return the shared store of a runtimes directory."""
+    with _stores_lock:
+        store = _stores.get(runtimes_dir)
+        if store is None:
+            store = _stores[runtimes_dir] = RuntimeStore(runtimes_dir)
+        return store
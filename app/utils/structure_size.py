@@ -0,0 +1,183 @@
+# Size of a Structure File
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-18
+
+"""
+Quick estimate of the atom count and unit cell volume of a structure file.
+
+Used as cost features of Zeo++ runs, so it only needs to be cheap and
+roughly right: CIF, CSSR, V1 and PDB files are read for their cell and atom
+records; for other formats (and unreadable files) every non-empty line is
+counted as an atom and the volume is unknown.
+"""
+
+import math
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Number of file identities whose size is remembered
+STRUCTURE_SIZE_CACHE_ENTRIES = 256
+
+
+@dataclass(frozen=True)
+class StructureSize:
+    """Atom count and unit cell volume (Å^3, None when unknown) of a structure."""
+    atoms: int
+    volume: Optional[float] = None
+
+
+def _number(token: str) -> Optional[float]:
+    """Parse a number, dropping a CIF standard uncertainty such as ``10.123(4)``."""
+    try:
+        return float(token.split("(")[0])
+    except ValueError:
+        return None
+
+
+def _numbers(tokens: List[str], count: int) -> Optional[List[float]]:
+    """The first ``count`` tokens as numbers, or None if any is missing or not a number."""
+    numbers = [value for value in (_number(token) for token in tokens[:count]) if value is not None]
+    return numbers if len(numbers) == count else None
+
+
+def cell_volume(a: float, b: float, c: float, alpha: float, beta: float, gamma: float) -> Optional[float]:
+    """Volume of a triclinic cell from its lengths and angles in degrees."""
+    cosines = [math.cos(math.radians(angle)) for angle in (alpha, beta, gamma)]
+    factor = 1 - sum(x * x for x in cosines) + 2 * cosines[0] * cosines[1] * cosines[2]
+    if factor <= 0:
+        return None
+    return a * b * c * math.sqrt(factor)
+
+
+def _cif_size(lines: List[str]) -> StructureSize:
+    cell: Dict[str, float] = {}
+    atoms = 0
+    headers: List[str] = []
+    in_atom_rows = False
+    for raw in lines:
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        lower = line.lower()
+        if lower.startswith("loop_"):
+            headers, in_atom_rows = [], False
+            continue
+        if line.startswith("_"):
+            if in_atom_rows:
+                headers, in_atom_rows = [], False
+            tokens = line.split()
+            key = tokens[0].lower()
+            if key.startswith("_cell_") and len(tokens) > 1:
+                value = _number(tokens[1])
+                if value is not None:
+                    cell[key] = value
+            headers.append(key)
+            continue
+        if lower.startswith("data_"):
+            headers, in_atom_rows = [], False
+            continue
+        if headers and any(h in ("_atom_site_fract_x", "_atom_site_cartn_x") for h in headers):
+            in_atom_rows = True
+            atoms += 1
+
+    volume = cell.get("_cell_volume")
+    a, b, c = (cell.get(f"_cell_length_{axis}") for axis in "abc")
+    angles = [cell.get(f"_cell_angle_{name}", 90.0) for name in ("alpha", "beta", "gamma")]
+    if volume is None and a and b and c:
+        volume = cell_volume(a, b, c, *angles)
+    return StructureSize(atoms, volume)
+
+
+def _cssr_size(lines: List[str]) -> Optional[StructureSize]:
+    if len(lines) < 3:
+        return None
+    lengths = _numbers(lines[0].split(), 3)
+    angles = _numbers(lines[1].split(), 3)
+    count = _number(lines[2].split()[0]) if lines[2].split() else None
+    if count is None:
+        return None
+    volume = cell_volume(*lengths, *angles) if lengths is not None and angles is not None else None
+    return StructureSize(int(count), volume)
+
+
+def _v1_size(lines: List[str]) -> Optional[StructureSize]:
+    vectors = []
+    for line in lines[1:4]:
+        values = _numbers(line.split("=")[-1].split(), 3)
+        if values is None:
+            return None
+        vectors.append(values)
+    (ax, ay, az), (bx, by, bz), (cx, cy, cz) = vectors
+    volume = abs(ax * (by * cz - bz * cy) - ay * (bx * cz - bz * cx) + az * (bx * cy - by * cx))
+    count = _number(lines[4].split()[0]) if len(lines) > 4 and lines[4].split() else None
+    if count is None:
+        return None
+    return StructureSize(int(count), volume or None)
+
+
+def _pdb_size(lines: List[str]) -> StructureSize:
+    atoms = 0
+    volume = None
+    for line in lines:
+        if line.startswith(("ATOM", "HETATM")):
+            atoms += 1
+        elif line.startswith("CRYST1"):
+            values = _numbers(line.split()[1:7], 6)
+            if values is not None:
+                volume = cell_volume(*values)
+    return StructureSize(atoms, volume)
+
+
+def _read_size(path: Path) -> StructureSize:
+    lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
+    suffix = path.suffix.lower()
+    size: Optional[StructureSize] = None
+    if suffix == ".cif":
+        size = _cif_size(lines)
+    elif suffix == ".cssr":
+        size = _cssr_size(lines)
+    elif suffix == ".v1":
+        size = _v1_size(lines)
+    elif suffix == ".pdb":
+        size = _pdb_size(lines)
+    if size is None or size.atoms <= 0:
+        size = StructureSize(sum(1 for line in lines if line.strip()), size.volume if size else None)
+    return size
+
+
+_sizes: "OrderedDict[Tuple[int, int, int, int], StructureSize]" = OrderedDict()
+_sizes_lock = threading.Lock()
+
+
+def structure_size(path: Path) -> StructureSize:
+    """
+    Atom count and cell volume of a structure file.
+
+    Results are remembered by file identity (device, inode, size, mtime), so
+    the hard-linked copies the runner gives every Zeo++ run are read once.
+    Unreadable files count as one atom of unknown volume.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return StructureSize(1)
+    identity = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    with _sizes_lock:
+        size = _sizes.get(identity)
+        if size is not None:
+            _sizes.move_to_end(identity)
+            return size
+    try:
+        size = _read_size(path)
+    except OSError:
+        return StructureSize(1)
+    with _sizes_lock:
+        _sizes[identity] = size
+        while len(_sizes) > STRUCTURE_SIZE_CACHE_ENTRIES:
+            _sizes.popitem(last=False)
+    return size
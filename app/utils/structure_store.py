@@ -0,0 +1,159 @@
+# Content-addressed Structure Store
+# -*- coding: utf-8 -*-
+# Author: Shibo Li
+# Date: 2026-10-17
+
+"""
+Upload-once / analyze-many storage for structure files.
+
+Structures are stored under ``workspace/structures/<sha256>/`` together with
+a small ``meta.json``. The SHA-256 of the content is the ``structure_id`` and
+doubles as the content hash of the cache key, so analyses of a stored
+structure never re-read or re-hash it.
+"""
+
+import json
+import os
+import re
+import shutil
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO, Optional
+
+from app.core.config import STRUCTURES_DIR, TMP_DIR
+from app.core.exceptions import ZeoppStructureNotFoundError
+from app.utils.file import copy_stream_hashed
+from app.utils.logger import logger
+
+_STRUCTURE_ID_RE = re.compile(r"^[0-9a-f]{64}$")
+_META_FILE = "meta.json"
+
+
+@dataclass
+class StoredStructure:
+    structure_id: str
+    filename: str
+    size_bytes: int
+    created: str
+
+    @property
+    def path(self) -> Path:
+        return STRUCTURES_DIR / self.structure_id / self.filename
+
+
+def _sanitize_filename(filename: Optional[str]) -> str:
+    safe = Path(filename or "").name.replace("\\", "_").replace("/", "_").strip()
+    return safe or "structure.cif"
+
+
+def store_structure(
+    source: IO[bytes],
+    filename: Optional[str],
+    max_bytes: Optional[int] = None
+) -> StoredStructure:
+    """
+    Stream a structure into the store and return its metadata.
+
+    The content is written to a staging directory while being hashed and
+    then published with an atomic rename. Storing content that already
+    exists is a no-op that returns the existing entry (and its original
+    filename).
+
+    Args:
+        source: Readable binary stream with the structure content.
+        filename: Original filename, used for the stored copy.
+        max_bytes: Optional size limit; larger content is rejected.
+
+    Returns:
+        StoredStructure: Metadata of the stored structure.
+
+    Raises:
+        ZeoppFileTooLargeError: If the content is larger than ``max_bytes``.
+    """
+    safe_filename = _sanitize_filename(filename)
+    incoming_root = STRUCTURES_DIR / ".incoming"
+    incoming_root.mkdir(parents=True, exist_ok=True)
+    staging_dir = incoming_root / uuid.uuid4().hex
+    staging_dir.mkdir()
+
+    try:
+        structure_id, size = copy_stream_hashed(
+            source, staging_dir / safe_filename, max_bytes=max_bytes
+        )
+        target_dir = STRUCTURES_DIR / structure_id
+        if (target_dir / _META_FILE).exists():
+            logger.info(f"[store] Structure already stored: {structure_id}")
+            return get_structure(structure_id)
+
+        stored = StoredStructure(
+            structure_id=structure_id,
+            filename=safe_filename,
+            size_bytes=size,
+            created=datetime.now(timezone.utc).isoformat(),
+        )
+        (staging_dir / _META_FILE).write_text(json.dumps(asdict(stored)), encoding="utf-8")
+        try:
+            os.rename(staging_dir, target_dir)
+        except OSError:
+            # A concurrent upload of the same content published first.
+            return get_structure(structure_id)
+
+        logger.info(f"[store] Stored structure {structure_id} ({size} bytes)")
+        return stored
+    finally:
+        if staging_dir.exists():
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def get_structure(structure_id: str) -> StoredStructure:
+    """
+    Return metadata of a stored structure.
+
+    Raises:
+        ZeoppStructureNotFoundError: If the id is malformed or unknown.
+    """
+    if not _STRUCTURE_ID_RE.match(structure_id or ""):
+        raise ZeoppStructureNotFoundError(f"Invalid structure_id: {structure_id!r}", structure_id=structure_id)
+    meta_path = STRUCTURES_DIR / structure_id / _META_FILE
+    if not meta_path.exists():
+        raise ZeoppStructureNotFoundError(f"Structure not found: {structure_id}", structure_id=structure_id)
+    return StoredStructure(**json.loads(meta_path.read_text(encoding="utf-8")))
+
+
+def materialize_structure(structure_id: str, prefix: str = "task") -> Path:
+    """
+    Expose a stored structure inside a fresh task directory.
+
+    Zeo++ writes its outputs next to the input file, so every run still needs
+    its own directory; the structure is hard-linked into it (copied only when
+    linking is not supported), which avoids rewriting the content.
+
+    Returns:
+        Path: Path of the structure inside the new task directory.
+
+    Raises:
+        ZeoppStructureNotFoundError: If the structure does not exist.
+    """
+    stored = get_structure(structure_id)
+    TMP_DIR.mkdir(parents=True, exist_ok=True)
+    task_dir = TMP_DIR / f"{prefix}_{uuid.uuid4().hex}"
+    task_dir.mkdir(parents=True)
+    target = task_dir / stored.filename
+    try:
+        os.link(stored.path, target)
+    except OSError:
+        shutil.copyfile(stored.path, target)
+    return target
+
+
+def delete_structure(structure_id: str) -> bool:
+    """Remove a stored structure. Returns False if it did not exist."""
+    try:
+        get_structure(structure_id)
+    except ZeoppStructureNotFoundError:
+        return False
+    shutil.rmtree(STRUCTURES_DIR / structure_id, ignore_errors=True)
+    logger.info(f"[store] Deleted structure {structure_id}")
+    return True
@@ -7,6 +7,7 @@ Exercises every analysis whose parser was rewritten to confirm:
 """
 from __future__ import annotations
 
+import asyncio
 import json
 import shutil
 from pathlib import Path
@@ -23,20 +24,20 @@ CIF = Path("examples/sample_structures/HKUST-1.cif").resolve()
 
 def run(args: list[str], outputs: list[str], tag: str) -> dict:
     with TemporaryDirectory() as tmp:
-        wd = Path(tmp)
+        # The runner works in a sibling of the task directory, so keep both in tmp.
+        wd = Path(tmp) / "task"
+        wd.mkdir()
         shutil.copy(CIF, wd / CIF.name)
-        # Ensure runner writes into our scratch dir by overriding the
-        # workspace lookup: easiest is to call _run_with_sh directly.
         zeo_args = list(args) + [CIF.name]
-        ok, code, out, err = runner._run_with_sh(zeo_args, wd)  # noqa: SLF001
-        result = {"ok": ok, "code": code, "tag": tag, "outputs": {}}
-        for name in outputs:
-            p = wd / name
-            if p.exists():
-                result["outputs"][name] = p.read_text()
+        # skip_cache: always run the real binary, even when the result is cached
+        run_result = asyncio.run(
+            runner.run_command_async(wd / CIF.name, zeo_args, outputs, skip_cache=True)
+        )
+        ok = run_result["success"]
+        result = {"ok": ok, "code": run_result["exit_code"], "tag": tag, "outputs": run_result["output_data"]}
         if not ok:
-            result["stderr"] = err
-            result["stdout"] = out
+            result["stderr"] = run_result["stderr"]
+            result["stdout"] = run_result["stdout"]
         return result
 
 
@@ -8,6 +8,15 @@ from fastapi.testclient import TestClient
 from httpx import AsyncClient
 
 from app.main import app
+from app.utils.result_cache import result_memory_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_result_memory_cache():
+    """Keep parsed results cached in memory from leaking between tests."""
+    result_memory_cache.clear()
+    yield
+    result_memory_cache.clear()
 
 
 @pytest.fixture
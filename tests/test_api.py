@@ -1,7 +1,29 @@
 # API Integration Tests (Windows-friendly, no Zeo++ binary required)
 # -*- coding: utf-8 -*-
 
+import hashlib
+import io
+import json
+import zipfile
+
+import pytest
+
+import app.api.cache as cache_api
+import app.core.admission as admission
+import app.core.handler as handler_module
+import app.core.quota as quota
+import app.utils.cleanup as cleanup_utils
+import app.utils.file as file_utils
+import app.utils.structure_store as store_utils
 from app.core.config import settings
+from app.core.deadlines import DEADLINE_EXIT_CODE, remaining_seconds
+from app.core.jobs import job_dispatcher
+from app.core.runner import ZeoRunner
+from app.core.scheduler import runtime_model
+from app.utils.cache_index import get_cache_index
+from app.utils.job_store import JobStore
+from app.utils.quota_store import QuotaStore
+from app.utils.runtime_store import RuntimeStore
 
 
 class TestSystemEndpoints:
@@ -29,6 +51,9 @@ class TestSystemEndpoints:
         assert data["api_version"] == "v1"
         assert isinstance(data["zeopp_available"], bool)
         assert "uptime_seconds" in data
+        assert data["zeopp_process_slots"] >= 1
+        assert set(data["zeopp_lanes"]) == {"fast", "slow"}
+        assert data["zeopp_lanes"]["fast"]["queue_depth"] == settings.fast_lane_queue_depth
 
     def test_version_endpoint(self, client):
         response = client.get("/version")
@@ -78,6 +103,30 @@ class TestCacheEndpoints:
         response = client.post("/api/v1/cache/cleanup?max_age_hours=0")
         assert response.status_code == 422
 
+    def test_cache_evict(self, client, monkeypatch, tmp_path):
+        monkeypatch.setattr(cleanup_utils, "CACHE_DIR", tmp_path / "cache")
+        response = client.post("/api/v1/cache/evict?max_entries=10")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["success"] is True
+        assert data["expired"] == 0
+        assert data["evicted"] == 0
+
+    def test_cache_entries(self, client, monkeypatch, tmp_path):
+        cache_root = tmp_path / "cache"
+        monkeypatch.setattr(cache_api, "CACHE_DIR", cache_root)
+        get_cache_index(cache_root).record("k1", "-sa", "a" * 64, 42)
+
+        response = client.get("/api/v1/cache/entries?operation=-sa")
+        assert response.status_code == 200
+        entries = response.json()["entries"]
+        assert [e["key"] for e in entries] == ["k1"]
+        assert entries[0]["size_bytes"] == 42
+
+    def test_cache_evict_invalid_limits(self, client):
+        response = client.post("/api/v1/cache/evict?max_entries=-1")
+        assert response.status_code == 422
+
     def test_cache_clear(self, client):
         response = client.delete("/api/v1/cache/clear")
         assert response.status_code == 200
@@ -87,6 +136,481 @@ class TestCacheEndpoints:
         assert "entries_failed" in data
 
 
+    def test_memory_cache_serves_hits_until_cleared(self, client, monkeypatch, tmp_path):
+        monkeypatch.setattr(file_utils, "CACHE_DIR", tmp_path / "cache")
+        monkeypatch.setattr(cleanup_utils, "CACHE_DIR", tmp_path / "cache")
+        reads = []
+        original_cached_result = ZeoRunner._cached_result
+
+        async def fake_execute(self, zeo_args, cwd, on_output=None):
+            (cwd / "result.res").write_text("input.cif 4.9 3.0 4.9\n", encoding="utf-8")
+            return True, 0, "", ""
+
+        def counting_cached_result(cache_dir, output_files=None):
+            reads.append(cache_dir)
+            return original_cached_result(cache_dir, output_files)
+
+        monkeypatch.setattr(ZeoRunner, "_execute_async", fake_execute)
+        monkeypatch.setattr(ZeoRunner, "_cached_result", staticmethod(counting_cached_result))
+        files = {"structure_file": ("memo.cif", b"data_memory_cache", "text/plain")}
+
+        first = client.post("/api/v1/pore_diameter", files=files)
+        disk_reads = len(reads)
+        second = client.post("/api/v1/pore_diameter", files=files)
+        assert first.json()["cached"] is False
+        assert second.json()["cached"] is True
+        assert second.json()["included_diameter"] == 4.9
+        assert len(reads) == disk_reads  # served without touching the disk cache
+
+        client.delete("/api/v1/cache/clear")
+        third = client.post("/api/v1/pore_diameter", files=files)
+        assert third.json()["cached"] is False
+
+
+class TestJobEndpoints:
+    def test_submit_poll_and_cancel_job(self, client, monkeypatch, tmp_path):
+        monkeypatch.setattr(store_utils, "STRUCTURES_DIR", tmp_path / "structures")
+        monkeypatch.setattr(job_dispatcher, "store", JobStore(tmp_path / "jobs"))
+        files = {"structure_file": ("test.cif", b"data_job", "text/plain")}
+
+        response = client.post("/api/v1/jobs", files=files, data={"analyses": "channel_analysis"})
+        assert response.status_code == 202
+        location = response.headers["location"]
+        assert location == f"/api/v1/jobs/{response.json()['job_id']}"
+
+        job = client.get(location).json()
+        assert job["status"] == "queued"
+        assert job["kind"] == "analysis"
+        assert job["analyses"] == [{"analysis": "channel_analysis", "params": {"probe_radius": 1.21}}]
+
+        assert client.delete(location).json()["status"] == "cancelled"
+        assert client.delete(location).status_code == 200  # finished jobs are removed
+        assert client.get(location).status_code == 404
+
+    def test_prefer_respond_async_queues_job(self, client, monkeypatch, tmp_path):
+        monkeypatch.setattr(store_utils, "STRUCTURES_DIR", tmp_path / "structures")
+        monkeypatch.setattr(job_dispatcher, "store", JobStore(tmp_path / "jobs"))
+        files = {"structure_file": ("test.cif", b"data_job", "text/plain")}
+
+        response = client.post(
+            "/api/v1/surface_area",
+            files=files,
+            data={"probe_radius": "1.5", "chan_radius": "1.5", "ha": "false"},
+            headers={"Prefer": "respond-async"},
+        )
+
+        assert response.status_code == 202
+        assert response.headers["preference-applied"] == "respond-async"
+        job = response.json()
+        assert job["ha"] is False
+        assert job["analyses"][0]["params"] == {"chan_radius": 1.5, "probe_radius": 1.5, "samples": 2000}
+
+    def test_directory_job_requires_allowed_path(self, client, monkeypatch, tmp_path):
+        monkeypatch.setattr(job_dispatcher, "store", JobStore(tmp_path / "jobs"))
+        monkeypatch.setattr(settings, "mcp_allowed_path_roots", str(tmp_path / "shared"))
+        (tmp_path / "shared" / "mofs").mkdir(parents=True)
+        data = {"analyses": '["pore_diameter"]'}
+
+        response = client.post("/api/v1/jobs/directory", data={**data, "path": str(tmp_path)})
+        assert response.status_code == 422
+
+        response = client.post("/api/v1/jobs/directory", data={**data, "path": str(tmp_path / "shared" / "mofs")})
+        assert response.status_code == 202
+        job = response.json()
+        assert job["kind"] == "directory"
+        assert job["path"] == str(tmp_path / "shared" / "mofs")
+        assert job["structure_id"] is None
+        assert client.get(f"/api/v1/jobs/{job['job_id']}/items").json() == []
+
+    def test_invalid_job_analysis(self, client, monkeypatch, tmp_path):
+        monkeypatch.setattr(store_utils, "STRUCTURES_DIR", tmp_path / "structures")
+        monkeypatch.setattr(job_dispatcher, "store", JobStore(tmp_path / "jobs"))
+        files = {"structure_file": ("test.cif", b"data_job", "text/plain")}
+        response = client.post("/api/v1/jobs", files=files, data={"analyses": "nonexistent"})
+        assert response.status_code == 422
+
+
+class TestBatchEndpoints:
+    @staticmethod
+    def _lines(response):
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    def test_archive_batch_streams_ndjson(self, client, monkeypatch, tmp_path):
+        monkeypatch.setattr(file_utils, "CACHE_DIR", tmp_path / "cache")
+        monkeypatch.setattr(store_utils, "STRUCTURES_DIR", tmp_path / "structures")
+        monkeypatch.setattr(store_utils, "TMP_DIR", tmp_path / "tmp")
+
+        async def fake_execute(self, zeo_args, cwd, on_output=None):
+            (cwd / "result.res").write_text("input.cif 4.9 3.0 4.9\n", encoding="utf-8")
+            return True, 0, "", ""
+
+        monkeypatch.setattr(ZeoRunner, "_execute_async", fake_execute)
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            archive.writestr("mofs/a.cif", "data_a")
+            archive.writestr("mofs/b.cif", "data_b")
+            archive.writestr("mofs/README.txt", "not a structure")
+            archive.writestr("__MACOSX/mofs/._a.cif", "resource fork")
+
+        response = client.post(
+            "/api/v1/batch",
+            files={"archive": ("mofs.zip", buffer.getvalue(), "application/zip")},
+            data={"analyses": '["pore_diameter"]'},
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = self._lines(response)
+        results = sorted(lines[:-1], key=lambda line: line["index"])
+        assert [line["name"] for line in results] == ["mofs/a.cif", "mofs/b.cif"]
+        assert all(line["status"] == "succeeded" for line in results)
+        assert results[0]["results"]["pore_diameter"]["included_diameter"] == 4.9
+        assert lines[-1] == {"type": "summary", "total": 2, "succeeded": 2, "failed": 0, "filtered": 0}
+        assert store_utils.get_structure(results[0]["structure_id"]).filename == "a.cif"
+
+    def test_pipeline_batch_filters_structures(self, client, monkeypatch, tmp_path):
+        monkeypatch.setattr(file_utils, "CACHE_DIR", tmp_path / "cache")
+        monkeypatch.setattr(store_utils, "STRUCTURES_DIR", tmp_path / "structures")
+        monkeypatch.setattr(store_utils, "TMP_DIR", tmp_path / "tmp")
+
+        async def fake_execute(self, zeo_args, cwd, on_output=None):
+            free = "4.0" if "wide" in (cwd / zeo_args[-1]).read_text() else "2.0"
+            (cwd / "result.res").write_text(f"input.cif 4.9 {free} 4.9\n", encoding="utf-8")
+            (cwd / "result.chan").write_text("input.chan 1 channels identified of dimensionality 1\n", encoding="utf-8")
+            return True, 0, "", ""
+
+        monkeypatch.setattr(ZeoRunner, "_execute_async", fake_execute)
+        ids = [
+            client.post("/api/v1/structures", files={"structure_file": (f"{name}.cif", f"data_{name}", "text/plain")})
+            .json()["structure_id"]
+            for name in ("wide", "narrow")
+        ]
+        condition = {"field": "pore_diameter.free_diameter", "op": ">=", "value": 3}
+        pipeline = [{"analyses": ["pore_diameter"], "require": [condition]}, {"analyses": ["channel_analysis"]}]
+
+        response = client.post(
+            "/api/v1/batch", data={"structure_ids": json.dumps(ids), "pipeline": json.dumps(pipeline)}
+        )
+
+        lines = {line.get("structure_id"): line for line in self._lines(response)}
+        assert lines[ids[0]]["passed"] is True
+        assert lines[ids[0]]["stages_run"] == 2
+        assert lines[ids[1]]["passed"] is False
+        assert lines[ids[1]]["rejected_by"] == "pore_diameter.free_diameter >= 3"
+        assert "channel_analysis" not in lines[ids[1]]["results"]
+        assert lines[None]["filtered"] == 1
+
+    def test_structure_id_batch_reports_missing_structures(self, client, monkeypatch, tmp_path):
+        monkeypatch.setattr(store_utils, "STRUCTURES_DIR", tmp_path / "structures")
+        response = client.post(
+            "/api/v1/batch",
+            data={"structure_ids": json.dumps(["0" * 64]), "analyses": '["pore_diameter"]'},
+        )
+
+        lines = self._lines(response)
+        assert lines[0]["status"] == "failed"
+        assert lines[0]["error"]["error_code"] == "ZEOPP_3004"
+        assert lines[-1]["failed"] == 1
+
+    def test_batch_rejects_non_archives(self, client, monkeypatch, tmp_path):
+        monkeypatch.setattr(file_utils, "TMP_DIR", tmp_path / "tmp")
+        response = client.post(
+            "/api/v1/batch",
+            files={"archive": ("a.cif", b"data_a", "text/plain")},
+            data={"analyses": '["pore_diameter"]'},
+        )
+        assert response.status_code == 422
+
+
+class TestSweepEndpoints:
+    def test_sweep_returns_columns_and_shares_cache(self, client, monkeypatch, tmp_path):
+        monkeypatch.setattr(file_utils, "CACHE_DIR", tmp_path / "cache")
+        monkeypatch.setattr(file_utils, "TMP_DIR", tmp_path / "tmp")
+        calls = []
+
+        async def fake_execute(self, zeo_args, cwd, on_output=None):
+            calls.append(zeo_args)
+            if float(zeo_args[-4]) > 2.0:
+                return False, 1, "", "probe too large"
+            asa_mass = round(1000 / float(zeo_args[-4]), 2)
+            (cwd / "result.sa").write_text(
+                f"@ input.sa Unitcell_volume: 307.484 Density: 1.62239 ASA_A^2: 60.7 ASA_m^2/cm^3: 1976.4 "
+                f"ASA_m^2/g: {asa_mass} NASA_A^2: 0 NASA_m^2/cm^3: 0 NASA_m^2/g: 0\n",
+                encoding="utf-8",
+            )
+            return True, 0, "", ""
+
+        monkeypatch.setattr(ZeoRunner, "_execute_async", fake_execute)
+        response = client.post(
+            "/api/v1/sweep",
+            files={"structure_file": ("a.cif", b"data_a", "text/plain")},
+            data={"analysis": "surface_area", "radius_start": "1.0", "radius_stop": "2.5", "radius_step": "0.5"},
+        )
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["probe_radii"] == [1.0, 1.5, 2.0, 2.5]
+        assert body["params"] == {"samples": 2000}
+        assert body["metrics"]["asa_mass"] == [1000.0, 666.67, 500.0, None]
+        assert "probe_radius" not in body["metrics"]
+        assert body["errors"][:3] == [None, None, None]
+        assert body["errors"][3]["exit_code"] == 1
+        assert body["zeo_invocations"] == 4
+
+        single = client.post(
+            "/api/v1/surface_area",
+            files={"structure_file": ("a.cif", b"data_a", "text/plain")},
+            data={"probe_radius": "1.5", "chan_radius": "1.5"},
+        )
+        assert single.json()["cached"] is True
+        assert single.json()["asa_mass"] == 666.67
+        assert len(calls) == 4
+
+    def test_sweep_rejects_invalid_requests(self, client):
+        for data in (
+            {"analysis": "pore_diameter", "radii": "[1.2]"},
+            {"analysis": "surface_area"},
+            {"analysis": "surface_area", "radii": "1.2"},
+        ):
+            response = client.post(
+                "/api/v1/sweep", files={"structure_file": ("a.cif", b"data_a", "text/plain")}, data=data
+            )
+            assert response.status_code == 422
+
+
+class TestRuntimePrediction:
+    def test_prediction_in_header_and_job(self, client, monkeypatch, tmp_path):
+        monkeypatch.setattr(file_utils, "CACHE_DIR", tmp_path / "cache")
+        monkeypatch.setattr(file_utils, "TMP_DIR", tmp_path / "tmp")
+        monkeypatch.setattr(store_utils, "STRUCTURES_DIR", tmp_path / "structures")
+        monkeypatch.setattr(job_dispatcher, "store", JobStore(tmp_path / "jobs"))
+        monkeypatch.setattr(runtime_model, "store", RuntimeStore(tmp_path / "runtimes"))
+        monkeypatch.setattr(runtime_model, "_coefficients", {})
+
+        async def fake_execute(self, zeo_args, cwd, on_output=None):
+            (cwd / "result.res").write_text("a.cif 4.9 3.0 4.9\n", encoding="utf-8")
+            return True, 0, "", ""
+
+        monkeypatch.setattr(ZeoRunner, "_execute_async", fake_execute)
+        files = {"structure_file": ("a.cif", b"data_a", "text/plain")}
+        response = client.post("/api/v1/pore_diameter", files=files)
+        assert response.status_code == 200
+        assert float(response.headers["x-predicted-runtime"].rstrip("s")) > 0
+
+        response = client.post(
+            "/api/v1/open_metal_sites", files=files, headers={"Prefer": "respond-async"}
+        )
+        assert response.status_code == 202
+        assert response.json()["predicted_seconds"] > 0
+
+
+class TestExecutionLanes:
+    def test_full_lane_answers_503(self, client, monkeypatch, tmp_path):
+        monkeypatch.setattr(file_utils, "CACHE_DIR", tmp_path / "cache")
+        monkeypatch.setattr(file_utils, "TMP_DIR", tmp_path / "tmp")
+
+        async def fake_execute(self, zeo_args, cwd, on_output=None):
+            return False, 75, "", "The fast execution lane is full: 64 runs are already queued"
+
+        monkeypatch.setattr(ZeoRunner, "_execute_async", fake_execute)
+        response = client.post(
+            "/api/v1/pore_diameter", files={"structure_file": ("a.cif", b"data_a", "text/plain")}
+        )
+        assert response.status_code == 503
+        assert "lane is full" in response.json()["detail"]["stderr"]
+
+    def test_psd_download_maps_failures_like_other_analyses(self, client, monkeypatch, tmp_path):
+        monkeypatch.setattr(file_utils, "CACHE_DIR", tmp_path / "cache")
+        monkeypatch.setattr(file_utils, "TMP_DIR", tmp_path / "tmp")
+        exit_codes = iter([75, 124])
+
+        async def fake_execute(self, zeo_args, cwd, on_output=None):
+            return False, next(exit_codes), "", ""
+
+        monkeypatch.setattr(ZeoRunner, "_execute_async", fake_execute)
+        files = {"structure_file": ("a.cif", b"data_a", "text/plain")}
+        response = client.post("/api/v1/pore_size_dist/download", files=files)
+        assert response.status_code == 503
+        assert int(response.headers["retry-after"]) >= 1
+
+        response = client.post("/api/v1/pore_size_dist/download", files=files)
+        assert response.status_code == 504
+
+
+class TestAdmissionControl:
+    def test_tenant_backlog_answers_429_with_retry_after(self, client, monkeypatch, tmp_path):
+        monkeypatch.setattr(file_utils, "CACHE_DIR", tmp_path / "cache")
+        monkeypatch.setattr(file_utils, "TMP_DIR", tmp_path / "tmp")
+        monkeypatch.setattr(settings, "admission_tenant_max_seconds", 10.0)
+        monkeypatch.setattr(admission.tenant_ledger, "_outstanding", {"ip:testclient": 60.0})
+
+        async def fake_execute(self, zeo_args, cwd, on_output=None):
+            raise AssertionError("rejected requests must not run Zeo++")
+
+        monkeypatch.setattr(ZeoRunner, "_execute_async", fake_execute)
+        response = client.post(
+            "/api/v1/pore_diameter", files={"structure_file": ("a.cif", b"data_a", "text/plain")}
+        )
+        assert response.status_code == 429
+        assert int(response.headers["retry-after"]) >= 1
+        assert response.json()["detail"]["retry_after_seconds"] == int(response.headers["retry-after"])
+        assert not list((tmp_path / "tmp").iterdir())
+
+    def test_unpublished_cache_entry_is_not_a_hit(self, client, monkeypatch, tmp_path):
+        monkeypatch.setattr(file_utils, "CACHE_DIR", tmp_path / "cache")
+        monkeypatch.setattr(file_utils, "TMP_DIR", tmp_path / "tmp")
+        monkeypatch.setattr(settings, "admission_tenant_max_seconds", 10.0)
+        monkeypatch.setattr(admission.tenant_ledger, "_outstanding", {"ip:testclient": 60.0})
+        # Every entry directory exists, as while another run is still writing it
+        get_cache_path = handler_module.get_cache_path
+
+        def existing_cache_path(key):
+            path = get_cache_path(key)
+            path.mkdir(parents=True, exist_ok=True)
+            return path
+
+        monkeypatch.setattr(handler_module, "get_cache_path", existing_cache_path)
+
+        async def fake_execute(self, zeo_args, cwd, on_output=None):
+            raise AssertionError("rejected requests must not run Zeo++")
+
+        monkeypatch.setattr(ZeoRunner, "_execute_async", fake_execute)
+        response = client.post(
+            "/api/v1/pore_diameter", files={"structure_file": ("a.cif", b"data_a", "text/plain")}
+        )
+        assert response.status_code == 429
+
+
+class TestCpuQuotas:
+    def test_quota_headers_and_429_once_exhausted(self, client, monkeypatch, tmp_path):
+        monkeypatch.setattr(file_utils, "CACHE_DIR", tmp_path / "cache")
+        monkeypatch.setattr(file_utils, "TMP_DIR", tmp_path / "tmp")
+        monkeypatch.setattr(quota, "store", QuotaStore(tmp_path / "quotas"))
+        monkeypatch.setattr(settings, "quota_cpu_seconds_per_hour", 360.0)
+        calls = []
+
+        async def fake_execute(self, zeo_args, cwd, on_output=None):
+            calls.append(zeo_args)
+            (cwd / "result.res").write_text("a.cif 4.9 3.0 4.9\n", encoding="utf-8")
+            return True, 0, "", ""
+
+        monkeypatch.setattr(ZeoRunner, "_execute_async", fake_execute)
+        headers = {"X-API-Key": "campaign"}
+        response = client.post(
+            "/api/v1/pore_diameter", files={"structure_file": ("a.cif", b"data_a", "text/plain")}, headers=headers
+        )
+        assert response.status_code == 200
+        assert response.headers["x-cpu-quota-limit"] == "360"
+        assert float(response.headers["x-cpu-quota-remaining"]) < 360
+
+        quota.charge("key:" + hashlib.sha256(b"campaign").hexdigest()[:16], 1000.0)
+        response = client.post(
+            "/api/v1/pore_diameter", files={"structure_file": ("b.cif", b"data_b", "text/plain")}, headers=headers
+        )
+        assert response.status_code == 429
+        assert int(response.headers["retry-after"]) >= 6000
+        assert response.headers["x-cpu-quota-remaining"] == "0.00"
+
+        # Cache hits are still served, and other tenants are unaffected
+        response = client.post(
+            "/api/v1/pore_diameter", files={"structure_file": ("a.cif", b"data_a", "text/plain")}, headers=headers
+        )
+        assert response.status_code == 200 and response.json()["cached"] is True
+        response = client.post(
+            "/api/v1/pore_diameter", files={"structure_file": ("b.cif", b"data_b", "text/plain")}
+        )
+        assert response.status_code == 200
+        assert len(calls) == 2
+
+
+class TestClientDeadlines:
+    def test_request_timeout_header(self, client, monkeypatch, tmp_path):
+        monkeypatch.setattr(file_utils, "CACHE_DIR", tmp_path / "cache")
+        monkeypatch.setattr(file_utils, "TMP_DIR", tmp_path / "tmp")
+        budgets = []
+
+        async def fake_execute(self, zeo_args, cwd, on_output=None):
+            budgets.append(remaining_seconds())
+            return False, DEADLINE_EXIT_CODE, "", "Deadline cannot be met"
+
+        monkeypatch.setattr(ZeoRunner, "_execute_async", fake_execute)
+        files = {"structure_file": ("a.cif", b"data_a", "text/plain")}
+        response = client.post("/api/v1/pore_diameter", files=files, headers={"X-Request-Timeout": "soon"})
+        assert response.status_code == 400
+        assert budgets == []
+
+        response = client.post("/api/v1/pore_diameter", files=files, headers={"X-Request-Timeout": "5"})
+        assert response.status_code == 504
+        assert response.json()["detail"]["error_code"] == "ZEOPP_1003"
+        assert 0 < budgets[0] <= 5
+
+        response = client.post("/api/v1/pore_diameter", files=files)
+        assert response.status_code == 504
+        assert budgets[1] is None
+
+
+class TestAdaptiveSampling:
+    def test_auto_samples_reports_convergence(self, client, monkeypatch, tmp_path):
+        monkeypatch.setattr(file_utils, "CACHE_DIR", tmp_path / "cache")
+        monkeypatch.setattr(file_utils, "TMP_DIR", tmp_path / "tmp")
+
+        async def fake_execute(self, zeo_args, cwd, on_output=None):
+            fraction = 0.3 + 3 / int(zeo_args[-3])
+            (cwd / "result.volpo").write_text(
+                f"@ a.volpo Unitcell_volume: 307.484 Density: 1.62239 POAV_A^3: 92.2 "
+                f"POAV_Volume_fraction: {fraction} POAV_cm^3/g: 0.18 PONAV_A^3: 0 "
+                "PONAV_Volume_fraction: 0 PONAV_cm^3/g: 0\n",
+                encoding="utf-8",
+            )
+            return True, 0, "", ""
+
+        monkeypatch.setattr(ZeoRunner, "_execute_async", fake_execute)
+        response = client.post(
+            "/api/v1/probe_volume",
+            files={"structure_file": ("a.cif", b"data_a", "text/plain")},
+            data={"samples": "auto", "tolerance": "0.01"},
+        )
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["poav_fraction"] == pytest.approx(0.3003)
+        assert body["convergence"]["metric"] == "poav_fraction"
+        assert body["convergence"]["converged"] is True
+        assert body["convergence"]["samples"] == 10000
+        assert body["convergence"]["total_samples"] == 5000 + 10000
+
+    def test_auto_samples_validation(self, client):
+        for data in ({"samples": "many"}, {"samples": "auto", "tolerance": "0"}):
+            response = client.post(
+                "/api/v1/surface_area", files={"structure_file": ("a.cif", b"data_a", "text/plain")}, data=data
+            )
+            assert response.status_code == 422
+
+
+class TestStructureEndpoints:
+    def test_upload_and_get_structure(self, client, monkeypatch, tmp_path):
+        monkeypatch.setattr(store_utils, "STRUCTURES_DIR", tmp_path / "structures")
+        files = {"structure_file": ("test.cif", b"data_test", "text/plain")}
+        response = client.post("/api/v1/structures", files=files)
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["structure_id"]) == 64
+        assert data["size_bytes"] == 9
+
+        response = client.get(f"/api/v1/structures/{data['structure_id']}")
+        assert response.status_code == 200
+        assert response.json()["filename"] == "test.cif"
+
+    def test_analysis_with_unknown_structure_id(self, client, monkeypatch, tmp_path):
+        monkeypatch.setattr(store_utils, "STRUCTURES_DIR", tmp_path / "structures")
+        response = client.post("/api/v1/pore_diameter", data={"structure_id": "0" * 64})
+        assert response.status_code == 404
+
+    def test_analysis_requires_exactly_one_input(self, client):
+        response = client.post("/api/v1/pore_diameter", data={"ha": "true"})
+        assert response.status_code == 422
+
+
 class TestHeaders:
     def test_request_headers(self, client):
         response = client.get("/health")
@@ -123,3 +647,22 @@ class TestValidationAndErrors:
     def test_method_not_allowed(self, client):
         response = client.delete("/health")
         assert response.status_code == 405
+
+    def test_oversized_upload_rejected(self, client, monkeypatch):
+        monkeypatch.setattr(settings, "max_upload_size_mb", 1)
+        files = {"structure_file": ("big.cif", b"x" * (1024 * 1024 + 1), "text/plain")}
+        response = client.post("/api/v1/pore_diameter", files=files)
+        assert response.status_code == 413
+
+    def test_oversized_body_rejected_before_parsing(self, client, monkeypatch):
+        monkeypatch.setattr(settings, "max_upload_size_mb", 1)
+        files = {"structure_file": ("big.cif", b"x" * (3 * 1024 * 1024), "text/plain")}
+        response = client.post("/api/v1/structures", files=files)
+        assert response.status_code == 413
+
+    def test_profile_invalid_analyses(self, client):
+        files = {"structure_file": ("test.cif", b"data", "text/plain")}
+        response = client.post("/api/v1/profile", files=files, data={"analyses": '["unknown"]'})
+        assert response.status_code == 422
+        response = client.post("/api/v1/profile", files=files, data={"analyses": "not json"})
+        assert response.status_code == 422
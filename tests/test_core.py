@@ -2,22 +2,91 @@
 # -*- coding: utf-8 -*-
 
 from io import BytesIO
+import asyncio
 import os
+import sys
+import time
 
+import pytest
+
+from fastapi import HTTPException
 from starlette.datastructures import UploadFile
 
 import app.utils.cleanup as cleanup_utils
 import app.utils.file as file_utils
+import app.utils.quota_store as quota_store_utils
+import app.utils.structure_store as store_utils
+from app.core.admission import ServiceSaturatedError, TenantBacklogError, admit, check_admission
+from app.core.analyses import get_analysis, resolve_analysis_plan
+from app.core.batch import iter_directory_structures, resolve_screening_path
+from app.core.deadlines import (
+    DEADLINE_EXIT_CODE,
+    DeadlineExceededError,
+    check_deadline,
+    current_deadline,
+    deadline_scope,
+    parse_timeout,
+)
+import app.core.config as settings_module
 from app.core.config import Settings
 from app.core.exceptions import (
     ErrorCode,
     ZeoppBaseException,
     ZeoppExecutionError,
+    ZeoppFileTooLargeError,
     ZeoppInvalidFileTypeError,
     ZeoppParsingError,
+    ZeoppStructureNotFoundError,
 )
+from app.core.handler import await_unless_disconnected
+from app.core.host_slots import HostSlots, host_capacity
+from app.core.jobs import JobDispatcher
+from app.core.lanes import (
+    FAST_LANE,
+    QUEUE_FULL_EXIT_CODE,
+    SLOW_LANE,
+    assign_lane,
+    get_lane,
+    lane_host_capacities,
+    lane_host_slots,
+    lane_scheduler,
+)
+from app.core.pipeline import resolve_pipeline, run_pipeline
+import app.core.quota as quota
+from app.core.quota import QuotaExceededError, metered
 from app.core.middleware import ALLOWED_EXTENSIONS, validate_structure_file
+from app.core.montecarlo import run_adaptive
 from app.core.runner import ZeoRunner
+from app.core.scheduler import (
+    CostScheduler,
+    QueueFullError,
+    RuntimeModel,
+    fit_coefficients,
+    run_operations,
+    runtime_model,
+)
+from app.core.sweep import resolve_sweep, sweep_radii
+from app.core.single_flight import LOCKS_DIRNAME
+from app.utils.cache_entry import (
+    MANIFEST_FILENAME,
+    STAGING_DIRNAME,
+    read_cache_manifest,
+    write_cache_entry,
+)
+from app.models.pore_diameter import PoreDiameterResponse
+from app.utils.cache_index import get_cache_index
+from app.utils.cache_layout import (
+    CACHE_LAYOUT_VERSION,
+    cache_entry_path,
+    ensure_cache_layout,
+    migrate_cache_layout,
+    read_layout_version,
+)
+from app.utils.job_store import JobStore
+from app.utils.quota_store import QuotaStore
+from app.utils.result_cache import ParsedResultCache
+from app.utils.runtime_store import RuntimeStore
+from app.utils.structure_size import StructureSize, structure_size
 
 
 class TestSettings:
@@ -103,6 +172,73 @@ class TestFileUtilities:
         key2 = file_utils.compute_cache_key(saved_path, args, "x")
         assert key1 == key2
 
+    def test_cache_key_ignores_filenames_and_number_spelling(self, tmp_path):
+        content_hash = "a" * 64
+        key = file_utils.compute_cache_key(
+            tmp_path / "HKUST-1.cif",
+            ["-ha", "-sa", "1.2", "1.2", "2000", "result.sa", "HKUST-1.cif"],
+            content_hash=content_hash,
+        )
+        same = file_utils.compute_cache_key(
+            tmp_path / "hkust1.cif",
+            ["-ha", "-sa", "1.20", "1.2", "2000", "other.sa", "hkust1.cif"],
+            content_hash=content_hash,
+        )
+        assert key == same
+        assert key == file_utils.build_cache_key(content_hash, "-sa", [1.2, 1.2, 2000], ha=True)
+
+    def test_cache_key_distinguishes_ha_operation_and_params(self):
+        content_hash = "a" * 64
+        base = file_utils.build_cache_key(content_hash, "-vol", [1.2, 1.2, 50000], ha=True)
+        assert base != file_utils.build_cache_key(content_hash, "-vol", [1.2, 1.2, 50000], ha=False)
+        assert base != file_utils.build_cache_key(content_hash, "-volpo", [1.2, 1.2, 50000], ha=True)
+        assert base != file_utils.build_cache_key(content_hash, "-vol", [1.2, 1.3, 50000], ha=True)
+        assert base != file_utils.build_cache_key(content_hash, "-vol", [1.2, 1.2, 50000], ha=True, variant="r1")
+
+    def test_save_uploaded_file_hashed_matches_file_hash(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(file_utils, "TMP_DIR", tmp_path / "tmp")
+        monkeypatch.setattr(file_utils, "COPY_CHUNK_SIZE", 4)
+
+        upload = UploadFile(filename="a.cif", file=BytesIO(b"0123456789"))
+        saved_path, content_hash = file_utils.save_uploaded_file_hashed(upload, prefix="unit")
+
+        assert saved_path.read_bytes() == b"0123456789"
+        assert content_hash == file_utils.hash_file(saved_path)
+
+    def test_save_uploaded_file_rejects_oversized_upload(self, monkeypatch, tmp_path):
+        temp_root = tmp_path / "tmp"
+        monkeypatch.setattr(file_utils, "TMP_DIR", temp_root)
+        monkeypatch.setattr(file_utils, "COPY_CHUNK_SIZE", 4)
+
+        upload = UploadFile(filename="a.cif", file=BytesIO(b"0123456789"))
+        with pytest.raises(ZeoppFileTooLargeError):
+            file_utils.save_uploaded_file_hashed(upload, prefix="unit", max_bytes=6)
+
+        assert list(temp_root.iterdir()) == []
+
+
+class TestStructureStore:
+    def test_store_is_content_addressed(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(store_utils, "STRUCTURES_DIR", tmp_path / "structures")
+        monkeypatch.setattr(store_utils, "TMP_DIR", tmp_path / "tmp")
+
+        first = store_utils.store_structure(BytesIO(b"abc"), "a.cif")
+        second = store_utils.store_structure(BytesIO(b"abc"), "renamed.cif")
+
+        assert first.structure_id == second.structure_id == file_utils.hash_file(first.path)
+        assert second.filename == "a.cif"
+
+        linked = store_utils.materialize_structure(first.structure_id, prefix="unit")
+        assert linked.read_bytes() == b"abc"
+        assert linked.parent.parent == tmp_path / "tmp"
+
+    def test_unknown_structure_id(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(store_utils, "STRUCTURES_DIR", tmp_path / "structures")
+        with pytest.raises(ZeoppStructureNotFoundError):
+            store_utils.get_structure("0" * 64)
+        with pytest.raises(ZeoppStructureNotFoundError):
+            store_utils.get_structure("../etc")
+
 
 class TestCleanupUtilities:
     def test_storage_stats_and_clear_cache(self, monkeypatch, tmp_path):
@@ -117,8 +253,8 @@ class TestCleanupUtilities:
         (task_dir / "in.cif").write_text("x", encoding="utf-8")
 
         # Create cache directory/file
-        cache_entry = cache_root / "abc123"
-        cache_entry.mkdir()
+        cache_entry = cache_entry_path(cache_root, "ab" * 32)
+        cache_entry.mkdir(parents=True)
         (cache_entry / "result.res").write_text("res", encoding="utf-8")
 
         monkeypatch.setattr(cleanup_utils, "TMP_DIR", temp_root)
@@ -136,6 +272,76 @@ class TestCleanupUtilities:
         assert removed == 1
         assert failed == 0
 
+    def test_evict_cache_entries_by_age_and_lru(self, monkeypatch, tmp_path):
+        cache_root = tmp_path / "cache"
+        cache_root.mkdir()
+        monkeypatch.setattr(cleanup_utils, "CACHE_DIR", cache_root)
+        index = get_cache_index(cache_root)
+
+        now = time.time()
+        for name, created, last_hit in [("a" * 64, 0, now), ("b" * 64, now - 10, now - 5), ("c" * 64, now - 10, now)]:
+            entry = cache_entry_path(cache_root, name)
+            entry.mkdir(parents=True)
+            (entry / "result.res").write_text("x" * 10, encoding="utf-8")
+            index.record(name, "-res", "h" * 64, 10, created=created, last_hit=last_hit)
+
+        result = cleanup_utils.evict_cache_entries(max_age_hours=1, max_size_bytes=15, max_entries=0)
+
+        assert result["expired"] == 1
+        assert result["evicted"] == 1
+        assert result["remaining_entries"] == 1
+        assert not cache_entry_path(cache_root, "a" * 64).exists()
+        assert not cache_entry_path(cache_root, "b" * 64).exists()
+        assert cache_entry_path(cache_root, "c" * 64).exists()
+        assert index.totals() == (1, 10)
+
+    def test_cache_index_backfills_existing_entries(self, monkeypatch, tmp_path):
+        cache_root = tmp_path / "cache"
+        entry = cache_entry_path(cache_root, "d" * 64)
+        entry.mkdir(parents=True)
+        (entry / "result.res").write_text("abc", encoding="utf-8")
+        monkeypatch.setattr(cleanup_utils, "CACHE_DIR", cache_root)
+
+        stats = cleanup_utils.get_cache_storage_stats()
+
+        assert stats["count"] == 1
+        assert get_cache_index(cache_root).list_entries()[0]["size_bytes"] == 3
+
+    def test_runner_indexes_fresh_entries_and_hits(self, monkeypatch, tmp_path):
+        cache_root = tmp_path / "cache"
+        monkeypatch.setattr(file_utils, "CACHE_DIR", cache_root)
+        (tmp_path / "task").mkdir()
+        structure_file = tmp_path / "task" / "input.cif"
+        structure_file.write_text("data", encoding="utf-8")
+
+        async def fake_execute(self, zeo_args, cwd, on_output=None):
+            (cwd / "result.res").write_text("res", encoding="utf-8")
+            return True, 0, "", ""
+
+        monkeypatch.setattr(ZeoRunner, "_execute_async", fake_execute)
+        args = ["-ha", "-res", "result.res", "input.cif"]
+        asyncio.run(ZeoRunner().run_command_async(structure_file, args, ["result.res"]))
+        asyncio.run(ZeoRunner().run_command_async(structure_file, args, ["result.res"]))
+
+        (entry,) = get_cache_index(cache_root).list_entries(operation="-res")
+        assert entry["structure_hash"] == file_utils.hash_file(structure_file)
+        assert entry["size_bytes"] == 3
+        assert entry["hits"] == 1
+
+    def test_migrate_flat_cache_layout(self, tmp_path):
+        cache_root = tmp_path / "cache"
+        key = "e" * 64
+        (cache_root / key).mkdir(parents=True)
+        (cache_root / key / "result.res").write_text("res", encoding="utf-8")
+
+        assert ensure_cache_layout(cache_root) is False
+        assert migrate_cache_layout(cache_root) == (1, 0)
+
+        assert (cache_entry_path(cache_root, key) / "result.res").exists()
+        assert not (cache_root / key).exists()
+        assert read_layout_version(cache_root) == CACHE_LAYOUT_VERSION
+        assert ensure_cache_layout(cache_root) is True
+
     def test_cleanup_old_temp_files(self, monkeypatch, tmp_path):
         temp_root = tmp_path / "tmp"
         temp_root.mkdir()
@@ -163,19 +369,1005 @@ class TestCleanupUtilities:
         assert not target.exists()
 
 
+class TestCacheEntryWrites:
+    def test_entry_published_with_manifest(self, tmp_path):
+        cache_root = tmp_path / "cache"
+        entry = cache_entry_path(cache_root, "f" * 64)
+
+        assert write_cache_entry(entry, {"result.res": b"res"}) is True
+
+        manifest = read_cache_manifest(entry)
+        assert set(manifest["files"]) == {"result.res"}
+        assert manifest["size_bytes"] == 3
+        assert (entry / "result.res").read_bytes() == b"res"
+        assert list((cache_root / STAGING_DIRNAME).iterdir()) == []
+
+    def test_existing_complete_entry_kept_unless_replaced(self, tmp_path):
+        entry = cache_entry_path(tmp_path / "cache", "f" * 64)
+        write_cache_entry(entry, {"result.res": b"first"})
+
+        assert write_cache_entry(entry, {"result.res": b"second"}) is False
+        assert (entry / "result.res").read_bytes() == b"first"
+
+        assert write_cache_entry(entry, {"result.res": b"third"}, replace=True) is True
+        assert (entry / "result.res").read_bytes() == b"third"
+
+    def test_partial_entry_is_a_miss(self, monkeypatch, tmp_path):
+        cache_root = tmp_path / "cache"
+        monkeypatch.setattr(file_utils, "CACHE_DIR", cache_root)
+        (tmp_path / "task").mkdir()
+        structure_file = tmp_path / "task" / "input.cif"
+        structure_file.write_text("data", encoding="utf-8")
+        args = ["-ha", "-res", "result.res", "input.cif"]
+
+        # An entry without a manifest, as left by an interrupted writer.
+        key = file_utils.compute_cache_key(structure_file, args)
+        partial = cache_entry_path(cache_root, key)
+        partial.mkdir(parents=True)
+        (partial / "result.res").write_text("", encoding="utf-8")
+
+        async def fake_execute(self, zeo_args, cwd, on_output=None):
+            (cwd / "result.res").write_text("res", encoding="utf-8")
+            return True, 0, "", ""
+
+        monkeypatch.setattr(ZeoRunner, "_execute_async", fake_execute)
+        result = asyncio.run(ZeoRunner().run_command_async(structure_file, args, ["result.res"]))
+
+        assert result["cached"] is False
+        assert (partial / MANIFEST_FILENAME).exists()
+        assert (partial / "result.res").read_text(encoding="utf-8") == "res"
+
+
+class TestParsedResultCache:
+    @staticmethod
+    def _result(value):
+        return PoreDiameterResponse(
+            included_diameter=value, free_diameter=value, included_along_free=value, cached=True
+        )
+
+    def test_lru_bounded_by_bytes(self):
+        one_entry = len(self._result(1.0).model_dump_json())
+        cache = ParsedResultCache(max_bytes=2 * one_entry)
+        cache.put("a", self._result(1.0))
+        cache.put("b", self._result(2.0))
+        assert cache.get("a", PoreDiameterResponse) is not None  # "b" is now least recent
+        cache.put("c", self._result(3.0))
+
+        assert cache.get("b", PoreDiameterResponse) is None
+        assert cache.get("a", PoreDiameterResponse).included_diameter == 1.0
+        assert cache.get("c", PoreDiameterResponse).included_diameter == 3.0
+
+    def test_discard_evicted_keys(self):
+        cache = ParsedResultCache(max_bytes=1024 * 1024)
+        cache.put("a", self._result(1.0))
+        cache.put("b", self._result(2.0))
+        cache.discard(["a"])
+
+        assert cache.get("a", PoreDiameterResponse) is None
+        assert cache.get("b", PoreDiameterResponse) is not None
+
+
+class TestSingleFlight:
+    @staticmethod
+    def _slow_runner(monkeypatch, tmp_path, calls):
+        monkeypatch.setattr(file_utils, "CACHE_DIR", tmp_path / "cache")
+        (tmp_path / "task").mkdir()
+        structure_file = tmp_path / "task" / "input.cif"
+        structure_file.write_text("data", encoding="utf-8")
+
+        async def fake_execute_async(self, zeo_args, cwd, on_output=None):
+            calls.append(zeo_args)
+            await asyncio.sleep(0.2)
+            (cwd / "result.res").write_text("res", encoding="utf-8")
+            return True, 0, "", ""
+
+        monkeypatch.setattr(ZeoRunner, "_execute_async", fake_execute_async)
+        return structure_file
+
+    def test_concurrent_async_requests_share_one_run(self, monkeypatch, tmp_path):
+        calls = []
+        structure_file = self._slow_runner(monkeypatch, tmp_path, calls)
+        runner = ZeoRunner()
+        args = ["-ha", "-res", "result.res", "input.cif"]
+
+        async def burst():
+            return await asyncio.gather(
+                *(runner.run_command_async(structure_file, args, ["result.res"]) for _ in range(4))
+            )
+
+        results = asyncio.run(burst())
+
+        assert len(calls) == 1
+        assert [r["cached"] for r in results].count(False) == 1
+        assert all(r["output_data"]["result.res"] == "res" for r in results)
+
+    def test_key_lock_serializes_identical_runs_without_coalescing(self, monkeypatch, tmp_path):
+        # Runs that do not share a SingleFlight (e.g. in different workers) meet at the key lock
+        calls = []
+        structure_file = self._slow_runner(monkeypatch, tmp_path, calls)
+        args = ["-ha", "-res", "result.res", "input.cif"]
+        content_hash = file_utils.hash_file(structure_file)
+        cache_dir = file_utils.get_cache_path(file_utils.compute_cache_key(structure_file, args))
+        runner = ZeoRunner()
+
+        async def burst():
+            return await asyncio.gather(*(
+                runner._compute_command(structure_file, args, ["result.res"], cache_dir, content_hash, False, None)
+                for _ in range(3)
+            ))
+
+        results = asyncio.run(burst())
+
+        assert len(calls) == 1
+        assert sorted(r["cached"] for r in results) == [False, True, True]
+        assert list((tmp_path / "cache" / LOCKS_DIRNAME).iterdir()) == []
+
+
+class TestHostSlots:
+    def test_caps_concurrency_across_waiters(self, tmp_path):
+        slots = HostSlots(tmp_path / ".slots", capacity=2)
+        running = []
+        peak = []
+
+        async def hold():
+            async with slots.hold_async():
+                running.append(1)
+                peak.append(len(running))
+                await asyncio.sleep(0.05)
+                running.pop()
+
+        async def scenario():
+            await asyncio.gather(*(hold() for _ in range(6)))
+
+        asyncio.run(scenario())
+        assert max(peak) == 2
+        assert slots.status() == {"capacity": 2, "running": 0, "queued": 0}
+
+    def test_waiters_are_served_in_arrival_order(self, tmp_path):
+        slots = HostSlots(tmp_path / ".slots", capacity=1)
+        order = []
+
+        async def waiter(i):
+            await asyncio.sleep(0.01 * i)
+            async with slots.hold_async():
+                order.append(i)
+                await asyncio.sleep(0.03)
+
+        async def scenario():
+            await asyncio.gather(*(waiter(i) for i in range(4)))
+
+        asyncio.run(scenario())
+        assert order == [0, 1, 2, 3]
+
+    def test_stale_tickets_are_pruned(self, tmp_path):
+        slots = HostSlots(tmp_path / ".slots", capacity=1)
+        queue_dir = tmp_path / ".slots" / "queue"
+        queue_dir.mkdir(parents=True)
+        # Ticket of a worker that died while queued: nobody holds its lock
+        (queue_dir / "00000000000000000001-1-dead").touch()
+
+        async def hold():
+            async with slots.hold_async() as index:
+                return index
+
+        assert asyncio.run(hold()) == 0
+        assert list(queue_dir.iterdir()) == []
+
+    def test_only_the_head_of_the_queue_polls_the_slots(self, tmp_path, monkeypatch):
+        slots = HostSlots(tmp_path / ".slots", capacity=1)
+        tickets = [slots._enqueue(float(i)) for i in range(1, 4)]
+        checked = []
+        original_pruned = slots._pruned
+        monkeypatch.setattr(slots, "_pruned", lambda name: checked.append(name) or original_pruned(name))
+        monkeypatch.setattr(slots, "_try_slot", lambda: pytest.fail("a queued waiter tried the slots"))
+
+        assert slots._poll(tickets[2][0]) == (None, 2)
+        assert checked == [tickets[0][0].name]
+        for ticket, fd in tickets:
+            slots._leave(ticket, fd)
+
+
+class TestAbandonedRuns:
+    @staticmethod
+    def _runner(monkeypatch, tmp_path, events):
+        monkeypatch.setattr(file_utils, "CACHE_DIR", tmp_path / "cache")
+        task_dir = tmp_path / "task"
+        task_dir.mkdir()
+        structure_file = task_dir / "input.cif"
+        structure_file.write_text("data", encoding="utf-8")
+
+        async def fake_execute_async(self, zeo_args, cwd, on_output=None):
+            try:
+                await asyncio.sleep(0.2)
+            except asyncio.CancelledError:
+                events.append("killed")
+                raise
+            (cwd / "result.res").write_text("res", encoding="utf-8")
+            events.append("finished")
+            return True, 0, "", ""
+
+        monkeypatch.setattr(ZeoRunner, "_execute_async", fake_execute_async)
+        return structure_file
+
+    @staticmethod
+    async def _abandon(structure_file):
+        args = ["-ha", "-res", "result.res", "input.cif"]
+        task = asyncio.ensure_future(ZeoRunner().run_command_async(structure_file, args, ["result.res"]))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.sleep(0.4)
+        return file_utils.get_cache_path(file_utils.compute_cache_key(structure_file, args))
+
+    def test_kill_policy_cancels_process(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(settings_module.settings, "abandoned_run_policy", "kill")
+        events = []
+        structure_file = self._runner(monkeypatch, tmp_path, events)
+
+        cache_dir = asyncio.run(self._abandon(structure_file))
+
+        assert events == ["killed"]
+        assert not cache_dir.exists()
+
+    def test_finish_policy_populates_cache(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(settings_module.settings, "abandoned_run_policy", "finish")
+        events = []
+        structure_file = self._runner(monkeypatch, tmp_path, events)
+
+        cache_dir = asyncio.run(self._abandon(structure_file))
+
+        assert events == ["finished"]
+        assert read_cache_manifest(cache_dir)["files"].keys() == {"result.res"}
+
+    def test_disconnected_client_abandons_wait(self):
+        class DisconnectedRequest:
+            scope = {}
+
+            async def is_disconnected(self):
+                return True
+
+        cancelled = []
+
+        async def long_run():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        async def scenario():
+            with pytest.raises(HTTPException) as excinfo:
+                await await_unless_disconnected(DisconnectedRequest(), long_run(), "test")
+            await asyncio.sleep(0)
+            return excinfo.value.status_code
+
+        assert asyncio.run(scenario()) == 499
+        assert cancelled == [True]
+
+
+class TestJobs:
+    def test_dispatcher_runs_queued_job(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(file_utils, "CACHE_DIR", tmp_path / "cache")
+        monkeypatch.setattr(store_utils, "STRUCTURES_DIR", tmp_path / "structures")
+        monkeypatch.setattr(store_utils, "TMP_DIR", tmp_path / "tmp")
+        stored = store_utils.store_structure(BytesIO(b"data_job"), "job.cif")
+
+        async def fake_execute_async(self, zeo_args, cwd, on_output=None):
+            on_output("stdout", "Voronoi decomposition done\n")
+            (cwd / "result.res").write_text("job.cif 4.9 3.0 4.9\n", encoding="utf-8")
+            return True, 0, "", ""
+
+        monkeypatch.setattr(ZeoRunner, "_execute_async", fake_execute_async)
+        store = JobStore(tmp_path / "jobs")
+        spec = {"analyses": [{"analysis": "pore_diameter", "params": {}}], "ha": True, "force_recalculate": False}
+        job = store.create("analysis", spec, stored.structure_id)
+        dispatcher = JobDispatcher(store, concurrency=1)
+
+        async def scenario():
+            await dispatcher._tick()
+            await asyncio.gather(*dispatcher._tasks.values())
+
+        asyncio.run(scenario())
+
+        finished = store.get(job["id"])
+        assert finished["status"] == "succeeded"
+        assert finished["attempts"] == 1
+        assert finished["result"]["included_diameter"] == 4.9
+
+    def test_expired_and_released_jobs_are_requeued(self, tmp_path):
+        store = JobStore(tmp_path / "jobs")
+        spec = {"analyses": [{"analysis": "pore_diameter", "params": {}}], "ha": True, "force_recalculate": False}
+        first = store.create("analysis", spec, "a" * 64)
+        second = store.create("analysis", spec, "b" * 64)
+
+        assert store.claim_next("dead-worker")["id"] == first["id"]
+        assert store.claim_next("stopping-worker")["id"] == second["id"]
+        assert store.requeue_expired(lease_seconds=-1) == 2
+        assert store.get(first["id"])["status"] == "queued"
+
+        store.claim_next("stopping-worker")
+        assert store.release("stopping-worker") == 1
+        assert store.get(first["id"])["attempts"] == 2
+
+    def test_stale_worker_cannot_finish_a_reclaimed_job(self, tmp_path):
+        store = JobStore(tmp_path / "jobs")
+        spec = {"analyses": [{"analysis": "pore_diameter", "params": {}}], "ha": True, "force_recalculate": False}
+        job = store.create("analysis", spec, "a" * 64)
+        stale = store.claim_next("worker")
+        store.requeue_expired(lease_seconds=-1)
+        current = store.claim_next("worker")
+
+        # Same worker identity, but an earlier claim
+        assert store.finish(job["id"], "worker", stale["attempts"], "failed", error={"message": "late"}) is False
+        assert store.finish(job["id"], "other-worker", current["attempts"], "succeeded", {}) is False
+        assert store.get(job["id"])["status"] == "running"
+
+        assert store.finish(job["id"], "worker", current["attempts"], "succeeded", {"ok": True}) is True
+        assert store.finish(job["id"], "worker", current["attempts"], "failed") is False
+        assert store.get(job["id"])["result"] == {"ok": True}
+
+    def test_cancel_running_job_is_flagged_for_its_worker(self, tmp_path):
+        store = JobStore(tmp_path / "jobs")
+        spec = {"analyses": [{"analysis": "pore_diameter", "params": {}}], "ha": True, "force_recalculate": False}
+        job = store.create("analysis", spec, "a" * 64)
+        store.claim_next("worker")
+
+        assert store.request_cancel(job["id"])["cancel_requested"] is True
+        assert store.heartbeat("worker", {}) == {job["id"]}
+        assert store.delete(job["id"]) is False  # still running
+
+
+class TestDirectoryScreening:
+    @staticmethod
+    def _tree(tmp_path):
+        root = tmp_path / "shared"
+        (root / "mofs" / "sub").mkdir(parents=True)
+        (root / "mofs" / "a.cif").write_text("data_a", encoding="utf-8")
+        (root / "mofs" / "sub" / "b.cif").write_text("data_b", encoding="utf-8")
+        (root / "mofs" / "notes.txt").write_text("not a structure", encoding="utf-8")
+        return root
+
+    def test_screening_path_must_be_under_allowed_roots(self, monkeypatch, tmp_path):
+        root = self._tree(tmp_path)
+        monkeypatch.setattr(settings_module.settings, "mcp_allowed_path_roots", "")
+        with pytest.raises(ValueError, match="disabled"):
+            resolve_screening_path(str(root / "mofs"))
+
+        monkeypatch.setattr(settings_module.settings, "mcp_allowed_path_roots", str(root))
+        assert resolve_screening_path(str(root / "mofs")) == str((root / "mofs").resolve())
+        assert resolve_screening_path(str(root / "mofs" / "**" / "*.cif")).endswith("*.cif")
+        with pytest.raises(ValueError, match="outside"):
+            resolve_screening_path(str(root / ".." / "*.cif"))
+        with pytest.raises(ValueError, match="absolute"):
+            resolve_screening_path("mofs")
+
+    def test_directory_walk_skips_checkpointed_files(self, monkeypatch, tmp_path):
+        root = self._tree(tmp_path)
+        monkeypatch.setattr(settings_module.settings, "mcp_allowed_path_roots", str(root))
+        monkeypatch.setattr(store_utils, "STRUCTURES_DIR", tmp_path / "structures")
+        path = resolve_screening_path(str(root / "mofs"))
+
+        names = sorted(item.name for item in iter_directory_structures(path))
+        assert names == [str(root / "mofs" / "a.cif"), str(root / "mofs" / "sub" / "b.cif")]
+
+        remaining = list(iter_directory_structures(path, skip={names[0]}))
+        assert [item.name for item in remaining] == [names[1]]
+        assert store_utils.get_structure(remaining[0].structure_id).filename == "b.cif"
+
+    def test_directory_job_resumes_from_checkpoint(self, monkeypatch, tmp_path):
+        root = self._tree(tmp_path)
+        monkeypatch.setattr(settings_module.settings, "mcp_allowed_path_roots", str(root))
+        monkeypatch.setattr(file_utils, "CACHE_DIR", tmp_path / "cache")
+        monkeypatch.setattr(store_utils, "STRUCTURES_DIR", tmp_path / "structures")
+        monkeypatch.setattr(store_utils, "TMP_DIR", tmp_path / "tmp")
+        runs = []
+
+        async def fake_execute_async(self, zeo_args, cwd, on_output=None):
+            runs.append(zeo_args)
+            (cwd / "result.res").write_text("input.cif 4.9 3.0 4.9\n", encoding="utf-8")
+            return True, 0, "", ""
+
+        monkeypatch.setattr(ZeoRunner, "_execute_async", fake_execute_async)
+        store = JobStore(tmp_path / "jobs")
+        spec = {
+            "analyses": [{"analysis": "pore_diameter", "params": {}}],
+            "ha": True,
+            "force_recalculate": False,
+            "path": resolve_screening_path(str(root / "mofs")),
+        }
+        job = store.create("directory", spec, "")
+        # A previous attempt finished a.cif before its worker was restarted
+        store.record_item(job["id"], str(root / "mofs" / "a.cif"), "succeeded", None, {"status": "succeeded"})
+        dispatcher = JobDispatcher(store, concurrency=1)
+
+        async def scenario():
+            await dispatcher._tick()
+            await asyncio.gather(*dispatcher._tasks.values())
+
+        asyncio.run(scenario())
+
+        finished = store.get(job["id"])
+        assert finished["status"] == "succeeded"
+        assert finished["result"] == {"total": 2, "succeeded": 2, "failed": 0, "filtered": 0}
+        assert len(runs) == 1
+        items = store.list_items(job["id"])
+        assert items[-1]["name"] == str(root / "mofs" / "sub" / "b.cif")
+        assert items[-1]["result"]["results"]["pore_diameter"]["included_diameter"] == 4.9
+
+
+class TestAsyncSubprocessEngine:
+    @staticmethod
+    def _script(tmp_path, body):
+        script = tmp_path / "network"
+        script.write_text("#!/bin/sh\n" + body, encoding="utf-8")
+        script.chmod(0o755)
+        return ZeoRunner(zeo_exec_path=str(script), workspace=tmp_path)
+
+    @pytest.mark.skipif(os.name != "posix", reason="requires a POSIX shell")
+    def test_streams_output_incrementally(self, tmp_path):
+        runner = self._script(tmp_path, "echo first\necho oops >&2\nsleep 0.1\necho second\n")
+        chunks = []
+
+        success, exit_code, stdout, stderr = asyncio.run(
+            runner._execute_async([], tmp_path, lambda stream, text: chunks.append((stream, text)))
+        )
+
+        assert success is True and exit_code == 0
+        assert stdout == "first\nsecond\n"
+        assert stderr == "oops\n"
+        assert ("stdout", "first\n") in chunks
+
+    @pytest.mark.skipif(os.name != "posix", reason="requires a POSIX shell")
+    def test_timeout_kills_process_group(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(settings_module.settings, "zeo_command_timeout_seconds", 1)
+        marker = tmp_path / "survived"
+        runner = self._script(tmp_path, f"(sleep 2; touch {marker}) &\nsleep 30\n")
+
+        started = time.monotonic()
+        success, exit_code, _, stderr = asyncio.run(runner._execute_async([], tmp_path))
+
+        assert (success, exit_code) == (False, 124)
+        assert "timed out" in stderr
+        assert time.monotonic() - started < 5
+        time.sleep(1.5)
+        assert not marker.exists()  # the background child was killed with its group
+
+    def test_missing_executable(self, tmp_path):
+        runner = ZeoRunner(zeo_exec_path=str(tmp_path / "missing"), workspace=tmp_path)
+        assert asyncio.run(runner._execute_async([], tmp_path))[:2] == (False, 127)
+
+
 class TestRunnerFallback:
     def test_runner_handles_missing_executable(self, tmp_path):
-        structure_file = tmp_path / "input.cif"
+        (tmp_path / "task").mkdir()
+        structure_file = tmp_path / "task" / "input.cif"
         structure_file.write_text("data", encoding="utf-8")
 
         runner = ZeoRunner(zeo_exec_path="definitely_missing_network_binary")
-        result = runner.run_command(
+        result = asyncio.run(runner.run_command_async(
             structure_file=structure_file,
             zeo_args=["--help", structure_file.name],
             output_files=["result.res"],
             extra_identifier="unit",
             skip_cache=True,
-        )
+        ))
 
         assert result["success"] is False
         assert result["exit_code"] != 0
+
+
+class TestAnalysisRegistry:
+    def test_build_args_matches_single_routes(self):
+        spec = get_analysis("surface_area")
+        params = spec.resolve_params({"probe_radius": 1.21, "chan_radius": 1.21})
+        assert spec.build_args(params) == ["-sa", "1.21", "1.21", "2000", "result.sa"]
+        assert get_analysis("pore_diameter").build_args({}) == ["-res", "result.res"]
+
+    def test_chan_radius_defaults_to_probe_radius(self):
+        params = get_analysis("accessible_volume").resolve_params({"probe_radius": 1.5})
+        assert params["chan_radius"] == 1.5
+
+    def test_resolve_plan_rejects_invalid_items(self):
+        with pytest.raises(ValueError):
+            resolve_analysis_plan([])
+        with pytest.raises(ValueError):
+            resolve_analysis_plan(["pore_diameter", "pore_diameter"])
+        with pytest.raises(ValueError):
+            resolve_analysis_plan(["not_an_analysis"])
+        with pytest.raises(ValueError):
+            resolve_analysis_plan([{"analysis": "surface_area", "params": {"probe_radius": 2.0, "chan_radius": 1.0}}])
+
+
+class TestPipelines:
+    def test_resolve_pipeline_validates_stages_and_conditions(self):
+        condition = {"field": "pore_diameter.free_diameter", "op": ">=", "value": 3.0}
+        stages = resolve_pipeline([
+            {"analyses": ["pore_diameter"], "require": [condition]},
+            {"analyses": ["surface_area"]},
+        ])
+        assert [str(p) for p in stages[0].require] == ["pore_diameter.free_diameter >= 3.0"]
+        assert stages[1].to_dict()["analyses"][0]["params"]["samples"] == 2000
+
+        invalid = [
+            [],
+            [{"analyses": ["pore_diameter"]}, {"analyses": ["pore_diameter"]}],
+            [{"analyses": ["pore_diameter"], "require": [{**condition, "field": "surface_area.asa_mass"}]}],
+            [{"analyses": ["pore_diameter"], "require": [{**condition, "field": "pore_diameter.cached"}]}],
+            [{"analyses": ["channel_analysis"], "require": [{**condition, "field": "channel_analysis.channels"}]}],
+            [{"analyses": ["pore_diameter"], "require": [{**condition, "op": "~"}]}],
+            [{"analyses": ["pore_diameter"], "require": [{**condition, "value": "3"}]}],
+        ]
+        for pipeline in invalid:
+            with pytest.raises(ValueError):
+                resolve_pipeline(pipeline)
+
+    def test_rejected_structures_skip_later_stages(self, monkeypatch, tmp_path, sample_sa_output):
+        monkeypatch.setattr(file_utils, "CACHE_DIR", tmp_path / "cache")
+        monkeypatch.setattr(store_utils, "STRUCTURES_DIR", tmp_path / "structures")
+        monkeypatch.setattr(store_utils, "TMP_DIR", tmp_path / "tmp")
+        calls = []
+
+        async def fake_execute_async(self, zeo_args, cwd, on_output=None):
+            calls.append(zeo_args)
+            free = "4.0" if "wide" in (cwd / zeo_args[-1]).read_text() else "2.0"
+            (cwd / "result.res").write_text(f"input.cif 4.9 {free} 4.9\n", encoding="utf-8")
+            (cwd / "result.sa").write_text(sample_sa_output, encoding="utf-8")
+            return True, 0, "", ""
+
+        monkeypatch.setattr(ZeoRunner, "_execute_async", fake_execute_async)
+        condition = {"field": "pore_diameter.free_diameter", "op": ">=", "value": 3.0}
+        stages = resolve_pipeline([
+            {"analyses": ["pore_diameter"], "require": [condition]},
+            {"analyses": ["surface_area"]},
+        ])
+        narrow = store_utils.store_structure(BytesIO(b"data_narrow"), "narrow.cif").structure_id
+        wide = store_utils.store_structure(BytesIO(b"data_wide"), "wide.cif").structure_id
+
+        rejected = asyncio.run(run_pipeline(narrow, stages))
+        assert rejected["passed"] is False
+        assert rejected["stages_run"] == 1
+        assert rejected["rejected_by"] == "pore_diameter.free_diameter >= 3.0"
+        assert len(calls) == 1
+
+        passed = asyncio.run(run_pipeline(wide, stages))
+        assert passed["passed"] is True
+        assert passed["results"]["surface_area"]["asa_mass"] == 1218.21
+        assert passed["computed"] == ["pore_diameter", "surface_area"]
+        assert len(calls) == 3
+
+
+class TestSweeps:
+    def test_sweep_radii_from_list_or_inclusive_range(self):
+        assert sweep_radii([1.8, 1.2, 1.8]) == [1.2, 1.8]
+        assert sweep_radii(start=1.0, stop=1.3, step=0.1) == [1.0, 1.1, 1.2, 1.3]
+        for kwargs in (
+            {},
+            {"radii": [1.2], "start": 1.0, "stop": 2.0, "step": 0.5},
+            {"start": 1.0, "stop": 2.0},
+            {"start": 2.0, "stop": 1.0, "step": 0.1},
+            {"start": 0.1, "stop": 10.0, "step": 0.1},
+            {"radii": []},
+        ):
+            with pytest.raises(ValueError):
+                sweep_radii(**kwargs)
+
+    def test_resolve_sweep_matches_single_analysis_params(self):
+        points = resolve_sweep("surface_area", [1.2, 1.5])
+        assert points[1] == get_analysis("surface_area").resolve_params({"probe_radius": 1.5})
+        assert resolve_sweep("probe_volume", [1.2], samples=500)[0]["samples"] == 500
+        with pytest.raises(ValueError):
+            resolve_sweep("pore_diameter", [1.2])
+        with pytest.raises(ValueError, match="takes no chan_radius"):
+            resolve_sweep("blocking_spheres", [1.2], chan_radius=2.0)
+        assert resolve_sweep("blocking_spheres", [1.2])[0]["probe_radius"] == 1.2
+        with pytest.raises(ValueError):
+            resolve_sweep("surface_area", [1.2, 1.5], chan_radius=1.3)
+
+
+class TestAdaptiveMonteCarlo:
+    def test_doubles_samples_until_successive_runs_agree(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(file_utils, "CACHE_DIR", tmp_path / "cache")
+        calls = []
+
+        async def fake_execute_async(self, zeo_args, cwd, on_output=None):
+            samples = int(zeo_args[-3])
+            calls.append(samples)
+            (cwd / "result.sa").write_text(
+                f"@ x.sa Unitcell_volume: 307.484 Density: 1.62239 ASA_A^2: 60.7 ASA_m^2/cm^3: 1976.4 "
+                f"ASA_m^2/g: {1000 + 300 / samples} NASA_A^2: 0 NASA_m^2/cm^3: 0 NASA_m^2/g: 0\n",
+                encoding="utf-8",
+            )
+            return True, 0, "", ""
+
+        monkeypatch.setattr(ZeoRunner, "_execute_async", fake_execute_async)
+        structure = tmp_path / "x.cif"
+        structure.write_text("data_x")
+        spec = get_analysis("surface_area")
+        params = spec.resolve_params({"probe_radius": 1.5})
+
+        result, convergence = asyncio.run(run_adaptive(structure, "hash", spec, params, tolerance=1e-4))
+        assert sorted(calls) == [200, 400, 800, 1600, 3200]
+        assert convergence["converged"] is True
+        assert convergence["relative_change"] <= 1e-4
+        assert convergence["samples"] == 3200
+        assert convergence["previous_value"] == pytest.approx(1000 + 300 / 1600)
+        assert convergence["total_samples"] == sum(calls)
+        assert convergence["runs"] == 5
+        assert result["asa_mass"] == pytest.approx(convergence["value"])
+        assert result["cached"] is False
+
+        again, repeated = asyncio.run(run_adaptive(structure, "hash", spec, params, tolerance=1e-4))
+        assert again["cached"] is True
+        assert repeated == convergence
+        assert len(calls) == 5
+
+    def test_stops_at_sample_budget(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(file_utils, "CACHE_DIR", tmp_path / "cache")
+
+        async def fake_execute_async(self, zeo_args, cwd, on_output=None):
+            fraction = 1 / int(zeo_args[-3])
+            (cwd / "result.vol").write_text(
+                f"@ x.vol Unitcell_volume: 307.484 Density: 1.62239 AV_A^3: 30.0 AV_Volume_fraction: {fraction} "
+                "AV_cm^3/g: 0.06 NAV_A^3: 0 NAV_Volume_fraction: 0 NAV_cm^3/g: 0\n",
+                encoding="utf-8",
+            )
+            return True, 0, "", ""
+
+        monkeypatch.setattr(ZeoRunner, "_execute_async", fake_execute_async)
+        structure = tmp_path / "x.cif"
+        structure.write_text("data_x")
+        spec = get_analysis("accessible_volume")
+
+        _, convergence = asyncio.run(run_adaptive(structure, "hash", spec, spec.resolve_params({}), tolerance=1e-6))
+        assert convergence["converged"] is False
+        assert convergence["relative_change"] == pytest.approx(1.0)
+        assert convergence["total_samples"] <= 50000 * 20 < convergence["total_samples"] + 2 * convergence["samples"]
+        with pytest.raises(ValueError):
+            asyncio.run(run_adaptive(structure, "hash", get_analysis("blocking_spheres"), {}))
+
+
+class TestCostScheduling:
+    def test_structure_size(self, temp_cif_file, temp_cssr_file):
+        assert structure_size(temp_cif_file) == StructureSize(2, pytest.approx(1000.0))
+        cssr = structure_size(temp_cssr_file)
+        assert cssr.atoms == 15
+        assert cssr.volume == pytest.approx(6.926 * 6.926 * 6.41)
+
+    def test_structure_size_with_missing_cell_parameters(self, tmp_path):
+        cif = tmp_path / "a.cif"
+        cif.write_text("data_a\n_cell_length_a 10\n_cell_length_b 10\nloop_\n_atom_site_fract_x\n0.1\n")
+        cssr = tmp_path / "a.cssr"
+        cssr.write_text("10 10 10\n90 90\n1 0\nx\n1 Si 0 0 0\n")
+        pdb = tmp_path / "a.pdb"
+        pdb.write_text("CRYST1   10.000   10.000   10.000  90.00  90.00\nATOM      1  Si\n")
+        assert structure_size(cif) == StructureSize(1, None)
+        assert structure_size(cssr) == StructureSize(1, None)
+        assert structure_size(pdb) == StructureSize(1, None)
+
+    def test_operations_and_prior_ordering(self, tmp_path):
+        assert run_operations(["-ha", "-res", "r.res", "-sa", "1.2", "1.2", "2000", "r.sa", "x.cif"]) == [
+            ("-res", None), ("-sa", 2000.0)
+        ]
+        model = RuntimeModel(RuntimeStore(tmp_path / "runtimes"))
+        size = StructureSize(500, 8000.0)
+        assert model.predict_operations([("-res", None)], size, True) < model.predict_operations(
+            [("-oms", None)], size, True
+        )
+        assert model.predict_operations([("-vol", 10000.0)], size, False) == pytest.approx(
+            10 * model.predict_operations([("-vol", 1000.0)], size, False)
+        )
+
+    def test_model_learns_recorded_durations(self, tmp_path):
+        runs = [
+            {"atoms": atoms, "volume": 1000.0, "samples": 0.0, "ha": 0, "seconds": 0.01 * atoms ** 2}
+            for atoms in range(20, 420, 2)
+        ]
+        coefficients = fit_coefficients("-oms", runs)
+        assert coefficients[1] == pytest.approx(2.0, abs=0.05)
+
+        model = RuntimeModel(RuntimeStore(tmp_path / "runtimes"))
+        prior = model.predict(["-strinfo", "r.strinfo", "x.cif"], tmp_path / "missing.cif")
+        for _ in range(50):
+            model.record(["-strinfo", "r.strinfo", "x.cif"], StructureSize(1), 5.0)
+        model.record(["-res", "r.res", "-chan", "1.2", "r.chan", "x.cif"], StructureSize(1), 5.0)
+        assert model.store.counts() == {"-strinfo": 50}
+        learned = model.predict(["-strinfo", "r.strinfo", "x.cif"], tmp_path / "missing.cif")
+        assert prior < 1.0 < learned <= 5.0
+
+    def test_scheduler_starts_lowest_priority_first(self):
+        scheduler = CostScheduler(capacity=1)
+        started = []
+
+        async def waiter(priority):
+            async with scheduler.slot(priority, predicted_seconds=priority):
+                started.append(priority)
+
+        async def scenario():
+            async with scheduler.slot(0.0):
+                tasks = [asyncio.create_task(waiter(p)) for p in (30.0, 10.0, 20.0, 5.0)]
+                await asyncio.sleep(0)
+                tasks[3].cancel()
+                await asyncio.sleep(0)
+                assert scheduler.status()["queued"] == 3
+                assert scheduler.status()["queued_seconds"] == 60.0
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        asyncio.run(scenario())
+        assert started == [10.0, 20.0, 30.0]
+        assert scheduler.status()["running"] == 0
+
+    def test_jobs_claimed_by_predicted_runtime_with_aging(self, tmp_path):
+        store = JobStore(tmp_path / "jobs")
+        spec = {"analyses": [{"analysis": "open_metal_sites", "params": {}}], "ha": True, "force_recalculate": False}
+        long_job = store.create("analysis", spec, "a" * 64, predicted_seconds=1800.0)
+        short_job = store.create("analysis", spec, "b" * 64, predicted_seconds=0.5)
+        assert store.claim_next("worker", aging_factor=10.0)["id"] == short_job["id"]
+
+        store.create("analysis", spec, "c" * 64, predicted_seconds=0.5)
+        with store._connect() as conn:
+            conn.execute("UPDATE jobs SET created = created - 200 WHERE id = ?", (long_job["id"],))
+        assert store.claim_next("worker", aging_factor=10.0)["id"] == long_job["id"]
+
+
+class TestExecutionLanes:
+    @staticmethod
+    def _script(tmp_path, body):
+        script = tmp_path / "network"
+        script.write_text("#!/bin/sh\n" + body, encoding="utf-8")
+        script.chmod(0o755)
+        return ZeoRunner(zeo_exec_path=str(script), workspace=tmp_path)
+
+    def test_assign_lane(self, monkeypatch):
+        assert assign_lane(["-ha", "-res", "r.res", "-chan", "1.2", "r.chan", "x.cif"], 100.0).name == FAST_LANE
+        assert assign_lane(["-ha", "-res", "r.res", "-oms", "r.oms", "x.cif"], 0.1).name == SLOW_LANE
+        assert assign_lane([], 0.0).name == SLOW_LANE
+
+        monkeypatch.setattr(settings_module.settings, "lane_assignment", "predicted")
+        monkeypatch.setattr(settings_module.settings, "fast_lane_max_predicted_seconds", 5.0)
+        assert assign_lane(["-oms", "r.oms", "x.cif"], 0.1).name == FAST_LANE
+        assert assign_lane(["-res", "r.res", "x.cif"], 100.0).name == SLOW_LANE
+
+    def test_lanes_share_one_host_budget(self, monkeypatch):
+        for reserved in (0, 1, 3, 100):
+            monkeypatch.setattr(settings_module.settings, "fast_lane_host_max_concurrent_tasks", reserved)
+            for total in range(1, 17):
+                fast, slow = lane_host_capacities(total)
+                assert slow >= 1
+                assert fast + slow <= total if total > 1 else (fast, slow) == (0, 1)
+        monkeypatch.setattr(settings_module.settings, "fast_lane_host_max_concurrent_tasks", 0)
+        assert lane_host_capacities(8) == (2, 6)
+
+        fast_slots = lane_host_slots(get_lane(FAST_LANE))
+        slow_slots = lane_host_slots(get_lane(SLOW_LANE))
+        combined = slow_slots.capacity + (fast_slots.capacity if fast_slots is not slow_slots else 0)
+        assert combined <= host_capacity()
+
+    def test_scheduler_queue_depth(self):
+        scheduler = CostScheduler(capacity=1, max_queued=1)
+
+        async def scenario():
+            async with scheduler.slot(0.0):
+                waiter = asyncio.create_task(scheduler.slot(1.0).__aenter__())
+                await asyncio.sleep(0)
+                with pytest.raises(QueueFullError):
+                    async with scheduler.slot(2.0):
+                        pass
+                waiter.cancel()
+                await asyncio.gather(waiter, return_exceptions=True)
+
+        asyncio.run(scenario())
+
+    @pytest.mark.skipif(os.name != "posix", reason="requires a POSIX shell")
+    def test_full_fast_lane_rejects_runs(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(runtime_model, "store", RuntimeStore(tmp_path / "runtimes"))
+        monkeypatch.setattr(settings_module.settings, "fast_lane_max_concurrent_tasks", 1)
+        monkeypatch.setattr(settings_module.settings, "fast_lane_queue_depth", 1)
+        runner = self._script(tmp_path, "sleep 0.3\n")
+
+        async def scenario():
+            return await asyncio.gather(*(
+                runner._execute_async(["-res", "r.res", "x.cif"], tmp_path) for _ in range(3)
+            ))
+
+        exit_codes = sorted(exit_code for _, exit_code, _, _ in asyncio.run(scenario()))
+        assert exit_codes == [0, 0, QUEUE_FULL_EXIT_CODE]
+
+    @pytest.mark.skipif(os.name != "posix", reason="requires a POSIX shell")
+    def test_fast_lane_timeout_reruns_in_slow_lane(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(runtime_model, "store", RuntimeStore(tmp_path / "runtimes"))
+        monkeypatch.setattr(settings_module.settings, "fast_lane_timeout_seconds", 1)
+        monkeypatch.setattr(settings_module.settings, "zeo_command_timeout_seconds", 10)
+        attempts = tmp_path / "attempts"
+        runner = self._script(tmp_path, f"echo run >> {attempts}\nsleep 1.5\necho done\n")
+
+        success, exit_code, stdout, _ = asyncio.run(runner._execute_async(["-res", "r.res", "x.cif"], tmp_path))
+
+        assert (success, exit_code, stdout) == (True, 0, "done\n")
+        assert attempts.read_text().count("run") == 2
+
+
+class TestAdmissionControl:
+    def test_expected_wait(self):
+        scheduler = CostScheduler(capacity=1)
+
+        async def scenario():
+            assert scheduler.expected_wait() == 0.0
+            async with scheduler.slot(0.0, predicted_seconds=100.0):
+                waiter = asyncio.create_task(scheduler.slot(1.0, predicted_seconds=50.0).__aenter__())
+                await asyncio.sleep(0)
+                assert scheduler.expected_wait() == pytest.approx(100.0, abs=1.0)
+                assert scheduler.expected_wait(2.0) == pytest.approx(150.0, abs=1.0)
+                waiter.cancel()
+                await asyncio.gather(waiter, return_exceptions=True)
+
+        asyncio.run(scenario())
+
+    def test_saturated_lane_rejects_with_retry_after(self, monkeypatch):
+        monkeypatch.setattr(settings_module.settings, "max_concurrent_tasks", 1)
+        monkeypatch.setattr(settings_module.settings, "admission_max_wait_seconds", 10.0)
+
+        async def scenario():
+            async with lane_scheduler(get_lane(SLOW_LANE)).slot(0.0, predicted_seconds=100.0):
+                with pytest.raises(ServiceSaturatedError) as excinfo:
+                    check_admission("ip:a", ["-oms", "r.oms", "x.cif"], 1.0)
+                assert 85 <= excinfo.value.retry_after <= 91
+                check_admission("ip:a", ["-res", "r.res", "x.cif"], 1.0)  # the fast lane is idle
+
+        asyncio.run(scenario())
+
+    def test_tenant_backlog(self, monkeypatch):
+        monkeypatch.setattr(settings_module.settings, "admission_tenant_max_seconds", 100.0)
+        args = ["-res", "r.res", "x.cif"]
+
+        async def scenario():
+            with admit("ip:a", args, 500.0):  # one oversized run is admitted
+                with pytest.raises(TenantBacklogError) as excinfo:
+                    check_admission("ip:a", args, 1.0)
+                assert excinfo.value.status_code == 429 and excinfo.value.retry_after >= 1
+                check_admission("ip:b", args, 1.0)
+            check_admission("ip:a", args, 1.0)
+
+        asyncio.run(scenario())
+
+
+class TestCpuQuotas:
+    def test_token_bucket_refills_and_reports_exhausted_tenants(self, tmp_path, monkeypatch):
+        store = QuotaStore(tmp_path / "quotas")
+        assert store.peek("key:a", 100.0, 1.0) == 100.0
+        assert store.charge("key:a", 150.0, 100.0, 1.0) == pytest.approx(-50.0)
+        assert store.exhausted(100.0, 1.0) == ["key:a"]
+
+        now = time.time()
+        monkeypatch.setattr(quota_store_utils.time, "time", lambda: now + 60)
+        assert store.peek("key:a", 100.0, 1.0) == pytest.approx(10.0, abs=1.0)
+        assert store.exhausted(100.0, 1.0) == []
+        monkeypatch.setattr(quota_store_utils.time, "time", lambda: now + 3600)
+        assert store.peek("key:a", 100.0, 1.0) == 100.0
+
+    def test_processes_are_charged_to_the_metered_tenant(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(quota, "store", QuotaStore(tmp_path / "quotas"))
+        monkeypatch.setattr(runtime_model, "store", RuntimeStore(tmp_path / "runtimes"))
+        monkeypatch.setattr(settings_module.settings, "quota_cpu_seconds_per_hour", 36.0)
+        monkeypatch.setattr(settings_module.settings, "quota_burst_cpu_seconds", 1.0)
+        runner = ZeoRunner(zeo_exec_path=sys.executable)
+
+        async def scenario():
+            async with metered("key:a"):
+                await runner._run_process(["-c", "import time; time.sleep(0.3)"], tmp_path, None, 10, StructureSize(1))
+            await runner._run_process(["-c", "pass"], tmp_path, None, 10, StructureSize(1))
+
+        asyncio.run(scenario())
+        status = quota.quota_status("key:a")
+        assert status.limit == 1.0
+        assert status.remaining <= 1.0 - 0.3 - settings_module.settings.quota_request_cpu_seconds + 0.01
+        assert quota.quota_status("key:b").remaining == 1.0
+
+        quota.charge("key:a", 10.0)
+        with pytest.raises(QuotaExceededError) as excinfo:
+            quota.check_quota("key:a")
+        assert excinfo.value.status_code == 429 and excinfo.value.retry_after >= 9
+
+    def test_jobs_of_exhausted_tenants_are_claimed_last(self, tmp_path):
+        store = JobStore(tmp_path / "jobs")
+        heavy = store.create("analysis", {"ha": True, "tenant": "key:heavy"}, "s1")
+        light = store.create("analysis", {"ha": True, "tenant": "key:light"}, "s2")
+
+        assert store.claim_next("worker", deferred_tenants=["key:heavy"])["id"] == light["id"]
+        assert store.claim_next("worker", deferred_tenants=["key:heavy"])["id"] == heavy["id"]
+
+
+class TestDeadlines:
+    def test_deadline_scope_only_tightens(self):
+        assert current_deadline() is None
+        with deadline_scope(10):
+            outer = current_deadline()
+            with deadline_scope(3600):
+                assert current_deadline() == outer
+            with deadline_scope(1):
+                assert current_deadline() < outer
+                with pytest.raises(DeadlineExceededError):
+                    check_deadline(5.0)
+            check_deadline(5.0)
+        assert current_deadline() is None
+
+        assert parse_timeout("2.5") == 2.5
+        for value in ("abc", "0", "-1", "inf", "nan"):
+            with pytest.raises(ValueError):
+                parse_timeout(value)
+
+    def test_runner_refuses_runs_predicted_to_miss_the_deadline(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(runtime_model, "estimate", lambda zeo_args, structure_file: (StructureSize(1), 30.0))
+        runner = ZeoRunner(zeo_exec_path=sys.executable)
+
+        async def scenario():
+            with deadline_scope(5):
+                return await runner._execute_async(["-c", "pass"], tmp_path)
+
+        success, exit_code, _, stderr = asyncio.run(scenario())
+        assert not success and exit_code == DEADLINE_EXIT_CODE
+        assert "predicted 30.0s" in stderr
+
+    def test_process_timeout_is_shortened_to_the_deadline(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(runtime_model, "store", RuntimeStore(tmp_path / "runtimes"))
+        runner = ZeoRunner(zeo_exec_path=sys.executable)
+
+        async def scenario():
+            with deadline_scope(0.5):
+                zeo_args = ["-c", "import time; time.sleep(5)"]
+                return await runner._execute_in_lane(
+                    get_lane(SLOW_LANE), zeo_args, tmp_path, None, 0.0, 0.1, StructureSize(1)
+                )
+
+        started = time.monotonic()
+        success, exit_code, _, _ = asyncio.run(scenario())
+        assert not success and exit_code == DEADLINE_EXIT_CODE
+        assert time.monotonic() - started < 4
+
+    def test_queued_jobs_past_their_deadline_expire(self, tmp_path):
+        store = JobStore(tmp_path / "jobs")
+        overdue = store.create("analysis", {"ha": True, "deadline": time.time() - 1}, "s1")
+        pending = store.create("analysis", {"ha": True, "deadline": time.time() + 3600}, "s2")
+        unbounded = store.create("analysis", {"ha": True}, "s3")
+
+        assert store.expire_overdue({"code": "ZEOPP_1003"}) == 1
+        assert store.get(overdue["id"])["status"] == "failed"
+        assert store.get(overdue["id"])["error"] == {"code": "ZEOPP_1003"}
+        assert store.get(pending["id"])["status"] == "queued"
+        assert store.get(unbounded["id"])["status"] == "queued"
+
+
+class TestRunnerCombined:
+    def test_run_combined_single_invocation_and_shared_cache(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(file_utils, "CACHE_DIR", tmp_path / "cache")
+        task_dir = tmp_path / "task"
+        task_dir.mkdir()
+        structure_file = task_dir / "input.cif"
+        structure_file.write_text("data", encoding="utf-8")
+
+        calls = []
+
+        async def fake_execute(self, zeo_args, cwd, on_output=None):
+            calls.append(zeo_args)
+            for arg in zeo_args:
+                if arg.startswith("result."):
+                    (cwd / arg).write_text(f"output of {arg}", encoding="utf-8")
+            return True, 0, "", ""
+
+        monkeypatch.setattr(ZeoRunner, "_execute_async", fake_execute)
+        runner = ZeoRunner()
+        segments = [
+            ("pore_diameter", ["-res", "result.res"], ["result.res"]),
+            ("channel_analysis", ["-chan", "1.21", "result.chan"], ["result.chan"]),
+        ]
+        results = asyncio.run(runner.run_combined_async(structure_file, segments, ha=True))
+
+        assert calls == [["-ha", "-res", "result.res", "-chan", "1.21", "result.chan", "input.cif"]]
+        assert results["pore_diameter"]["output_data"]["result.res"] == "output of result.res"
+        assert results["channel_analysis"]["cached"] is False
+
+        single = asyncio.run(runner.run_command_async(
+            structure_file=structure_file,
+            zeo_args=["-ha", "-res", "result.res", "input.cif"],
+            output_files=["result.res"],
+        ))
+        assert single["cached"] is True
+        assert len(calls) == 1